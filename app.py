@@ -9,11 +9,13 @@ from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import time
 from src.db.connection import init_db
-from src.utils.auth import create_initial_admin
+from src.utils.auth import create_initial_admin, login_session
 from src.components.ai_page_context import add_ai_page_context # Removed render_page_ai_assistant as it's not directly called here
-from src.services import device_service, material_service, certification_service, auth_service # Added auth_service
-from src.components.universal_css import inject_universal_css
+from src.services import device_service, material_service, certification_service, auth_service, usage_rollup_service # Added auth_service
+from src.components.universal_css import inject_dashboard_css
 from src.components.navigation import create_sidebar
+from src.services.cache_warmup_service import start_background_refresh, get_aggregate
+from src.services.utilization_service import get_utilization
 
 # Page configuration
 st.set_page_config(
@@ -23,16 +25,11 @@ st.set_page_config(
     initial_sidebar_state="collapsed",
 )
 
-# Inject universal CSS
-inject_universal_css()
+# Warm the hot aggregates and keep them fresh in the background (no-op after the first run)
+start_background_refresh()
 
-# Function to load custom CSS
-def load_css(file_name):
-    with open(file_name) as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-# Load custom CSS
-load_css("static/css/custom.css")
+# Inject universal + custom CSS as one cached static asset (sent once per browser session)
+inject_dashboard_css()
 
 
 # Initialize session state for authentication if not already done
@@ -66,10 +63,7 @@ def display_login_form():
             else:
                 user = auth_service.authenticate_user(username_input, password_input)
                 if user:
-                    st.session_state.authenticated = True
-                    st.session_state.username = user['username']
-                    st.session_state.user_role = user['role']
-                    st.session_state.user_info = user # Store full user info if needed
+                    login_session(user) # Resolve identity, role and permissions once for this session
                     st.success("Login successful!")
                     time.sleep(1) # Brief pause
                     st.rerun() # Rerun to show the main app
@@ -192,7 +186,7 @@ def main_dashboard():
 
     # Fetch print job stats
     try:
-        production_stats = print_job_service.get_print_job_statistics()
+        production_stats = get_aggregate("print_job_statistics")
         success_rate = production_stats.get("success_rate", 0)
         avg_duration = production_stats.get("average_duration_minutes", 0)
         total_material_used = production_stats.get("total_material_used", 0)
@@ -290,57 +284,6 @@ def main_dashboard():
         """.format(on_time_delivery), unsafe_allow_html=True)
         st.metric(label="On-Time Delivery", value=f"{on_time_delivery}%", delta="1.8%", delta_color="normal", label_visibility="collapsed")
     
-    # Add CSS for KPI cards
-    st.markdown("""
-    <style>
-        .kpi-card {
-            background: rgba(255, 255, 255, 0.05);
-            border-radius: 10px;
-            padding: 15px;
-            box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-            text-align: center;
-            border-left: 4px solid #4CAF50;
-            margin-bottom: 10px;
-            transition: transform 0.3s ease;
-        }
-        .kpi-card:hover {
-            transform: translateY(-5px);
-        }
-        .kpi-title {
-            font-size: 0.9rem;
-            color: #aaa;
-            margin-bottom: 5px;
-        }
-        .kpi-value {
-            font-size: 1.8rem;
-            font-weight: bold;
-            color: white;
-            margin-bottom: 5px;
-        }
-        .kpi-trend {
-            font-size: 0.8rem;
-            font-style: italic;
-        }
-        .kpi-trend.positive {
-            color: #4CAF50;
-        }
-        .kpi-trend.negative {
-            color: #F44336;
-        }
-        .kpi-trend.neutral {
-            color: #FFC107;
-        }
-        .device-kpi { border-left-color: #2196F3; }
-        .material-kpi { border-left-color: #FF9800; }
-        .cert-kpi { border-left-color: #E91E63; }
-        .user-kpi { border-left-color: #9C27B0; }
-        .production-kpi { border-left-color: #4CAF50; }
-        .time-kpi { border-left-color: #00BCD4; }
-        .material-usage-kpi { border-left-color: #FF5722; }
-        .delivery-kpi { border-left-color: #8BC34A; }
-    </style>
-    """, unsafe_allow_html=True)
-
     st.markdown("<hr/>", unsafe_allow_html=True)
     
     # Display content based on selected tab
@@ -687,45 +630,6 @@ def main_dashboard():
             </div>
             """, unsafe_allow_html=True)
             
-            st.markdown("""
-            <style>
-                .quality-kpi-card {
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 8px;
-                    padding: 12px;
-                    margin-bottom: 15px;
-                    border-left: 3px solid #4CAF50;
-                }
-                .quality-kpi-title {
-                    font-size: 0.9rem;
-                    color: #aaa;
-                    margin-bottom: 5px;
-                }
-                .quality-kpi-value {
-                    font-size: 1.5rem;
-                    font-weight: bold;
-                    color: white;
-                    margin-bottom: 5px;
-                }
-                .quality-kpi-trend {
-                    font-size: 0.8rem;
-                    margin-bottom: 8px;
-                }
-                .quality-kpi-bar {
-                    height: 6px;
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 3px;
-                    overflow: hidden;
-                }
-                .quality-kpi-fill {
-                    height: 100%;
-                    background: linear-gradient(90deg, #4CAF50, #8BC34A);
-                }
-                .quality-kpi-fill.negative {
-                    background: linear-gradient(90deg, #F44336, #FF9800);
-                }
-            </style>
-            """, unsafe_allow_html=True)
             st.markdown('</div>', unsafe_allow_html=True)
             
             # Top Quality Issues
@@ -775,38 +679,38 @@ def main_dashboard():
             eqp_tabs = st.tabs(["Utilization", "Downtime", "OEE"])
             
             with eqp_tabs[0]:  # Utilization tab
-                # Sample data - equipment utilization over time
-                equipment_names = ["3D Printer A", "CNC Mill B", "Assembly Robot C", "Laser Cutter D", "Injection Mold E"]
-                dates = pd.date_range(end=datetime.now(), periods=30).strftime("%m-%d").tolist()
-                
-                # Generate random utilization data with trends
-                np.random.seed(42)  # for reproducible results
-                base_levels = [75, 80, 65, 70, 85]  # base utilization levels
-                
-                utilization_data = {}
-                for i, equipment in enumerate(equipment_names):
-                    # Create data with realistic patterns and some noise
-                    base = base_levels[i]
-                    trend = np.linspace(0, 5, 30) if i % 2 == 0 else np.linspace(2, -2, 30)
-                    weekly = 5 * np.sin(np.linspace(0, 2*np.pi, 30))
-                    noise = np.random.normal(0, 3, 30)
-                    values = np.clip(base + trend + weekly + noise, 0, 100).tolist()
-                    utilization_data[equipment] = values
-                
-                # Create multi-line chart
+                # Busy time per device per day from print job start/end times
+                utilization = get_utilization(days=30)
+                percent = utilization["percent"]
+                dates = pd.to_datetime(utilization["bin_starts"]).strftime("%m-%d").tolist()
+
                 fig_utilization = go.Figure()
-                
-                for equipment, values in utilization_data.items():
+
+                if percent.size and percent.any():
+                    # Busiest devices over the window, plus the fleet average
+                    top = np.argsort(percent.mean(axis=1))[::-1][:5]
+                    for index in top:
+                        fig_utilization.add_trace(
+                            go.Scatter(
+                                x=dates,
+                                y=percent[index].round(1),
+                                mode='lines+markers',
+                                name=utilization["device_names"][index],
+                                marker=dict(size=6)
+                            )
+                        )
                     fig_utilization.add_trace(
                         go.Scatter(
                             x=dates,
-                            y=values,
-                            mode='lines+markers',
-                            name=equipment,
-                            marker=dict(size=6)
+                            y=percent.mean(axis=0).round(1),
+                            mode='lines',
+                            name='Fleet Average',
+                            line=dict(width=3)
                         )
                     )
-                
+                else:
+                    st.info("No print job history in the last 30 days to compute utilization.")
+
                 # Add target line
                 fig_utilization.add_trace(
                     go.Scatter(
@@ -823,7 +727,7 @@ def main_dashboard():
                     title='Equipment Utilization (Last 30 Days)',
                     xaxis_title='Date',
                     yaxis_title='Utilization (%)',
-                    yaxis=dict(range=[40, 100]),
+                    yaxis=dict(range=[0, 100]),
                     hovermode='x unified',
                     legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1)
                 )
@@ -860,26 +764,33 @@ def main_dashboard():
                 st.plotly_chart(fig_downtime, use_container_width=True)
                 
             with eqp_tabs[2]:  # OEE tab
-                # Sample data - OEE components by equipment
-                oee_equipment = ["3D Printer A", "3D Printer B", "CNC Mill A", "CNC Mill B", "Assembly Line"]
-                
-                # OEE components - Availability, Performance, Quality
-                availability = [92.5, 88.7, 94.1, 90.3, 96.2]
-                performance = [87.3, 85.1, 91.2, 88.5, 83.7]
-                quality = [98.2, 97.5, 95.8, 96.7, 99.1]
-                
-                # Calculate OEE
-                oee = [(a * p * q) / 10000 for a, p, q in zip(availability, performance, quality)]
-                
+                # OEE components per device, from the materialized daily table
+                oee_rows = [row for row in (get_aggregate("device_oee") or []) if row["oee"] is not None]
+                oee_rows = sorted(oee_rows, key=lambda row: row["finished_jobs"], reverse=True)[:8]
+
+                oee_equipment = [row["name"] for row in oee_rows]
+                oee = [row["oee"] for row in oee_rows]
+
                 # Create DataFrame
                 oee_df = pd.DataFrame({
                     "Equipment": oee_equipment,
-                    "Availability (%)": availability,
-                    "Performance (%)": performance,
-                    "Quality (%)": quality,
+                    "Availability (%)": [row["availability"] for row in oee_rows],
+                    "Performance (%)": [row["performance"] for row in oee_rows],
+                    "Quality (%)": [row["quality"] for row in oee_rows],
                     "OEE (%)": oee
                 })
-                
+
+                if not oee_rows:
+                    st.info("No finished print jobs in the last 30 days to compute OEE.")
+                else:
+                    fleet_oee = get_aggregate("fleet_oee") or []
+                    location_oee = get_aggregate("location_oee") or []
+                    if fleet_oee and fleet_oee[0]["oee"] is not None:
+                        by_location = ", ".join(
+                            f"{row['location']} {row['oee']:.1f}%" for row in location_oee if row["oee"] is not None
+                        )
+                        st.caption(f"Fleet OEE: {fleet_oee[0]['oee']:.1f}%" + (f" · By location: {by_location}" if by_location else ""))
+
                 # Create grouped bar chart
                 fig_oee = px.bar(
                     oee_df,
@@ -915,7 +826,7 @@ def main_dashboard():
                 fig_oee.update_layout(
                     xaxis_title='Equipment',
                     yaxis_title='Percentage (%)',
-                    yaxis=dict(range=[70, 100]),
+                    yaxis=dict(range=[0, 105]),
                     legend_title='Metric'
                 )
                 
@@ -1016,69 +927,6 @@ def main_dashboard():
                 </div>
                 """, unsafe_allow_html=True)
             
-            # Add CSS for equipment cards
-            st.markdown("""
-            <style>
-                .equipment-card {
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 8px;
-                    padding: 12px;
-                    margin-bottom: 15px;
-                    border-left: 4px solid #4CAF50;
-                }
-                .equipment-card.warning {
-                    border-left-color: #FFC107;
-                }
-                .equipment-card.critical {
-                    border-left-color: #F44336;
-                }
-                .equipment-header {
-                    display: flex;
-                    justify-content: space-between;
-                    align-items: center;
-                    margin-bottom: 10px;
-                }
-                .equipment-name {
-                    font-weight: bold;
-                    font-size: 1.1rem;
-                }
-                .equipment-status {
-                    font-size: 0.9rem;
-                    padding: 3px 8px;
-                    border-radius: 12px;
-                    background: rgba(76, 175, 80, 0.2);
-                }
-                .equipment-card.warning .equipment-status {
-                    background: rgba(255, 193, 7, 0.2);
-                }
-                .equipment-card.critical .equipment-status {
-                    background: rgba(244, 67, 54, 0.2);
-                }
-                .equipment-health-bar {
-                    height: 8px;
-                    background: rgba(255, 255, 255, 0.1);
-                    border-radius: 4px;
-                    overflow: hidden;
-                    margin-bottom: 5px;
-                }
-                .equipment-health-fill {
-                    height: 100%;
-                }
-                .equipment-health-label {
-                    font-size: 0.9rem;
-                    margin-bottom: 8px;
-                }
-                .equipment-details {
-                    font-size: 0.85rem;
-                    color: #aaa;
-                }
-                .equipment-alert {
-                    margin-top: 8px;
-                    font-size: 0.85rem;
-                    color: #FFC107;
-                }
-            </style>
-            """, unsafe_allow_html=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
             
@@ -1151,28 +999,41 @@ def main_dashboard():
             # Create tabs for different material views
             mat_tabs = st.tabs(["By Material Type", "By Product Line", "By Month"])
             
+            # Daily usage rollup: last 12 months of consumption per material type
+            usage_end = datetime.now()
+            monthly_usage = pd.DataFrame(usage_rollup_service.get_usage_by_period(
+                usage_end - timedelta(days=365), usage_end, period="month", by="material_type"
+            ))
+
             with mat_tabs[0]:  # By Material Type
-                # Sample data - material consumption by type
-                material_types = ["PLA", "ABS", "Resin", "Metal Powder", "Nylon", "TPU", "Carbon Fiber", "PETG"]
-                consumption = [285.6, 142.3, 78.9, 35.2, 67.8, 41.2, 28.6, 92.5]  # in kg
-                
-                # Create bar chart
-                fig_mat_consumption = px.bar(
-                    x=material_types,
-                    y=consumption,
-                    color=material_types,
-                    labels={"x": "Material Type", "y": "Consumption (kg)"},
-                    title="Material Consumption by Type (Last Quarter)"
-                )
-                
-                # Customize layout
-                fig_mat_consumption.update_layout(
-                    xaxis_title="Material Type",
-                    yaxis_title="Consumption (kg)",
-                    showlegend=False
-                )
-                
-                st.plotly_chart(fig_mat_consumption, use_container_width=True)
+                quarter_usage = pd.DataFrame(usage_rollup_service.get_usage_by_period(
+                    usage_end - timedelta(days=90), usage_end, period="month", by="material_type"
+                ))
+                if quarter_usage.empty:
+                    st.info("No material consumption recorded in the last quarter.")
+                else:
+                    by_type = (
+                        quarter_usage.groupby("group", as_index=False)["usage_amount"].sum()
+                        .sort_values("usage_amount", ascending=False)
+                    )
+
+                    # Create bar chart
+                    fig_mat_consumption = px.bar(
+                        x=by_type["group"],
+                        y=by_type["usage_amount"].round(2),
+                        color=by_type["group"],
+                        labels={"x": "Material Type", "y": "Consumption"},
+                        title="Material Consumption by Type (Last Quarter)"
+                    )
+
+                    # Customize layout
+                    fig_mat_consumption.update_layout(
+                        xaxis_title="Material Type",
+                        yaxis_title="Consumption",
+                        showlegend=False
+                    )
+
+                    st.plotly_chart(fig_mat_consumption, use_container_width=True)
                 
             with mat_tabs[1]:  # By Product Line
                 # Sample data - material consumption by product line
@@ -1208,40 +1069,32 @@ def main_dashboard():
                 st.plotly_chart(fig_mat_product, use_container_width=True)
                 
             with mat_tabs[2]:  # By Month
-                # Sample data - monthly material consumption
-                months = list(calendar.month_abbr)[1:]
-                
-                # Consumption data for multiple materials
-                monthly_consumption = {
-                    "PLA": [22.3, 24.5, 21.8, 25.7, 28.2, 27.6, 30.5, 26.8, 24.2, 23.5, 28.4, 30.1],
-                    "ABS": [12.5, 13.8, 15.2, 10.8, 11.3, 10.9, 12.2, 14.5, 15.7, 11.6, 12.8, 13.0],
-                    "Resin": [8.2, 7.5, 6.9, 7.3, 8.5, 8.9, 7.2, 6.5, 7.8, 8.1, 7.8, 8.1],
-                    "Metal Powder": [2.8, 3.1, 3.2, 2.7, 3.5, 3.8, 3.2, 2.9, 3.4, 2.8, 3.0, 3.3]
-                }
-                
-                # Create multi-line chart
-                fig_monthly_mat = go.Figure()
-                
-                for material, values in monthly_consumption.items():
-                    fig_monthly_mat.add_trace(
-                        go.Scatter(
-                            x=months,
-                            y=values,
-                            mode='lines+markers',
-                            name=material
+                if monthly_usage.empty:
+                    st.info("No material consumption recorded yet.")
+                else:
+                    # Create multi-line chart
+                    fig_monthly_mat = go.Figure()
+
+                    for material, values in monthly_usage.groupby("group"):
+                        fig_monthly_mat.add_trace(
+                            go.Scatter(
+                                x=values["period"],
+                                y=values["usage_amount"].round(2),
+                                mode='lines+markers',
+                                name=material
+                            )
                         )
+
+                    # Customize layout
+                    fig_monthly_mat.update_layout(
+                        title="Monthly Material Consumption by Type",
+                        xaxis_title="Month",
+                        yaxis_title="Consumption",
+                        hovermode="x unified",
+                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
                     )
-                
-                # Customize layout
-                fig_monthly_mat.update_layout(
-                    title="Monthly Material Consumption by Type",
-                    xaxis_title="Month",
-                    yaxis_title="Consumption (kg)",
-                    hovermode="x unified",
-                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                )
-                
-                st.plotly_chart(fig_monthly_mat, use_container_width=True)
+
+                    st.plotly_chart(fig_monthly_mat, use_container_width=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
             
@@ -1432,73 +1285,61 @@ def main_dashboard():
             st.markdown('<div class="chart-container">', unsafe_allow_html=True)
             st.subheader("Material Cost Analysis")
             
-            # Sample cost data
-            cost_data = {
-                "Category": ["PLA", "ABS", "Resin", "Metal", "Specialty"],
-                "Unit Cost ($/kg)": [25, 28, 65, 120, 85],
-                "Monthly Usage (kg)": [145, 95, 48, 22, 18],
-                "Monthly Cost ($)": [3625, 2660, 3120, 2640, 1530]
-            }
-            
-            cost_df = pd.DataFrame(cost_data)
-            
-            # Create pie chart for cost distribution
-            fig_cost = px.pie(
-                cost_df,
-                values="Monthly Cost ($)",
-                names="Category",
-                title="Material Cost Distribution",
-                color_discrete_sequence=px.colors.qualitative.Set3
-            )
-            
-            fig_cost.update_traces(
-                textposition="inside",
-                textinfo="percent+label"
-            )
-            
-            # Update layout
-            fig_cost.update_layout(
-                height=300,
-                margin=dict(t=30, b=10, l=10, r=10)
-            )
-            
-            st.plotly_chart(fig_cost, use_container_width=True)
-            
-            # Cost trend by month (line chart)
-            months = list(calendar.month_abbr)[1:7]  # Last 6 months
-            
-            # Sample trend data for different material categories
-            cost_trends = {
-                "PLA": [3200, 3450, 3625, 3580, 3700, 3625],
-                "ABS": [2400, 2550, 2480, 2660, 2720, 2660],
-                "Resin": [2900, 3050, 3180, 3250, 3120, 3120],
-                "Metal": [2300, 2450, 2580, 2620, 2530, 2640],
-                "Specialty": [1200, 1350, 1420, 1480, 1550, 1530]
-            }
-            
-            # Create stacked area chart
-            fig_cost_trend = go.Figure()
+            # FIFO cost of material consumed over the last six months, from the valuation engine
+            cost_df = pd.DataFrame(get_aggregate("material_cost_by_month"))
+            inventory_value = get_aggregate("inventory_value")
+            st.metric("Inventory Value (FIFO)", f"${inventory_value:,.0f}")
             
-            for material, costs in cost_trends.items():
-                fig_cost_trend.add_trace(
-                    go.Scatter(
-                        x=months,
-                        y=costs,
-                        mode="lines",
-                        stackgroup="one",
-                        name=material
+            if cost_df.empty:
+                st.info("No material consumption recorded in the last six months.")
+            else:
+                by_type_cost = cost_df.groupby("group", as_index=False)["consumed_cost"].sum()
+                
+                # Create pie chart for cost distribution
+                fig_cost = px.pie(
+                    by_type_cost,
+                    values="consumed_cost",
+                    names="group",
+                    title="Material Cost Distribution",
+                    color_discrete_sequence=px.colors.qualitative.Set3
+                )
+                
+                fig_cost.update_traces(
+                    textposition="inside",
+                    textinfo="percent+label"
+                )
+                
+                # Update layout
+                fig_cost.update_layout(
+                    height=300,
+                    margin=dict(t=30, b=10, l=10, r=10)
+                )
+                
+                st.plotly_chart(fig_cost, use_container_width=True)
+                
+                # Create stacked area chart of the monthly cost per material type
+                fig_cost_trend = go.Figure()
+                
+                for material_type, costs in cost_df.groupby("group"):
+                    fig_cost_trend.add_trace(
+                        go.Scatter(
+                            x=costs["period"],
+                            y=costs["consumed_cost"].round(2),
+                            mode="lines",
+                            stackgroup="one",
+                            name=material_type
+                        )
                     )
+                
+                # Customize layout
+                fig_cost_trend.update_layout(
+                    title="Monthly Material Cost Trends",
+                    xaxis_title="Month",
+                    yaxis_title="Cost ($)",
+                    legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5)
                 )
-            
-            # Customize layout
-            fig_cost_trend.update_layout(
-                title="Monthly Material Cost Trends",
-                xaxis_title="Month",
-                yaxis_title="Cost ($)",
-                legend=dict(orientation="h", yanchor="top", y=-0.1, xanchor="center", x=0.5)
-            )
-            
-            st.plotly_chart(fig_cost_trend, use_container_width=True)
+                
+                st.plotly_chart(fig_cost_trend, use_container_width=True)
             st.markdown('</div>', unsafe_allow_html=True)
             
     elif st.session_state.dashboard_tab == "Advanced Analytics":
@@ -1574,35 +1415,6 @@ def main_dashboard():
                     </div>
                 </div>
             </div>
-            
-            <style>
-                .insight-cards {
-                    display: flex;
-                    gap: 10px;
-                    margin-top: 10px;
-                }
-                .insight-card {
-                    flex: 1;
-                    background: rgba(255, 255, 255, 0.05);
-                    border-radius: 8px;
-                    padding: 10px;
-                    border-left: 3px solid #2196F3;
-                }
-                .insight-card:nth-child(2) {
-                    border-left-color: #4CAF50;
-                }
-                .insight-card:nth-child(3) {
-                    border-left-color: #FFC107;
-                }
-                .insight-title {
-                    font-weight: bold;
-                    margin-bottom: 5px;
-                    font-size: 0.9rem;
-                }
-                .insight-content {
-                    font-size: 0.85rem;
-                }
-            </style>
             """, unsafe_allow_html=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
@@ -1829,72 +1641,6 @@ def main_dashboard():
                         </div>
                     </div>
                 </div>
-                <style>
-                    .model-container {
-                        background: rgba(33, 150, 243, 0.1);
-                        border-radius: 8px;
-                        overflow: hidden;
-                        margin-bottom: 15px;
-                    }
-                    .model-header {
-                        display: flex;
-                        justify-content: space-between;
-                        align-items: center;
-                        background: rgba(33, 150, 243, 0.2);
-                        padding: 8px 12px;
-                    }
-                    .model-title {
-                        font-weight: bold;
-                    }
-                    .model-accuracy {
-                        font-size: 0.8rem;
-                        background: rgba(76, 175, 80, 0.2);
-                        padding: 3px 8px;
-                        border-radius: 12px;
-                    }
-                    .model-content {
-                        padding: 12px;
-                    }
-                    .anomaly-metrics {
-                        display: flex;
-                        justify-content: space-between;
-                        margin-bottom: 15px;
-                    }
-                    .anomaly-metric {
-                        text-align: center;
-                    }
-                    .anomaly-value {
-                        font-size: 1.5rem;
-                        font-weight: bold;
-                    }
-                    .anomaly-label {
-                        font-size: 0.8rem;
-                        color: #aaa;
-                    }
-                    .anomaly-list-header {
-                        margin-bottom: 8px;
-                        font-weight: bold;
-                        font-size: 0.9rem;
-                    }
-                    .anomaly-list {
-                        font-size: 0.85rem;
-                    }
-                    .anomaly {
-                        display: flex;
-                        justify-content: space-between;
-                        padding: 5px;
-                        margin-bottom: 3px;
-                        border-radius: 4px;
-                    }
-                    .anomaly.critical {
-                        background: rgba(244, 67, 54, 0.1);
-                        border-left: 3px solid #F44336;
-                    }
-                    .anomaly.warning {
-                        background: rgba(255, 193, 7, 0.1);
-                        border-left: 3px solid #FFC107;
-                    }
-                </style>
                 """, unsafe_allow_html=True)
             
             # Predictive maintenance model
@@ -1929,49 +1675,6 @@ def main_dashboard():
                         </div>
                     </div>
                 </div>
-                <style>
-                    .gauge-container {
-                        margin-bottom: 10px;
-                    }
-                    .gauge-header {
-                        margin-bottom: 10px;
-                        font-weight: bold;
-                        font-size: 0.9rem;
-                    }
-                    .gauge-row {
-                        display: flex;
-                        justify-content: space-between;
-                    }
-                    .gauge {
-                        flex: 1;
-                        text-align: center;
-                        padding: 0 5px;
-                    }
-                    .gauge-title {
-                        font-size: 0.85rem;
-                        margin-bottom: 5px;
-                    }
-                    .gauge-visual {
-                        height: 5px;
-                        background: linear-gradient(to right, #F44336, #FFC107, #4CAF50);
-                        position: relative;
-                        border-radius: 3px;
-                        margin-bottom: 5px;
-                    }
-                    .gauge-visual::after {
-                        content: "";
-                        position: absolute;
-                        left: var(--value);
-                        top: -5px;
-                        width: 2px;
-                        height: 15px;
-                        background: white;
-                    }
-                    .gauge-label {
-                        font-size: 0.75rem;
-                        color: #aaa;
-                    }
-                </style>
                 """, unsafe_allow_html=True)
             
             st.markdown('</div>', unsafe_allow_html=True)
@@ -11,6 +11,7 @@ from src.services.device_service import (
     update_device,
     delete_device,  # Added delete_device for device deletion
 )
+from src.services.cache_warmup_service import get_aggregate
 from src.services.maintenance_service import (
     get_maintenance_records,
     schedule_maintenance,
@@ -415,8 +416,10 @@ def generate_device_visualizations():
 
     # Device Status Distribution
     with col1:
-        status_counts = devices_df["Status"].value_counts().reset_index()
-        status_counts.columns = ["Status", "Count"]
+        # Counted over the whole fleet and warmed in the background
+        status_counts = pd.DataFrame(
+            list((get_aggregate("device_status_distribution") or {}).items()), columns=["Status", "Count"]
+        ).sort_values("Count", ascending=False)
 
         fig1 = px.pie(
             status_counts,
@@ -435,8 +438,9 @@ def generate_device_visualizations():
 
     # Device Type Distribution
     with col2:
-        type_counts = devices_df["Type"].value_counts().reset_index()
-        type_counts.columns = ["Type", "Count"]
+        type_counts = pd.DataFrame(
+            get_aggregate("device_type_distribution") or [], columns=["Type", "Count"]
+        ).sort_values("Count", ascending=False)
 
         fig2 = px.bar(
             type_counts, x="Type", y="Count", title="Device Types", color="Type"
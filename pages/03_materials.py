@@ -9,6 +9,8 @@ from src.services.material_service import (
     create_material,
     update_material,
 )
+from src.services.reservation_service import get_available_to_promise
+from src.services.stock_import_service import import_stock_movements
 from src.utils.auth import check_authentication
 from src.components.navigation import create_sidebar
 from src.components.ai_page_context import add_ai_page_context, render_page_ai_assistant, get_materials_page_context
@@ -167,6 +169,10 @@ def display_material_details(material_id):
         with col1:
             st.write(f"**Type:** {material['material_type']}")
             st.write(f"**Stock Quantity:** {material['stock_quantity']} {material['unit']}")
+            atp = get_available_to_promise([material_id]).get(material_id)
+            if atp:
+                st.write(f"**Available to Promise:** {atp['available']:.2f} {material['unit']} "
+                         f"({atp['reserved']:.2f} reserved for print jobs)")
             st.write(f"**Minimum Stock Level:** {material['min_stock_level']} {material['unit']}")
             st.write(f"**Location:** {material['storage_location']}")
             st.write(f"**Status:** {material['status']}")
@@ -321,6 +327,56 @@ def add_material_form():
                 st.error("Failed to add material.")
 
 
+def import_movements_form():
+    """Bulk import of stock receipts and issues from a CSV or Excel file."""
+    st.subheader("Import Stock Movements")
+    st.caption(
+        "Columns: material (name) or material_id, quantity (positive for receipts, "
+        "negative for issues), type (Purchase, Usage, Write-off, ...), and optionally "
+        "date, unit_cost and notes."
+    )
+
+    uploaded_file = st.file_uploader("Movements file", type=["csv", "xlsx"])
+    allow_negative = st.checkbox("Allow stock to go below zero", value=False)
+
+    if uploaded_file is None or not st.button("Import Movements"):
+        return
+
+    progress = st.progress(0.0, text="Reading file...")
+
+    def update_progress(processed, total):
+        if total:
+            progress.progress(min(processed / total, 1.0), text=f"Processed {processed:,} of {total:,} rows")
+        else:
+            progress.progress(0.0, text=f"Processed {processed:,} rows")
+
+    result = import_stock_movements(
+        uploaded_file,
+        filename=uploaded_file.name,
+        allow_negative=allow_negative,
+        progress_callback=update_progress,
+    )
+    progress.progress(1.0, text=f"Processed {result['rows']:,} rows")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Rows Read", f"{result['rows']:,}")
+    col2.metric("Movements Applied", f"{result['applied']:,}")
+    col3.metric("Rows Rejected", f"{result['rejected']:,}")
+
+    if result["errors"]:
+        errors_df = pd.DataFrame(result["errors"])
+        st.warning(f"{result['rejected']:,} row(s) were not imported.")
+        st.dataframe(errors_df, use_container_width=True, hide_index=True)
+        st.download_button(
+            "Download Error Report",
+            errors_df.to_csv(index=False),
+            file_name=f"{uploaded_file.name.rsplit('.', 1)[0]}_errors.csv",
+            mime="text/csv",
+        )
+    else:
+        st.success("All movements imported successfully!")
+
+
 def generate_material_visualizations():
     """Generate visualizations for material statistics."""
     st.subheader("Material Statistics")
@@ -428,7 +484,9 @@ def main():
     st.title("🧱 Material Inventory Management")
 
     # Tabs for different sections
-    tab1, tab2, tab3 = st.tabs(["Material Inventory", "Add New Material", "Statistics"])
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Material Inventory", "Add New Material", "Import Movements", "Statistics"]
+    )
 
     with tab1:
         display_materials()
@@ -437,6 +495,9 @@ def main():
         add_material_form()
 
     with tab3:
+        import_movements_form()
+
+    with tab4:
         generate_material_visualizations()
 
     # Render AI assistant for this page
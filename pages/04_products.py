@@ -11,6 +11,8 @@ from src.db.models.product import Product, ProductCategory, OEM
 from src.db.models.user import User
 from src.components.ai_page_context import add_ai_page_context, render_page_ai_assistant, get_products_page_context
 from src.components.universal_css import inject_universal_css
+from src.services.bom_service import get_bom
+from src.services.image_service import thumbnail_or_source
 from src.services.product_service import (
     get_all_products,
     get_product_by_id,
@@ -56,8 +58,9 @@ def display_product_details(product):
     col1, col2 = st.columns([1, 2])
 
     with col1:
-        if product.image_url:
-            st.image(product.image_url, width=300)
+        image = thumbnail_or_source(product.image_url, 300)
+        if image:
+            st.image(image, width=300)
         else:
             st.image("https://via.placeholder.com/300x300?text=No+Image", width=300)
 
@@ -106,7 +109,21 @@ def display_product_details(product):
 
     with tab2:
         st.write("#### Materials Used")
-        st.write(product.materials_used or "No materials information available")
+        bom = get_bom(product.id)
+        if bom:
+            bom_df = pd.DataFrame([
+                {
+                    "Component": line["material_name"] or line["component_name"],
+                    "Kind": "Material" if line["material_id"] is not None else "Sub-assembly",
+                    "Quantity per Unit": line["quantity"],
+                    "Unit": line["unit"] if line["material_id"] is not None else "pcs",
+                    "Source": line["source"],
+                }
+                for line in bom
+            ])
+            st.dataframe(bom_df, use_container_width=True, hide_index=True)
+        else:
+            st.write(product.materials_used or "No materials information available")
 
         st.write("#### Assembly Instructions")
         st.write(product.assembly_instructions or "No assembly instructions available")
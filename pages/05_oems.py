@@ -10,6 +10,7 @@ from src.db.models.product import OEM, Product
 from src.utils.auth import check_authentication, check_authorization
 from src.components.ai_page_context import add_ai_page_context, render_page_ai_assistant, get_oems_page_context
 from src.components.universal_css import inject_universal_css
+from src.services.image_service import thumbnail_or_source
 
 # Page configuration
 st.set_page_config(
@@ -388,7 +389,15 @@ def display_oem_details():
             st.session_state.selected_oem_id = None
     
     # OEM details header
-    st.title(oem_dict["name"])
+    logo = thumbnail_or_source(oem_dict["logo_url"], 128)
+    if logo:
+        logo_col, title_col = st.columns([1, 8])
+        with logo_col:
+            st.image(logo, width=96)
+        with title_col:
+            st.title(oem_dict["name"])
+    else:
+        st.title(oem_dict["name"])
     
     status_color = {
         "Active": "green",
@@ -11,6 +11,7 @@ from src.services.certification_service import (
     delete_certification,
     get_all_products
 )
+from src.services.cache_warmup_service import get_aggregate
 from src.services.material_service import get_all_materials
 from src.utils.auth import check_authentication, check_authorization
 from src.components.navigation import create_sidebar
@@ -375,6 +376,12 @@ def generate_certification_visualizations():
     # Expiring Certifications Timeline
     st.subheader("Certification Expiry Timeline")
     
+    # Active certifications by time until expiry, warmed in the background
+    expiry_buckets = get_aggregate("certification_expiry_buckets") or {}
+    if expiry_buckets:
+        for column, (bucket, count) in zip(st.columns(len(expiry_buckets)), expiry_buckets.items()):
+            column.metric(bucket, count)
+    
     # Only show valid certifications with expiry dates
     valid_certs = certs_df[(certs_df["Status"] == "Active") & (certs_df["Days Remaining"] > 0)]
     
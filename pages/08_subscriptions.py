@@ -16,7 +16,9 @@ from src.services.subscription_service import (
     get_active_subscriptions_trend,
     get_churn_rate_trend 
 )
-from src.services.auth_service import get_current_user_id, get_user_by_id # Assuming you have these
+from src.services.auth_service import get_usernames_by_ids
+from src.utils.auth import get_session_identity
+from src.services.cache_warmup_service import get_aggregate
 
 # --- Streamlit Page Configuration ---
 st.set_page_config(page_title="Subscription Management", layout="wide", page_icon="💳")
@@ -42,15 +44,11 @@ def main():
     # --- Database Session and User Authentication ---
     # db_session = next(get_session()) # Old way
     with get_db_session() as db_session: # New context managed way
-        current_user_id = get_current_user_id(db_session) # Placeholder, replace with actual auth
-        current_user = None
-        is_admin = False
+        identity = get_session_identity(db_session) # Resolved once per session, no per-render lookups
+        current_user_id = identity.user_id if identity else None
+        is_admin = identity.is_admin if identity else False
 
-        if current_user_id:
-            current_user = get_user_by_id(db_session, current_user_id) # Fetch user details
-            if current_user:
-                is_admin = current_user.role == "admin" # Check if user is admin
-        else:
+        if not current_user_id:
             st.warning("Please log in to manage subscriptions.")
             st.stop()
 
@@ -111,7 +109,7 @@ def main():
             st.header("Admin Dashboard: Subscription Metrics")
             
             # stats = get_mock_subscription_stats() # Old mock
-            stats = get_subscription_stats(db_session) # Service call
+            stats = get_aggregate("subscription_stats") # Warmed in the background
 
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Total Subscriptions", stats.get("total_subscriptions", 0))
@@ -123,7 +121,7 @@ def main():
             
             st.subheader("Revenue Trend (Last 90 Days)")
             # revenue_df = get_mock_total_revenue_over_time() # Old mock
-            revenue_df = get_total_revenue_over_time(db_session) # Service call
+            revenue_df = get_aggregate("subscription_revenue_series") # Warmed in the background
             if not revenue_df.empty:
                 revenue_chart = alt.Chart(revenue_df).mark_line(point=True).encode(
                     x=alt.X('date:T', title='Date'),
@@ -143,7 +141,7 @@ def main():
             with col_active:
                 st.subheader("Active Subscriptions Trend (Last 90 Days)")
                 # active_trend_df = get_mock_active_subscriptions_trend() # Old mock
-                active_trend_df = get_active_subscriptions_trend(db_session) # Service call
+                active_trend_df = get_aggregate("active_subscriptions_trend") # Warmed in the background
                 if not active_trend_df.empty:
                     active_chart = alt.Chart(active_trend_df).mark_area(
                         line={'color':'darkgreen'},
@@ -190,12 +188,12 @@ def main():
             if all_subs_list:
                 # Now we're getting just a list of Subscription objects
                 all_subs_data = []
+                # Resolve all usernames with one query instead of one lookup per row
+                usernames = get_usernames_by_ids((sub.user_id for sub in all_subs_list), db_session)
                 for sub in all_subs_list:
-                    # Get the username if needed (could be done in the service instead)
-                    user = get_user_by_id(db_session, sub.user_id) if sub.user_id else None
                     all_subs_data.append({
                         "user_id": sub.user_id,
-                        "user_name": user.username if user else "N/A",
+                        "user_name": usernames.get(sub.user_id, "N/A"),
                         "plan_name": sub.plan_name,
                         "start_date": sub.start_date.strftime("%Y-%m-%d"),
                         "end_date": sub.end_date.strftime("%Y-%m-%d") if sub.end_date else "N/A",
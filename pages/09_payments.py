@@ -12,7 +12,8 @@ from src.services.payment_service import (
     get_payment_volume_over_time
     # process_refund # Example, if you implement refund processing
 )
-from src.services.auth_service import get_current_user_id, get_user_by_id # Assuming you have these
+from src.utils.auth import get_session_identity
+from src.services.cache_warmup_service import get_aggregate
 from src.components.universal_css import inject_universal_css
 
 # --- Streamlit Page Configuration ---
@@ -28,15 +29,11 @@ st.markdown("View your payment history or overall payment metrics.")
 # --- Database Session and User Authentication ---
 # db_session = next(get_session()) # Old way
 with get_db_session() as db_session: # New context managed way
-    current_user_id = get_current_user_id(db_session) # Placeholder, replace with actual auth
-    current_user = None
-    is_admin = False
-
-    if current_user_id:
-        current_user = get_user_by_id(db_session, current_user_id) # Fetch user details
-        if current_user:
-            is_admin = current_user.role == "admin" # Check if user is admin
-    else:
+    identity = get_session_identity(db_session) # Resolved once per session, no per-render lookups
+    current_user_id = identity.user_id if identity else None
+    is_admin = identity.is_admin if identity else False
+
+    if not current_user_id:
         st.warning("Please log in to view payment information.")
         st.stop()
 
@@ -82,7 +79,7 @@ with get_db_session() as db_session: # New context managed way
                             if row['status'] == 'Completed':
                                 if st.button("Request Refund", key=f"refund_{row['id']}_{index}"): # Ensure unique key
                                     # try:
-                                    #     process_refund(db_session, row['id'], current_user_id)
+                                    #     process_refund(db_session, row['id'], identity)
                                     #     st.success(f"Refund processed for payment ID {row['id']}.")
                                     #     st.rerun() # To refresh the payment list
                                     # except Exception as e:
@@ -100,7 +97,7 @@ with get_db_session() as db_session: # New context managed way
         with tabs[1]: # Admin Dashboard
             st.header("Admin Dashboard: Payment Metrics")
 
-            stats = get_payment_stats(db_session) # Service call
+            stats = get_aggregate("payment_stats") # Warmed in the background
 
             col1, col2, col3, col4 = st.columns(4)
             col1.metric("Total Payments Logged", stats.get("total_payments",0))
@@ -112,7 +109,7 @@ with get_db_session() as db_session: # New context managed way
             st.divider()
 
             st.subheader("Payment Volume Over Time (Last 90 Days)")
-            volume_df = get_payment_volume_over_time(db_session) # Service call
+            volume_df = get_aggregate("payment_volume_series") # Warmed in the background
             
             if not volume_df.empty:
                 volume_chart = alt.Chart(volume_df).mark_bar().encode(
@@ -13,6 +13,7 @@ from src.db.models.blueprint import Blueprint
 from src.db.models.certification import Certification
 from src.db.models.user import User
 from src.db.connection import get_db_session, Session
+from src.services.search_service import search_ids
 from src.components.ai_page_context import add_ai_page_context, render_page_ai_assistant, get_blueprints_page_context
 from src.components.universal_css import inject_universal_css
 
@@ -67,10 +68,7 @@ def get_blueprints_from_db(page=1, limit=10, search_term=None, status_filter=Non
         
         # Apply filters if provided
         if search_term:
-            query = query.filter(
-                (Blueprint.name.ilike(f'%{search_term}%')) | 
-                (Blueprint.description.ilike(f'%{search_term}%'))
-            )
+            query = query.filter(Blueprint.id.in_(search_ids(search_term, "blueprint")))
             
         if status_filter:
             query = query.filter(Blueprint.status == status_filter)
@@ -10,6 +10,10 @@ from src.db.models.material import Material, MaterialCategory, Supplier
 from src.db.models.product import Product, ProductCategory, OEM
 from src.services.material_service import get_all_materials, get_material_by_id
 from src.services.product_service import get_all_products, get_product_by_id
+from src.services.cache_warmup_service import get_aggregate
+from src.services.demand_forecast_service import get_material_forecast
+from src.services.reservation_service import get_available_to_promise, get_material_reservations
+from src.services.stock_alert_service import LEVEL_MINIMUM, acknowledge_alerts, get_low_stock, get_stock_alerts
 from src.components.universal_css import inject_universal_css
 from src.components.floating_ai_assistant import render_floating_ai_assistant
 from src.components.ai_page_context import add_ai_page_context
@@ -30,35 +34,9 @@ if 'selected_product_id' not in st.session_state:
 inject_universal_css()
 
 # Helper functions
-@st.cache_data(ttl=60)
 def get_inventory_overview():
     """Get overview statistics for inventory"""
-    with get_db_session() as session:
-        # Material stats
-        total_materials = session.query(Material).filter(Material.is_active == True).count()
-        low_stock_materials = session.query(Material).filter(
-            Material.is_active == True,
-            Material.current_stock <= Material.min_stock_level
-        ).count()
-        
-        # Product stats
-        total_products = session.query(Product).count()
-        active_products = session.query(Product).filter(Product.status == 'Active').count()
-        
-        # Material categories
-        material_categories = session.query(MaterialCategory).count()
-        
-        # Suppliers
-        active_suppliers = session.query(Supplier).count()
-        
-        return {
-            'total_materials': total_materials,
-            'low_stock_materials': low_stock_materials,
-            'total_products': total_products,
-            'active_products': active_products,
-            'material_categories': material_categories,
-            'active_suppliers': active_suppliers
-        }
+    return get_aggregate("inventory_overview")
 
 @st.cache_data(ttl=60)
 def get_material_inventory_data():
@@ -68,14 +46,19 @@ def get_material_inventory_data():
         if not materials:
             return pd.DataFrame()
         
+        availability = get_available_to_promise()
+
         # Convert to DataFrame
         material_data = []
         for material in materials:
+            atp = availability.get(material.get('id'), {})
             material_data.append({
                 'ID': material.get('id'),
                 'Name': material.get('name', 'Unknown'),
                 'Type': material.get('type', 'Unknown'),
                 'Current Stock': material.get('current_stock', 0),
+                'Reserved': atp.get('reserved', 0.0),
+                'Available': atp.get('available', material.get('current_stock', 0)),
                 'Unit': material.get('unit', 'kg'),
                 'Min Stock Level': material.get('min_stock_level', 0),
                 'Price per Unit': material.get('price_per_unit', 0),
@@ -255,7 +238,7 @@ def display_materials():
     
     # Configure columns to display
     display_columns = [
-        'Name', 'Type', 'Current Stock', 'Unit', 'Min Stock Level', 
+        'Name', 'Type', 'Current Stock', 'Reserved', 'Available', 'Unit', 'Min Stock Level', 
         'Price per Unit', 'Status', 'Location', 'Supplier'
     ]
     
@@ -346,14 +329,34 @@ def display_low_stock_alerts():
     """Display low stock alerts"""
     st.header("⚠️ Low Stock Alerts")
     
+    # Threshold crossings recorded by the stock write path, newest first
+    alerts = get_stock_alerts(unacknowledged_only=True)
+    if alerts:
+        with st.expander(f"🔔 {len(alerts)} new stock alerts", expanded=True):
+            alerts_df = pd.DataFrame(alerts)
+            alerts_df['level'] = alerts_df['level'].map(
+                lambda level: 'Below minimum' if level == LEVEL_MINIMUM else 'Reorder'
+            )
+            st.dataframe(
+                alerts_df[['created_at', 'name', 'level', 'current_stock', 'threshold']].rename(columns={
+                    'created_at': 'Time', 'name': 'Material', 'level': 'Alert',
+                    'current_stock': 'Stock', 'threshold': 'Threshold'
+                }),
+                use_container_width=True
+            )
+            if st.button("Acknowledge all", key="acknowledge_stock_alerts"):
+                acknowledge_alerts([alert['id'] for alert in alerts])
+                st.rerun()
+    
     material_df = get_material_inventory_data()
     
     if material_df.empty:
         st.warning("No material data available")
         return
     
-    # Identify low stock items
-    low_stock_df = material_df[material_df['Current Stock'] <= material_df['Min Stock Level']]
+    # Low stock items come from the low-stock set kept by the stock write path
+    low_stock_ids = [entry['material_id'] for entry in get_low_stock(LEVEL_MINIMUM)]
+    low_stock_df = material_df[material_df['ID'].isin(low_stock_ids)]
     
     if low_stock_df.empty:
         st.success("✅ No low stock items found! All materials are adequately stocked.")
@@ -568,6 +571,19 @@ def display_material_details(material_id):
         st.write(f"**Current Stock:** {material.get('current_stock', 0)} {material.get('unit', 'units')}")
         st.write(f"**Minimum Level:** {material.get('min_stock_level', 0)} {material.get('unit', 'units')}")
         st.write(f"**Reorder Level:** {material.get('reorder_level', 0)} {material.get('unit', 'units')}")
+
+        atp = get_available_to_promise([material_id]).get(material_id)
+        if atp:
+            st.write(f"**Reserved for Jobs:** {atp['reserved']:.2f} {material.get('unit', 'units')}")
+            st.write(f"**Available to Promise:** {atp['available']:.2f} {material.get('unit', 'units')}")
+
+        forecast = get_material_forecast(material_id)
+        if forecast:
+            st.write("**Demand Forecast**")
+            st.write(f"**Daily Demand:** {forecast['daily_demand']:.2f} {material.get('unit', 'units')}/day")
+            st.write(f"**Safety Stock:** {forecast['safety_stock']:.2f} {material.get('unit', 'units')}")
+            st.write(f"**Lead Time:** {forecast['lead_time_days']:g} days")
+            st.caption(f"Forecast updated {forecast['computed_at']:%Y-%m-%d %H:%M}")
     
     with col2:
         st.write("**Supplier Information**")
@@ -581,6 +597,15 @@ def display_material_details(material_id):
         total_value = (material.get('current_stock', 0) * material.get('price_per_unit', 0))
         st.write(f"**Total Inventory Value:** ${total_value:.2f}")
 
+    reservations = get_material_reservations(material_id)
+    if reservations:
+        st.write("**Reserved by Print Jobs**")
+        reservations_df = pd.DataFrame(reservations).rename(columns={
+            'print_job_id': 'Job ID', 'job_name': 'Job', 'status': 'Status',
+            'quantity': f"Quantity ({material.get('unit', 'units')})", 'created_at': 'Reserved At'
+        })
+        st.dataframe(reservations_df, use_container_width=True, hide_index=True)
+
 def display_product_details(product_id):
     """Display detailed product information"""
     with get_db_session() as session:
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark the print job dispatcher.
+Plans synthetic fleets of increasing size with plan_assignments() and, with
+--db, also loads and writes back the largest case through a throwaway
+SQLite database to time the batched UPDATEs.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SIZES = [(1_000, 20), (5_000, 100), (10_000, 250), (25_000, 500), (50_000, 1_000)]
+MATERIALS = 40
+
+
+def synthetic_fleet(job_count, device_count, now, seed=42):
+    rng = random.Random(seed)
+    devices = [
+        {
+            "id": device_id,
+            "available_at": now + timedelta(minutes=rng.randint(0, 240)),
+            "maintenance_date": (now + timedelta(days=rng.randint(1, 30))).date() if rng.random() < 0.3 else None,
+        }
+        for device_id in range(1, device_count + 1)
+    ]
+    jobs = [
+        {
+            "id": job_id,
+            "device_id": rng.randint(1, device_count) if rng.random() < 0.05 else None,
+            "material_id": rng.randint(1, MATERIALS),
+            "estimated_duration": rng.randint(20, 600),
+            "required": rng.uniform(0.01, 0.5),
+            "created_at": now - timedelta(minutes=rng.randint(0, 100_000)),
+        }
+        for job_id in range(1, job_count + 1)
+    ]
+    stock = {material_id: job_count * 0.2 / MATERIALS for material_id in range(1, MATERIALS + 1)}
+    return jobs, devices, stock
+
+
+def benchmark_planning(now):
+    from src.services.dispatch_service import plan_assignments
+
+    print(f"{'jobs':>8} {'devices':>8} {'assigned':>9} {'blocked':>8} {'seconds':>8} {'us/job':>7}")
+    for job_count, device_count in SIZES:
+        jobs, devices, stock = synthetic_fleet(job_count, device_count, now)
+        started = time.perf_counter()
+        plan = plan_assignments(jobs, devices, stock, now)
+        elapsed = time.perf_counter() - started
+        blocked = sum(len(ids) for ids in plan["blocked"].values())
+        print(
+            f"{job_count:>8,} {device_count:>8,} {len(plan['assignments']):>9,} {blocked:>8,} "
+            f"{elapsed:>8.3f} {elapsed / job_count * 1e6:>7.1f}"
+        )
+
+
+def benchmark_database(now):
+    from sqlalchemy import insert
+    from src.db.connection import engine, init_db
+    from src.db.models import Device, Material, PrintJob
+    from src.services.dispatch_service import dispatch_pending_jobs
+
+    init_db()
+    job_count, device_count = SIZES[-1]
+    jobs, devices, stock = synthetic_fleet(job_count, device_count, now)
+    with engine.begin() as connection:
+        connection.execute(insert(Material), [
+            {"id": m, "name": f"Material {m}", "type": "Polymer", "unit": "kg", "current_stock": s}
+            for m, s in stock.items()
+        ])
+        connection.execute(insert(Device), [
+            {"id": d["id"], "name": f"Printer {d['id']}", "device_type": "3D Printer", "model": "X",
+             "serial_number": f"SN-{d['id']}", "status": "Active", "next_maintenance_date": d["maintenance_date"]}
+            for d in devices
+        ])
+        connection.execute(insert(PrintJob), [
+            {"id": j["id"], "name": f"Job {j['id']}", "status": "Pending", "device_id": j["device_id"],
+             "material_id": j["material_id"], "estimated_duration": j["estimated_duration"],
+             "material_used": j["required"] * 1000, "created_at": j["created_at"]}
+            for j in jobs
+        ])
+
+    started = time.perf_counter()
+    result = dispatch_pending_jobs(now=now)
+    elapsed = time.perf_counter() - started
+    print(f"\nDatabase round trip for {job_count:,} jobs / {device_count:,} devices: "
+          f"{result['assigned']:,} assigned, blocked {result['blocked']} in {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", action="store_true", help="also time load + batched writeback on SQLite")
+    args = parser.parse_args()
+
+    if args.db:
+        # Must be set before src.db.connection is first imported
+        db_path = os.path.join(tempfile.mkdtemp(), "dispatch_benchmark.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+    now = datetime(2025, 1, 6, 8, 0)
+    benchmark_planning(now)
+    if args.db:
+        benchmark_database(now)
+
+
+if __name__ == '__main__':
+    main()
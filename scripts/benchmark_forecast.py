@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Benchmark the demand forecast.
+Builds a throwaway SQLite database with a synthetic catalog and half a year
+of daily usage, then times a full forecast run (load, fit, bulk write) and
+the NumPy fit on its own.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the demand forecast")
+    parser.add_argument("--materials", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=180)
+    parser.add_argument("--usage-probability", type=float, default=0.3,
+                        help="Chance that a material is used on a given day")
+    args = parser.parse_args()
+
+    # Never touch the configured database
+    os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "forecast_benchmark.db")
+
+    from sqlalchemy import insert
+
+    from src.db.connection import get_db_session, init_db
+    from src.db.models.material import Material, StockAdjustment
+    from src.services.demand_forecast_service import fit_demand, run_forecast
+
+    init_db()
+    rng = np.random.default_rng(42)
+    now = datetime.now().replace(hour=12, minute=0, second=0, microsecond=0)
+    first_day = now - timedelta(days=args.days)
+
+    with get_db_session() as db_session:
+        db_session.execute(insert(Material), [
+            {"id": i + 1, "name": f"Material {i + 1}", "type": "Polymer", "current_stock": 1000.0,
+             "min_stock_level": 5.0, "reorder_level": 10.0}
+            for i in range(args.materials)
+        ])
+        used = rng.random((args.materials, args.days)) < args.usage_probability
+        materials, days = np.nonzero(used)
+        scale = rng.gamma(2.0, 2.0, args.materials)
+        quantities = np.round(rng.gamma(2.0, scale[materials]), 3) + 0.001
+        db_session.execute(insert(StockAdjustment), [
+            {"material_id": int(m) + 1, "adjustment_date": first_day + timedelta(days=int(d)),
+             "quantity": -float(q), "adjustment_type": "Usage"}
+            for m, d, q in zip(materials, days, quantities)
+        ])
+    print(f"{args.materials:,} materials, {len(quantities):,} usage adjustments over {args.days} days")
+
+    demand = np.zeros((args.materials, args.days))
+    demand[materials, days] = quantities
+    for method in ("ses", "moving_average"):
+        started = time.perf_counter()
+        fit_demand(demand, method)
+        print(f"fit only ({method}): {(time.perf_counter() - started) * 1000:8.1f} ms")
+
+    for method in ("ses", "moving_average"):
+        started = time.perf_counter()
+        result = run_forecast(now, method)
+        elapsed = time.perf_counter() - started
+        print(f"full run ({method}): {elapsed:8.2f} s, {result['forecast']:,} forecast, "
+              f"{result['reorder_levels_changed']:,} reorder levels changed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark the device utilization sweep.
+Builds a synthetic year of print jobs for a fleet of devices, with
+overlapping and still-running jobs, and times busy_seconds() for daily and
+hourly bins over the whole year and for a single-day refresh.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DAY = 86400
+
+
+def synthetic_jobs(device_count, days, jobs_per_day, seed=42):
+    rng = np.random.default_rng(seed)
+    count = device_count * days * jobs_per_day
+    devices = rng.integers(0, device_count, count)
+    starts = rng.integers(0, days * DAY, count)
+    ends = starts + rng.integers(10 * 60, 8 * 3600, count)
+    # A few jobs still running: they end "now"
+    running = rng.random(count) < 0.001
+    ends[running] = days * DAY
+    return devices, starts, ends
+
+
+def timed(label, func, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<28} {best * 1000:8.1f} ms  shape={result.shape}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the utilization sweep")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--jobs-per-day", type=int, default=4)
+    args = parser.parse_args()
+
+    from src.services.utilization_service import busy_seconds
+
+    devices, starts, ends = synthetic_jobs(args.devices, args.days, args.jobs_per_day)
+    print(f"{len(starts):,} jobs on {args.devices:,} devices over {args.days} days")
+
+    daily = timed("year, daily bins", lambda: busy_seconds(
+        devices, starts, ends, args.devices, 0, args.days, DAY))
+    timed("year, hourly bins", lambda: busy_seconds(
+        devices, starts, ends, args.devices, 0, args.days * 24, 3600))
+
+    # Incremental refresh: only jobs touching the last day are recomputed
+    last_day = (args.days - 1) * DAY
+    touching = (starts < last_day + DAY) & (ends >= last_day)
+    today = timed("today only, hourly bins", lambda: busy_seconds(
+        devices[touching], starts[touching], ends[touching], args.devices, last_day, 24, 3600))
+
+    assert np.allclose(today.sum(axis=1), daily[:, -1]), "incremental day does not match full sweep"
+    print(f"Mean utilization: {daily.mean() / DAY * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
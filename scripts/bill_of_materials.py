@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Bill of materials maintenance and requirements planning.
+
+    python scripts/bill_of_materials.py migrate [--dry-run] [--replace] [--product 3]
+        # create BOM lines from Product.materials_used
+    python scripts/bill_of_materials.py explode 3=10 7=2
+        # material requirements of building 10 of product 3 and 2 of product 7
+"""
+
+import argparse
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.bom_service import get_material_requirements, migrate_materials_used
+
+
+def parse_plan_entry(entry):
+    product_id, _, units = entry.partition("=")
+    return int(product_id), float(units or 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bill of materials maintenance and requirements planning")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate")
+    migrate.add_argument("--dry-run", action="store_true", help="parse and report without writing")
+    migrate.add_argument("--replace", action="store_true", help="re-parse products whose lines were all parsed")
+    migrate.add_argument("--product", type=int, action="append")
+
+    explode = commands.add_parser("explode")
+    explode.add_argument("plan", nargs="+", type=parse_plan_entry, help="PRODUCT_ID=UNITS")
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        summary = migrate_materials_used(args.product, replace=args.replace, dry_run=args.dry_run)
+        verb = "Would create" if args.dry_run else "Created"
+        print(f"{verb} {summary['lines']} BOM line(s) for {summary['products']} product(s)")
+        for part in summary["unparsed"]:
+            print(f"  product #{part['product_id']}: could not read '{part['text']}'")
+    else:
+        requirements = get_material_requirements(args.plan)
+        for material in requirements["materials"]:
+            line = (f"#{material['material_id']} {material['name']}: need {material['required']:g} "
+                    f"{material['unit'] or ''}, available {material['available']:g}")
+            if material["shortage"] > 0:
+                line += f" (short {material['shortage']:g})"
+            print(line)
+        if requirements["without_bom"]:
+            print(f"No bill of materials for product(s) {', '.join(map(str, requirements['without_bom']))}")
+        sys.exit(1 if requirements["short"] else 0)
+
+
+if __name__ == "__main__":
+    main()
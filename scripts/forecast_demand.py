@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Nightly demand forecast.
+Refits every material's usage forecast and updates reorder levels.
+
+    python scripts/forecast_demand.py                  # run if the last run is over a day old
+    python scripts/forecast_demand.py --force          # run now
+    python scripts/forecast_demand.py --dry-run --method moving_average
+
+Meant to be run from cron (e.g. nightly after the stock ledger snapshot).
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.demand_forecast_service import METHODS, run_forecast, run_forecast_if_due
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Forecast material demand and update reorder levels")
+    parser.add_argument("--method", choices=METHODS, default="ses")
+    parser.add_argument("--force", action="store_true", help="Run even if the last run is recent")
+    parser.add_argument("--dry-run", action="store_true", help="Print the forecasts without writing them")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.dry_run:
+        result = run_forecast(method=args.method, apply=False)
+    elif args.force:
+        result = run_forecast(method=args.method)
+    else:
+        result = run_forecast_if_due(method=args.method)
+        if result is None:
+            print("Forecast is up to date")
+            return
+    elapsed = time.perf_counter() - started
+
+    if args.dry_run:
+        for forecast in result["forecasts"]:
+            print(f"#{forecast['material_id']}: {forecast['daily_demand']:g}/day "
+                  f"(sigma {forecast['demand_std']:g}), safety stock {forecast['safety_stock']:g}, "
+                  f"reorder point {forecast['reorder_point']:g} (was {forecast['reorder_level']})")
+    print(f"Forecast {result['forecast']} material(s), {result['reorder_levels_changed']} reorder level(s) "
+          f"{'would change' if args.dry_run else 'changed'} in {elapsed:.2f} s")
+    sys.exit(1 if "error" in result else 0)
+
+
+if __name__ == "__main__":
+    main()
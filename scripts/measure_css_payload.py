@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Measure the CSS payload sent to the browser per rerun.
+Compares the legacy approach (every stylesheet inlined in a <style> block on
+every rerun) with the asset pipeline (one <link> snippet per browser session,
+nothing on later reruns) and builds the hashed bundles as a side effect.
+"""
+
+import os
+import sys
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.components.asset_pipeline import payload_report
+from src.components.theme_toggle import get_theme_css
+from src.components.universal_css import DASHBOARD_STYLESHEETS, UNIVERSAL_CSS
+
+
+def main():
+    bundles = {
+        "dashboard": DASHBOARD_STYLESHEETS,
+        "universal": [UNIVERSAL_CSS],
+        "theme-light": [get_theme_css()],
+    }
+
+    print(f"{'bundle':<12} {'legacy/rerun':>13} {'minified':>10} {'1st rerun':>10} {'later':>6}  file")
+    for row in payload_report(bundles):
+        print(
+            f"{row['bundle']:<12} {row['legacy_per_rerun']:>13,} {row['bundle_bytes']:>10,} "
+            f"{row['first_rerun']:>10,} {row['later_reruns']:>6}  {row['file']}"
+        )
+
+
+if __name__ == '__main__':
+    main()
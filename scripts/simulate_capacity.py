@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Print farm capacity planning.
+Estimates farm parameters from the database (or uses a synthetic farm with
+--synthetic), then simulates the baseline and the requested what-if
+scenarios and prints the distribution of each metric.
+
+Examples:
+    python scripts/simulate_capacity.py --add-devices 10
+    python scripts/simulate_capacity.py --remove-location "Site B" --replications 2000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.simulation_service import (
+    FarmParameters,
+    compare_scenarios,
+    estimate_parameters,
+)
+
+
+def synthetic_farm() -> FarmParameters:
+    return FarmParameters(
+        devices_by_location={"Site A": 30, "Site B": 20},
+        arrivals_per_hour=7.0,
+        durations=(45.0, 90.0, 120.0, 180.0, 240.0, 360.0, 480.0),
+        failure_rate=0.08,
+        maintenance_interval_hours=14 * 24,
+        maintenance_minutes=240,
+    )
+
+
+def print_comparison(comparison):
+    metrics = list(next(iter(comparison.values())).keys())
+    for metric in metrics:
+        print(f"\n{metric}")
+        for name, summary in comparison.items():
+            values = summary[metric]
+            print(f"  {name:<24} mean {values['mean']:>10.2f}   "
+                  f"p5 {values['p5']:>10.2f}   p50 {values['p50']:>10.2f}   p95 {values['p95']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate print farm capacity scenarios")
+    parser.add_argument("--synthetic", action="store_true", help="Use a synthetic farm instead of the database")
+    parser.add_argument("--history-days", type=int, default=90)
+    parser.add_argument("--add-devices", type=int, default=0,
+                        help="Devices to add (negative removes them across locations)")
+    parser.add_argument("--remove-location", action="append", default=[])
+    parser.add_argument("--arrival-factor", type=float, default=1.0)
+    parser.add_argument("--replications", type=int, default=1000)
+    parser.add_argument("--horizon-days", type=float, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    params = synthetic_farm() if args.synthetic else estimate_parameters(args.history_days)
+    if not params.device_count or not params.arrivals_per_hour:
+        print("Not enough history to simulate; try --synthetic")
+        return
+
+    print(f"Devices by location: {params.devices_by_location}")
+    print(f"Arrivals/hour: {params.arrivals_per_hour:.2f}, failure rate: {params.failure_rate:.1%}, "
+          f"maintenance every {params.maintenance_interval_hours or 0:.0f} h per device")
+
+    scenarios = {}
+    if args.add_devices:
+        scenarios[f"{args.add_devices:+d} devices"] = {"add_devices": args.add_devices}
+    for location in args.remove_location:
+        scenarios[f"without {location}"] = {"remove_locations": [location]}
+    if args.arrival_factor != 1.0:
+        scenarios[f"demand x{args.arrival_factor:g}"] = {"arrival_factor": args.arrival_factor}
+
+    started = time.perf_counter()
+    comparison = compare_scenarios(
+        params, scenarios,
+        replications=args.replications,
+        horizon_hours=args.horizon_days * 24,
+        workers=args.workers,
+    )
+    elapsed = time.perf_counter() - started
+
+    print_comparison(comparison)
+    print(f"\n{len(comparison)} scenario(s) x {args.replications} replications in {elapsed:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Telemetry load simulator.
+Generates 1 Hz samples for a fleet of printers running jobs (fast-forwarded,
+not in real time), writes them through the batched TelemetryWriter, runs the
+rollups and times range queries against each tier. Uses a throwaway SQLite
+database unless --database-url is given.
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def simulate(devices, hours, seed=7):
+    """Yield one second of samples at a time for every device"""
+    rng = random.Random(seed)
+    start = datetime(2025, 1, 6, 0, 0)
+    jobs = {}
+    next_job_id = 1
+
+    for second in range(int(hours * 3600)):
+        ts = start + timedelta(seconds=second)
+        batch = []
+        for device_id in range(1, devices + 1):
+            job = jobs.get(device_id)
+            if job is None or job["elapsed"] >= job["duration"]:
+                job = jobs[device_id] = {
+                    "id": next_job_id,
+                    "duration": rng.randint(20, 240) * 60,
+                    "elapsed": 0,
+                    "layers": rng.randint(200, 1500),
+                    "nozzle": rng.choice([205.0, 215.0, 240.0, 260.0]),
+                    "bed": rng.choice([55.0, 60.0, 80.0, 100.0]),
+                }
+                next_job_id += 1
+            job["elapsed"] += 1
+            progress = job["elapsed"] / job["duration"]
+            batch.append({
+                "device_id": device_id,
+                "job_id": job["id"],
+                "ts": ts,
+                "progress": round(progress * 100, 2),
+                "nozzle_temp": job["nozzle"] + rng.gauss(0, 1.5) + math.sin(second / 30),
+                "bed_temp": job["bed"] + rng.gauss(0, 0.5),
+                "layer": int(progress * job["layers"]),
+            })
+        yield ts, batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--devices", type=int, default=50)
+    parser.add_argument("--hours", type=float, default=3)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--database-url", help="database to write to (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    # Must be set before src.db.connection is first imported
+    os.environ["DATABASE_URL"] = args.database_url or (
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(), "telemetry_simulation.db")
+    )
+
+    from src.db.connection import init_db
+    from src.services.telemetry_service import TelemetryWriter, query_telemetry, rollup_telemetry
+
+    init_db()
+    writer = TelemetryWriter(batch_size=args.batch_size)
+
+    started = time.perf_counter()
+    last_ts = None
+    for last_ts, batch in simulate(args.devices, args.hours):
+        writer.extend(batch)
+    writer.flush()
+    write_seconds = time.perf_counter() - started
+    print(f"Wrote {writer.written:,} samples in {write_seconds:.2f}s "
+          f"({writer.written / write_seconds:,.0f} samples/s, batch size {args.batch_size:,})")
+
+    started = time.perf_counter()
+    marks = rollup_telemetry(now=last_ts + timedelta(hours=1))
+    print(f"Rolled up in {time.perf_counter() - started:.2f}s, watermarks {marks}")
+
+    for label, span in (("15 minutes", timedelta(minutes=15)), ("3 hours", timedelta(hours=3)),
+                        ("30 days", timedelta(days=30))):
+        started = time.perf_counter()
+        df = query_telemetry(last_ts - span, last_ts, device_id=1)
+        print(f"Device 1, last {label:<10}: tier {df.attrs['tier']:<3} {len(df):>6,} rows "
+              f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
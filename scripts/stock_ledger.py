@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Stock ledger maintenance.
+
+    python scripts/stock_ledger.py snapshot          # snapshot every material (when due)
+    python scripts/stock_ledger.py snapshot --force  # snapshot now regardless of the interval
+    python scripts/stock_ledger.py reconcile         # list materials whose figures disagree
+    python scripts/stock_ledger.py as-of 2024-06-30 [--material 3]
+    python scripts/stock_ledger.py rebuild-usage [--material 3]  # recompute the daily usage rollup
+    python scripts/stock_ledger.py sync-low-stock    # reconcile the low-stock set with the materials
+    python scripts/stock_ledger.py sync-reservations # reconcile material reservations with active print jobs
+    python scripts/stock_ledger.py checkpoint-valuation [--method average]  # month-end valuation checkpoints
+    python scripts/stock_ledger.py value [--at 2024-06-30] [--method average]  # inventory value
+    python scripts/stock_ledger.py prune-outbox [--days 7]  # delete change events past the retention
+
+Meant to be run from cron (e.g. nightly snapshot, reconcile and prune-outbox).
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the project root to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.db import outbox
+from src.services.stock_ledger_service import (
+    get_all_stock_as_of,
+    get_stock_as_of,
+    reconcile_stock,
+    take_snapshots,
+    take_snapshots_if_due,
+)
+from src.services.reservation_service import sync_reservations
+from src.services.stock_alert_service import sync_low_stock
+from src.services.usage_rollup_service import rebuild_usage_rollup
+from src.services.valuation_service import METHODS, checkpoint_valuations, get_inventory_valuation
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stock ledger snapshots, reconciliation and as-of queries")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot")
+    snapshot.add_argument("--force", action="store_true")
+
+    commands.add_parser("reconcile")
+
+    as_of = commands.add_parser("as-of")
+    as_of.add_argument("when", help="Date or datetime (ISO format)")
+    as_of.add_argument("--material", type=int)
+
+    rebuild_usage = commands.add_parser("rebuild-usage")
+    rebuild_usage.add_argument("--material", type=int, action="append")
+
+    commands.add_parser("sync-low-stock")
+    commands.add_parser("sync-reservations")
+
+    checkpoint_valuation = commands.add_parser("checkpoint-valuation")
+    checkpoint_valuation.add_argument("--method", choices=METHODS, default="fifo")
+
+    value = commands.add_parser("value")
+    value.add_argument("--at", help="Date or datetime (ISO format); defaults to now")
+    value.add_argument("--method", choices=METHODS, default="fifo")
+
+    prune_outbox = commands.add_parser("prune-outbox")
+    prune_outbox.add_argument("--days", type=int, default=outbox.RETENTION_DAYS, help="Days of events to keep")
+
+    args = parser.parse_args()
+
+    if args.command == "snapshot":
+        written = take_snapshots() if args.force else take_snapshots_if_due()
+        print(f"Wrote {written} snapshot(s)")
+    elif args.command == "reconcile":
+        drifts = reconcile_stock()
+        if not drifts:
+            print("current_stock, stock_quantity and the ledger agree for every material")
+        for drift in drifts:
+            print(f"#{drift['material_id']} {drift['name']}: current_stock={drift['current_stock']} "
+                  f"stock_quantity={drift['stock_quantity']} ledger={drift['ledger_balance']} "
+                  f"(drift {drift['current_stock_drift']:+g} / {drift['stock_quantity_drift']:+g})")
+        sys.exit(1 if drifts else 0)
+    elif args.command == "rebuild-usage":
+        rows = rebuild_usage_rollup(args.material)
+        print(f"Usage rollup rebuilt ({rows} row(s))")
+    elif args.command == "sync-low-stock":
+        print(f"{sync_low_stock()} material(s) at or below a stock threshold")
+    elif args.command == "sync-reservations":
+        result = sync_reservations()
+        print(f"Reserved {result['reserved']} and released {result['released']} material reservation(s)")
+    elif args.command == "checkpoint-valuation":
+        print(f"Wrote {checkpoint_valuations(args.method)} {args.method} valuation checkpoint(s)")
+    elif args.command == "value":
+        valuation = get_inventory_valuation(datetime.fromisoformat(args.at) if args.at else None, args.method)
+        for material in valuation["materials"]:
+            print(f"#{material['material_id']} {material['name']}: {material['quantity']:g} {material['unit'] or ''} "
+                  f"= {material['value']:,.2f}")
+        print(f"Total ({args.method}): {valuation['total_value']:,.2f}")
+    elif args.command == "prune-outbox":
+        removed = outbox.prune_events(datetime.utcnow() - timedelta(days=args.days))
+        print(f"Deleted {removed} outbox event(s) older than {args.days} day(s)")
+    else:
+        when = datetime.fromisoformat(args.when)
+        if args.material is not None:
+            print(get_stock_as_of(args.material, when))
+        else:
+            for material_id, balance in sorted(get_all_stock_as_of(when).items()):
+                print(f"#{material_id}: {balance:g}")
+
+
+if __name__ == "__main__":
+    main()
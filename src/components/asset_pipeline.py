@@ -0,0 +1,277 @@
+"""
+Static asset pipeline for the dashboard stylesheets.
+Stylesheets are minified and concatenated once per process into a
+content-hashed file under static/css/dist, which Streamlit serves from
+/app/static. Each browser session receives a single <link> to that file
+instead of the full CSS on every rerun; the browser caches the file.
+Streamlit releases whose st.html cannot run scripts get the same snippet
+through a zero-height component frame; releases that serve .css from
+/app/static as text/plain get the stylesheet inline.
+"""
+
+import hashlib
+import inspect
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+STATIC_DIR = PROJECT_ROOT / "static"
+DIST_DIR = STATIC_DIR / "css" / "dist"
+
+# Session state key holding the asset file currently injected in each slot
+_SESSION_KEY = "_css_assets"
+
+_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_STRING_RE = re.compile(r"""("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')""")
+_WHITESPACE_RE = re.compile(r"\s+")
+_PUNCTUATION_RE = re.compile(r"\s*([{};,>])\s*")
+_COLON_RE = re.compile(r":\s+")
+
+# A stylesheet source is either CSS text or a Path to a .css file (relative to the project root)
+StylesheetSource = Union[str, Path]
+
+
+@dataclass(frozen=True)
+class CssAsset:
+    """A built stylesheet bundle"""
+    name: str
+    digest: str
+    css: str
+    path: Path
+    source_bytes: int
+
+    @property
+    def filename(self) -> str:
+        return self.path.name
+
+    @property
+    def size(self) -> int:
+        return len(self.css.encode("utf-8"))
+
+
+_assets: Dict[Tuple, CssAsset] = {}
+_assets_lock = threading.Lock()
+
+
+def minify_css(css: str) -> str:
+    """
+    Minify a stylesheet: drop comments, collapse whitespace and remove
+    the spaces and trailing semicolons that CSS does not need.
+    Quoted strings are left untouched.
+    """
+    css = _COMMENT_RE.sub("", css)
+    parts = _STRING_RE.split(css)
+    # Even indices are outside quoted strings
+    for i in range(0, len(parts), 2):
+        chunk = _WHITESPACE_RE.sub(" ", parts[i])
+        chunk = _PUNCTUATION_RE.sub(r"\1", chunk)
+        chunk = _COLON_RE.sub(":", chunk)
+        parts[i] = chunk.replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _is_file_source(source: StylesheetSource) -> bool:
+    return isinstance(source, Path)
+
+
+def _resolve(source: StylesheetSource) -> Path:
+    path = Path(source)
+    return path if path.is_absolute() else PROJECT_ROOT / path
+
+
+def _fingerprint(sources: Sequence[StylesheetSource]) -> Tuple:
+    """Cheap per-rerun key: file sources by mtime and size, text sources by value"""
+    key = []
+    for source in sources:
+        if _is_file_source(source):
+            stat = _resolve(source).stat()
+            key.append((str(source), stat.st_mtime_ns, stat.st_size))
+        else:
+            key.append(source)
+    return tuple(key)
+
+
+def _read(source: StylesheetSource) -> str:
+    if _is_file_source(source):
+        return _resolve(source).read_text(encoding="utf-8")
+    return source
+
+
+def _write_asset(path: Path, css: str):
+    if path.exists():
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp_path.write_text(css, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def build_asset(name: str, sources: Sequence[StylesheetSource]) -> CssAsset:
+    """
+    Build (or fetch the already built) bundle for a list of stylesheets.
+
+    The bundle is rebuilt only when a text source changes or a file source
+    is modified on disk.
+
+    Args:
+        name: Bundle name, used as the file name prefix
+        sources: CSS text or .css file paths, in cascade order
+
+    Returns:
+        The built CssAsset, written to static/css/dist
+    """
+    key = (name, _fingerprint(sources))
+    asset = _assets.get(key)
+    if asset is not None:
+        return asset
+
+    with _assets_lock:
+        asset = _assets.get(key)
+        if asset is not None:
+            return asset
+
+        texts = [_read(source) for source in sources]
+        css = "\n".join(minify_css(text) for text in texts)
+        digest = hashlib.sha256(css.encode("utf-8")).hexdigest()[:12]
+        path = DIST_DIR / f"{name}.{digest}.css"
+        _write_asset(path, css)
+
+        asset = CssAsset(
+            name=name,
+            digest=digest,
+            css=css,
+            path=path,
+            source_bytes=sum(len(text.encode("utf-8")) for text in texts),
+        )
+        _assets[key] = asset
+        return asset
+
+
+def static_serving_enabled() -> bool:
+    """Whether Streamlit serves the static/ folder under /app/static"""
+    try:
+        return bool(st.get_option("server.enableStaticServing"))
+    except Exception:
+        return False
+
+
+def _static_serves_css() -> bool:
+    """
+    Whether /app/static serves .css files as text/css. Releases up to 1.56
+    serve static files through a Tornado handler that sends anything outside
+    its safe extension list as text/plain with nosniff, which browsers refuse
+    as a stylesheet; later releases serve by file type.
+    """
+    try:
+        from streamlit.web.server.app_static_file_handler import SAFE_APP_STATIC_FILE_EXTENSIONS
+    except ImportError:
+        return True
+    return ".css" in SAFE_APP_STATIC_FILE_EXTENSIONS
+
+
+def asset_url(asset: CssAsset) -> str:
+    """Absolute URL of a built asset under the app's static route"""
+    base_path = (st.get_option("server.baseUrlPath") or "").strip("/")
+    prefix = f"/{base_path}" if base_path else ""
+    relative = asset.path.relative_to(STATIC_DIR).as_posix()
+    return f"{prefix}/app/static/{relative}"
+
+
+def link_snippet(asset: CssAsset, slot: str, document: str = "document") -> str:
+    """
+    HTML that places a <link> to the asset in the document head, replacing
+    whatever stylesheet previously occupied the same slot. Elements in the
+    head survive reruns and page switches, so this only has to run once.
+    `document` is the JavaScript expression of the page's document.
+    """
+    href = asset_url(asset)
+    return (
+        "<script>(function(){"
+        f"var id='css-asset-{slot}',href='{href}',d={document},l=d.getElementById(id);"
+        "if(l&&l.getAttribute('href')===href)return;"
+        "if(!l){l=d.createElement('link');l.id=id;l.rel='stylesheet';d.head.appendChild(l);}"
+        "l.href=href;"
+        "})();</script>"
+    )
+
+
+def _html_runs_scripts() -> bool:
+    """Whether this Streamlit's st.html can run scripts (the option only exists in recent releases)"""
+    try:
+        return "unsafe_allow_javascript" in inspect.signature(st.html).parameters
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+
+def inline_snippet(asset: CssAsset) -> str:
+    """Fallback for when /app/static cannot serve the asset: the minified CSS inline"""
+    return f"<style>{asset.css}</style>"
+
+
+def inject_stylesheet(name: str, sources: Sequence[StylesheetSource], slot: str = "app"):
+    """
+    Make a stylesheet bundle active in the current browser session.
+
+    When Streamlit serves the bundle from /app/static as text/css, the page
+    receives a short <link> snippet the first time the bundle is needed in a
+    slot and nothing on later reruns. Otherwise (static serving disabled, or
+    a release that serves .css as text/plain) the minified CSS is sent inline
+    on every rerun, as Streamlit drops elements that a rerun does not emit
+    again.
+
+    Args:
+        name: Bundle name
+        sources: CSS text or .css file paths, in cascade order
+        slot: Head slot the bundle occupies; injecting another bundle into
+            the same slot replaces it
+    """
+    asset = build_asset(name, sources)
+
+    if not static_serving_enabled() or not _static_serves_css():
+        st.markdown(inline_snippet(asset), unsafe_allow_html=True)
+        return
+
+    injected = st.session_state.setdefault(_SESSION_KEY, {})
+    if injected.get(slot) == asset.filename:
+        return
+
+    if _html_runs_scripts():
+        st.html(link_snippet(asset, slot), unsafe_allow_javascript=True)
+    else:
+        # Older releases: run the snippet from a same-origin component frame against the app's document
+        components.html(link_snippet(asset, slot, "window.parent.document"), height=0)
+    injected[slot] = asset.filename
+
+
+def payload_report(bundles: Dict[str, List[StylesheetSource]]) -> List[Dict]:
+    """
+    Per-rerun CSS payload for each bundle, before and after the pipeline.
+
+    Args:
+        bundles: Bundle name -> stylesheet sources
+
+    Returns:
+        List of dictionaries with the legacy per-rerun bytes, the minified
+        bundle size, the first-rerun snippet size and the later-rerun size
+    """
+    report = []
+    for name, sources in bundles.items():
+        asset = build_asset(name, sources)
+        report.append({
+            "bundle": name,
+            "legacy_per_rerun": sum(
+                len(f"<style>{_read(source)}</style>".encode("utf-8")) for source in sources
+            ),
+            "bundle_bytes": asset.size,
+            "first_rerun": len(link_snippet(asset, "app").encode("utf-8")),
+            "later_reruns": 0,
+            "file": asset.filename,
+        })
+    return report
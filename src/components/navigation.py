@@ -1,15 +1,32 @@
 # src/components/navigation.py
 import streamlit as st
 
+from src.services.image_service import thumbnail_or_source
+from src.services.search_service import search
+
+# Search result entity -> icon, page, roles allowed to open it (None: all roles)
+SEARCH_RESULT_PAGES = {
+    "material": ("🧱", "pages/13_inventory.py", None),
+    "product": ("📦", "pages/13_inventory.py", None),
+    "blueprint": ("📐", "pages/10_blueprints.py", None),
+    "certification": ("📜", "pages/07_certifications.py", None),
+    "oem": ("🏭", "pages/05_oems.py", ["Admin", "Manager"]),
+    "supplier": ("🚚", "pages/13_inventory.py", None),
+}
+
 def create_sidebar():
     """Create the sidebar navigation menu based on user role."""
 
     with st.sidebar:
-        st.image("static/images/logo.png", width=200)
+        logo = thumbnail_or_source("static/images/logo.png", 200)
+        if logo:
+            st.image(logo, width=200)
 
         st.subheader(f"User: {st.session_state.username}")
         st.caption(f"Role: {st.session_state.user_role}")
 
+        render_global_search()
+
         st.divider()
 
         # Dashboard navigation
@@ -86,6 +103,41 @@ def create_sidebar():
             logout()  # Call the logout function
 
 
+def render_global_search():
+    """Search box over the whole catalog, with links to each result's page."""
+    query = st.text_input(
+        "🔍 Search", key="global_search", placeholder="Materials, products, blueprints..."
+    )
+    if not query.strip():
+        return
+
+    entities = [
+        entity for entity, (_, _, roles) in SEARCH_RESULT_PAGES.items()
+        if roles is None or st.session_state.user_role in roles
+    ]
+    results = search(query, entities, limit=8)
+    if not results:
+        st.caption("No matches")
+        return
+
+    for result in results:
+        icon, page, _ = SEARCH_RESULT_PAGES[result["entity"]]
+        if st.button(
+            f"{icon} {result['title']}",
+            key=f"search_{result['entity']}_{result['id']}",
+            help=result["snippet"] or result["entity"].title(),
+            use_container_width=True,
+        ):
+            # Materials and products open straight on their detail view
+            if result["entity"] == "material":
+                st.session_state.inventory_view = "materials"
+                st.session_state.selected_material_id = result["id"]
+            elif result["entity"] == "product":
+                st.session_state.inventory_view = "products"
+                st.session_state.selected_product_id = result["id"]
+            st.switch_page(page)
+
+
 def logout():
     # Clear session state for logout
     # Note: Cookie management removed due to import issues with streamlit_extras.cookies
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from src.components.asset_pipeline import inject_stylesheet
+
 def init_theme():
     """Initialize theme settings in session state"""
     if 'dark_mode' not in st.session_state:
@@ -302,13 +304,12 @@ def render_theme_toggle():
         toggle_theme()
         st.rerun()
 
-def inject_theme_css():
-    """Inject CSS based on current theme"""
+def get_theme_css():
+    """Build the stylesheet for the current theme"""
     init_theme()
     colors = get_theme_colors()
     
-    css = f"""
-    <style>
+    return f"""
     /* Theme Variables */
     :root {{
         --bg-primary: {colors['background']};
@@ -779,10 +780,11 @@ def inject_theme_css():
     * {{
         transition: background-color 0.3s ease, color 0.3s ease, border-color 0.3s ease !important;
     }}
-    </style>
     """
-    
-    st.markdown(css, unsafe_allow_html=True)
+
+def inject_theme_css():
+    """Inject CSS based on current theme"""
+    inject_stylesheet(f"theme-{get_current_theme()}", [get_theme_css()], slot="theme")
 
 def create_theme_aware_metric(label, value, delta=None, delta_color="normal"):
     """Create a themed metric card"""
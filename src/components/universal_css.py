@@ -3,12 +3,11 @@ Universal CSS styling for all MITACS Dashboard pages.
 This module provides consistent, modern styling across all pages.
 """
 
-def inject_universal_css():
-    """Inject clean, comprehensive CSS styling for all dashboard pages."""
-    import streamlit as st
-    
-    st.markdown("""
-    <style>
+from pathlib import Path
+
+from src.components.asset_pipeline import inject_stylesheet
+
+UNIVERSAL_CSS = """
     /* Remove Streamlit emotion cache classes and streamlit-specific defaults */
     [class*="st-emotion-cache-"] {
         font-family: inherit;
@@ -283,5 +282,21 @@ def inject_universal_css():
             padding: 1rem !important;
         }
     }
-    </style>
-    """, unsafe_allow_html=True)
+"""
+
+# Stylesheets of the main dashboard (app.py), in cascade order
+DASHBOARD_STYLESHEETS = [
+    UNIVERSAL_CSS,
+    Path("static/css/custom.css"),
+    Path("static/css/dashboard.css"),
+]
+
+
+def inject_universal_css():
+    """Inject clean, comprehensive CSS styling for all dashboard pages."""
+    inject_stylesheet("universal", [UNIVERSAL_CSS])
+
+
+def inject_dashboard_css():
+    """Inject the universal styling plus the main dashboard stylesheets."""
+    inject_stylesheet("dashboard", DASHBOARD_STYLESHEETS)
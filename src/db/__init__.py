@@ -7,3 +7,6 @@ from src.db.models.quality import QualityTest
 from src.db.models.certification import Certification
 from src.db.models.subscription import Subscription, Payment
 from src.db.models.print_job import PrintJob  # This is the correct import
+
+# Register the change-data-capture listeners on application sessions
+from src.db import outbox
@@ -94,6 +94,25 @@ def get_db_session():
         session.close()
 
 
+def begin_savepoint(session):
+    """
+    Start a SAVEPOINT (session.begin_nested()) inside the session's transaction.
+
+    pysqlite only opens its transaction at the first INSERT/UPDATE/DELETE;
+    a SAVEPOINT issued before that starts a transaction of its own, which
+    its RELEASE would commit. On SQLite the transaction is opened first.
+
+    Returns:
+        The nested transaction; commit() releases it, rollback() undoes its writes
+    """
+    connection = session.connection()
+    if connection.dialect.name == "sqlite":
+        dbapi_connection = connection.connection.dbapi_connection
+        if not dbapi_connection.in_transaction:
+            dbapi_connection.execute("BEGIN")
+    return session.begin_nested()
+
+
 def init_db():
     """Initialize the database by creating all tables defined in Base.metadata."""
     # Import all models that define tables using this Base
@@ -103,11 +122,22 @@ def init_db():
     print("[DB Init] Attempting to create all tables...")
     try:
         Base.metadata.create_all(bind=engine)
+        # create_all skips tables that already exist, so add indexes declared after they were created
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         print("[DB Init] ✅ Tables created successfully or already exist.")
     except Exception as e:
         print(f"[DB Init] ❌ Error creating tables: {e}")
         raise
 
+    # Full-text search index (SQLite FTS5); search falls back to pattern matching without it
+    from src.db import search_index
+    try:
+        search_index.install(engine)
+    except Exception as e:
+        print(f"[DB Init] ❌ Error installing search index: {e}")
+
 # Example of how to call init_db if this script is run directly (for testing connection.py)
 # if __name__ == "__main__":
 #     print("[DB Connection Test] Initializing database directly from connection.py...")
@@ -10,16 +10,27 @@ from .user import User
 from .device import Device, MaintenanceRecord
 from .certification import Certification
 from .material import (
+    LowStockMaterial,
     Material, 
+    MaterialAllocation,
     MaterialCategory, 
     MaterialCertification,
+    MaterialForecast,
+    MaterialReservation,
+    MaterialUsageDaily,
     StockAdjustment,
-    Supplier
+    StockAlert,
+    StockSnapshot,
+    Supplier,
+    ValuationCheckpoint
 )
 from .print_job import PrintJob
-from .product import Product, ProductCategory, OEM, product_certification  # Added ProductCategory here
+from .product import BomLine, Product, ProductCategory, OEM, product_certification  # Added ProductCategory here
 from .quality import QualityTest
 from .blueprint import Blueprint, blueprint_certification
+from .outbox import OutboxEvent
+from .telemetry import TelemetrySample, TelemetryRollup
+from .oee import DeviceOeeDaily
 
 # Explicitly re-export all models for easy import
 __all__ = [
@@ -28,19 +39,32 @@ __all__ = [
     'Device', 
     'MaintenanceRecord',
     'Certification',
+    'LowStockMaterial',
     'Material', 
+    'MaterialAllocation',
     'MaterialCategory', 
     'MaterialCertification',
+    'MaterialForecast',
+    'MaterialReservation',
+    'MaterialUsageDaily',
     'StockAdjustment',
+    'StockAlert',
+    'StockSnapshot',
     'Supplier',
+    'ValuationCheckpoint',
     'PrintJob',
     'Product', 
     'ProductCategory',  # Added ProductCategory here
+    'BomLine',
     'OEM',
     'product_certification',
     'QualityTest',
     'Blueprint',
-    'blueprint_certification'
+    'blueprint_certification',
+    'OutboxEvent',
+    'TelemetrySample',
+    'TelemetryRollup',
+    'DeviceOeeDaily'
 ]
 
 # Make sure all models are registered before configuring
@@ -10,6 +10,7 @@ from sqlalchemy import (
     ForeignKey,
     Text,
     JSON,
+    Index,
 )
 from sqlalchemy.orm import relationship
 import datetime
@@ -122,10 +123,158 @@ class StockAdjustment(Base):
     # Relationships
     material = relationship("Material", back_populates="stock_adjustments")
 
+    __table_args__ = (
+        # Ledger delta scans: one material's movements over a date range
+        Index("ix_stock_adjustments_material_id_date", "material_id", "adjustment_date"),
+        # Movements of all materials over a date range (valuation replays)
+        Index("ix_stock_adjustments_adjustment_date", "adjustment_date"),
+    )
+
     def __repr__(self):
         return f"<StockAdjustment(id={self.id}, material_id={self.material_id}, quantity={self.quantity})>"
 
 
+class StockSnapshot(Base):
+    """Ledger balance of a material at a point in time"""
+    __tablename__ = "stock_snapshots"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    snapshot_at = Column(DateTime, primary_key=True)
+    balance = Column(Float, nullable=False)  # Stock after every adjustment dated up to snapshot_at
+    adjustment_count = Column(Integer, nullable=False, default=0)  # Adjustments since the previous snapshot
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<StockSnapshot(material_id={self.material_id}, snapshot_at={self.snapshot_at}, balance={self.balance})>"
+
+
+class ValuationCheckpoint(Base):
+    """Inventory valuation state of a material, covering adjustments dated before checkpoint_at"""
+    __tablename__ = "valuation_checkpoints"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    method = Column(String(20), primary_key=True)  # fifo, average
+    checkpoint_at = Column(DateTime, primary_key=True)
+    quantity = Column(Float, nullable=False)  # Stock on hand (negative when issued ahead of receipts)
+    value = Column(Float, nullable=False)
+    unit_cost = Column(Float, nullable=False)  # Value per unit on hand (the moving average for "average")
+    receipt_cost = Column(Float, nullable=False)  # Latest receipt cost, used for receipts recorded without one
+    layers = Column(JSON)  # FIFO: [[quantity, unit_cost], ...] still on hand, oldest first
+    consumed_quantity = Column(Float, nullable=False, default=0)  # Issued since the start of the ledger
+    consumed_cost = Column(Float, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<ValuationCheckpoint(material_id={self.material_id}, method='{self.method}', checkpoint_at={self.checkpoint_at})>"
+
+
+class MaterialUsageDaily(Base):
+    """Stock adjustments of one material and type summed per day"""
+    __tablename__ = "material_usage_daily"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+    adjustment_type = Column(String(50), primary_key=True)
+    quantity_in = Column(Float, nullable=False, default=0)  # Sum of positive quantities
+    quantity_out = Column(Float, nullable=False, default=0)  # Sum of negative quantities, as a positive number
+    cost_in = Column(Float, nullable=False, default=0)  # Sum of quantity * unit_cost of the positive ones
+    cost_out = Column(Float, nullable=False, default=0)
+    movements = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Range queries over all materials
+        Index("ix_material_usage_daily_day", "day"),
+    )
+
+    def __repr__(self):
+        return f"<MaterialUsageDaily(material_id={self.material_id}, day={self.day}, type='{self.adjustment_type}')>"
+
+
+class MaterialForecast(Base):
+    """Latest demand forecast and derived reorder point of a material"""
+    __tablename__ = "material_forecasts"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    method = Column(String(30), nullable=False)  # ses, moving_average
+    daily_demand = Column(Float, nullable=False)  # Forecast usage per day
+    demand_std = Column(Float, nullable=False)  # Standard deviation of daily forecast error
+    lead_time_days = Column(Float, nullable=False)
+    safety_stock = Column(Float, nullable=False)
+    reorder_point = Column(Float, nullable=False)
+    history_days = Column(Integer, nullable=False)  # Days of usage history the forecast was fitted on
+    computed_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<MaterialForecast(material_id={self.material_id}, daily_demand={self.daily_demand}, reorder_point={self.reorder_point})>"
+
+
+class LowStockMaterial(Base):
+    """Active material at or below its reorder level or minimum stock level"""
+    __tablename__ = "low_stock_materials"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    below_reorder = Column(Boolean, nullable=False, default=False)  # current_stock <= reorder_level
+    below_minimum = Column(Boolean, nullable=False, default=False)  # current_stock <= min_stock_level
+    current_stock = Column(Float, nullable=False)
+    reorder_level = Column(Float)
+    min_stock_level = Column(Float)
+    since = Column(DateTime, nullable=False)  # When the material entered the set
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<LowStockMaterial(material_id={self.material_id}, current_stock={self.current_stock})>"
+
+
+class StockAlert(Base):
+    """Downward crossing of a material's reorder level or minimum stock level"""
+    __tablename__ = "stock_alerts"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=False)
+    level = Column(String(20), nullable=False)  # reorder, minimum
+    current_stock = Column(Float, nullable=False)  # Stock right after the crossing
+    threshold = Column(Float, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    acknowledged_at = Column(DateTime)
+
+    __table_args__ = (
+        Index("ix_stock_alerts_created_at", "created_at"),
+        Index("ix_stock_alerts_material_id", "material_id"),
+    )
+
+    def __repr__(self):
+        return f"<StockAlert(id={self.id}, material_id={self.material_id}, level='{self.level}')>"
+
+
+class MaterialReservation(Base):
+    """Material held by a print job from dispatch until it finishes"""
+    __tablename__ = "material_reservations"
+
+    print_job_id = Column(Integer, ForeignKey("print_jobs.id"), primary_key=True, autoincrement=False)
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    quantity = Column(Float, nullable=False)  # In the material's stock unit
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_material_reservations_material_id", "material_id"),
+    )
+
+    def __repr__(self):
+        return f"<MaterialReservation(print_job_id={self.print_job_id}, material_id={self.material_id}, quantity={self.quantity})>"
+
+
+class MaterialAllocation(Base):
+    """Running total of a material's open reservations"""
+    __tablename__ = "material_allocations"
+
+    material_id = Column(Integer, ForeignKey("materials.id"), primary_key=True, autoincrement=False)
+    reserved = Column(Float, nullable=False, default=0.0)  # Available to promise = current_stock - reserved
+    updated_at = Column(DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<MaterialAllocation(material_id={self.material_id}, reserved={self.reserved})>"
+
+
 class MaterialCertification(Base):
     """Material certification model."""
     __tablename__ = "material_certifications"
@@ -0,0 +1,37 @@
+# src/db/models/oee.py
+from sqlalchemy import Column, Integer, Float, Date, DateTime, Index
+
+from .user import Base
+
+
+class DeviceOeeDaily(Base):
+    """Materialized OEE inputs and components for one device on one day"""
+    __tablename__ = "device_oee_daily"
+
+    device_id = Column(Integer, primary_key=True, autoincrement=False)
+    day = Column(Date, primary_key=True)
+
+    # Raw sums, so rollups over devices/days are ratios of sums
+    planned_minutes = Column(Float, nullable=False)
+    downtime_minutes = Column(Float, nullable=False)
+    ideal_minutes = Column(Float, nullable=False)  # Estimated duration of completed jobs
+    run_minutes = Column(Float, nullable=False)    # Actual duration of the same jobs
+    finished_jobs = Column(Integer, nullable=False)
+    good_jobs = Column(Integer, nullable=False)
+    test_pass_rate = Column(Float)  # Fleet quality test pass rate that day, if any tests ran
+
+    # Components as fractions (0-1); NULL when there is nothing to measure
+    availability = Column(Float)
+    performance = Column(Float)
+    quality = Column(Float)
+    oee = Column(Float)
+
+    computed_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Fleet and location rollups read a range of days across all devices
+        Index("ix_device_oee_daily_day", "day"),
+    )
+
+    def __repr__(self):
+        return f"<DeviceOeeDaily(device_id={self.device_id}, day={self.day}, oee={self.oee})>"
@@ -0,0 +1,24 @@
+# src/db/models/outbox.py
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
+import datetime
+
+from .user import Base
+
+
+class OutboxEvent(Base):
+    """Change-data-capture record written in the same transaction as the row change"""
+    __tablename__ = "outbox_events"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Sequence number for tailing
+    table_name = Column(String(100), nullable=False)
+    row_pk = Column(String(100), nullable=False)
+    op = Column(String(10), nullable=False)  # insert, update, delete
+    changed_columns = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index("ix_outbox_events_table_name_id", "table_name", "id"),
+    )
+
+    def __repr__(self):
+        return f"<OutboxEvent(id={self.id}, table='{self.table_name}', pk='{self.row_pk}', op='{self.op}')>"
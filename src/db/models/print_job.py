@@ -1,5 +1,5 @@
 # src/db/models/print_job.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from .user import Base
@@ -11,7 +11,7 @@ class PrintJob(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     name = Column(String(100), nullable=False)
     description = Column(Text)
-    status = Column(String(20), default="Pending")  # Pending, In Progress, Completed, Failed, Cancelled
+    status = Column(String(20), default="Pending")  # Pending, Scheduled, In Progress, Completed, Failed, Cancelled, Merged
     
     # Relationships
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -38,5 +38,17 @@ class PrintJob(Base):
     device = relationship("Device", back_populates="print_jobs")
     material = relationship("Material", back_populates="print_jobs")
     
+    # Filter columns lead, created_at follows so "latest N matching jobs" is an index range scan
+    __table_args__ = (
+        Index("ix_print_jobs_status_created_at", "status", "created_at"),
+        Index("ix_print_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_print_jobs_device_id_created_at", "device_id", "created_at"),
+        Index("ix_print_jobs_created_at", "created_at"),
+        # Utilization reads the jobs running in a time window
+        Index("ix_print_jobs_start_time", "start_time"),
+        # Covers the GROUP BY status statistics query, so it never touches the table rows
+        Index("ix_print_jobs_status_totals", "status", "material_used", "actual_duration"),
+    )
+    
     def __repr__(self):
         return f"<PrintJob(id={self.id}, name='{self.name}', status='{self.status}')>"
\ No newline at end of file
@@ -10,6 +10,7 @@ from sqlalchemy import (
     Boolean,
     JSON,
     Table,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -75,6 +76,31 @@ class Product(Base):
         return f"<Product(id={self.id}, name='{self.name}')>"
 
 
+class BomLine(Base):
+    """Bill of materials line: a material or a sub-assembly needed per unit of a product"""
+
+    __tablename__ = "bom_lines"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    # Exactly one of material_id and component_product_id is set
+    material_id = Column(Integer, ForeignKey("materials.id"), nullable=True)
+    component_product_id = Column(Integer, ForeignKey("products.id"), nullable=True)  # Sub-assembly
+    quantity = Column(Float, nullable=False)  # Per unit: in the material's stock unit, or number of sub-assemblies
+    source = Column(String(20), default="manual")  # manual, parsed (from Product.materials_used)
+    notes = Column(Text)  # For parsed lines, the text they were read from
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_bom_lines_product_id", "product_id"),
+        Index("ix_bom_lines_component_product_id", "component_product_id"),
+    )
+
+    def __repr__(self):
+        return f"<BomLine(id={self.id}, product_id={self.product_id}, quantity={self.quantity})>"
+
+
 class ProductCategory(Base):
     """Model for product categories"""
 
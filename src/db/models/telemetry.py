@@ -0,0 +1,51 @@
+# src/db/models/telemetry.py
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Index
+
+from .user import Base
+
+
+class TelemetrySample(Base):
+    """Raw (1 second) print telemetry sample; append-only"""
+    __tablename__ = "telemetry_samples"
+
+    device_id = Column(Integer, primary_key=True, autoincrement=False)
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    ts = Column(BigInteger, primary_key=True, autoincrement=False)  # Epoch seconds (UTC)
+    progress = Column(Float)     # Percent complete
+    nozzle_temp = Column(Float)  # Celsius
+    bed_temp = Column(Float)     # Celsius
+    layer = Column(Integer)
+
+    __table_args__ = (
+        # Rollups and retention scan by time across all devices
+        Index("ix_telemetry_samples_ts", "ts"),
+    )
+
+    def __repr__(self):
+        return f"<TelemetrySample(device_id={self.device_id}, job_id={self.job_id}, ts={self.ts})>"
+
+
+class TelemetryRollup(Base):
+    """Downsampled telemetry for one device/job over one bucket of a tier (1m or 1h)"""
+    __tablename__ = "telemetry_rollups"
+
+    tier = Column(String(4), primary_key=True)
+    device_id = Column(Integer, primary_key=True, autoincrement=False)
+    job_id = Column(Integer, primary_key=True, autoincrement=False)
+    bucket = Column(BigInteger, primary_key=True, autoincrement=False)  # Bucket start, epoch seconds
+    samples = Column(Integer, nullable=False)
+    progress = Column(Float)  # Highest progress reached in the bucket
+    nozzle_temp_avg = Column(Float)
+    nozzle_temp_min = Column(Float)
+    nozzle_temp_max = Column(Float)
+    bed_temp_avg = Column(Float)
+    bed_temp_min = Column(Float)
+    bed_temp_max = Column(Float)
+    layer = Column(Integer)  # Highest layer reached in the bucket
+
+    __table_args__ = (
+        Index("ix_telemetry_rollups_tier_bucket", "tier", "bucket"),
+    )
+
+    def __repr__(self):
+        return f"<TelemetryRollup(tier='{self.tier}', device_id={self.device_id}, job_id={self.job_id}, bucket={self.bucket})>"
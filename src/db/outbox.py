@@ -0,0 +1,237 @@
+"""
+Change-data-capture outbox.
+Every ORM flush on an application session records one (table, pk, op,
+changed columns) row per inserted, updated or deleted object in the
+outbox_events table, inside the same transaction as the change itself.
+After commit the events are published to in-process subscribers; other
+processes can tail the table by sequence number with read_events().
+Events older than the retention window are deleted by prune_events(), run
+from cron through scripts/stock_ledger.py prune-outbox.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect
+
+from src.db.connection import get_db_session, session_factory
+from src.db.models.outbox import OutboxEvent
+
+_PENDING_KEY = "outbox_pending"
+
+# Days events are kept for out-of-process consumers (override with OUTBOX_RETENTION_DAYS)
+RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+
+outbox_table = OutboxEvent.__table__
+
+_subscribers: List[Dict] = []
+_subscribers_lock = threading.Lock()
+
+
+def subscribe(callback: Callable[[Dict], None], tables: Optional[Iterable[str]] = None):
+    """
+    Register a callback that receives every committed change event.
+
+    Callbacks run in the committing thread right after commit, so they should
+    stay cheap (mark something stale, enqueue work) and must not open
+    database sessions themselves.
+
+    Args:
+        callback: Function called with one event dictionary per change
+        tables: Optional table names to limit the events delivered
+
+    Returns:
+        The callback, so this can also be used as a decorator
+    """
+    with _subscribers_lock:
+        _subscribers.append({
+            "callback": callback,
+            "tables": set(tables) if tables else None,
+        })
+    return callback
+
+
+def unsubscribe(callback: Callable[[Dict], None]):
+    """Remove a callback registered with subscribe()"""
+    with _subscribers_lock:
+        _subscribers[:] = [s for s in _subscribers if s["callback"] is not callback]
+
+
+def publish(events: List[Dict]):
+    """Deliver committed events to in-process subscribers"""
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+
+    for subscriber in subscribers:
+        for change in events:
+            if subscriber["tables"] and change["table_name"] not in subscriber["tables"]:
+                continue
+            try:
+                subscriber["callback"](change)
+            except Exception as e:
+                print(f"[Outbox] Error in subscriber {subscriber['callback']}: {e}")
+
+
+def _row_pk(state) -> str:
+    identity = state.mapper.primary_key_from_instance(state.obj())
+    return ",".join(str(value) for value in identity)
+
+
+def _changed_columns(state) -> List[str]:
+    return [
+        column_attr.key
+        for column_attr in state.mapper.column_attrs
+        if state.attrs[column_attr.key].history.has_changes()
+    ]
+
+
+def _write_events(session, rows: List[Dict]) -> List[Dict]:
+    """Insert outbox rows on the session's connection and return them with their sequence ids"""
+    if not rows:
+        return []
+
+    connection = session.connection()
+    if connection.dialect.insert_executemany_returning:
+        result = connection.execute(outbox_table.insert().returning(outbox_table.c.id), rows)
+        ids = [row[0] for row in result]
+    else:
+        ids = [
+            connection.execute(outbox_table.insert(), row).inserted_primary_key[0]
+            for row in rows
+        ]
+
+    return [dict(row, id=sequence) for row, sequence in zip(rows, ids)]
+
+
+def record_events(session, table_name: str, row_pks: Iterable, op: str,
+                  changed_columns: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Record change events for writes that bypass the ORM unit of work.
+
+    Set-based UPDATE/INSERT/DELETE statements are not seen by after_flush, so
+    services issuing them should call this on the same session to keep the
+    outbox complete.
+
+    Args:
+        session: The session whose transaction performed the write
+        table_name: Name of the table that changed
+        row_pks: Primary keys of the affected rows
+        op: "insert", "update" or "delete"
+        changed_columns: Columns written by the statement
+
+    Returns:
+        List of the recorded event dictionaries
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "table_name": table_name,
+            "row_pk": str(pk),
+            "op": op,
+            "changed_columns": changed_columns or [],
+            "created_at": now,
+        }
+        for pk in row_pks
+    ]
+    written = _write_events(session, rows)
+    session.info.setdefault(_PENDING_KEY, []).extend(written)
+    return written
+
+
+@event.listens_for(session_factory, "after_flush")
+def _capture_flush(session, flush_context):
+    now = datetime.utcnow()
+    rows = []
+
+    for op, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if isinstance(obj, OutboxEvent):
+                continue
+            if op == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+
+            state = inspect(obj)
+            rows.append({
+                "table_name": state.mapper.persist_selectable.name,
+                "row_pk": _row_pk(state),
+                "op": op,
+                "changed_columns": [] if op == "delete" else _changed_columns(state),
+                "created_at": now,
+            })
+
+    written = _write_events(session, rows)
+    if written:
+        session.info.setdefault(_PENDING_KEY, []).extend(written)
+
+
+@event.listens_for(session_factory, "after_commit")
+def _publish_committed(session):
+    events = session.info.pop(_PENDING_KEY, None)
+    if events:
+        publish(events)
+
+
+@event.listens_for(session_factory, "after_transaction_end")
+def _discard_uncommitted(session, transaction):
+    # Events still pending when the outermost transaction ends were rolled back
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def read_events(after_sequence: int = 0, limit: int = 1000,
+                tables: Optional[Iterable[str]] = None) -> List[Dict]:
+    """
+    Read persisted events in sequence order, for out-of-process consumers.
+
+    Args:
+        after_sequence: Return only events with a sequence number above this
+        limit: Maximum number of events to return
+        tables: Optional table names to filter on
+
+    Returns:
+        List of event dictionaries ordered by sequence number
+    """
+    try:
+        with get_db_session() as session:
+            query = session.query(OutboxEvent).filter(OutboxEvent.id > after_sequence)
+            if tables:
+                query = query.filter(OutboxEvent.table_name.in_(list(tables)))
+
+            events = query.order_by(OutboxEvent.id).limit(limit).all()
+            return [
+                {
+                    "id": e.id,
+                    "table_name": e.table_name,
+                    "row_pk": e.row_pk,
+                    "op": e.op,
+                    "changed_columns": e.changed_columns or [],
+                    "created_at": e.created_at,
+                }
+                for e in events
+            ]
+    except Exception as e:
+        print(f"[Outbox] Error reading events after {after_sequence}: {e}")
+        return []
+
+
+def prune_events(before: Optional[datetime] = None) -> int:
+    """
+    Delete events created before the given time.
+
+    Args:
+        before: Cut-off time (UTC); defaults to RETENTION_DAYS ago
+
+    Returns:
+        Number of events removed
+    """
+    before = before or datetime.utcnow() - timedelta(days=RETENTION_DAYS)
+    try:
+        with get_db_session() as session:
+            return session.query(OutboxEvent).filter(OutboxEvent.created_at < before).delete(
+                synchronize_session=False
+            )
+    except Exception as e:
+        print(f"[Outbox] Error pruning events: {e}")
+        return 0
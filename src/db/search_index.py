@@ -0,0 +1,124 @@
+"""
+Full-text search index.
+One SQLite FTS5 table, search_index, holds a title and a body per catalog
+row (materials, products, blueprints, certifications, OEMs and suppliers).
+The rowid packs the entity and its id (id * 8 + entity code), so a row is
+replaced or removed by rowid.
+
+The index is kept in sync by triggers on the source tables, so ORM flushes,
+set-based Core statements and raw SQL all update it in the writing
+transaction. Update triggers only fire when an indexed column changes
+(stock movements do not touch the index).
+
+On other databases, or SQLite builds without FTS5, there is no index and
+search_service falls back to pattern matching.
+"""
+
+from typing import Dict, List
+
+from sqlalchemy import text
+
+SEARCH_TABLE = "search_index"
+
+# Entity -> rowid code, source table, title column and body columns
+ENTITIES: Dict[str, Dict] = {
+    "material": {
+        "code": 0, "table": "materials", "title": "name",
+        "body": ["material_type", "type", "description", "location", "storage_location"],
+    },
+    "product": {
+        "code": 1, "table": "products", "title": "name",
+        "body": ["product_code", "description", "materials_used"],
+    },
+    "blueprint": {
+        "code": 2, "table": "blueprints", "title": "name",
+        "body": ["description", "file_type", "notes"],
+    },
+    "certification": {
+        "code": 3, "table": "certifications", "title": "cert_number",
+        "body": ["cert_type", "issuing_authority", "status", "requirements"],
+    },
+    "oem": {
+        "code": 4, "table": "oems", "title": "name",
+        "body": ["partnership_type", "location", "contact_name", "description"],
+    },
+    "supplier": {
+        "code": 5, "table": "suppliers", "title": "name",
+        "body": ["contact_person", "address", "website", "notes"],
+    },
+}
+
+ROWID_STRIDE = 8
+
+
+def is_supported(connection) -> bool:
+    return connection.dialect.name == "sqlite"
+
+
+def is_installed(connection) -> bool:
+    """Whether the search table exists (install() fails on SQLite builds without FTS5)"""
+    if not is_supported(connection):
+        return False
+    return connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": SEARCH_TABLE}
+    ).first() is not None
+
+
+def _row_values(entity: str, prefix: str) -> str:
+    """SQL expressions for (rowid, entity, title, body) of a row (prefix is new., old. or empty)"""
+    spec = ENTITIES[entity]
+    body = " || ' ' || ".join(f"coalesce({prefix}{column}, '')" for column in spec["body"])
+    return f"{prefix}id * {ROWID_STRIDE} + {spec['code']}, '{entity}', {prefix}{spec['title']}, {body}"
+
+
+def _trigger_statements(entity: str) -> List[str]:
+    spec = ENTITIES[entity]
+    table = spec["table"]
+    columns = ", ".join([spec["title"]] + spec["body"])
+    insert_new = f"INSERT INTO {SEARCH_TABLE}(rowid, entity, title, body) VALUES ({_row_values(entity, 'new.')});"
+    delete_old = f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * {ROWID_STRIDE} + {spec['code']};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_update AFTER UPDATE OF id, {columns} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_{table}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END",
+    ]
+
+
+def rebuild(connection) -> int:
+    """Repopulate the index from the source tables; returns the number of rows indexed"""
+    connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+    for entity, spec in ENTITIES.items():
+        connection.execute(text(
+            f"INSERT INTO {SEARCH_TABLE}(rowid, entity, title, body) "
+            f"SELECT {_row_values(entity, '')} FROM {spec['table']}"
+        ))
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    return connection.execute(text(f"SELECT count(*) FROM {SEARCH_TABLE}")).scalar()
+
+
+def install(engine) -> bool:
+    """
+    Create the search table and its triggers if missing, and backfill a new index.
+
+    Returns:
+        Whether the database supports the index
+    """
+    with engine.begin() as connection:
+        if not is_supported(connection):
+            return False
+        exists = is_installed(connection)
+        if not exists:
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+                f"entity UNINDEXED, title, body, "
+                f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            ))
+        for entity in ENTITIES:
+            for statement in _trigger_statements(entity):
+                connection.execute(text(statement))
+        if not exists:
+            rebuild(connection)
+    return True
@@ -52,6 +52,28 @@ def get_user_by_id(user_id, db_session=None):
                 return None
 
 
+def get_usernames_by_ids(user_ids, db_session):
+    """
+    Get usernames for several users with a single query.
+
+    Args:
+        user_ids: Iterable of user IDs
+        db_session: SQLAlchemy session
+
+    Returns:
+        Dictionary mapping user ID to username
+    """
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return {}
+    try:
+        rows = db_session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()
+        return {user_id: username for user_id, username in rows}
+    except Exception as e:
+        print(f"Error fetching usernames: {e}")
+        return {}
+
+
 def create_user(
     username, password, first_name, last_name, email, role, phone=None, is_active=True
 ):
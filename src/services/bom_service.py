@@ -0,0 +1,563 @@
+"""
+Bill of materials service.
+A product's bom_lines give the materials (in the material's stock unit)
+and sub-assemblies (other products) needed per unit. explode_requirements()
+turns a production plan (product -> units) into material requirements:
+
+1. Each product is expanded once into its flattened material quantities
+   per unit, depth first, so a sub-assembly is expanded once however many
+   products contain it; a product's expansion sums its own lines and its
+   sub-assemblies' expansions with numpy. Expansions are memoized across calls and dropped
+   when bom_lines changes in this process (outbox subscriber).
+2. The plan is rolled up in one vectorized step: the expansions of the
+   planned products are concatenated, scaled by the planned units and
+   summed per material with np.bincount.
+3. The totals are compared with the stock available to promise (current
+   stock minus reservations, see reservation_service) for all materials
+   at once.
+
+migrate_materials_used() backfills BOM lines from the free-text
+Product.materials_used; see parse_materials_text() for what it reads.
+"""
+
+import re
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.material import Material
+from src.db.models.product import BomLine, Product
+from src.services import reservation_service
+from src.services.dispatch_service import material_required
+
+# Bound on IN lists when loading BOM lines and stock
+IN_LIST_LIMIT = 500
+
+SOURCE_MANUAL = "manual"
+SOURCE_PARSED = "parsed"
+
+bom_table = BomLine.__table__
+products_table = Product.__table__
+materials_table = Material.__table__
+
+# Product id -> (material ids, quantities per unit), sorted by material id
+_expansions: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+_expansions_lock = threading.Lock()
+_generation = 0
+
+_EMPTY = (np.empty(0, dtype=np.int64), np.empty(0, dtype=float))
+
+
+def _clear_expansions(change: Dict) -> None:
+    """Outbox subscriber: forget memoized expansions once a BOM changes"""
+    global _generation
+    with _expansions_lock:
+        _expansions.clear()
+        _generation += 1
+
+
+outbox.subscribe(_clear_expansions, tables=["bom_lines"])
+
+
+def _load_lines(db_session, product_ids: List[int]) -> Dict[int, List[Tuple[Optional[int], Optional[int], float]]]:
+    """BOM lines of the given products as (material_id, component_product_id, quantity)"""
+    lines = {product_id: [] for product_id in product_ids}
+    for start in range(0, len(product_ids), IN_LIST_LIMIT):
+        rows = db_session.execute(
+            select(bom_table.c.product_id, bom_table.c.material_id, bom_table.c.component_product_id,
+                   bom_table.c.quantity)
+            .where(bom_table.c.product_id.in_(product_ids[start:start + IN_LIST_LIMIT]))
+        )
+        for product_id, material_id, component_id, quantity in rows:
+            lines[product_id].append((material_id, component_id, float(quantity or 0)))
+    return lines
+
+
+def _combine(lines: List[Tuple[Optional[int], Optional[int], float]],
+             expansions: Dict[int, Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Sum a product's own materials and its scaled sub-assembly expansions per material"""
+    own = [(material_id, quantity) for material_id, _, quantity in lines if material_id is not None]
+    ids = [np.array([material_id for material_id, _ in own], dtype=np.int64)]
+    quantities = [np.array([quantity for _, quantity in own], dtype=float)]
+    for _, component_id, quantity in lines:
+        if component_id is not None:
+            ids.append(expansions[component_id][0])
+            quantities.append(expansions[component_id][1] * quantity)
+    material_ids, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+    return material_ids, np.bincount(inverse, weights=np.concatenate(quantities), minlength=len(material_ids))
+
+
+def expand_products(db_session, product_ids: Iterable[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+    """
+    Flattened material quantities per unit of each product.
+
+    Args:
+        db_session: Database session
+        product_ids: Products to expand
+
+    Returns:
+        Dictionary of product id -> (material ids, quantities per unit)
+
+    Raises:
+        ValueError: If the BOM of a product contains itself
+    """
+    product_ids = set(product_ids)
+    with _expansions_lock:
+        generation = _generation
+        expansions = dict(_expansions)
+
+    # Load the BOM of every product reachable from the ones not memoized, level by level
+    lines: Dict[int, List[Tuple[Optional[int], Optional[int], float]]] = {}
+    frontier = sorted(product_ids - expansions.keys())
+    while frontier:
+        loaded = _load_lines(db_session, frontier)
+        lines.update(loaded)
+        frontier = sorted({
+            component_id for entries in loaded.values() for _, component_id, _ in entries
+            if component_id is not None and component_id not in lines and component_id not in expansions
+        })
+
+    computed = {}
+    for root in sorted(lines):
+        if root in expansions:
+            continue
+        # Depth-first post-order: a product is expanded after all of its sub-assemblies
+        stack = [(root, iter([c for _, c, _ in lines[root] if c is not None]))]
+        visiting = {root}
+        while stack:
+            product_id, components = stack[-1]
+            component_id = next(components, None)
+            if component_id is None:
+                stack.pop()
+                visiting.discard(product_id)
+                expansions[product_id] = computed[product_id] = _combine(lines[product_id], expansions)
+                continue
+            if component_id in expansions:
+                continue
+            if component_id in visiting:
+                raise ValueError(f"Bill of materials of product {component_id} contains itself")
+            visiting.add(component_id)
+            stack.append((component_id, iter([c for _, c, _ in lines[component_id] if c is not None])))
+
+    with _expansions_lock:
+        # Keep the results only if no BOM changed while they were computed
+        if generation == _generation:
+            _expansions.update(computed)
+    return {product_id: expansions.get(product_id, _EMPTY) for product_id in product_ids}
+
+
+def _plan_units(plan: Union[Dict[int, float], Iterable[Tuple[int, float]]]) -> Dict[int, float]:
+    units: Dict[int, float] = {}
+    for product_id, quantity in (plan.items() if isinstance(plan, dict) else plan):
+        units[product_id] = units.get(product_id, 0.0) + float(quantity or 0)
+    return {product_id: quantity for product_id, quantity in units.items() if quantity > 0}
+
+
+def _load_stock(db_session, material_ids: np.ndarray) -> pd.DataFrame:
+    """Name, unit and available-to-promise figures of the given materials, indexed by material id"""
+    rows = []
+    ids = material_ids.tolist()
+    for start in range(0, len(ids), IN_LIST_LIMIT):
+        query = reservation_service.available_to_promise_query(
+            materials_table.c.id.in_(ids[start:start + IN_LIST_LIMIT])
+        ).add_columns(materials_table.c.name, materials_table.c.unit)
+        rows.extend(db_session.execute(query).all())
+    stock = pd.DataFrame(
+        rows, columns=["material_id", "current_stock", "reserved", "available", "name", "unit"]
+    ).set_index("material_id")
+    return stock.reindex(material_ids)
+
+
+def explode_requirements(db_session, plan: Union[Dict[int, float], Iterable[Tuple[int, float]]]) -> pd.DataFrame:
+    """
+    Material requirements of a production plan, against available stock.
+
+    Args:
+        db_session: Database session
+        plan: Product id -> units to build (or (product id, units) pairs)
+
+    Returns:
+        DataFrame with one row per material: material_id, name, unit,
+        required, current_stock, reserved, available and shortage
+        (required beyond what is available, 0 when covered)
+
+    Raises:
+        ValueError: If the BOM of a planned product contains itself
+    """
+    units = _plan_units(plan)
+    columns = ["material_id", "name", "unit", "required", "current_stock", "reserved", "available", "shortage"]
+    expansions = expand_products(db_session, units)
+    product_ids = [product_id for product_id in units if len(expansions[product_id][0])]
+    if not product_ids:
+        return pd.DataFrame(columns=columns)
+
+    material_ids, inverse = np.unique(
+        np.concatenate([expansions[product_id][0] for product_id in product_ids]), return_inverse=True
+    )
+    quantities = np.concatenate([expansions[product_id][1] * units[product_id] for product_id in product_ids])
+    required = np.bincount(inverse, weights=quantities, minlength=len(material_ids))
+
+    stock = _load_stock(db_session, material_ids)
+    frame = pd.DataFrame({
+        "material_id": material_ids,
+        "name": stock["name"].to_numpy(),
+        "unit": stock["unit"].to_numpy(),
+        "required": required,
+        "current_stock": stock["current_stock"].fillna(0).to_numpy(dtype=float),
+        "reserved": stock["reserved"].fillna(0).to_numpy(dtype=float),
+        "available": stock["available"].fillna(0).to_numpy(dtype=float),
+    })
+    frame["shortage"] = np.maximum(frame["required"].to_numpy() - frame["available"].to_numpy(), 0.0)
+    return frame[columns]
+
+
+def get_material_requirements(plan: Union[Dict[int, float], Iterable[Tuple[int, float]]]) -> Dict[str, Any]:
+    """
+    Explode a production plan into material requirements.
+
+    Args:
+        plan: Product id -> units to build (or (product id, units) pairs)
+
+    Returns:
+        Dictionary with "materials" (dictionaries with material_id, name,
+        unit, required, current_stock, reserved, available and shortage,
+        largest shortage first), "short" (number of materials with a
+        shortage) and "without_bom" (planned product ids that have no
+        bill of materials)
+    """
+    reservation_service.ensure_reservations_synced()
+    units = _plan_units(plan)
+    try:
+        with get_db_session() as db_session:
+            frame = explode_requirements(db_session, units)
+            expansions = expand_products(db_session, units)
+    except Exception as e:
+        print(f"Error exploding material requirements: {e}")
+        return {"materials": [], "short": 0, "without_bom": []}
+
+    frame = frame.sort_values(["shortage", "required"], ascending=False, kind="stable")
+    return {
+        "materials": frame.to_dict("records"),
+        "short": int((frame["shortage"] > 0).sum()),
+        "without_bom": sorted(product_id for product_id in units if not len(expansions[product_id][0])),
+    }
+
+
+def get_bom(product_id: int) -> List[Dict[str, Any]]:
+    """
+    BOM lines of a product.
+
+    Returns:
+        List of dictionaries with id, material_id, material_name, unit,
+        component_product_id, component_name, quantity, source and notes
+    """
+    components = products_table.alias("components")
+    try:
+        with get_db_session() as db_session:
+            rows = db_session.execute(
+                select(
+                    bom_table.c.id, bom_table.c.material_id, materials_table.c.name.label("material_name"),
+                    materials_table.c.unit, bom_table.c.component_product_id,
+                    components.c.name.label("component_name"), bom_table.c.quantity, bom_table.c.source,
+                    bom_table.c.notes,
+                )
+                .select_from(
+                    bom_table
+                    .outerjoin(materials_table, materials_table.c.id == bom_table.c.material_id)
+                    .outerjoin(components, components.c.id == bom_table.c.component_product_id)
+                )
+                .where(bom_table.c.product_id == product_id)
+                .order_by(bom_table.c.id)
+            ).all()
+            return [dict(row._mapping) for row in rows]
+    except Exception as e:
+        print(f"Error retrieving bill of materials for product {product_id}: {e}")
+        return []
+
+
+def _component_graph(db_session) -> Dict[int, Set[int]]:
+    graph: Dict[int, Set[int]] = {}
+    for product_id, component_id in db_session.execute(
+        select(bom_table.c.product_id, bom_table.c.component_product_id)
+        .where(bom_table.c.component_product_id.isnot(None))
+    ):
+        graph.setdefault(product_id, set()).add(component_id)
+    return graph
+
+
+def _reaches(graph: Dict[int, Set[int]], start: int, target: int) -> bool:
+    """Whether `target` is `start` or one of its (nested) sub-assemblies"""
+    seen, stack = set(), [start]
+    while stack:
+        product_id = stack.pop()
+        if product_id == target:
+            return True
+        if product_id not in seen:
+            seen.add(product_id)
+            stack.extend(graph.get(product_id, ()))
+    return False
+
+
+def set_bom(product_id: int, lines: Iterable[Dict[str, Any]]) -> bool:
+    """
+    Replace a product's bill of materials.
+
+    Args:
+        product_id: Product id
+        lines: Dictionaries with either material_id or component_product_id,
+            quantity per unit of the product, and optionally notes
+
+    Returns:
+        True if saved, False if a line is invalid or would make the
+        product contain itself
+    """
+    lines = list(lines)
+    try:
+        with get_db_session() as db_session:
+            graph = _component_graph(db_session)
+            graph.pop(product_id, None)
+            for line in lines:
+                if (line.get("material_id") is None) == (line.get("component_product_id") is None):
+                    raise ValueError("each line needs exactly one of material_id and component_product_id")
+                if not line.get("quantity") or line["quantity"] <= 0:
+                    raise ValueError("quantities must be positive")
+                component_id = line.get("component_product_id")
+                if component_id is not None and _reaches(graph, component_id, product_id):
+                    raise ValueError(f"product {component_id} contains product {product_id}")
+
+            stale = list(db_session.scalars(select(bom_table.c.id).where(bom_table.c.product_id == product_id)))
+            if stale:
+                db_session.execute(delete(bom_table).where(bom_table.c.id.in_(stale)))
+                outbox.record_events(db_session, "bom_lines", stale, "delete")
+            db_session.add_all([
+                BomLine(
+                    product_id=product_id,
+                    material_id=line.get("material_id"),
+                    component_product_id=line.get("component_product_id"),
+                    quantity=float(line["quantity"]),
+                    source=SOURCE_MANUAL,
+                    notes=line.get("notes"),
+                )
+                for line in lines
+            ])
+            return True
+    except Exception as e:
+        print(f"Error saving bill of materials for product {product_id}: {e}")
+        return False
+
+
+# Free-text parsing
+_SEPARATORS = re.compile(r"[;,\n]+|\s+\+\s+|\s+&\s+|\s+and\s+", re.IGNORECASE)
+_MASS = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)\s*(kg|mg|g|ml|l)(?!\w)", re.IGNORECASE)
+_SHARE = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)\s*%")
+_COUNT = re.compile(r"(?<![\w.])[x×*]?\s*(\d+(?:\.\d+)?)\s*(?:[x×*](?!\w))?(?![\w.])", re.IGNORECASE)
+_GRAMS = {"kg": 1000.0, "g": 1.0, "mg": 0.001, "l": 1000.0, "ml": 1.0}
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercase a name and reduce it to words, for matching free text against catalog names"""
+    return " ".join(re.findall(r"\w+", (name or "").lower()))
+
+
+def _named_in(text: str, catalog: Dict[str, Any]) -> Optional[str]:
+    """Longest catalog name appearing in `text` as whole words (None if tied)"""
+    padded = f" {normalize_name(text)} "
+    found = [name for name in catalog if name and f" {name} " in padded]
+    if not found:
+        return None
+    longest = max(len(name) for name in found)
+    best = [name for name in found if len(name) == longest]
+    return best[0] if len(best) == 1 else None
+
+
+def _naming(text: str, catalog: Dict[str, Any]) -> Optional[str]:
+    """The only catalog name that contains `text` as whole words (for "Titanium" naming "Titanium Ti-6Al-4V")"""
+    key = normalize_name(text)
+    if not key:
+        return None
+    found = [name for name in catalog if f" {key} " in f" {name} "]
+    return found[0] if len(found) == 1 else None
+
+
+def _without(text: str, name: str) -> str:
+    """`text` with the words of a normalized catalog name removed"""
+    pattern = r"(?<!\w)" + r"\W+".join(re.escape(word) for word in name.split()) + r"(?!\w)"
+    return re.sub(pattern, " ", text, count=1, flags=re.IGNORECASE)
+
+
+def _strip_amounts(text: str) -> str:
+    for pattern in (_MASS, _SHARE, _COUNT):
+        text = pattern.sub(" ", text)
+    return re.sub(r"(?<!\w)[x×*](?!\w)", " ", text, flags=re.IGNORECASE)
+
+
+def parse_materials_text(text: Optional[str], materials: Dict[str, Tuple[int, Optional[str]]],
+                         products: Dict[str, int], weight: Optional[float] = None) -> Dict[str, List]:
+    """
+    Read BOM lines from free text such as "PLA 200g; 2x Hinge; Carbon Fiber PETG".
+
+    The text is split on semicolons, commas, new lines, "+", "&" and "and".
+    Each part names a material or a product (a sub-assembly): the longest
+    catalog name it contains, or else the one catalog name containing what
+    is left once amounts are removed. Materials take a mass or volume
+    (200g, 0.5 kg, 30 ml) or a share of the product weight (40%); materials
+    without either share whatever product weight the others leave.
+    Sub-assemblies take a count (2x Hinge, Hinge x2), defaulting to 1.
+
+    Args:
+        text: Free text
+        materials: Normalized material name -> (material id, unit)
+        products: Normalized product name -> product id
+        weight: Product weight in kg, if known
+
+    Returns:
+        Dictionary with "lines" (dictionaries with material_id or
+        component_product_id, quantity and notes) and "unparsed" (parts
+        that named nothing known or had no quantity to go on)
+    """
+    lines, unparsed, unweighed = [], [], []
+    weighed_grams = 0.0
+    for part in _SEPARATORS.split(text or ""):
+        part = part.strip(" \t.:-")
+        if not part:
+            continue
+
+        # Names are found before amounts, so grades like "316L" stay part of the name
+        material_name, product_name = _named_in(part, materials), _named_in(part, products)
+        if material_name and product_name:
+            if len(material_name) >= len(product_name):
+                product_name = None
+            else:
+                material_name = None
+        if material_name or product_name:
+            rest = _without(part, material_name or product_name)
+        else:
+            rest = part
+            bare = _strip_amounts(part)
+            material_name = _naming(bare, materials)
+            product_name = None if material_name else _naming(bare, products)
+            if not (material_name or product_name):
+                unparsed.append(part)
+                continue
+
+        mass, share = _MASS.search(rest), _SHARE.search(rest)
+        if product_name:
+            count = _COUNT.search(_MASS.sub(" ", rest))
+            lines.append({
+                "component_product_id": products[product_name],
+                "quantity": float(count.group(1)) if count else 1.0,
+                "notes": part,
+            })
+            continue
+
+        material_id, unit = materials[material_name]
+        if mass:
+            grams = float(mass.group(1)) * _GRAMS[mass.group(2).lower()]
+        elif share and weight:
+            grams = float(weight) * 1000.0 * float(share.group(1)) / 100.0
+        else:
+            unweighed.append((part, material_id, unit))
+            continue
+        weighed_grams += grams
+        lines.append({"material_id": material_id, "quantity": material_required(grams, unit), "notes": part})
+
+    # Materials named without an amount split the product weight the others leave
+    remaining = float(weight or 0) * 1000.0 - weighed_grams
+    for part, material_id, unit in unweighed:
+        if remaining <= 0:
+            unparsed.append(part)
+            continue
+        lines.append({
+            "material_id": material_id,
+            "quantity": material_required(remaining / len(unweighed), unit),
+            "notes": part,
+        })
+    return {"lines": lines, "unparsed": unparsed}
+
+
+def migrate_materials_used(product_ids: Optional[Iterable[int]] = None, replace: bool = False,
+                           dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Create BOM lines from Product.materials_used.
+
+    Products that already have a bill of materials are left alone, except
+    that replace=True re-reads products whose lines all came from an
+    earlier migration. Sub-assembly lines that would make a product
+    contain itself are skipped.
+
+    Args:
+        product_ids: Products to migrate (defaults to all)
+        replace: Re-parse products whose lines were all parsed before
+        dry_run: Parse and report without writing
+
+    Returns:
+        Dictionary with the number of products migrated, the number of
+        lines created and the unparsed parts ({"product_id", "text"})
+    """
+    summary = {"products": 0, "lines": 0, "unparsed": []}
+    try:
+        with get_db_session() as db_session:
+            materials = {
+                normalize_name(name): (material_id, unit)
+                for material_id, name, unit in db_session.execute(
+                    select(materials_table.c.id, materials_table.c.name, materials_table.c.unit)
+                )
+            }
+            products_query = select(
+                products_table.c.id, products_table.c.name, products_table.c.weight, products_table.c.materials_used
+            )
+            if product_ids is not None:
+                products_query = products_query.where(products_table.c.id.in_(list(product_ids)))
+            candidates = db_session.execute(products_query.order_by(products_table.c.id)).all()
+            products = {
+                normalize_name(name): product_id
+                for product_id, name in db_session.execute(select(products_table.c.id, products_table.c.name))
+            }
+
+            sources = {}
+            for product_id, source in db_session.execute(
+                select(bom_table.c.product_id, bom_table.c.source).distinct()
+            ):
+                sources.setdefault(product_id, set()).add(source)
+            graph = _component_graph(db_session)
+
+            selected = [
+                row for row in candidates
+                if (row.materials_used or "").strip()
+                and (row.id not in sources or (replace and sources[row.id] == {SOURCE_PARSED}))
+            ]
+            reparsed = [row.id for row in selected if row.id in sources]
+            for product_id in reparsed:
+                graph.pop(product_id, None)
+            if reparsed and not dry_run:
+                stale = list(db_session.scalars(select(bom_table.c.id).where(bom_table.c.product_id.in_(reparsed))))
+                db_session.execute(delete(bom_table).where(bom_table.c.id.in_(stale)))
+                outbox.record_events(db_session, "bom_lines", stale, "delete")
+
+            for product_id, name, weight, text in selected:
+                parsed = parse_materials_text(text, materials, products, weight)
+                summary["unparsed"].extend({"product_id": product_id, "text": part} for part in parsed["unparsed"])
+                lines = []
+                for line in parsed["lines"]:
+                    component_id = line.get("component_product_id")
+                    if component_id is not None:
+                        if _reaches(graph, component_id, product_id):
+                            summary["unparsed"].append({"product_id": product_id, "text": line["notes"]})
+                            continue
+                        graph.setdefault(product_id, set()).add(component_id)
+                    lines.append(BomLine(product_id=product_id, source=SOURCE_PARSED, **line))
+                if not lines:
+                    continue
+                summary["products"] += 1
+                summary["lines"] += len(lines)
+                if not dry_run:
+                    db_session.add_all(lines)
+        return summary
+    except Exception as e:
+        print(f"Error migrating product materials to bills of materials: {e}")
+        return {"products": 0, "lines": 0, "unparsed": []}
@@ -0,0 +1,280 @@
+"""
+Cache Warm-up Service - Precomputes the heaviest dashboard aggregates.
+This module keeps an in-process cache of hot aggregates (inventory overview,
+device distributions, subscription stats, revenue series, certification
+expiry buckets, print job statistics, device and fleet OEE and inventory valuation)
+and refreshes it from a background thread, so page reruns read a ready
+value instead of running the underlying queries. Committed
+writes reported by the outbox trigger an early refresh of the affected
+aggregates; a burst of commits is coalesced into at most one such refresh
+per STALE_REFRESH_DELAY seconds.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import pandas as pd
+
+from src.db.connection import get_db_session
+from src.db import outbox
+from src.services import (
+    certification_service,
+    device_service,
+    material_service,
+    oee_service,
+    payment_service,
+    print_job_service,
+    subscription_service,
+    valuation_service,
+)
+
+# Seconds between two background refreshes (override with CACHE_REFRESH_INTERVAL)
+DEFAULT_REFRESH_INTERVAL = int(os.getenv("CACHE_REFRESH_INTERVAL", "300"))
+
+# Minimum seconds between two write-triggered refreshes (override with CACHE_STALE_REFRESH_DELAY)
+STALE_REFRESH_DELAY = float(os.getenv("CACHE_STALE_REFRESH_DELAY", "30"))
+
+_cache: Dict[str, Dict[str, Any]] = {}
+_cache_lock = threading.Lock()
+_refresher_lock = threading.Lock()
+_refresher_thread: Optional[threading.Thread] = None
+_stop_event = threading.Event()
+_wake_event = threading.Event()
+_stale: Set[str] = set()
+
+
+def _subscription_stats():
+    with get_db_session() as db_session:
+        return subscription_service.get_subscription_stats(db_session)
+
+
+def _subscription_revenue_series():
+    with get_db_session() as db_session:
+        return subscription_service.get_total_revenue_over_time(db_session)
+
+
+def _active_subscriptions_trend():
+    with get_db_session() as db_session:
+        return subscription_service.get_active_subscriptions_trend(db_session)
+
+
+def _payment_stats():
+    with get_db_session() as db_session:
+        return payment_service.get_payment_stats(db_session)
+
+
+def _payment_volume_series():
+    with get_db_session() as db_session:
+        return payment_service.get_payment_volume_over_time(db_session)
+
+
+def _material_cost_by_month(months: int = 6):
+    """FIFO cost of material consumed per month and material type, current month included"""
+    start = valuation_service.month_start(datetime.now())
+    for _ in range(months - 1):
+        start = valuation_service.month_start(start - timedelta(days=1))
+    return valuation_service.get_consumed_cost_by_period(start, method="fifo")
+
+
+def _inventory_value():
+    return valuation_service.get_inventory_valuation(method="fifo")["total_value"]
+
+
+def _fleet_oee():
+    # Reads the table device_oee materializes, so it is listed after it
+    return oee_service.get_oee("fleet", days=30)
+
+
+def _location_oee():
+    return oee_service.get_oee("location", days=30)
+
+
+# Name -> zero-argument function computing the aggregate
+HOT_AGGREGATES: Dict[str, Callable[[], Any]] = {
+    "inventory_overview": material_service.get_inventory_overview,
+    "device_status_distribution": device_service.get_device_status_distribution,
+    "device_type_distribution": device_service.get_device_type_distribution,
+    "subscription_stats": _subscription_stats,
+    "subscription_revenue_series": _subscription_revenue_series,
+    "active_subscriptions_trend": _active_subscriptions_trend,
+    "payment_stats": _payment_stats,
+    "payment_volume_series": _payment_volume_series,
+    "certification_expiry_buckets": certification_service.get_certification_expiry_buckets,
+    "print_job_statistics": print_job_service.get_print_job_statistics,
+    "device_oee": oee_service.get_device_oee_summary,
+    "fleet_oee": _fleet_oee,
+    "location_oee": _location_oee,
+    "material_cost_by_month": _material_cost_by_month,
+    "inventory_value": _inventory_value,
+}
+
+
+# Table name -> aggregates that must be refreshed when rows of that table change
+AGGREGATE_DEPENDENCIES: Dict[str, List[str]] = {
+    "materials": ["inventory_overview", "material_cost_by_month", "inventory_value"],
+    "stock_adjustments": ["material_cost_by_month", "inventory_value"],
+    "low_stock_materials": ["inventory_overview"],
+    "material_categories": ["inventory_overview"],
+    "suppliers": ["inventory_overview"],
+    "products": ["inventory_overview"],
+    "devices": ["device_status_distribution", "device_type_distribution", "device_oee", "fleet_oee", "location_oee"],
+    "subscriptions": ["subscription_stats", "subscription_revenue_series", "active_subscriptions_trend"],
+    "payments": ["payment_stats", "payment_volume_series"],
+    "certifications": ["certification_expiry_buckets"],
+    "print_jobs": ["print_job_statistics", "device_oee", "fleet_oee", "location_oee"],
+    "maintenance_records": ["device_oee", "fleet_oee", "location_oee"],
+    "quality_tests": ["device_oee", "fleet_oee", "location_oee"],
+}
+
+
+def refresh_aggregate(name: str) -> Any:
+    """
+    Recompute a single aggregate and store it in the cache.
+
+    Args:
+        name: Key of the aggregate in HOT_AGGREGATES
+
+    Returns:
+        The freshly computed value
+    """
+    value = HOT_AGGREGATES[name]()
+    with _cache_lock:
+        _cache[name] = {"value": value, "refreshed_at": datetime.utcnow()}
+    return value
+
+
+def warm_caches() -> Dict[str, bool]:
+    """
+    Compute every hot aggregate once.
+
+    Returns:
+        Dictionary mapping each aggregate name to whether it was refreshed
+    """
+    results = {}
+    for name in HOT_AGGREGATES:
+        try:
+            refresh_aggregate(name)
+            results[name] = True
+        except Exception as e:
+            print(f"[Cache Warm-up] Error refreshing '{name}': {e}")
+            results[name] = False
+    return results
+
+
+def get_aggregate(name: str) -> Any:
+    """
+    Get a hot aggregate from the cache.
+
+    The value is only computed inline when it has never been warmed; after
+    that it is served from memory while the background thread refreshes it.
+    DataFrames are returned as copies so callers can modify them freely.
+
+    Args:
+        name: Key of the aggregate in HOT_AGGREGATES
+
+    Returns:
+        The cached (or freshly computed) value
+    """
+    start_background_refresh()
+
+    with _cache_lock:
+        entry = _cache.get(name)
+    value = entry["value"] if entry else refresh_aggregate(name)
+
+    if isinstance(value, pd.DataFrame):
+        return value.copy()
+    return value
+
+
+def get_last_refreshed(name: str) -> Optional[datetime]:
+    """Get the UTC time an aggregate was last refreshed, or None if never"""
+    with _cache_lock:
+        entry = _cache.get(name)
+    return entry["refreshed_at"] if entry else None
+
+
+@outbox.subscribe
+def _mark_stale(change: Dict):
+    """Outbox subscriber: queue the aggregates depending on the changed table"""
+    names = AGGREGATE_DEPENDENCIES.get(change["table_name"])
+    if names:
+        with _cache_lock:
+            _stale.update(names)
+        _wake_event.set()
+
+
+def _refresh_stale():
+    with _cache_lock:
+        # In HOT_AGGREGATES order, so aggregates read what earlier ones materialize
+        names = [name for name in HOT_AGGREGATES if name in _stale]
+        _stale.clear()
+    for name in names:
+        try:
+            refresh_aggregate(name)
+        except Exception as e:
+            print(f"[Cache Warm-up] Error refreshing '{name}': {e}")
+
+
+def _refresh_loop(interval: int):
+    last_stale_refresh = float("-inf")
+    while not _stop_event.is_set():
+        warm_caches()
+        # Between full refreshes, only recompute what committed writes touched
+        deadline = time.monotonic() + interval
+        while not _stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if _wake_event.wait(remaining):
+                # Let further commits pile up so a burst costs one refresh
+                delay = min(last_stale_refresh + STALE_REFRESH_DELAY, deadline) - time.monotonic()
+                if delay > 0 and _stop_event.wait(delay):
+                    break
+                _wake_event.clear()
+                _refresh_stale()
+                last_stale_refresh = time.monotonic()
+
+
+def start_background_refresh(interval: int = DEFAULT_REFRESH_INTERVAL) -> bool:
+    """
+    Start the background refresher thread if it is not already running.
+
+    The first iteration runs immediately, so starting the thread also warms
+    the cache. Safe to call on every rerun.
+
+    Args:
+        interval: Seconds to wait between two refreshes
+
+    Returns:
+        True if a new thread was started, False if one was already running
+    """
+    global _refresher_thread
+
+    with _refresher_lock:
+        if _refresher_thread is not None and _refresher_thread.is_alive():
+            return False
+
+        _stop_event.clear()
+        _refresher_thread = threading.Thread(
+            target=_refresh_loop,
+            args=(interval,),
+            name="cache-warmup-refresher",
+            daemon=True,
+        )
+        _refresher_thread.start()
+        return True
+
+
+def stop_background_refresh(timeout: Optional[float] = None):
+    """Stop the background refresher thread and wait for it to exit"""
+    global _refresher_thread
+
+    with _refresher_lock:
+        _stop_event.set()
+        _wake_event.set()
+        if _refresher_thread is not None:
+            _refresher_thread.join(timeout)
+        _refresher_thread = None
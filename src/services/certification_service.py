@@ -4,7 +4,7 @@ import pandas as pd
 import os
 import json
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, case, func
 
 from src.db.connection import get_db_session
 from src.db.models.certification import Certification
@@ -330,4 +330,39 @@ def get_pending_certifications_count() -> int:
             return count
     except Exception as e:
         print(f"Error getting pending certifications count: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+
+def get_certification_expiry_buckets() -> Dict[str, int]:
+    """Get counts of active certifications grouped by time until expiry"""
+    try:
+        with get_db_session() as session:
+            today = datetime.now().date()
+            bucket = case(
+                (Certification.expiry_date.is_(None), "No Expiry"),
+                (Certification.expiry_date < today, "Expired"),
+                (Certification.expiry_date <= today + timedelta(days=30), "Expiring in 30 Days"),
+                (Certification.expiry_date <= today + timedelta(days=90), "Expiring in 90 Days"),
+                else_="Valid",
+            ).label("bucket")
+
+            results = (
+                session.query(bucket, func.count(Certification.id))
+                .filter(Certification.status == "Active")
+                .group_by(bucket)
+                .all()
+            )
+
+            buckets = {
+                "Expired": 0,
+                "Expiring in 30 Days": 0,
+                "Expiring in 90 Days": 0,
+                "Valid": 0,
+                "No Expiry": 0,
+            }
+            for name, count in results:
+                buckets[name] = count
+            return buckets
+    except Exception as e:
+        print(f"Error getting certification expiry buckets: {e}")
+        return {}
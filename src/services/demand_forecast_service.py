@@ -0,0 +1,287 @@
+"""
+Demand forecast service.
+Forecasts daily usage of every material from the stock ledger (negative
+StockAdjustment quantities) and derives safety stock and reorder points:
+
+    safety_stock  = z(service level) * sigma * sqrt(lead time)
+    reorder_point = daily_demand * lead time + safety_stock
+
+Usage is loaded with one grouped query into a materials x days matrix, and
+the forecasts (simple exponential smoothing or a trailing moving average)
+are fitted for all materials at once with NumPy. Results are stored in
+material_forecasts and written back to Material.reorder_level with one
+executemany UPDATE. run_forecast_if_due() is meant to be run nightly.
+"""
+
+from datetime import datetime, timedelta
+from statistics import NormalDist
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.material import Material, MaterialForecast, StockAdjustment
+from src.services import stock_alert_service
+
+# Days of usage history fitted
+HISTORY_DAYS = 180
+
+# Materials with less usage history than this keep their reorder level
+MIN_HISTORY_DAYS = 14
+
+# Smoothing factor of simple exponential smoothing
+SMOOTHING_ALPHA = 0.2
+
+# Window of the moving average method
+MOVING_AVERAGE_DAYS = 28
+
+# Probability of not running out during a replenishment lead time
+SERVICE_LEVEL = 0.95
+
+# Used when Material.properties has no "lead_time_days"
+DEFAULT_LEAD_TIME_DAYS = 14.0
+
+# How often run_forecast_if_due() recomputes
+FORECAST_INTERVAL = timedelta(days=1)
+
+METHODS = ("ses", "moving_average")
+
+adjustments_table = StockAdjustment.__table__
+materials_table = Material.__table__
+forecasts_table = MaterialForecast.__table__
+
+
+def _load_usage(db_session, start: datetime, end: datetime) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Daily usage of every material between `start` and `end`.
+
+    Returns:
+        Tuple of material ids and a (materials x days) matrix of usage,
+        column 0 being the day of `start`
+    """
+    day = func.date(adjustments_table.c.adjustment_date)
+    rows = db_session.execute(
+        select(adjustments_table.c.material_id, day, -func.sum(adjustments_table.c.quantity))
+        .where(
+            adjustments_table.c.quantity < 0,
+            adjustments_table.c.adjustment_date >= start,
+            adjustments_table.c.adjustment_date < end,
+        )
+        .group_by(adjustments_table.c.material_id, day)
+    ).all()
+
+    n_days = (end.date() - start.date()).days
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, n_days))
+
+    usage = pd.DataFrame(rows, columns=["material_id", "day", "quantity"])
+    material_ids, rows_index = np.unique(usage["material_id"].to_numpy(dtype=np.int64), return_inverse=True)
+    days = (pd.to_datetime(usage["day"]) - pd.Timestamp(start.date())).dt.days.to_numpy()
+
+    demand = np.zeros((len(material_ids), n_days))
+    inside = (days >= 0) & (days < n_days)
+    np.add.at(demand, (rows_index[inside], days[inside]), usage["quantity"].to_numpy(dtype=float)[inside])
+    return material_ids, demand
+
+
+def fit_demand(demand: np.ndarray, method: str = "ses", alpha: float = SMOOTHING_ALPHA,
+               window: int = MOVING_AVERAGE_DAYS) -> Dict[str, np.ndarray]:
+    """
+    Fit a daily demand forecast to every row of a usage matrix.
+
+    Each material's history starts at its first day of usage. With "ses"
+    the level starts at the mean of that history and is smoothed forward
+    day by day (one vectorized step per day for all materials); sigma is
+    the RMSE of the one-step-ahead errors. With "moving_average" the
+    forecast is the mean of the trailing `window` days and sigma their
+    standard deviation.
+
+    Args:
+        demand: (materials x days) usage matrix, oldest day first
+        method: "ses" or "moving_average"
+        alpha: Smoothing factor for "ses"
+        window: Trailing days for "moving_average"
+
+    Returns:
+        Dictionary of per-material arrays: daily_demand, demand_std and
+        history_days (days since the first usage)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown forecast method '{method}' (expected one of {', '.join(METHODS)})")
+
+    n_materials, n_days = demand.shape
+    used = demand > 0
+    start = np.where(used.any(axis=1), used.argmax(axis=1), n_days)
+    history_days = n_days - start
+    active = np.arange(n_days)[None, :] >= start[:, None]
+    counts = np.maximum(history_days, 1)
+
+    if method == "moving_average":
+        in_window = active & (np.arange(n_days)[None, :] >= n_days - window)
+        counts = np.maximum(in_window.sum(axis=1), 1)
+        mean = np.where(in_window, demand, 0.0).sum(axis=1) / counts
+        deviation = np.where(in_window, demand - mean[:, None], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=1) / np.maximum(counts - 1, 1))
+        return {"daily_demand": mean, "demand_std": std, "history_days": history_days}
+
+    level = np.where(active, demand, 0.0).sum(axis=1) / counts
+    squared_error = np.zeros(n_materials)
+    for day in range(n_days):
+        is_active = active[:, day]
+        error = demand[:, day] - level
+        squared_error += np.where(is_active, error * error, 0.0)
+        level = np.where(is_active, level + alpha * error, level)
+    std = np.sqrt(squared_error / counts)
+    return {"daily_demand": level, "demand_std": std, "history_days": history_days}
+
+
+def reorder_points(daily_demand: np.ndarray, demand_std: np.ndarray, lead_time_days: np.ndarray,
+                   service_level: float = SERVICE_LEVEL) -> Tuple[np.ndarray, np.ndarray]:
+    """Safety stock and reorder point for each material; returns (safety_stock, reorder_point)"""
+    z = NormalDist().inv_cdf(service_level)
+    safety_stock = z * demand_std * np.sqrt(lead_time_days)
+    return safety_stock, daily_demand * lead_time_days + safety_stock
+
+
+def _lead_time(properties: Any) -> float:
+    try:
+        value = float((properties or {}).get("lead_time_days", DEFAULT_LEAD_TIME_DAYS))
+    except (AttributeError, TypeError, ValueError):
+        return DEFAULT_LEAD_TIME_DAYS
+    return value if value > 0 else DEFAULT_LEAD_TIME_DAYS
+
+
+def compute_forecasts(db_session, now: datetime, method: str = "ses",
+                      history_days: int = HISTORY_DAYS,
+                      service_level: float = SERVICE_LEVEL) -> pd.DataFrame:
+    """
+    Forecast demand and reorder points of every material with enough history.
+
+    Args:
+        db_session: Database session
+        now: End of the history (the current, partial day is excluded)
+        method: "ses" or "moving_average"
+        history_days: Days of history to fit
+        service_level: Target probability of not stocking out
+
+    Returns:
+        DataFrame indexed by material id with the MaterialForecast columns
+        (except computed_at) and the material's current min_stock_level and
+        reorder_level
+    """
+    end = datetime.combine(now.date(), datetime.min.time())
+    material_ids, demand = _load_usage(db_session, end - timedelta(days=history_days), end)
+
+    fitted = fit_demand(demand, method)
+    forecasts = pd.DataFrame({
+        "material_id": material_ids,
+        "daily_demand": fitted["daily_demand"],
+        "demand_std": fitted["demand_std"],
+        "history_days": fitted["history_days"],
+    }).set_index("material_id")
+    forecasts = forecasts[forecasts["history_days"] >= MIN_HISTORY_DAYS]
+
+    materials = pd.DataFrame(
+        db_session.execute(
+            select(materials_table.c.id, materials_table.c.properties,
+                   materials_table.c.min_stock_level, materials_table.c.reorder_level)
+        ).all(),
+        columns=["material_id", "properties", "min_stock_level", "reorder_level"],
+    ).set_index("material_id")
+    forecasts = forecasts.join(materials, how="inner")
+
+    forecasts["lead_time_days"] = forecasts["properties"].map(_lead_time).astype(float)
+    safety_stock, reorder_point = reorder_points(
+        forecasts["daily_demand"].to_numpy(), forecasts["demand_std"].to_numpy(),
+        forecasts["lead_time_days"].to_numpy(), service_level,
+    )
+    forecasts["safety_stock"] = safety_stock.round(3)
+    # Never reorder below the configured minimum stock level
+    forecasts["reorder_point"] = np.maximum(reorder_point, forecasts["min_stock_level"].fillna(0).to_numpy()).round(3)
+    forecasts["daily_demand"] = forecasts["daily_demand"].round(4)
+    forecasts["demand_std"] = forecasts["demand_std"].round(4)
+    forecasts["method"] = method
+    return forecasts.drop(columns=["properties"])
+
+
+def run_forecast(now: Optional[datetime] = None, method: str = "ses", apply: bool = True,
+                 history_days: int = HISTORY_DAYS) -> Dict[str, Any]:
+    """
+    Recompute every material's forecast and update reorder levels in bulk.
+
+    Args:
+        now: Time of the run (defaults to now)
+        method: "ses" or "moving_average"
+        apply: Whether to write forecasts and reorder levels (False for a dry run)
+        history_days: Days of history to fit
+
+    Returns:
+        Dictionary with the number of materials forecast and of reorder
+        levels changed, and the forecasts as a list of dictionaries
+    """
+    now = now or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            forecasts = compute_forecasts(db_session, now, method, history_days)
+            changed = forecasts[(forecasts["reorder_level"].isna())
+                                | ((forecasts["reorder_level"] - forecasts["reorder_point"]).abs() > 1e-6)]
+
+            if apply and len(forecasts):
+                rows = forecasts.reset_index()[[
+                    "material_id", "method", "daily_demand", "demand_std", "lead_time_days",
+                    "safety_stock", "reorder_point", "history_days",
+                ]].assign(computed_at=now)
+                db_session.execute(delete(forecasts_table))
+                db_session.execute(insert(forecasts_table), rows.to_dict("records"))
+
+                if len(changed):
+                    db_session.execute(
+                        update(materials_table)
+                        .where(materials_table.c.id == bindparam("b_id"))
+                        .values(reorder_level=bindparam("b_reorder_level"), updated_at=now),
+                        [{"b_id": int(material_id), "b_reorder_level": float(point)}
+                         for material_id, point in changed["reorder_point"].items()],
+                    )
+                    outbox.record_events(db_session, "materials", [int(i) for i in changed.index],
+                                         "update", ["reorder_level", "updated_at"])
+                    stock_alert_service.refresh_low_stock(db_session, [int(i) for i in changed.index], now)
+
+            return {
+                "forecast": len(forecasts),
+                "reorder_levels_changed": len(changed),
+                "forecasts": forecasts.reset_index().to_dict("records"),
+            }
+    except Exception as e:
+        print(f"Error running demand forecast: {e}")
+        return {"forecast": 0, "reorder_levels_changed": 0, "forecasts": [], "error": str(e)}
+
+
+def run_forecast_if_due(now: Optional[datetime] = None, interval: timedelta = FORECAST_INTERVAL,
+                        method: str = "ses") -> Optional[Dict[str, Any]]:
+    """Run the forecast when the last run is older than `interval`; returns its result or None"""
+    now = now or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            latest = db_session.scalar(select(func.max(forecasts_table.c.computed_at)))
+    except Exception as e:
+        print(f"Error checking demand forecasts: {e}")
+        return None
+    if latest is not None and now - latest < interval:
+        return None
+    return run_forecast(now, method)
+
+
+def get_material_forecast(material_id: int) -> Optional[Dict[str, Any]]:
+    """Stored forecast of one material, or None if it has none"""
+    try:
+        with get_db_session() as db_session:
+            row = db_session.execute(
+                select(forecasts_table).where(forecasts_table.c.material_id == material_id)
+            ).first()
+            return dict(row._mapping) if row is not None else None
+    except Exception as e:
+        print(f"Error getting forecast of material {material_id}: {e}")
+        return None
@@ -0,0 +1,374 @@
+"""
+Print job dispatch service.
+Assigns pending print jobs to devices with two heaps: jobs are popped in
+priority order (oldest first) and each one goes to the device that can
+start it earliest. Only Active devices are used, jobs never overlap a
+device's next maintenance day, and a job is only dispatched while its
+material is covered: pending jobs normally hold a reservation from the
+moment they are created, and a job without one (there was not enough
+stock then) needs the shortfall from the stock available to promise
+(current stock minus the material reserved by other jobs, see
+reservation_service). Assignments are written back in batches of
+set-based UPDATEs, each reserving the material of the jobs it schedules;
+a job whose material was reserved elsewhere since planning stays Pending.
+"""
+
+import heapq
+from datetime import datetime, time, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, bindparam, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.material import Material
+from src.db.models.print_job import PrintJob
+from src.services import reservation_service
+
+# Minutes assumed for jobs without an estimated duration
+DEFAULT_JOB_DURATION = 60
+
+# Status given to jobs once they are queued on a device
+SCHEDULED_STATUS = "Scheduled"
+
+# Jobs occupying a device until they finish
+ACTIVE_JOB_STATUSES = [SCHEDULED_STATUS, "In Progress"]
+
+# Jobs holding material, from creation until they finish
+RESERVED_JOB_STATUSES = ["Pending"] + ACTIVE_JOB_STATUSES
+
+DEFAULT_BATCH_SIZE = 1000
+
+# print_jobs.material_used is recorded in grams (or ml); stock is kept in the material's unit
+_GRAMS_PER_STOCK_UNIT = {"kg": 1000.0, "l": 1000.0, "g": 1.0, "ml": 1.0}
+
+
+def material_required(material_used: Optional[float], unit: Optional[str]) -> float:
+    """Convert a job's material_used (grams/ml) into the material's stock unit"""
+    if not material_used:
+        return 0.0
+    return float(material_used) / _GRAMS_PER_STOCK_UNIT.get((unit or "kg").lower(), 1.0)
+
+
+def job_duration_minutes(job: Dict[str, Any]) -> float:
+    """Planned duration of a job in minutes"""
+    return float(job.get("estimated_duration") or DEFAULT_JOB_DURATION)
+
+
+def plan_assignments(
+    jobs: Iterable[Dict[str, Any]],
+    devices: Iterable[Dict[str, Any]],
+    stock: Dict[int, float],
+    now: datetime,
+    priority: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    duration: Callable[[Dict[str, Any]], float] = job_duration_minutes,
+    horizon: Optional[timedelta] = None,
+) -> Dict[str, Any]:
+    """
+    Plan device assignments for pending jobs, without touching the database.
+
+    Args:
+        jobs: Pending jobs as dictionaries with id, device_id (a pinned
+            device or None), material_id, required (stock units needed),
+            reserved (stock units the job already holds, optional),
+            estimated_duration and created_at
+        devices: Eligible devices as dictionaries with id, available_at
+            and maintenance_date (next maintenance day or None)
+        stock: Material id -> stock available to promise; decremented in place
+        now: Current time; no job starts before it
+        priority: Sort key for jobs, lowest first (default: created_at, id)
+        duration: Function giving a job's duration in minutes
+        horizon: Optional limit on how far ahead jobs may be started
+
+    Returns:
+        Dictionary with "assignments" (job_id, device_id, start_time,
+        end_time, material_id, required) and "blocked" (reason -> list of
+        job ids)
+    """
+    if priority is None:
+        priority = lambda job: (job.get("created_at") or now, job["id"])
+    latest_start = now + horizon if horizon is not None else None
+
+    # Device state: id -> [available_at, maintenance window start, window end]
+    state: Dict[int, List] = {}
+    device_heap: List[Tuple[datetime, int]] = []
+    for device in devices:
+        window_start = window_end = None
+        if device.get("maintenance_date"):
+            window_start = datetime.combine(device["maintenance_date"], time.min)
+            window_end = window_start + timedelta(days=1)
+        available_at = max(device.get("available_at") or now, now)
+        state[device["id"]] = [available_at, window_start, window_end]
+        device_heap.append((available_at, device["id"]))
+    heapq.heapify(device_heap)
+
+    job_heap = [(priority(job), index, job) for index, job in enumerate(jobs)]
+    heapq.heapify(job_heap)
+
+    assignments: List[Dict[str, Any]] = []
+    blocked: Dict[str, List[int]] = {}
+
+    def block(reason: str, job: Dict[str, Any]):
+        blocked.setdefault(reason, []).append(job["id"])
+
+    def fit(device_id: int, minutes: float) -> Optional[datetime]:
+        """Earliest start on a device that keeps the job clear of its maintenance day"""
+        available_at, window_start, window_end = state[device_id]
+        start = available_at
+        if window_start is not None and start < window_end and start + timedelta(minutes=minutes) > window_start:
+            start = window_end
+        return start
+
+    while job_heap:
+        _, _, job = heapq.heappop(job_heap)
+        minutes = duration(job)
+
+        material_id = job.get("material_id")
+        required = job.get("required") or 0.0
+        # Only what the job's own reservation does not cover comes out of the stock
+        shortfall = max(required - (job.get("reserved") or 0.0), 0.0)
+        if material_id is not None and shortfall > stock.get(material_id, 0.0) + 1e-9:
+            block("insufficient_stock", job)
+            continue
+
+        pinned = job.get("device_id")
+        if pinned is not None:
+            if pinned not in state:
+                block("device_unavailable", job)
+                continue
+            device_id, start = pinned, fit(pinned, minutes)
+        else:
+            device_id = start = None
+            while device_heap:
+                available_at, candidate = device_heap[0]
+                if available_at != state[candidate][0]:
+                    heapq.heappop(device_heap)  # stale entry
+                    continue
+                start = fit(candidate, minutes)
+                if start != available_at:
+                    # Pushed past the maintenance day: requeue the device at its real start
+                    state[candidate][0] = start
+                    heapq.heapreplace(device_heap, (start, candidate))
+                    continue
+                device_id = candidate
+                break
+            if device_id is None:
+                block("no_device", job)
+                continue
+
+        if latest_start is not None and start > latest_start:
+            block("beyond_horizon", job)
+            continue
+
+        end = start + timedelta(minutes=minutes)
+        state[device_id][0] = end
+        heapq.heappush(device_heap, (end, device_id))
+        if material_id is not None:
+            stock[material_id] = stock.get(material_id, 0.0) - shortfall
+
+        assignments.append({
+            "job_id": job["id"],
+            "device_id": device_id,
+            "start_time": start,
+            "end_time": end,
+            "material_id": material_id,
+            "required": required,
+        })
+
+    return {"assignments": assignments, "blocked": blocked}
+
+
+def load_dispatch_inputs(db_session, now: datetime) -> Dict[str, Any]:
+    """
+    Load pending jobs, eligible devices and material stock available to promise.
+
+    Devices must be Active. A device's queue ends after the last Scheduled
+    or In Progress job on it. The stock held by pending and active jobs is
+    reserved, so it is not available to promise; each pending job carries
+    the quantity it holds itself.
+    """
+    today = now.date()
+    reservations = reservation_service.reservations_table
+
+    units = dict(db_session.execute(select(Material.id, Material.unit)).all())
+    stock = {
+        row.material_id: float(row.available)
+        for row in db_session.execute(reservation_service.available_to_promise_query())
+    }
+
+    available_at: Dict[int, datetime] = {}
+    active_jobs = db_session.execute(
+        select(PrintJob.device_id, PrintJob.start_time, PrintJob.estimated_duration)
+        .where(PrintJob.status.in_(ACTIVE_JOB_STATUSES), PrintJob.device_id.isnot(None))
+    )
+    for device_id, start_time, estimated_duration in active_jobs:
+        end = (start_time or now) + timedelta(minutes=estimated_duration or DEFAULT_JOB_DURATION)
+        if end > available_at.get(device_id, now):
+            available_at[device_id] = end
+
+    devices = [
+        {
+            "id": device_id,
+            "available_at": available_at.get(device_id, now),
+            # Only upcoming maintenance days constrain the plan
+            "maintenance_date": maintenance_date if maintenance_date and maintenance_date >= today else None,
+        }
+        for device_id, maintenance_date in db_session.execute(
+            select(Device.id, Device.next_maintenance_date).where(Device.status == "Active")
+        )
+    ]
+
+    jobs = [
+        {
+            "id": job_id,
+            "device_id": device_id,
+            "material_id": material_id,
+            "estimated_duration": estimated_duration,
+            "required": material_required(material_used, units.get(material_id)),
+            "reserved": float(reserved or 0.0),
+            "created_at": created_at,
+        }
+        for job_id, device_id, material_id, estimated_duration, material_used, created_at, reserved in db_session.execute(
+            select(
+                PrintJob.id, PrintJob.device_id, PrintJob.material_id,
+                PrintJob.estimated_duration, PrintJob.material_used, PrintJob.created_at,
+                reservations.c.quantity,
+            )
+            .outerjoin(reservations, and_(
+                reservations.c.print_job_id == PrintJob.id, reservations.c.material_id == PrintJob.material_id,
+            ))
+            .where(PrintJob.status == "Pending")
+        )
+    ]
+
+    return {"jobs": jobs, "devices": devices, "stock": stock}
+
+
+def write_assignments(db_session, assignments: List[Dict[str, Any]],
+                      batch_size: int = DEFAULT_BATCH_SIZE, blocked: Optional[List[int]] = None) -> int:
+    """
+    Write assignments back in batches of executemany UPDATEs.
+
+    Each batch first reserves the material of its jobs (a no-op for jobs
+    that already hold it); a job whose material is no longer available to
+    promise is left Pending. Jobs are only updated while still Pending, so
+    a job cancelled or started since planning is left alone (and a
+    reservation made for a job that no longer holds material is released).
+
+    Args:
+        db_session: Database session
+        assignments: Planned assignments (see plan_assignments)
+        batch_size: Number of jobs per UPDATE batch
+        blocked: Optional list that receives the ids of jobs left Pending
+            for lack of stock
+
+    Returns:
+        Number of jobs updated
+    """
+    table = PrintJob.__table__
+    statement = (
+        update(table)
+        .where(and_(table.c.id == bindparam("b_id"), table.c.status == "Pending"))
+        .values(
+            device_id=bindparam("b_device_id"),
+            start_time=bindparam("b_start_time"),
+            status=SCHEDULED_STATUS,
+            updated_at=bindparam("b_updated_at"),
+        )
+    )
+
+    now = datetime.utcnow()
+    updated = 0
+    for offset in range(0, len(assignments), batch_size):
+        batch = assignments[offset:offset + batch_size]
+        reservation = reservation_service.reserve_in_session(db_session, [
+            {"print_job_id": a["job_id"], "material_id": a["material_id"], "quantity": a["required"]}
+            for a in batch if a.get("material_id") is not None and a.get("required")
+        ])
+        refused = set(reservation["insufficient"]) | set(reservation["missing"])
+        if refused:
+            if blocked is not None:
+                blocked.extend(sorted(refused))
+            batch = [a for a in batch if a["job_id"] not in refused]
+            if not batch:
+                continue
+
+        result = db_session.execute(statement, [
+            {
+                "b_id": a["job_id"],
+                "b_device_id": a["device_id"],
+                "b_start_time": a["start_time"],
+                "b_updated_at": now,
+            }
+            for a in batch
+        ])
+        updated += result.rowcount
+        if result.rowcount != len(batch) and reservation["reserved"]:
+            # Jobs finished or cancelled since planning hold a reservation they should not
+            stale = db_session.scalars(
+                select(table.c.id)
+                .where(table.c.id.in_(reservation["reserved"]), table.c.status.notin_(RESERVED_JOB_STATUSES))
+            )
+            reservation_service.release_in_session(db_session, list(stale))
+        outbox.record_events(
+            db_session, "print_jobs", [a["job_id"] for a in batch], "update",
+            ["device_id", "start_time", "status", "updated_at"],
+        )
+    return updated
+
+
+def dispatch_pending_jobs(
+    now: Optional[datetime] = None,
+    horizon: Optional[timedelta] = None,
+    dry_run: bool = False,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    predict_durations: bool = False,
+) -> Dict[str, Any]:
+    """
+    Assign all pending print jobs to devices.
+
+    Args:
+        now: Planning start time (defaults to the current time)
+        horizon: Optional limit on how far ahead jobs may be scheduled
+        dry_run: Plan without writing anything
+        batch_size: Number of jobs per UPDATE batch
+        predict_durations: Plan with the duration model's predictions
+            instead of the hand-entered estimates
+
+    Returns:
+        Dictionary with the number of jobs assigned, blocked job counts by
+        reason and the planned assignments
+    """
+    now = now or datetime.now()
+    duration = job_duration_minutes
+    if predict_durations:
+        from src.services.duration_prediction_service import predict_pending_durations
+
+        predictions = predict_pending_durations()
+        duration = lambda job: predictions.get(job["id"]) or job_duration_minutes(job)
+
+    try:
+        reservation_service.ensure_reservations_synced()
+        refused: List[int] = []
+        with get_db_session() as db_session:
+            inputs = load_dispatch_inputs(db_session, now)
+            plan = plan_assignments(
+                inputs["jobs"], inputs["devices"], inputs["stock"], now,
+                duration=duration, horizon=horizon,
+            )
+            assigned = 0 if dry_run else write_assignments(db_session, plan["assignments"], batch_size, refused)
+
+        if refused:
+            plan["blocked"].setdefault("insufficient_stock", []).extend(refused)
+            refused_ids = set(refused)
+            plan["assignments"] = [a for a in plan["assignments"] if a["job_id"] not in refused_ids]
+        return {
+            "assigned": assigned,
+            "planned": len(plan["assignments"]),
+            "blocked": {reason: len(ids) for reason, ids in plan["blocked"].items()},
+            "assignments": plan["assignments"],
+        }
+    except Exception as e:
+        print(f"Error dispatching print jobs: {e}")
+        return {"assigned": 0, "planned": 0, "blocked": {}, "assignments": []}
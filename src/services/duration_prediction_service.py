@@ -0,0 +1,326 @@
+"""
+Print duration prediction service.
+A ridge-regularized linear model of actual print duration, fitted with
+NumPy least squares on completed print jobs. Features are the device
+model, material type, material used and the file type of the job's file;
+the hand-entered estimate is only used as the baseline the model is
+compared against.
+
+The model keeps the normal-equation sums (X'X, X'y) instead of the jobs
+themselves, so newly completed jobs are folded in without refitting from
+scratch, and new device models or materials just add columns. Each batch
+is predicted before it is learned from, which gives running out-of-sample
+error metrics next to those of the hand estimates.
+"""
+
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.material import Material
+from src.db.models.print_job import PrintJob
+
+# Numeric features, always first; categorical one-hot columns follow
+NUMERIC_FEATURES = ["intercept", "material_used", "sqrt_material_used"]
+
+# Categorical features and the job dictionary key they are read from
+CATEGORICAL_FEATURES = {"device_model": "device_model", "material_type": "material_type", "file_type": "file_type"}
+
+# Ridge penalty on every coefficient but the intercept
+DEFAULT_RIDGE = 1.0
+
+# Completed jobs with an actual duration outside this range (minutes) are not learned from
+MIN_DURATION = 1
+MAX_DURATION = 14 * 24 * 60
+
+_JOB_COLUMNS = [
+    PrintJob.id,
+    PrintJob.device_id,
+    PrintJob.file_path,
+    PrintJob.material_used,
+    PrintJob.estimated_duration,
+    PrintJob.actual_duration,
+    PrintJob.updated_at,
+    Device.model.label("device_model"),
+    func.coalesce(Material.material_type, Material.type).label("material_type"),
+]
+
+
+def file_type(file_path: Optional[str]) -> str:
+    """Lower-case file extension of a job's file (e.g. "gcode", "stl"), or "none" """
+    if not file_path:
+        return "none"
+    extension = os.path.splitext(file_path)[1].lower().lstrip(".")
+    return extension or "none"
+
+
+def _job_query():
+    return (
+        select(*_JOB_COLUMNS)
+        .outerjoin(Device, Device.id == PrintJob.device_id)
+        .outerjoin(Material, Material.id == PrintJob.material_id)
+    )
+
+
+def _job_dicts(rows) -> List[Dict[str, Any]]:
+    jobs = []
+    for row in rows:
+        job = dict(row._mapping)
+        job["file_type"] = file_type(job.get("file_path"))
+        jobs.append(job)
+    return jobs
+
+
+class DurationModel:
+    """Incrementally trained linear model of print duration in minutes"""
+
+    def __init__(self, ridge: float = DEFAULT_RIDGE):
+        self.ridge = ridge
+        self.categories: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL_FEATURES}
+        self.columns: List[str] = list(NUMERIC_FEATURES)
+        self.xtx = np.zeros((len(self.columns), len(self.columns)))
+        self.xty = np.zeros(len(self.columns))
+        self.coefficients: Optional[np.ndarray] = None
+        self.trained_ids: set = set()
+        self.watermark: Optional[datetime] = None
+        self.version = 0
+        # Running out-of-sample errors: model vs hand estimates, on the same jobs
+        self._errors = {"n": 0, "abs": 0.0, "sq": 0.0, "pct": 0.0,
+                        "baseline_n": 0, "baseline_abs": 0.0, "baseline_sq": 0.0}
+        self._lock = threading.RLock()
+
+    def _grow(self, jobs: Iterable[Dict[str, Any]]):
+        """Add one-hot columns for categories seen for the first time"""
+        added = 0
+        for job in jobs:
+            for name, key in CATEGORICAL_FEATURES.items():
+                value = str(job.get(key) or "unknown")
+                if value not in self.categories[name]:
+                    self.categories[name][value] = len(self.columns)
+                    self.columns.append(f"{name}={value}")
+                    added += 1
+        if added:
+            self.xtx = np.pad(self.xtx, ((0, added), (0, added)))
+            self.xty = np.pad(self.xty, (0, added))
+            if self.coefficients is not None:
+                self.coefficients = np.pad(self.coefficients, (0, added))
+
+    def design_matrix(self, jobs: List[Dict[str, Any]]) -> np.ndarray:
+        """Feature matrix (jobs x columns); unseen categories get no one-hot column"""
+        x = np.zeros((len(jobs), len(self.columns)))
+        material = np.array([float(job.get("material_used") or 0) for job in jobs])
+        x[:, 0] = 1.0
+        x[:, 1] = material
+        x[:, 2] = np.sqrt(np.maximum(material, 0))
+
+        for name, key in CATEGORICAL_FEATURES.items():
+            index = self.categories[name]
+            columns = np.array([index.get(str(job.get(key) or "unknown"), -1) for job in jobs], dtype=np.int64)
+            rows = np.nonzero(columns >= 0)[0]
+            x[rows, columns[rows]] = 1.0
+        return x
+
+    def _solve(self):
+        penalty = np.full(len(self.columns), self.ridge)
+        penalty[0] = 0.0
+        self.coefficients = np.linalg.lstsq(self.xtx + np.diag(penalty), self.xty, rcond=None)[0]
+        self.version += 1
+
+    def predict(self, jobs: List[Dict[str, Any]]) -> np.ndarray:
+        """Predicted durations in minutes; falls back to the hand estimate before any training"""
+        with self._lock:
+            if self.coefficients is None or not jobs:
+                return np.array([float(job.get("estimated_duration") or 0) for job in jobs])
+            return np.maximum(self.design_matrix(jobs) @ self.coefficients, MIN_DURATION)
+
+    def update(self, jobs: List[Dict[str, Any]]) -> int:
+        """
+        Learn from completed jobs not seen before.
+
+        Args:
+            jobs: Job dictionaries with the feature keys and actual_duration
+
+        Returns:
+            Number of jobs learned from
+        """
+        with self._lock:
+            jobs = [
+                job for job in jobs
+                if job["id"] not in self.trained_ids
+                and job.get("actual_duration") is not None
+                and MIN_DURATION <= job["actual_duration"] <= MAX_DURATION
+            ]
+            if not jobs:
+                return 0
+
+            actual = np.array([float(job["actual_duration"]) for job in jobs])
+            if self.coefficients is not None:
+                self._record_errors(jobs, self.predict(jobs), actual)
+
+            self._grow(jobs)
+            x = self.design_matrix(jobs)
+            self.xtx += x.T @ x
+            self.xty += x.T @ actual
+            self.trained_ids.update(job["id"] for job in jobs)
+            self._solve()
+            return len(jobs)
+
+    def _record_errors(self, jobs, predicted: np.ndarray, actual: np.ndarray):
+        errors = self._errors
+        residual = predicted - actual
+        errors["n"] += len(actual)
+        errors["abs"] += float(np.abs(residual).sum())
+        errors["sq"] += float((residual ** 2).sum())
+        errors["pct"] += float((np.abs(residual) / actual).sum())
+
+        estimate = np.array([float(job.get("estimated_duration") or 0) for job in jobs])
+        has_estimate = estimate > 0
+        baseline = estimate[has_estimate] - actual[has_estimate]
+        errors["baseline_n"] += int(has_estimate.sum())
+        errors["baseline_abs"] += float(np.abs(baseline).sum())
+        errors["baseline_sq"] += float((baseline ** 2).sum())
+
+    def metrics(self) -> Dict[str, Any]:
+        """
+        Out-of-sample error metrics.
+
+        Returns:
+            Dictionary with the number of training jobs, the number of
+            predictions scored, MAE/RMSE (minutes) and MAPE (%) of the
+            model, and MAE/RMSE of the hand estimates on the same jobs
+        """
+        with self._lock:
+            errors = self._errors
+            n, baseline_n = errors["n"], errors["baseline_n"]
+            return {
+                "trained_jobs": len(self.trained_ids),
+                "scored_jobs": n,
+                "features": len(self.columns),
+                "mae": round(errors["abs"] / n, 1) if n else None,
+                "rmse": round(math.sqrt(errors["sq"] / n), 1) if n else None,
+                "mape": round(errors["pct"] / n * 100, 1) if n else None,
+                "estimate_mae": round(errors["baseline_abs"] / baseline_n, 1) if baseline_n else None,
+                "estimate_rmse": round(math.sqrt(errors["baseline_sq"] / baseline_n), 1) if baseline_n else None,
+                "version": self.version,
+            }
+
+    def coefficient_table(self) -> Dict[str, float]:
+        """Coefficient per feature column"""
+        with self._lock:
+            if self.coefficients is None:
+                return {}
+            return {column: round(float(value), 4) for column, value in zip(self.columns, self.coefficients)}
+
+
+_model = DurationModel()
+_prediction_cache: Dict[str, Any] = {"version": None, "predictions": {}}
+
+
+def get_model() -> DurationModel:
+    """The shared duration model"""
+    return _model
+
+
+def train_on_completed_jobs(batch_size: int = 500) -> int:
+    """
+    Fold jobs completed since the last call into the shared model.
+
+    The first call trains on the whole history; later calls only read jobs
+    updated after the previous watermark.
+
+    Returns:
+        Number of jobs learned from
+    """
+    learned = 0
+    try:
+        with get_db_session() as db_session:
+            query = _job_query().where(PrintJob.status == "Completed", PrintJob.actual_duration.isnot(None))
+            if _model.watermark is not None:
+                query = query.where(PrintJob.updated_at >= _model.watermark)
+            # Oldest first, so the running error metrics score each batch with an earlier model
+            query = query.order_by(PrintJob.updated_at, PrintJob.id)
+
+            batch = []
+            for row in db_session.execute(query).yield_per(batch_size):
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    learned += _learn(batch)
+                    batch = []
+            learned += _learn(batch)
+    except Exception as e:
+        print(f"Error training duration model: {e}")
+    return learned
+
+
+def _learn(rows) -> int:
+    if not rows:
+        return 0
+    jobs = _job_dicts(rows)
+    learned = _model.update(jobs)
+    stamps = [job["updated_at"] for job in jobs if job.get("updated_at")]
+    if stamps:
+        _model.watermark = max([_model.watermark or stamps[0], *stamps])
+    return learned
+
+
+def predict_pending_durations(retrain: bool = True) -> Dict[int, float]:
+    """
+    Predicted duration (minutes) for every pending print job.
+
+    All pending jobs are scored with one matrix product; results are cached
+    until the model changes.
+
+    Args:
+        retrain: Fold newly completed jobs into the model first
+
+    Returns:
+        Dictionary of job id -> predicted minutes
+    """
+    if retrain:
+        train_on_completed_jobs()
+
+    try:
+        with get_db_session() as db_session:
+            jobs = _job_dicts(db_session.execute(_job_query().where(PrintJob.status == "Pending")))
+    except Exception as e:
+        print(f"Error loading pending print jobs: {e}")
+        return {}
+
+    # Keyed by (id, updated_at) so edited jobs are scored again
+    cached = _prediction_cache["predictions"] if _prediction_cache["version"] == _model.version else {}
+    missing = [job for job in jobs if (job["id"], job["updated_at"]) not in cached]
+    if missing:
+        for job, minutes in zip(missing, _model.predict(missing)):
+            cached[(job["id"], job["updated_at"])] = round(float(minutes), 1)
+    predictions = {job["id"]: cached[(job["id"], job["updated_at"])] for job in jobs}
+    _prediction_cache.update(version=_model.version, predictions={
+        (job["id"], job["updated_at"]): predictions[job["id"]] for job in jobs
+    })
+    return predictions
+
+
+def predict_job_durations(jobs: List[Dict[str, Any]]) -> List[float]:
+    """
+    Predict durations for job dictionaries that are not stored yet.
+
+    Args:
+        jobs: Dictionaries with device_model, material_type, material_used
+            and file_path
+
+    Returns:
+        Predicted minutes, in input order
+    """
+    jobs = [dict(job, file_type=file_type(job.get("file_path"))) for job in jobs]
+    return [round(float(minutes), 1) for minutes in _model.predict(jobs)]
+
+
+def get_duration_model_metrics() -> Dict[str, Any]:
+    """Error metrics of the shared duration model"""
+    return _model.metrics()
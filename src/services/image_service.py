@@ -0,0 +1,201 @@
+"""
+Image service module for logos and product images.
+Each local source image is decoded once with Pillow and turned into
+size-bucketed thumbnails. Thumbnails are cached on disk by content hash and
+in memory with an LRU, so reruns hand Streamlit a small pre-encoded image
+instead of the original.
+
+Only files under the static and data directories are read. http(s) URLs
+are never fetched by the server; they are handed to the browser unchanged.
+"""
+
+import hashlib
+import io
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+from PIL import Image, ImageOps, features
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+# Directories local image sources may be read from
+IMAGE_DIRS = (PROJECT_ROOT / "static", PROJECT_ROOT / "data")
+
+# Thumbnail widths in pixels; a request is served by the smallest bucket that covers it
+SIZE_BUCKETS = (64, 128, 256, 512)
+
+THUMBNAIL_CACHE_DIR = Path(os.getenv("THUMBNAIL_CACHE_DIR", PROJECT_ROOT / ".cache" / "thumbnails"))
+MEMORY_CACHE_SIZE = int(os.getenv("THUMBNAIL_MEMORY_CACHE_SIZE", "256"))
+
+# Seconds before a source that failed to load is tried again
+FAILED_SOURCE_RETRY = 300
+
+# Encodings tried for each thumbnail; the smallest result is kept
+THUMBNAIL_FORMATS = [("PNG", {"optimize": True})]
+if features.check("webp"):
+    THUMBNAIL_FORMATS.insert(0, ("WEBP", {"quality": 85, "method": 4}))
+
+WEB_FORMATS = ("PNG", "JPEG", "WEBP", "GIF")
+EXIF_ORIENTATION = 0x0112
+
+_lock = threading.Lock()
+_thumbnails: "OrderedDict[Tuple[str, int], bytes]" = OrderedDict()
+_source_digests: Dict[Tuple, str] = {}
+_failed_sources: Dict[str, float] = {}
+
+
+def bucket_for(width: int) -> int:
+    """Get the smallest size bucket at least as wide as the requested width"""
+    for bucket in SIZE_BUCKETS:
+        if bucket >= width:
+            return bucket
+    return SIZE_BUCKETS[-1]
+
+
+def _is_remote(source: str) -> bool:
+    return source.startswith(("http://", "https://"))
+
+
+def _local_path(source: str) -> Path:
+    """Resolve a local source, refusing anything outside the image directories"""
+    path = Path(source)
+    path = (path if path.is_absolute() else PROJECT_ROOT / path).resolve()
+    if not any(path.is_relative_to(directory.resolve()) for directory in IMAGE_DIRS):
+        raise ValueError(f"images are only read from {', '.join(d.name for d in IMAGE_DIRS)}/")
+    return path
+
+
+def _source_key(source: str) -> Tuple:
+    """Identity of a source: local path plus modification time"""
+    stat = _local_path(source).stat()
+    return (source, stat.st_mtime_ns, stat.st_size)
+
+
+def _read_source(source: str) -> bytes:
+    return _local_path(source).read_bytes()
+
+
+def _disk_path(digest: str, bucket: int) -> Path:
+    # Encoded bytes carry their own format, so the file name does not need it
+    return THUMBNAIL_CACHE_DIR / digest[:2] / f"{digest}_{bucket}.thumb"
+
+
+def _remember(key: Tuple[str, int], data: bytes):
+    with _lock:
+        _thumbnails[key] = data
+        _thumbnails.move_to_end(key)
+        while len(_thumbnails) > MEMORY_CACHE_SIZE:
+            _thumbnails.popitem(last=False)
+
+
+def _encode(image: Image.Image, bucket: int) -> bytes:
+    """Resize to the bucket width and keep the smaller of the WebP and PNG encodings"""
+    thumbnail = image.copy()
+    thumbnail.thumbnail((bucket, thumbnail.height), Image.LANCZOS)
+
+    candidates = []
+    for fmt, options in THUMBNAIL_FORMATS:
+        buffer = io.BytesIO()
+        thumbnail.save(buffer, format=fmt, **options)
+        candidates.append(buffer.getvalue())
+    return min(candidates, key=len)
+
+
+def _build_thumbnails(digest: str, data: bytes) -> Dict[int, bytes]:
+    """Decode the original once and write every size bucket to disk (never upscaled)"""
+    original = Image.open(io.BytesIO(data))
+    # The original file can stand in for buckets it already fits in, if it is web-displayable as is
+    reusable = original.format in WEB_FORMATS and original.getexif().get(EXIF_ORIENTATION, 1) == 1
+    image = ImageOps.exif_transpose(original)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+
+    encoded = {}
+    for bucket in SIZE_BUCKETS:
+        thumbnail = _encode(image, bucket)
+        if reusable and image.width <= bucket and len(data) < len(thumbnail):
+            thumbnail = data
+        path = _disk_path(digest, bucket)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_bytes(thumbnail)
+        os.replace(tmp_path, path)
+        encoded[bucket] = thumbnail
+    return encoded
+
+
+def get_thumbnail(source: Optional[str], width: int) -> Optional[bytes]:
+    """
+    Get an encoded thumbnail for an image.
+
+    Args:
+        source: Local path under the static or data directory (absolute or
+            relative to the project root)
+        width: Display width in pixels
+
+    Returns:
+        WebP or PNG bytes no wider than the matching size bucket, or None
+        if the source is empty, remote or cannot be loaded
+    """
+    if not source or _is_remote(source):
+        return None
+
+    with _lock:
+        failed_at = _failed_sources.get(source)
+    if failed_at and time.monotonic() - failed_at < FAILED_SOURCE_RETRY:
+        return None
+
+    bucket = bucket_for(width)
+    try:
+        source_key = _source_key(source)
+        with _lock:
+            digest = _source_digests.get(source_key)
+            cached = _thumbnails.get((digest, bucket)) if digest else None
+            if cached is not None:
+                _thumbnails.move_to_end((digest, bucket))
+                return cached
+
+        data = None
+        if digest is None:
+            data = _read_source(source)
+            digest = hashlib.sha256(data).hexdigest()
+            with _lock:
+                _source_digests[source_key] = digest
+
+        path = _disk_path(digest, bucket)
+        if path.exists():
+            thumbnail = path.read_bytes()
+        else:
+            if data is None:
+                data = _read_source(source)
+            thumbnail = _build_thumbnails(digest, data)[bucket]
+
+        _remember((digest, bucket), thumbnail)
+        return thumbnail
+    except Exception as e:
+        print(f"[Image Service] Error creating thumbnail for '{source}': {e}")
+        with _lock:
+            _failed_sources[source] = time.monotonic()
+        return None
+
+
+def thumbnail_or_source(source: Optional[str], width: int) -> Union[bytes, str, None]:
+    """
+    Get an image for st.image: a thumbnail of a local file, or a remote URL
+    unchanged so the browser loads it. None if neither is available.
+    """
+    if source and _is_remote(source):
+        return source
+    return get_thumbnail(source, width)
+
+
+def clear_memory_cache():
+    """Drop the in-memory thumbnails and source digests (disk cache is kept)"""
+    with _lock:
+        _thumbnails.clear()
+        _source_digests.clear()
+        _failed_sources.clear()
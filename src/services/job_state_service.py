@@ -0,0 +1,297 @@
+"""
+Print job state machine service.
+Validates print job status transitions and applies them in batches:
+
+    Pending -> Scheduled -> In Progress -> Completed / Failed
+    (Pending, Scheduled and In Progress jobs can also be Cancelled)
+
+Each batch runs in one transaction. Current job rows are read with one
+SELECT, transitions are folded per job in Python, and the new states are
+written with a single executemany UPDATE. That UPDATE is guarded on the
+status that was read, so a job changed concurrently is reported instead
+of overwritten. Jobs leaving In Progress (finished or cancelled) get an
+end_time and an actual_duration from their start/end times. The material
+consumption of completed jobs is subtracted from Material.current_stock
+with relative UPDATEs and posted as Usage StockAdjustment rows; if it
+cannot be posted (a material was deleted meanwhile) the whole batch is
+rolled back.
+
+Pending jobs hold their material from creation (see reservation_service).
+Jobs entering Scheduled or In Progress by hand reserve any material they
+do not hold yet (even past the stock available, since the job is already
+committed), requeued jobs reserve it again within the stock available,
+and finished, cancelled or merged jobs release it, in the same
+transaction.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, bindparam, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.material import Material
+from src.db.models.print_job import PrintJob
+from src.services import reservation_service
+from src.services.dispatch_service import ACTIVE_JOB_STATUSES, RESERVED_JOB_STATUSES, material_required
+from src.services.material_service import apply_stock_movements_in_session
+
+# Allowed transitions: current status -> statuses it may move to
+TRANSITIONS = {
+    "Pending": {"Scheduled", "In Progress", "Cancelled", "Merged"},
+    "Scheduled": {"Pending", "In Progress", "Cancelled"},
+    "In Progress": {"Completed", "Failed", "Cancelled"},
+    "Failed": {"Pending"},  # Requeue for a reprint
+    "Completed": set(),
+    "Cancelled": set(),
+    "Merged": set(),
+}
+
+FINISHED_STATUSES = {"Completed", "Failed"}
+
+DEFAULT_BATCH_SIZE = 500
+
+_STATE_COLUMNS = [
+    "status", "device_id", "start_time", "end_time", "actual_duration",
+    "material_used", "success", "failure_reason",
+]
+
+jobs_table = PrintJob.__table__
+
+
+class ConsumptionError(Exception):
+    """Material usage of completed jobs could not be posted"""
+
+    def __init__(self, job_ids: List[int], materials: List[int]):
+        super().__init__(f"usage not posted for materials {materials}")
+        self.job_ids = job_ids
+
+
+def can_transition(current: Optional[str], new: str) -> bool:
+    """Whether a job in status `current` may move to `new`"""
+    return new in TRANSITIONS.get(current or "Pending", set())
+
+
+def _apply(state: Dict[str, Any], transition: Dict[str, Any]) -> Optional[str]:
+    """Fold one transition into a job's state; returns a rejection reason or None"""
+    new = transition["status"]
+    if new not in TRANSITIONS:
+        return "unknown_status"
+    if not can_transition(state["status"], new):
+        return f"invalid_transition:{state['status']}->{new}"
+
+    at = transition.get("at") or datetime.now()
+    if transition.get("device_id") is not None:
+        state["device_id"] = transition["device_id"]
+
+    if state["status"] == "In Progress" and new != "In Progress":
+        # Leaving the printer (finished or cancelled mid-print) closes the run
+        state["end_time"] = at
+        if state["start_time"] is not None:
+            state["actual_duration"] = round(max((at - state["start_time"]).total_seconds(), 0) / 60, 2)
+
+    if new == "In Progress":
+        state["start_time"] = at
+        state["end_time"] = None
+    elif new in FINISHED_STATUSES:
+        state["success"] = new == "Completed"
+        if transition.get("material_used") is not None:
+            state["material_used"] = transition["material_used"]
+        if new == "Failed":
+            state["failure_reason"] = transition.get("failure_reason") or state["failure_reason"]
+    elif new == "Pending":
+        # Requeued: clear the previous attempt
+        state.update(start_time=None, end_time=None, actual_duration=None, success=None)
+
+    state["status"] = new
+    return None
+
+
+def _post_consumption(db_session, completed: List[Dict[str, Any]], now: datetime) -> int:
+    """Subtract material used by completed jobs from stock and record Usage adjustments"""
+    material_ids = {job["material_id"] for job in completed if job["material_id"] is not None}
+    if not material_ids:
+        return 0
+
+    materials = {
+        material_id: (unit, cost)
+        for material_id, unit, cost in db_session.execute(
+            select(Material.id, Material.unit, Material.cost_per_unit).where(Material.id.in_(material_ids))
+        )
+    }
+
+    movements = []
+    for job in completed:
+        if job["material_id"] not in materials:
+            continue
+        unit, cost = materials[job["material_id"]]
+        quantity = material_required(job["material_used"], unit)
+        if quantity <= 0:
+            continue
+        movements.append({
+            "material_id": job["material_id"],
+            "adjustment_date": job["end_time"] or now,
+            "quantity": -quantity,
+            "adjustment_type": "Usage",
+            "notes": f"Print job #{job['id']}",
+            "unit_cost": cost,
+        })
+
+    result = apply_stock_movements_in_session(db_session, movements)
+    failed = result["missing"] + result["insufficient"]
+    if failed:
+        raise ConsumptionError([job["id"] for job in completed if job["material_id"] in failed], failed)
+    return result["applied"]
+
+
+def _update_reservations(db_session, moves: List[tuple]) -> None:
+    """Reserve material for jobs that started or were requeued and release it for jobs that stopped holding it"""
+    entering, requeued, leaving = [], [], []
+    for before, after in moves:
+        if after["status"] in ACTIVE_JOB_STATUSES and before["status"] not in ACTIVE_JOB_STATUSES:
+            entering.append(after)
+        elif after["status"] in RESERVED_JOB_STATUSES and before["status"] not in RESERVED_JOB_STATUSES:
+            requeued.append(after)
+        elif before["status"] in RESERVED_JOB_STATUSES and after["status"] not in RESERVED_JOB_STATUSES:
+            leaving.append(after["id"])
+    reservation_service.release_in_session(db_session, leaving)
+    reservation_service.reserve_in_session(
+        db_session, reservation_service.job_reservations(db_session, entering), allow_overcommit=True
+    )
+    reservation_service.reserve_in_session(db_session, reservation_service.job_reservations(db_session, requeued))
+
+
+def _apply_batch(db_session, transitions: List[Dict[str, Any]], rejected: List[Dict[str, Any]]) -> Dict[str, int]:
+    job_ids = {transition["job_id"] for transition in transitions}
+    columns = [jobs_table.c.id, jobs_table.c.material_id] + [jobs_table.c[name] for name in _STATE_COLUMNS]
+    current = {
+        row.id: dict(row._mapping)
+        for row in db_session.execute(select(*columns).where(jobs_table.c.id.in_(job_ids)))
+    }
+
+    states: Dict[int, Dict[str, Any]] = {}
+    for transition in transitions:
+        job_id = transition["job_id"]
+        if job_id not in current:
+            rejected.append({"job_id": job_id, "status": transition.get("status"), "reason": "not_found"})
+            continue
+        state = states.setdefault(job_id, dict(current[job_id]))
+        reason = _apply(state, transition)
+        if reason:
+            rejected.append({"job_id": job_id, "status": transition.get("status"), "reason": reason})
+
+    changed = {
+        job_id: state for job_id, state in states.items()
+        if any(state[name] != current[job_id][name] for name in _STATE_COLUMNS)
+    }
+    if not changed:
+        return {"applied": 0, "adjustments": 0}
+
+    now = datetime.utcnow()
+    statement = (
+        update(jobs_table)
+        .where(and_(jobs_table.c.id == bindparam("b_id"), jobs_table.c.status == bindparam("b_expected")))
+        .values(updated_at=bindparam("b_updated_at"), **{name: bindparam(f"b_{name}") for name in _STATE_COLUMNS})
+    )
+    db_session.execute(statement, [
+        {
+            "b_id": job_id,
+            "b_expected": current[job_id]["status"],
+            "b_updated_at": now,
+            **{f"b_{name}": state[name] for name in _STATE_COLUMNS},
+        }
+        for job_id, state in changed.items()
+    ])
+
+    # executemany only reports a total rowcount; read back which guarded rows matched
+    applied_ids = set(db_session.scalars(
+        select(jobs_table.c.id).where(jobs_table.c.id.in_(list(changed)), jobs_table.c.updated_at == now)
+    ))
+    for job_id in changed.keys() - applied_ids:
+        rejected.append({"job_id": job_id, "status": changed[job_id]["status"], "reason": "concurrent_update"})
+    if not applied_ids:
+        return {"applied": 0, "adjustments": 0}
+
+    outbox.record_events(db_session, "print_jobs", sorted(applied_ids), "update", _STATE_COLUMNS + ["updated_at"])
+    _update_reservations(db_session, [(current[job_id], dict(changed[job_id], id=job_id)) for job_id in applied_ids])
+
+    completed = [
+        dict(changed[job_id], id=job_id) for job_id in applied_ids
+        if changed[job_id]["status"] == "Completed" and current[job_id]["status"] != "Completed"
+    ]
+    return {"applied": len(applied_ids), "adjustments": _post_consumption(db_session, completed, now)}
+
+
+def apply_transitions(transitions: Iterable[Dict[str, Any]],
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Apply print job status transitions in batches.
+
+    Transitions for the same job are applied in the order given (so a
+    start and a completion can arrive in one batch). A batch is one
+    transaction: either all of its valid transitions and stock postings
+    are committed or none are.
+
+    Args:
+        transitions: Dictionaries with job_id, status and optionally at
+            (event time, default now), device_id, material_used (grams/ml,
+            overrides the planned amount on completion) and failure_reason
+        batch_size: Transitions per transaction
+
+    Returns:
+        Dictionary with the number of jobs updated, the number of stock
+        adjustments posted and the rejected transitions with a reason
+    """
+    # Batches hold whole jobs, so all transitions of a job are folded together
+    by_job: Dict[int, List[Dict[str, Any]]] = {}
+    for transition in transitions:
+        by_job.setdefault(transition["job_id"], []).append(transition)
+
+    batches: List[List[Dict[str, Any]]] = [[]]
+    for job_transitions in by_job.values():
+        if batches[-1] and len(batches[-1]) + len(job_transitions) > batch_size:
+            batches.append([])
+        batches[-1].extend(job_transitions)
+
+    applied = adjustments = 0
+    rejected: List[Dict[str, Any]] = []
+    for batch in batches:
+        if not batch:
+            continue
+        try:
+            batch_rejected: List[Dict[str, Any]] = []
+            with get_db_session() as db_session:
+                result = _apply_batch(db_session, batch, batch_rejected)
+            applied += result["applied"]
+            adjustments += result["adjustments"]
+            rejected.extend(batch_rejected)
+        except ConsumptionError as e:
+            print(f"Error applying print job transitions: {e}")
+            rejected.extend(
+                {"job_id": t["job_id"], "status": t.get("status"),
+                 "reason": "consumption_failed" if t["job_id"] in e.job_ids else "error"}
+                for t in batch
+            )
+        except Exception as e:
+            print(f"Error applying print job transitions: {e}")
+            rejected.extend({"job_id": t["job_id"], "status": t.get("status"), "reason": "error"} for t in batch)
+
+    return {"applied": applied, "adjustments": adjustments, "rejected": rejected}
+
+
+def transition_jobs(job_ids: Iterable[int], status: str, at: Optional[datetime] = None,
+                    **fields) -> Dict[str, Any]:
+    """
+    Move several jobs to the same status.
+
+    Args:
+        job_ids: Print job ids
+        status: New status
+        at: Event time (defaults to now)
+        **fields: Extra transition fields (device_id, material_used, failure_reason)
+
+    Returns:
+        Same as apply_transitions
+    """
+    return apply_transitions({"job_id": job_id, "status": status, "at": at, **fields} for job_id in job_ids)
@@ -6,14 +6,23 @@ materials, as well as managing inventory levels and material certifications.
 
 from typing import List, Dict, Optional, Union, Tuple
 from datetime import datetime, timedelta
-from sqlalchemy import desc, asc, func, or_
+from sqlalchemy import desc, asc, func, bindparam, insert, select, update
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from sqlalchemy.orm import Session
 import pandas as pd
 import os
 
-from src.db.connection import get_db_session
-from src.db.models.material import Material, MaterialCategory, MaterialCertification, StockAdjustment
+from src.db import outbox
+from src.db.connection import begin_savepoint, get_db_session
+from src.db.models.material import LowStockMaterial, Material, MaterialCategory, MaterialCertification, StockAdjustment, Supplier
+from src.db.models.product import Product
+from src.services import search_service, stock_alert_service, usage_rollup_service, valuation_service
+
+materials_table = Material.__table__
+adjustments_table = StockAdjustment.__table__
+
+# Compare-and-set attempts when setting an absolute stock level
+STOCK_UPDATE_RETRIES = 5
 
 def get_all_materials(status=None, material_type=None, location=None, supplier_id=None):
     """Get all materials with optional filtering"""
@@ -172,6 +181,8 @@ def create_material(
             )
 
             session.add(new_material)
+            session.flush()
+            stock_alert_service.refresh_low_stock(session, [new_material.id])
             session.commit()
 
             return True
@@ -192,6 +203,10 @@ def update_material(material_id: int, data: Dict) -> bool:
     """
     Update an existing material in the database.
     
+    A new current_stock is written with a compare-and-set UPDATE, so the
+    stock adjustment recorded for it is the exact difference from the value
+    it replaced even when other sessions adjust the stock concurrently.
+    
     Args:
         material_id: ID of the material to update
         data: Dictionary of fields to update
@@ -205,27 +220,42 @@ def update_material(material_id: int, data: Dict) -> bool:
             if not material:
                 return False
             
-            # Track if stock changed to create adjustment record
-            old_stock = material.current_stock
-            
-            # Update fields from data dictionary
+            # Update fields from data dictionary; stock is set separately below
             for key, value in data.items():
-                if hasattr(material, key):
+                if key != 'current_stock' and hasattr(material, key):
                     setattr(material, key, value)
             
+            material.updated_at = datetime.now()
+            session.flush()
+            
             # Create stock adjustment record if stock changed
-            if 'current_stock' in data and data['current_stock'] != old_stock:
-                adjustment = StockAdjustment(
-                    material_id=material_id,
-                    adjustment_date=datetime.now(),
-                    quantity=data['current_stock'] - old_stock,
-                    adjustment_type="Manual Adjustment",
-                    notes=data.get('adjustment_notes', 'Stock updated through admin interface'),
-                    unit_cost=material.cost_per_unit
-                )
-                session.add(adjustment)
+            if 'current_stock' in data:
+                new_stock = data['current_stock']
+                for _ in range(STOCK_UPDATE_RETRIES):
+                    old_stock = session.execute(
+                        select(materials_table.c.current_stock).where(materials_table.c.id == material_id)
+                    ).scalar()
+                    if new_stock == old_stock:
+                        break
+                    result = session.execute(
+                        update(materials_table)
+                        .where(materials_table.c.id == material_id, materials_table.c.current_stock == old_stock)
+                        .values(current_stock=new_stock)
+                    )
+                    if result.rowcount == 1:
+                        _insert_adjustments(session, [{
+                            "material_id": material_id,
+                            "quantity": new_stock - (old_stock or 0),
+                            "adjustment_type": "Manual Adjustment",
+                            "notes": data.get('adjustment_notes', 'Stock updated through admin interface'),
+                            "unit_cost": material.cost_per_unit,
+                        }], datetime.now())
+                        outbox.record_events(session, "materials", [material_id], "update", ["current_stock"])
+                        break
+                else:
+                    raise RuntimeError("stock changed concurrently too many times")
             
-            material.updated_at = datetime.now()
+            stock_alert_service.refresh_low_stock(session, [material_id])
             session.commit()
             return True
     except Exception as e:
@@ -251,75 +281,207 @@ def delete_material(material_id: int) -> bool:
             # Soft delete by setting is_active to False
             material.is_active = False
             material.updated_at = datetime.now()
+            session.flush()
+            stock_alert_service.refresh_low_stock(session, [material_id])
             session.commit()
             return True
     except Exception as e:
         print(f"Error deleting material {material_id}: {e}")
         return False
 
+def _insert_adjustments(session, movements: List[Dict], now: datetime) -> List[int]:
+    """Insert StockAdjustment rows for movements in one executemany; returns their ids"""
+    rows = [
+        {
+            "b_material_id": movement["material_id"],
+            "b_date": movement.get("adjustment_date") or now,
+            "b_quantity": movement["quantity"],
+            "b_type": movement["adjustment_type"],
+            "b_notes": movement.get("notes"),
+            "b_unit_cost": movement.get("unit_cost"),
+            "b_created_at": now,
+        }
+        for movement in movements
+    ]
+    # Unit cost defaults to the material's current cost, looked up by the INSERT itself
+    statement = insert(adjustments_table).values(
+        material_id=bindparam("b_material_id"),
+        adjustment_date=bindparam("b_date"),
+        quantity=bindparam("b_quantity"),
+        adjustment_type=bindparam("b_type"),
+        notes=bindparam("b_notes"),
+        unit_cost=func.coalesce(
+            bindparam("b_unit_cost", type_=adjustments_table.c.unit_cost.type),
+            select(materials_table.c.cost_per_unit)
+            .where(materials_table.c.id == bindparam("b_material_id"))
+            .scalar_subquery(),
+        ),
+        created_at=bindparam("b_created_at"),
+    )
+
+    connection = session.connection()
+    if connection.dialect.insert_executemany_returning:
+        ids = list(session.scalars(statement.returning(adjustments_table.c.id), rows))
+    else:
+        ids = [connection.execute(statement, row).inserted_primary_key[0] for row in rows]
+    outbox.record_events(session, "stock_adjustments", ids, "insert")
+    usage_rollup_service.record_adjustments(session, ids)
+
+    # Explicitly dated movements may fall before valuation checkpoints
+    backdated: Dict[int, datetime] = {}
+    for movement in movements:
+        if movement.get("adjustment_date") is not None:
+            material_id = movement["material_id"]
+            backdated[material_id] = min(backdated.get(material_id, movement["adjustment_date"]), movement["adjustment_date"])
+    valuation_service.invalidate_checkpoints(session, backdated)
+    return ids
+
+
+def apply_stock_movements_in_session(session, movements: List[Dict], allow_negative: bool = True) -> Dict:
+    """
+    Apply stock movements inside an existing transaction.
+
+    Quantities are netted per material and applied with one executemany
+    of relative UPDATEs (current_stock = current_stock + :quantity), so
+    concurrent movements are never lost. With allow_negative=False each
+    UPDATE is guarded by current_stock + :quantity >= 0. The UPDATE runs
+    in a savepoint: if any material fails its guard (or does not exist)
+    the savepoint is rolled back, so nothing is changed or recorded.
+
+    Args:
+        session: Database session whose transaction the writes join
+        movements: Dictionaries with material_id, quantity and
+            adjustment_type, and optionally notes, unit_cost and
+            adjustment_date
+        allow_negative: Whether stock may go below zero
+
+    Returns:
+        Dictionary with the number of movements applied, and the material
+        ids rejected as missing or insufficient
+    """
+    net: Dict[int, float] = {}
+    for movement in movements:
+        net[movement["material_id"]] = net.get(movement["material_id"], 0.0) + movement["quantity"]
+    if not net:
+        return {"applied": 0, "missing": [], "insufficient": []}
+
+    now = datetime.now()
+    statement = (
+        update(materials_table)
+        .where(materials_table.c.id == bindparam("b_id"))
+        .values(current_stock=func.coalesce(materials_table.c.current_stock, 0) + bindparam("b_quantity"), updated_at=now)
+    )
+    if not allow_negative:
+        statement = statement.where(func.coalesce(materials_table.c.current_stock, 0) + bindparam("b_quantity") >= 0)
+
+    params = [{"b_id": material_id, "b_quantity": quantity} for material_id, quantity in net.items()]
+    savepoint = begin_savepoint(session)
+    result = session.execute(statement, params)
+
+    if result.rowcount != len(net):
+        savepoint.rollback()
+        stock = dict(session.execute(
+            select(materials_table.c.id, materials_table.c.current_stock).where(materials_table.c.id.in_(list(net)))
+        ).all())
+        return {
+            "applied": 0,
+            "missing": sorted(set(net) - set(stock)),
+            "insufficient": sorted(
+                material_id for material_id, current in stock.items() if (current or 0) + net[material_id] < 0
+            ),
+        }
+    savepoint.commit()
+
+    _insert_adjustments(session, movements, now)
+    outbox.record_events(session, "materials", list(net), "update", ["current_stock", "updated_at"])
+    stock_alert_service.refresh_low_stock(session, list(net), now)
+    return {"applied": len(movements), "missing": [], "insufficient": []}
+
+
+def apply_stock_movements(movements: List[Union[Dict, Tuple]], allow_negative: bool = True) -> Dict:
+    """
+    Apply many stock movements, and their StockAdjustment rows, in one transaction.
+
+    Args:
+        movements: Dictionaries (see apply_stock_movements_in_session) or
+            (material_id, quantity, adjustment_type) tuples
+        allow_negative: Whether stock may go below zero; when False the
+            whole batch is rejected if any material would
+
+    Returns:
+        Dictionary with the number of movements applied, and the material
+        ids rejected as missing or insufficient
+    """
+    movements = [
+        movement if isinstance(movement, dict)
+        else {"material_id": movement[0], "quantity": movement[1], "adjustment_type": movement[2]}
+        for movement in movements
+    ]
+    try:
+        with get_db_session() as session:
+            return apply_stock_movements_in_session(session, movements, allow_negative)
+    except Exception as e:
+        print(f"Error applying stock movements: {e}")
+        return {"applied": 0, "missing": [], "insufficient": [], "error": str(e)}
+
+
 def adjust_material_stock(
     material_id: int, 
     quantity: float,
     adjustment_type: str, 
     notes: Optional[str] = None,
-    unit_cost: Optional[float] = None
+    unit_cost: Optional[float] = None,
+    allow_negative: bool = True
 ) -> bool:
     """
     Adjust the stock level of a material.
     
+    The stock is changed with a single relative UPDATE, so concurrent
+    adjustments are never lost.
+    
     Args:
         material_id: ID of the material
         quantity: Amount to adjust (positive for additions, negative for removals)
         adjustment_type: Type of adjustment (e.g., "Purchase", "Usage", "Write-off")
         notes: Optional notes about the adjustment
         unit_cost: Cost per unit for this adjustment (for inventory valuation)
+        allow_negative: Whether the adjustment may take the stock below zero
         
     Returns:
         Boolean indicating success or failure
     """
-    try:
-        with get_db_session() as session:
-            material = session.query(Material).filter(Material.id == material_id).first()
-            if not material:
-                return False
-            
-            # Update the stock level
-            material.current_stock += quantity
-            
-            # Create a stock adjustment record
-            adjustment = StockAdjustment(
-                material_id=material_id,
-                adjustment_date=datetime.now(),
-                quantity=quantity,
-                adjustment_type=adjustment_type,
-                notes=notes,
-                unit_cost=unit_cost if unit_cost is not None else material.cost_per_unit
-            )
-            session.add(adjustment)
-            
-            material.updated_at = datetime.now()
-            session.commit()
-            return True
-    except Exception as e:
-        print(f"Error adjusting stock for material {material_id}: {e}")
-        return False
+    result = apply_stock_movements([{
+        "material_id": material_id,
+        "quantity": quantity,
+        "adjustment_type": adjustment_type,
+        "notes": notes,
+        "unit_cost": unit_cost,
+    }], allow_negative=allow_negative)
+    return result["applied"] == 1
 
 def get_low_stock_materials() -> List[Material]:
     """
     Get all materials that are at or below their reorder level.
     
+    Reads the low-stock set maintained by stock_alert_service rather than
+    scanning the materials table.
+    
     Returns:
         List of material objects that need reordering
     """
     try:
+        stock_alert_service.ensure_low_stock_synced()
         with get_db_session() as session:
             low_stock_materials = (
                 session.query(Material)
-                .filter(Material.current_stock <= Material.reorder_level)
-                .filter(Material.is_active == True)
-                .order_by(asc(Material.current_stock / Material.reorder_level))
+                .join(LowStockMaterial, LowStockMaterial.material_id == Material.id)
+                .filter(LowStockMaterial.below_reorder == True)
+                .order_by(asc(LowStockMaterial.current_stock / func.nullif(LowStockMaterial.reorder_level, 0)))
                 .all()
             )
+            # Detach loaded objects so they stay readable after the session commits
+            for material in low_stock_materials:
+                session.expunge(material)
             return low_stock_materials
     except Exception as e:
         print(f"Error retrieving low stock materials: {e}")
@@ -327,7 +489,10 @@ def get_low_stock_materials() -> List[Material]:
 
 def search_materials(search_term: str) -> List[Material]:
     """
-    Search for materials by name, type, or description.
+    Search for materials by name, type, description or location.
+    
+    Uses the full-text search index: each word of the search term matches
+    as a prefix, and results are ranked best match first.
     
     Args:
         search_term: The term to search for
@@ -336,21 +501,16 @@ def search_materials(search_term: str) -> List[Material]:
         List of material objects matching the search criteria
     """
     try:
+        material_ids = search_service.search_ids(search_term, "material")
+        if not material_ids:
+            return []
         with get_db_session() as session:
-            search_pattern = f"%{search_term}%"
-            materials = (
-                session.query(Material)
-                .filter(
-                    or_(
-                        Material.name.ilike(search_pattern),
-                        Material.material_type.ilike(search_pattern),
-                        Material.description.ilike(search_pattern)
-                    )
-                )
-                .order_by(Material.name)
-                .all()
-            )
-            return materials
+            materials = session.query(Material).filter(Material.id.in_(material_ids)).all()
+            # Detach loaded objects so they stay readable after the session commits
+            for material in materials:
+                session.expunge(material)
+            rank = {material_id: position for position, material_id in enumerate(material_ids)}
+            return sorted(materials, key=lambda material: rank[material.id])
     except Exception as e:
         print(f"Error searching materials: {e}")
         return []
@@ -576,16 +736,22 @@ def get_expiring_certifications(days: int = 30) -> List[Dict]:
         print(f"Error retrieving expiring certifications: {e}")
         return []
 
-def get_material_usage_stats(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> List[Dict]:
+def get_material_usage_stats(start_date: Optional[datetime] = None, end_date: Optional[datetime] = None,
+                             limit: Optional[int] = None) -> List[Dict]:
     """
     Get statistics on material usage during the specified period.
     
+    Reads the daily usage rollup, so the cost depends on the number of
+    days and materials in the range rather than on the adjustment history.
+    Write-offs are not counted as usage.
+    
     Args:
-        start_date: Starting date for the statistics (optional)
-        end_date: Ending date for the statistics (optional)
+        start_date: Starting date for the statistics (optional, whole days)
+        end_date: Ending date for the statistics (optional, whole days)
+        limit: Only return the top consumers (optional)
         
     Returns:
-        List of dictionaries with material usage statistics
+        List of dictionaries with material usage statistics, highest usage first
     """
     try:
         with get_db_session() as session:
@@ -594,24 +760,14 @@ def get_material_usage_stats(start_date: Optional[datetime] = None, end_date: Op
                 end_date = datetime.now()
             if not start_date:
                 start_date = end_date - timedelta(days=30)
-                
-            # Query for usage (negative adjustments)
-            usage_query = (
-                session.query(
-                    StockAdjustment.material_id,
-                    func.sum(StockAdjustment.quantity * -1).label("usage_amount"),
-                    func.sum(StockAdjustment.quantity * StockAdjustment.unit_cost * -1).label("usage_cost")
-                )
-                .filter(
-                    StockAdjustment.adjustment_date.between(start_date, end_date),
-                    StockAdjustment.quantity < 0,  # Only count usage (negative adjustments)
-                    StockAdjustment.adjustment_type != "Write-off"  # Don't count write-offs as usage
-                )
-                .group_by(StockAdjustment.material_id)
-            )
-            
+
+            usage_rollup_service.ensure_usage_rollup(session)
+            usage_query = usage_rollup_service.usage_query(
+                start_date, end_date, usage_rollup_service.rollup_table.c.material_id
+            ).subquery()
+
             # Join with materials table to get names
-            results = (
+            query = (
                 session.query(
                     Material.id,
                     Material.name,
@@ -626,12 +782,13 @@ def get_material_usage_stats(start_date: Optional[datetime] = None, end_date: Op
                     Material.id == usage_query.c.material_id
                 )
                 .order_by(desc(usage_query.c.usage_amount))
-                .all()
             )
+            if limit:
+                query = query.limit(limit)
             
             # Format the results
             usage_stats = []
-            for row in results:
+            for row in query.all():
                 usage_stats.append({
                     "material_id": row.id,
                     "material_name": row.name,
@@ -754,3 +911,34 @@ def get_materials_by_category() -> List[Tuple[str, int]]:
         print(f"Error getting materials by category: {e}")
         return []
 
+def get_inventory_overview() -> Dict:
+    """Get overview statistics for the inventory dashboard"""
+    try:
+        with get_db_session() as session:
+            total_materials = session.query(Material).filter(Material.is_active == True).count()
+            low_stock_materials = stock_alert_service.count_low_stock(stock_alert_service.LEVEL_MINIMUM)
+
+            total_products = session.query(Product).count()
+            active_products = session.query(Product).filter(Product.status == 'Active').count()
+
+            material_categories = session.query(MaterialCategory).count()
+            active_suppliers = session.query(Supplier).count()
+
+            return {
+                'total_materials': total_materials,
+                'low_stock_materials': low_stock_materials,
+                'total_products': total_products,
+                'active_products': active_products,
+                'material_categories': material_categories,
+                'active_suppliers': active_suppliers
+            }
+    except Exception as e:
+        print(f"Error getting inventory overview: {e}")
+        return {
+            'total_materials': 0,
+            'low_stock_materials': 0,
+            'total_products': 0,
+            'active_products': 0,
+            'material_categories': 0,
+            'active_suppliers': 0
+        }
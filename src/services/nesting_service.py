@@ -0,0 +1,432 @@
+"""
+Build-plate nesting service.
+Packs the bounding boxes of pending parts onto a device's build plate so
+several parts print in one job. Footprints are packed with a skyline
+bottom-left heuristic (each part may be turned 90 degrees), parts taller
+than the build volume are left out, and plates are filled first-fit in
+decreasing footprint order. Only parts of the same material share a plate.
+
+Part sizes come from the STL file of the job (or of its Blueprint), else
+from the dimensions of the products built from that Blueprint.
+"""
+
+import os
+import re
+import struct
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import case, func, or_, select, update
+
+from src.db import outbox
+from src.db.connection import begin_savepoint, get_db_session
+from src.db.models.blueprint import Blueprint
+from src.db.models.device import Device
+from src.db.models.print_job import PrintJob
+from src.db.models.product import Product
+from src.services import reservation_service
+
+# Build volume (x, y, z in mm) by device model; matched case-insensitively as a substring
+BUILD_VOLUMES = {
+    "ProPrint X300": (300.0, 300.0, 300.0),
+    "ProPrint X500": (500.0, 500.0, 500.0),
+    "ResinCraft Pro": (192.0, 120.0, 245.0),
+    "Prusa": (250.0, 210.0, 210.0),
+    "Ultimaker": (330.0, 240.0, 300.0),
+    "Form": (145.0, 145.0, 185.0),
+}
+DEFAULT_BUILD_VOLUME = (250.0, 210.0, 210.0)
+
+# Gap kept between parts and around the plate edge (mm)
+DEFAULT_SPACING = 5.0
+
+# Heat-up, homing and plate removal saved for each part beyond the first on a plate
+SETUP_MINUTES_PER_JOB = 10.0
+
+# Status of the original jobs once they are merged into a plate job
+MERGED_STATUS = "Merged"
+
+jobs_table = PrintJob.__table__
+
+_UNIT_FACTORS = {"mm": 1.0, "cm": 10.0, "m": 1000.0, "in": 25.4, '"': 25.4}
+_bbox_cache: Dict[Tuple[str, float], Optional[Tuple[float, float, float]]] = {}
+
+
+def build_volume(device_model: Optional[str]) -> Tuple[float, float, float]:
+    """Build volume (x, y, z in mm) for a device model"""
+    model = (device_model or "").lower()
+    for name, volume in BUILD_VOLUMES.items():
+        if name.lower() in model:
+            return volume
+    return DEFAULT_BUILD_VOLUME
+
+
+def parse_dimensions(text: Optional[str]) -> Optional[Tuple[float, float, float]]:
+    """Parse product dimensions such as "150x75x25mm" or "15 x 7.5 x 2.5 cm" into mm"""
+    if not text:
+        return None
+    numbers = [float(value) for value in re.findall(r"\d+(?:\.\d+)?", text)]
+    if len(numbers) < 2:
+        return None
+    unit = re.search(r"(mm|cm|m|in|\")\s*$", text.strip().lower())
+    factor = _UNIT_FACTORS[unit.group(1)] if unit else 1.0
+    x, y = numbers[0], numbers[1]
+    z = numbers[2] if len(numbers) > 2 else 1.0
+    return (x * factor, y * factor, z * factor)
+
+
+def stl_bounding_box(path: Optional[str]) -> Optional[Tuple[float, float, float]]:
+    """
+    Bounding box size (x, y, z) of an STL file, cached by path and mtime.
+
+    Binary files are read with one np.frombuffer; ASCII files with a regex
+    over the vertex lines.
+
+    Returns:
+        Tuple of extents in the file's units (mm by convention), or None
+        if the file is missing or unreadable
+    """
+    if not path or not path.lower().endswith(".stl") or not os.path.isfile(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    if key in _bbox_cache:
+        return _bbox_cache[key]
+
+    box = None
+    try:
+        with open(path, "rb") as handle:
+            data = handle.read()
+        vertices = None
+        if len(data) >= 84:
+            count = struct.unpack_from("<I", data, 80)[0]
+            if len(data) == 84 + count * 50:
+                records = np.frombuffer(data, dtype=np.dtype([
+                    ("normal", "<f4", 3), ("vertices", "<f4", (3, 3)), ("attribute", "<u2"),
+                ]), count=count, offset=84)
+                vertices = records["vertices"].reshape(-1, 3)
+        if vertices is None:
+            matches = re.findall(rb"vertex\s+(\S+)\s+(\S+)\s+(\S+)", data)
+            vertices = np.array(matches, dtype=float) if matches else None
+        if vertices is not None and len(vertices):
+            extent = vertices.max(axis=0) - vertices.min(axis=0)
+            box = tuple(float(value) for value in extent)
+    except Exception as e:
+        print(f"Error reading STL bounding box of {path}: {e}")
+
+    _bbox_cache[key] = box
+    return box
+
+
+class _Skyline:
+    """Skyline bottom-left packer for one rectangular plate"""
+
+    def __init__(self, width: float, depth: float):
+        self.width = width
+        self.depth = depth
+        self.segments = [[0.0, 0.0, width]]  # x, y (height of the skyline), length
+
+    def _fit(self, index: int, width: float, depth: float) -> Optional[float]:
+        """Lowest y at which a width-wide box starting at segment `index` fits"""
+        x = self.segments[index][0]
+        if x + width > self.width + 1e-9:
+            return None
+        y = 0.0
+        remaining = width
+        while remaining > 1e-9:
+            if index >= len(self.segments):
+                return None
+            y = max(y, self.segments[index][1])
+            if y + depth > self.depth + 1e-9:
+                return None
+            remaining -= self.segments[index][2]
+            index += 1
+        return y
+
+    def insert(self, width: float, depth: float, allow_rotation: bool = True) -> Optional[Tuple[float, float, bool]]:
+        """Place a box; returns (x, y, rotated) or None if it does not fit"""
+        best = None  # (top, waste-free tie-break x, index, width, depth, y, rotated)
+        options = [(width, depth, False)]
+        if allow_rotation and width != depth:
+            options.append((depth, width, True))
+        for w, d, rotated in options:
+            for index in range(len(self.segments)):
+                y = self._fit(index, w, d)
+                if y is None:
+                    continue
+                candidate = (y + d, self.segments[index][0], index, w, d, y, rotated)
+                if best is None or candidate[:2] < best[:2]:
+                    best = candidate
+        if best is None:
+            return None
+
+        _, x, index, w, d, y, rotated = best
+        self._add(index, x, y + d, w)
+        return x, y, rotated
+
+    def _add(self, index: int, x: float, top: float, width: float):
+        self.segments.insert(index, [x, top, width])
+        # Trim or drop the segments now covered by the new one
+        i = index + 1
+        while i < len(self.segments):
+            segment = self.segments[i]
+            previous_end = self.segments[i - 1][0] + self.segments[i - 1][2]
+            if segment[0] >= previous_end:
+                break
+            shrink = previous_end - segment[0]
+            segment[0] += shrink
+            segment[2] -= shrink
+            if segment[2] <= 1e-9:
+                self.segments.pop(i)
+            else:
+                break
+        # Merge neighbours at the same height
+        i = 0
+        while i < len(self.segments) - 1:
+            if abs(self.segments[i][1] - self.segments[i + 1][1]) < 1e-9:
+                self.segments[i][2] += self.segments.pop(i + 1)[2]
+            else:
+                i += 1
+
+
+def pack_parts(parts: List[Dict[str, Any]], volume: Tuple[float, float, float],
+               spacing: float = DEFAULT_SPACING) -> Dict[str, Any]:
+    """
+    Pack parts onto as few plates of one build volume as possible.
+
+    Args:
+        parts: Dictionaries with id and size (x, y, z in mm)
+        volume: Build volume (x, y, z in mm)
+        spacing: Gap kept between parts and around the plate edge
+
+    Returns:
+        Dictionary with "plates" (each with placements, area_utilization
+        and height) and "unplaced" (ids of parts too large for the volume)
+    """
+    plate_x, plate_y, plate_z = volume
+    usable_x, usable_y = plate_x - spacing, plate_y - spacing
+
+    unplaced = []
+    candidates = []
+    for part in parts:
+        x, y, z = part["size"]
+        fits_flat = x + spacing <= usable_x and y + spacing <= usable_y
+        fits_turned = y + spacing <= usable_x and x + spacing <= usable_y
+        if z > plate_z or not (fits_flat or fits_turned):
+            unplaced.append(part["id"])
+        else:
+            candidates.append(part)
+
+    # Largest footprint first, longest side as the tie-break
+    candidates.sort(key=lambda part: (part["size"][0] * part["size"][1], max(part["size"][:2])), reverse=True)
+
+    plates: List[Dict[str, Any]] = []
+    for part in candidates:
+        x, y, z = part["size"]
+        for plate in plates:
+            spot = plate["packer"].insert(x + spacing, y + spacing)
+            if spot is not None:
+                break
+        else:
+            plate = {"packer": _Skyline(usable_x, usable_y), "placements": []}
+            plates.append(plate)
+            spot = plate["packer"].insert(x + spacing, y + spacing)
+
+        px, py, rotated = spot
+        plate["placements"].append({
+            "id": part["id"],
+            "x": round(px + spacing, 2),
+            "y": round(py + spacing, 2),
+            "size": (y, x, z) if rotated else (x, y, z),
+            "rotated": rotated,
+        })
+
+    plate_area = plate_x * plate_y
+    results = []
+    for plate in plates:
+        placements = plate["placements"]
+        used = sum(p["size"][0] * p["size"][1] for p in placements)
+        results.append({
+            "placements": placements,
+            "part_ids": [p["id"] for p in placements],
+            "area_utilization": round(used / plate_area * 100, 1),
+            "height": max(p["size"][2] for p in placements),
+        })
+
+    total_area = sum(plate["area_utilization"] for plate in results)
+    return {
+        "plates": results,
+        "unplaced": unplaced,
+        "area_utilization": round(total_area / len(results), 1) if results else 0.0,
+    }
+
+
+def _part_sizes(db_session, jobs: List[Dict[str, Any]]) -> Dict[int, Tuple[float, float, float]]:
+    """Bounding box per job id, from STL files or Blueprint product dimensions"""
+    paths = {job["file_path"] for job in jobs if job.get("file_path")}
+    stems = {os.path.splitext(os.path.basename(path))[0] for path in paths}
+
+    blueprints = {}
+    if paths:
+        rows = db_session.execute(
+            select(Blueprint.id, Blueprint.file_path, func.min(Product.dimensions))
+            .outerjoin(Product, Product.blueprint_id == Blueprint.id)
+            .where(Blueprint.file_path.isnot(None))
+            .group_by(Blueprint.id, Blueprint.file_path)
+        ).all()
+        for blueprint_id, file_path, dimensions in rows:
+            stem = os.path.splitext(os.path.basename(file_path))[0]
+            if file_path in paths or stem in stems:
+                blueprint = {"file_path": file_path, "dimensions": dimensions}
+                blueprints[file_path] = blueprints[stem] = blueprint
+
+    sizes = {}
+    for job in jobs:
+        path = job.get("file_path")
+        size = stl_bounding_box(path)
+        if size is None and path:
+            blueprint = blueprints.get(path) or blueprints.get(os.path.splitext(os.path.basename(path))[0])
+            if blueprint:
+                size = stl_bounding_box(blueprint["file_path"]) or parse_dimensions(blueprint["dimensions"])
+        if size is not None:
+            sizes[job["id"]] = size
+    return sizes
+
+
+def nest_pending_jobs(device_id: Optional[int] = None, spacing: float = DEFAULT_SPACING,
+                      apply: bool = False) -> Dict[str, Any]:
+    """
+    Nest pending print jobs into shared plates.
+
+    With a device, its pinned jobs and the unpinned ones are packed onto
+    its build volume; without one, unpinned jobs are packed onto the
+    default volume. Plates holding more than one part become new combined
+    Pending jobs when `apply` is set, and their parts are marked Merged.
+    A plate is skipped if any of its parts stopped being Pending since
+    the jobs were read (dispatched, started or merged concurrently).
+
+    Args:
+        device_id: Optional device whose build volume is used
+        spacing: Gap between parts (mm)
+        apply: Create the combined jobs
+
+    Returns:
+        Dictionary with the plates per material, jobs without a known
+        size, parts too large for the volume, overall area utilization,
+        the ids of the combined jobs created and the part ids of plates
+        skipped because a part had moved on
+    """
+    started = datetime.now()
+    try:
+        with get_db_session() as db_session:
+            model = None
+            if device_id is not None:
+                model = db_session.scalar(select(Device.model).where(Device.id == device_id))
+            volume = build_volume(model)
+
+            query = select(
+                PrintJob.id, PrintJob.name, PrintJob.user_id, PrintJob.material_id, PrintJob.file_path,
+                PrintJob.estimated_duration, PrintJob.material_used,
+            ).where(PrintJob.status == "Pending")
+            if device_id is not None:
+                query = query.where(or_(PrintJob.device_id == device_id, PrintJob.device_id.is_(None)))
+            else:
+                query = query.where(PrintJob.device_id.is_(None))
+            jobs = [dict(row._mapping) for row in db_session.execute(query)]
+
+            sizes = _part_sizes(db_session, jobs)
+            by_material = defaultdict(list)
+            for job in jobs:
+                if job["id"] in sizes:
+                    by_material[job["material_id"]].append({"id": job["id"], "size": sizes[job["id"]]})
+
+            plans = {material_id: pack_parts(parts, volume, spacing) for material_id, parts in by_material.items()}
+            plates = [plate for plan in plans.values() for plate in plan["plates"]]
+
+            created, conflicts = [], []
+            if apply:
+                jobs_by_id = {job["id"]: job for job in jobs}
+                for material_id, plan in plans.items():
+                    for plate in plan["plates"]:
+                        if len(plate["part_ids"]) > 1:
+                            combined_id = _merge_plate(db_session, plate, jobs_by_id, material_id, device_id)
+                            if combined_id is None:
+                                conflicts.append(plate["part_ids"])
+                            else:
+                                created.append(combined_id)
+
+        return {
+            "volume": volume,
+            "plates": plates,
+            "plates_by_material": {material_id: plan["plates"] for material_id, plan in plans.items()},
+            "multi_part_plates": sum(1 for plate in plates if len(plate["part_ids"]) > 1),
+            "jobs": len(jobs),
+            "unsized": [job["id"] for job in jobs if job["id"] not in sizes],
+            "unplaced": [part for plan in plans.values() for part in plan["unplaced"]],
+            "area_utilization": (
+                round(sum(plate["area_utilization"] for plate in plates) / len(plates), 1) if plates else 0.0
+            ),
+            "created_jobs": created,
+            "conflicts": conflicts,
+            "seconds": round((datetime.now() - started).total_seconds(), 3),
+        }
+    except Exception as e:
+        print(f"Error nesting print jobs: {e}")
+        return {"volume": None, "plates": [], "plates_by_material": {}, "multi_part_plates": 0, "jobs": 0,
+                "unsized": [], "unplaced": [], "area_utilization": 0.0, "created_jobs": [], "conflicts": [], "seconds": 0.0}
+
+
+def _merge_plate(db_session, plate: Dict[str, Any], jobs_by_id: Dict[int, Dict[str, Any]],
+                 material_id: Optional[int], device_id: Optional[int]) -> Optional[int]:
+    """Create the combined job for one plate and mark its parts Merged; None if a part moved on"""
+    part_ids = plate["part_ids"]
+    now = datetime.utcnow()
+
+    # Claim the parts first, guarded on the status that was read; all or none
+    savepoint = begin_savepoint(db_session)
+    claimed = db_session.execute(
+        update(jobs_table)
+        .where(jobs_table.c.id.in_(part_ids), jobs_table.c.status == "Pending")
+        .values(status=MERGED_STATUS, updated_at=now)
+    ).rowcount
+    if claimed != len(part_ids):
+        savepoint.rollback()
+        return None
+    savepoint.commit()
+
+    # The parts' material moves to the combined job, which reserves it when flushed
+    reservation_service.release_in_session(db_session, part_ids)
+
+    parts = [jobs_by_id[part_id] for part_id in part_ids]
+    durations = [part["estimated_duration"] for part in parts if part["estimated_duration"]]
+    estimated = (
+        max(sum(durations) - SETUP_MINUTES_PER_JOB * (len(parts) - 1), max(durations))
+        if durations else None
+    )
+
+    combined = PrintJob(
+        name=f"Nested plate ({len(parts)} parts)",
+        description="Parts: " + ", ".join(f"#{part['id']} {part['name']}" for part in parts),
+        status="Pending",
+        user_id=parts[0]["user_id"],
+        device_id=device_id,
+        material_id=material_id,
+        estimated_duration=estimated,
+        material_used=sum(part["material_used"] or 0 for part in parts) or None,
+        notes=f"Plate area utilization {plate['area_utilization']}%",
+    )
+    db_session.add(combined)
+    db_session.flush()
+
+    note = f"Nested into print job #{combined.id}"
+    db_session.execute(
+        update(jobs_table)
+        .where(jobs_table.c.id.in_(part_ids))
+        .values(notes=case(
+            (func.coalesce(jobs_table.c.notes, "") == "", note),
+            else_=jobs_table.c.notes + "\n" + note,
+        ))
+    )
+    outbox.record_events(db_session, "print_jobs", part_ids, "update", ["status", "notes", "updated_at"])
+    return combined.id
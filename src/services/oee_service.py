@@ -0,0 +1,385 @@
+"""
+Overall Equipment Effectiveness (OEE) service.
+OEE = availability x performance x quality, materialized per device per
+day in device_oee_daily:
+
+- availability: planned time minus maintenance downtime (and, for today,
+  the time a device has been in Maintenance/Offline status)
+- performance: estimated over actual duration of completed print jobs
+- quality: share of finished jobs that succeeded, scaled by the day's
+  quality test pass rate
+
+Only days with new or changed source rows (plus today) are recomputed,
+along with days whose materialized job counts no longer match the jobs
+(a job requeued or moved to another day since). Refreshes are serialized
+per process. Fleet, location and device rollups are ratios of the
+materialized sums. The table is derived data written with Core
+statements and does not go through the outbox.
+"""
+
+import threading
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import delete, func, insert, select
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device, MaintenanceRecord
+from src.db.models.oee import DeviceOeeDaily
+from src.db.models.print_job import PrintJob
+from src.db.models.quality import QualityTest
+
+PLANNED_MINUTES_PER_DAY = 24 * 60
+
+# MaintenanceRecord has no duration; downtime assumed per maintenance type
+MAINTENANCE_DOWNTIME_MINUTES = {"Regular": 240, "Calibration": 120, "Emergency": 480}
+DEFAULT_DOWNTIME_MINUTES = 240
+
+# Device statuses counted as down for the current day
+DOWN_STATUSES = ["Maintenance", "Offline"]
+
+FINISHED_JOB_STATUSES = ["Completed", "Failed"]
+
+# How far back the first materialization (and later recomputation) reaches
+HISTORY_DAYS = 90
+
+DEFAULT_BATCH_SIZE = 1000
+
+oee_table = DeviceOeeDaily.__table__
+
+# The cached aggregate and the background refresher both materialize; each
+# deletes and reinserts its days, so two at once would collide
+_materialize_lock = threading.Lock()
+
+
+def _ratio(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def oee_components(planned: float, downtime: float, ideal: float, run: float,
+                   finished: int, good: float) -> Dict[str, Optional[float]]:
+    """
+    OEE components (fractions) from raw sums.
+
+    Args:
+        planned: Planned production minutes
+        downtime: Minutes lost to maintenance or down status
+        ideal: Estimated minutes of the completed jobs
+        run: Actual minutes of the same jobs
+        finished: Number of finished (completed or failed) jobs
+        good: Number of good jobs, possibly weighted by test pass rates
+
+    Returns:
+        Dictionary with availability, performance, quality and oee; a
+        component is None when there is nothing to measure
+    """
+    availability = _ratio(max(planned - downtime, 0.0), planned)
+    performance = _ratio(ideal, run)
+    if performance is not None:
+        performance = min(performance, 1.0)
+    quality = _ratio(good, finished)
+
+    parts = (availability, performance, quality)
+    oee = availability * performance * quality if None not in parts else None
+    return {"availability": availability, "performance": performance, "quality": quality, "oee": oee}
+
+
+def _as_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def _day_range(start: date, end: date) -> Set[date]:
+    return {start + timedelta(days=offset) for offset in range((end - start).days + 1)}
+
+
+def _dirty_days(db_session, today: date) -> Set[date]:
+    """Days whose source rows changed since the last materialization, plus today"""
+    earliest = today - timedelta(days=HISTORY_DAYS - 1)
+    last_computed, last_day = db_session.execute(
+        select(func.max(oee_table.c.computed_at), func.max(oee_table.c.day))
+    ).one()
+
+    if last_computed is None:
+        first_days = [
+            _as_date(db_session.scalar(select(func.min(PrintJob.end_time)))),
+            _as_date(db_session.scalar(select(func.min(MaintenanceRecord.maintenance_date)))),
+        ]
+        first_days = [day for day in first_days if day is not None]
+        start = max(min(first_days), earliest) if first_days else today
+        return _day_range(min(start, today), today)
+
+    # The last materialized day was partial if it was "today" back then; also
+    # cover the days the refresh did not run on
+    days = _day_range(max(min(_as_date(last_day), today), earliest), today)
+
+    changed = [
+        select(PrintJob.end_time).where(PrintJob.updated_at >= last_computed, PrintJob.end_time.isnot(None)),
+        select(MaintenanceRecord.maintenance_date).where(MaintenanceRecord.updated_at >= last_computed),
+        select(QualityTest.test_date).where(QualityTest.created_at >= last_computed, QualityTest.test_date.isnot(None)),
+    ]
+    for query in changed:
+        days.update(_as_date(value) for value in db_session.scalars(query.distinct()))
+    days.update(_recounted_days(db_session, earliest))
+
+    return {day for day in days if earliest <= day <= today}
+
+
+def _recounted_days(db_session, earliest: date) -> Set[date]:
+    """
+    Days whose materialized finished job counts differ from the jobs.
+
+    A job leaving a day (requeued, or its end_time moved) is only seen as
+    changed on its new day; the day it left shows up here instead. A job
+    joining a day marks that day through its updated_at.
+    """
+    period_start = datetime.combine(earliest, time.min)
+    created = {
+        device_id: _as_date(created_at)
+        for device_id, created_at in db_session.execute(select(Device.id, Device.created_at))
+    }
+    end_day = func.date(PrintJob.end_time)
+    counts = {}
+    for device_id, day, finished in db_session.execute(
+        select(PrintJob.device_id, end_day, func.count())
+        .where(
+            PrintJob.device_id.isnot(None),
+            PrintJob.status.in_(FINISHED_JOB_STATUSES),
+            PrintJob.end_time >= period_start,
+        )
+        .group_by(PrintJob.device_id, end_day)
+    ):
+        day = _as_date(day)
+        # Same rows as compute_daily_oee: devices are counted from the day they were added
+        if device_id in created and (created[device_id] is None or created[device_id] <= day):
+            counts[(device_id, day)] = finished
+
+    materialized = {
+        (device_id, _as_date(day)): finished
+        for device_id, day, finished in db_session.execute(
+            select(oee_table.c.device_id, oee_table.c.day, oee_table.c.finished_jobs)
+            .where(oee_table.c.day >= earliest)
+        )
+    }
+    return {key[1] for key in counts.keys() | materialized.keys() if counts.get(key, 0) != materialized.get(key, 0)}
+
+
+def compute_daily_oee(db_session, days: Iterable[date], now: datetime) -> List[Dict[str, Any]]:
+    """
+    Compute one OEE row per device per requested day.
+
+    Args:
+        db_session: Database session
+        days: Days to compute
+        now: Current time; today's planned time ends here
+
+    Returns:
+        List of row dictionaries for device_oee_daily (without computed_at)
+    """
+    days = sorted(set(days))
+    if not days:
+        return []
+    today = now.date()
+    period_start = datetime.combine(days[0], time.min)
+    period_end = datetime.combine(days[-1], time.min) + timedelta(days=1)
+    wanted = set(days)
+
+    devices = db_session.execute(select(Device.id, Device.status, Device.created_at)).all()
+
+    run = defaultdict(lambda: [0.0, 0.0, 0, 0])  # (device, day) -> ideal, run, finished, good
+    jobs = db_session.execute(
+        select(
+            PrintJob.device_id, PrintJob.status, PrintJob.end_time, PrintJob.estimated_duration,
+            PrintJob.actual_duration, PrintJob.success,
+        ).where(
+            PrintJob.device_id.isnot(None),
+            PrintJob.status.in_(FINISHED_JOB_STATUSES),
+            PrintJob.end_time >= period_start,
+            PrintJob.end_time < period_end,
+        )
+    )
+    for device_id, status, end_time, estimated, actual, success in jobs:
+        day = end_time.date()
+        if day not in wanted:
+            continue
+        totals = run[(device_id, day)]
+        if status == "Completed" and estimated and actual:
+            totals[0] += estimated
+            totals[1] += actual
+        totals[2] += 1
+        if success or (success is None and status == "Completed"):
+            totals[3] += 1
+
+    downtime = defaultdict(float)
+    records = db_session.execute(
+        select(MaintenanceRecord.device_id, MaintenanceRecord.maintenance_date, MaintenanceRecord.maintenance_type).where(
+            MaintenanceRecord.status != "Cancelled",
+            MaintenanceRecord.maintenance_date >= days[0],
+            MaintenanceRecord.maintenance_date <= days[-1],
+        )
+    )
+    for device_id, day, maintenance_type in records:
+        downtime[(device_id, day)] += MAINTENANCE_DOWNTIME_MINUTES.get(maintenance_type, DEFAULT_DOWNTIME_MINUTES)
+
+    tests = defaultdict(lambda: [0, 0])  # day -> total, passed
+    for test_date, result in db_session.execute(
+        select(QualityTest.test_date, QualityTest.result).where(
+            QualityTest.result.in_(["Pass", "Fail"]),
+            QualityTest.test_date >= period_start,
+            QualityTest.test_date < period_end,
+        )
+    ):
+        counts = tests[test_date.date()]
+        counts[0] += 1
+        counts[1] += result == "Pass"
+
+    elapsed_today = (now - datetime.combine(today, time.min)).total_seconds() / 60
+
+    rows = []
+    for day in days:
+        total_tests, passed_tests = tests.get(day, (0, 0))
+        pass_rate = _ratio(passed_tests, total_tests)
+        planned = min(elapsed_today, PLANNED_MINUTES_PER_DAY) if day == today else PLANNED_MINUTES_PER_DAY
+
+        for device_id, status, created_at in devices:
+            if created_at is not None and created_at.date() > day:
+                continue
+            ideal, actual, finished, good = run.get((device_id, day), (0.0, 0.0, 0, 0))
+            down = downtime.get((device_id, day), 0.0)
+            if day == today and status in DOWN_STATUSES:
+                down = planned
+            down = min(down, planned)
+
+            rows.append({
+                "device_id": device_id,
+                "day": day,
+                "planned_minutes": planned,
+                "downtime_minutes": down,
+                "ideal_minutes": ideal,
+                "run_minutes": actual,
+                "finished_jobs": finished,
+                "good_jobs": good,
+                "test_pass_rate": pass_rate,
+                **oee_components(planned, down, ideal, actual, finished,
+                                 good * (pass_rate if pass_rate is not None else 1.0)),
+            })
+    return rows
+
+
+def materialize_oee(now: Optional[datetime] = None, full: bool = False,
+                    batch_size: int = DEFAULT_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Recompute device_oee_daily for the days that have new data.
+
+    Args:
+        now: Current time (defaults to now)
+        full: Recompute the whole history window instead of only dirty days
+        batch_size: Rows per INSERT batch
+
+    Returns:
+        Dictionary with the number of days and rows written
+    """
+    now = now or datetime.now()
+    # Captured before reading, so rows changed during the refresh are picked up next time
+    computed_at = datetime.utcnow()
+    try:
+        with _materialize_lock, get_db_session() as db_session:
+            today = now.date()
+            if full:
+                days = _day_range(today - timedelta(days=HISTORY_DAYS - 1), today)
+            else:
+                days = _dirty_days(db_session, today)
+
+            rows = compute_daily_oee(db_session, days, now)
+            for row in rows:
+                row["computed_at"] = computed_at
+
+            if days:
+                db_session.execute(delete(oee_table).where(oee_table.c.day.in_(sorted(days))))
+            for offset in range(0, len(rows), batch_size):
+                db_session.execute(insert(oee_table), rows[offset:offset + batch_size])
+
+        return {"days": len(days), "rows": len(rows)}
+    except Exception as e:
+        print(f"Error materializing OEE: {e}")
+        return {"days": 0, "rows": 0}
+
+
+def get_oee(group_by: str = "device", days: int = 30, end: Optional[date] = None,
+            location: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    OEE rollups from the materialized daily table.
+
+    Args:
+        group_by: "device", "location", "day" or "fleet"
+        days: Number of days up to and including `end`
+        end: Last day (defaults to today)
+        location: Optional filter on device location
+
+    Returns:
+        List of dictionaries with the group key, availability, performance,
+        quality and oee as percentages (None where not measurable), and the
+        number of finished jobs
+    """
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    location_column = func.coalesce(Device.location, "Unassigned")
+    keys = {
+        "device": [Device.id.label("device_id"), Device.name.label("name")],
+        "location": [location_column.label("location")],
+        "day": [oee_table.c.day.label("day")],
+        "fleet": [],
+    }
+    if group_by not in keys:
+        raise ValueError(f"Unknown OEE grouping: {group_by}")
+
+    sums = [
+        func.sum(oee_table.c.planned_minutes),
+        func.sum(oee_table.c.downtime_minutes),
+        func.sum(oee_table.c.ideal_minutes),
+        func.sum(oee_table.c.run_minutes),
+        func.sum(oee_table.c.finished_jobs),
+        func.sum(oee_table.c.good_jobs * func.coalesce(oee_table.c.test_pass_rate, 1.0)),
+    ]
+    query = (
+        select(*keys[group_by], *sums)
+        .select_from(oee_table.join(Device.__table__, Device.id == oee_table.c.device_id))
+        .where(oee_table.c.day >= start, oee_table.c.day <= end)
+    )
+    if location:
+        query = query.where(location_column == location)
+    if keys[group_by]:
+        query = query.group_by(*keys[group_by]).order_by(*keys[group_by])
+
+    try:
+        with get_db_session() as db_session:
+            result = db_session.execute(query).all()
+    except Exception as e:
+        print(f"Error getting OEE: {e}")
+        return []
+
+    rollups = []
+    width = len(keys[group_by])
+    for row in result:
+        planned, down, ideal, actual, finished, good = (value or 0 for value in row[width:])
+        if not planned:
+            continue
+        components = oee_components(planned, down, ideal, actual, finished, good)
+        rollups.append({
+            **{key.name: value for key, value in zip(keys[group_by], row[:width])},
+            **{name: round(value * 100, 1) if value is not None else None for name, value in components.items()},
+            "finished_jobs": int(finished),
+        })
+    return rollups
+
+
+def get_device_oee_summary(days: int = 30) -> List[Dict[str, Any]]:
+    """Bring the materialized table up to date and return per-device OEE"""
+    materialize_oee()
+    return get_oee("device", days)
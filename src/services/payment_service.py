@@ -136,8 +136,8 @@ def get_payment_volume_over_time(db_session, days_limit=90):
         # Return empty DataFrame with expected columns
         return pd.DataFrame(columns=["date", "daily_volume", "cumulative_volume"])
 
-def process_refund(db_session, payment_id, user_id, reason="User requested refund"):
-    """Processes a refund for a given payment."""
+def process_refund(db_session, payment_id, identity, reason="User requested refund"):
+    """Processes a refund for a given payment (owner or admin, checked against the caller's SessionIdentity)."""
     try:
         # Find the payment
         payment = db_session.query(Payment).filter(Payment.id == payment_id).first()
@@ -149,12 +149,8 @@ def process_refund(db_session, payment_id, user_id, reason="User requested refun
         if not subscription:
             raise ValueError(f"Subscription for payment ID {payment_id} not found.")
         
-        # Get the user role (admin check would be here in a real implementation)
-        user = db_session.query(User).filter(User.id == user_id).first()
-        is_admin = user and user.role == 'admin'
-        
         # Check if user has permission (either owns the subscription or is an admin)
-        if subscription.user_id != user_id and not is_admin:
+        if subscription.user_id != identity.user_id and not identity.is_admin:
             raise PermissionError("User does not have permission to refund this payment.")
 
         # Check if payment is in a refundable state
@@ -1,169 +1,192 @@
 # src/services/print_job_service.py
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-import pandas as pd
-import os
-from sqlalchemy.exc import SQLAlchemyError, IntegrityError
-from sqlalchemy import desc, asc
+from typing import Optional, List, Dict, Any, Union
+from sqlalchemy import select, func, desc
 
 from src.db.connection import get_db_session
 from src.db.models.print_job import PrintJob
-from src.db.models.user import User
-from src.db.models.device import Device
-from src.db.models.material import Material
 
-def load_sample_print_jobs():
-    """Load sample print job data from CSV file for dashboard display"""
-    try:
-        csv_path = os.path.join(os.path.dirname(__file__), '../../data/sample_print_jobs.csv')
-        
-        if os.path.exists(csv_path):
-            df = pd.read_csv(csv_path)
-        else:
-            # Return default sample data if no CSV file found
-            return [
-                {"id": 1, "name": "Prototype Bracket", "status": "Completed", "user_id": 1, "device_id": 1, "material_used": 125.5},
-                {"id": 2, "name": "Medical Housing", "status": "Completed", "user_id": 2, "device_id": 2, "material_used": 89.3},
-                {"id": 3, "name": "Gear Assembly", "status": "In Progress", "user_id": 3, "device_id": 3, "material_used": 67.8}
-            ]
-        
-        # Convert DataFrame to list of dictionaries
-        print_jobs = df.to_dict('records')
-        
-        # Convert date strings to proper format if present
-        for job in print_jobs:
-            if 'start_time' in job and pd.notna(job['start_time']):
-                try:
-                    job['start_time'] = pd.to_datetime(job['start_time']).strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    pass
-            if 'end_time' in job and pd.notna(job['end_time']):
-                try:
-                    job['end_time'] = pd.to_datetime(job['end_time']).strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    pass
-            if 'created_at' in job and pd.notna(job['created_at']):
-                try:
-                    job['created_at'] = pd.to_datetime(job['created_at']).strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    pass
-                    
-        return print_jobs
-        
-    except Exception as e:
-        print(f"Error loading sample print jobs: {e}")
-        # Return basic fallback data
-        return [
-            {"id": 1, "name": "Prototype Bracket", "status": "Completed", "material_used": 125.5},
-            {"id": 2, "name": "Medical Housing", "status": "Completed", "material_used": 89.3},
-            {"id": 3, "name": "Gear Assembly", "status": "In Progress", "material_used": 67.8}
-        ]
-
-def get_print_job_status_counts():
-    """Get count of print jobs by status from sample data"""
+# Columns returned for job listings (dashboard tables don't need the long text fields)
+LISTING_COLUMNS = [
+    PrintJob.id,
+    PrintJob.name,
+    PrintJob.status,
+    PrintJob.user_id,
+    PrintJob.device_id,
+    PrintJob.material_id,
+    PrintJob.start_time,
+    PrintJob.end_time,
+    PrintJob.estimated_duration,
+    PrintJob.actual_duration,
+    PrintJob.material_used,
+    PrintJob.success,
+    PrintJob.created_at,
+]
+
+
+def _status_aggregates(db_session, since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Run the single GROUP BY status statement behind the dashboard statistics"""
+    query = select(
+        PrintJob.status,
+        func.count(PrintJob.id),
+        func.coalesce(func.sum(PrintJob.material_used), 0.0),
+        func.sum(PrintJob.actual_duration),
+        func.count(PrintJob.actual_duration),
+    ).group_by(PrintJob.status)
+
+    if since is not None:
+        query = query.where(PrintJob.created_at >= since)
+
+    return [
+        {
+            "status": status or "Unknown",
+            "count": count,
+            "material_used": float(material_used or 0),
+            "duration_sum": float(duration_sum or 0),
+            "duration_count": duration_count,
+        }
+        for status, count, material_used, duration_sum, duration_count in db_session.execute(query)
+    ]
+
+
+def get_print_job_status_counts(since: Optional[datetime] = None) -> Dict[str, int]:
+    """Get count of print jobs by status"""
     try:
-        print_jobs = load_sample_print_jobs()
-        status_counts = {}
-        
-        for job in print_jobs:
-            status = job.get('status', 'Unknown')
-            status_counts[status] = status_counts.get(status, 0) + 1
-            
-        return status_counts
-        
+        with get_db_session() as db_session:
+            counts = {}
+            for row in _status_aggregates(db_session, since):
+                counts[row["status"]] = counts.get(row["status"], 0) + row["count"]
+            return counts
+
     except Exception as e:
         print(f"Error getting print job status counts: {e}")
-        return {"Completed": 8, "In Progress": 3, "Failed": 2, "Pending": 1, "Cancelled": 1}
+        return {}
+
 
 def get_recent_print_jobs(limit=10):
-    """Get recent print jobs from sample data"""
-    try:
-        print_jobs = load_sample_print_jobs()
-        
-        # Sort by created_at if available, otherwise by id
-        if print_jobs and 'created_at' in print_jobs[0]:
-            print_jobs.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-        else:
-            print_jobs.sort(key=lambda x: x.get('id', 0), reverse=True)
-            
-        return print_jobs[:limit]
-        
-    except Exception as e:
-        print(f"Error getting recent print jobs: {e}")
-        return []
+    """Get the most recently created print jobs"""
+    return get_all_print_jobs(limit=limit)
+
 
-def get_print_job_statistics():
-    """Get print job statistics from sample data"""
+def get_print_job_statistics(since: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Get print job statistics from one aggregate statement.
+
+    Counts per status, total material used and duration sums come from a
+    single GROUP BY status query, so the work done in Python is bounded by
+    the number of distinct statuses rather than the number of jobs.
+
+    Args:
+        since: Optional lower bound on created_at
+
+    Returns:
+        Dictionary with job counts, success rate, total material used and
+        average duration of completed jobs
+    """
     try:
-        print_jobs = load_sample_print_jobs()
-        
-        total_jobs = len(print_jobs)
-        completed_jobs = len([job for job in print_jobs if job.get('status') == 'Completed'])
-        failed_jobs = len([job for job in print_jobs if job.get('status') == 'Failed'])
-        in_progress_jobs = len([job for job in print_jobs if job.get('status') == 'In Progress'])
-        
-        # Calculate success rate
+        with get_db_session() as db_session:
+            rows = _status_aggregates(db_session, since)
+
+        by_status = {row["status"]: row for row in rows}
+        completed = by_status.get("Completed", {})
+
+        total_jobs = sum(row["count"] for row in rows)
+        completed_jobs = completed.get("count", 0)
+        failed_jobs = by_status.get("Failed", {}).get("count", 0)
+        in_progress_jobs = by_status.get("In Progress", {}).get("count", 0)
+
         success_rate = (completed_jobs / total_jobs * 100) if total_jobs > 0 else 0
-        
-        # Calculate total material used
-        total_material_used = sum([
-            job.get('material_used', 0) for job in print_jobs 
-            if job.get('material_used') and pd.notna(job.get('material_used'))
-        ])
-        
-        # Calculate average duration for completed jobs
-        completed_durations = [
-            job.get('actual_duration', 0) for job in print_jobs 
-            if job.get('status') == 'Completed' and job.get('actual_duration') and pd.notna(job.get('actual_duration'))
-        ]
-        avg_duration = sum(completed_durations) / len(completed_durations) if completed_durations else 0
-        
+        total_material_used = sum(row["material_used"] for row in rows)
+
+        # Average duration is over completed jobs only
+        avg_duration = (
+            completed["duration_sum"] / completed["duration_count"]
+            if completed.get("duration_count") else 0
+        )
+
         return {
             "total_jobs": total_jobs,
             "completed_jobs": completed_jobs,
             "failed_jobs": failed_jobs,
             "in_progress_jobs": in_progress_jobs,
+            "status_counts": {row["status"]: row["count"] for row in rows},
             "success_rate": round(success_rate, 1),
             "total_material_used": round(total_material_used, 2),
             "average_duration_minutes": round(avg_duration, 0)
         }
-        
+
     except Exception as e:
         print(f"Error getting print job statistics: {e}")
         return {
-            "total_jobs": 15,
-            "completed_jobs": 8,
-            "failed_jobs": 2,
-            "in_progress_jobs": 3,
-            "success_rate": 73.3,
-            "total_material_used": 1456.7,
-            "average_duration_minutes": 168
+            "total_jobs": 0,
+            "completed_jobs": 0,
+            "failed_jobs": 0,
+            "in_progress_jobs": 0,
+            "status_counts": {},
+            "success_rate": 0,
+            "total_material_used": 0,
+            "average_duration_minutes": 0
         }
 
-def get_all_print_jobs(status=None, user_id=None, device_id=None, limit=None):
-    """Get all print jobs with optional filtering"""
+
+def get_all_print_jobs(
+    status: Optional[Union[str, List[str]]] = None,
+    user_id: Optional[int] = None,
+    device_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Get print jobs, newest first, with optional filtering.
+
+    Every filter column has a (column, created_at) index, so a filtered
+    and limited listing reads only the matching index range.
+
+    Args:
+        status: Optional status or list of statuses
+        user_id: Optional filter by submitting user
+        device_id: Optional filter by device
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+        limit: Optional maximum number of jobs to return
+        offset: Number of jobs to skip (for paging)
+
+    Returns:
+        List of print job dictionaries
+    """
     try:
-        print_jobs = load_sample_print_jobs()
-        
-        # Apply filters
+        query = select(*LISTING_COLUMNS)
+
         if status:
             if isinstance(status, list):
-                print_jobs = [job for job in print_jobs if job.get('status') in status]
+                query = query.where(PrintJob.status.in_(status))
             else:
-                print_jobs = [job for job in print_jobs if job.get('status') == status]
-                
+                query = query.where(PrintJob.status == status)
+
         if user_id:
-            print_jobs = [job for job in print_jobs if job.get('user_id') == user_id]
-            
+            query = query.where(PrintJob.user_id == user_id)
+
         if device_id:
-            print_jobs = [job for job in print_jobs if job.get('device_id') == device_id]
-            
-        # Apply limit
+            query = query.where(PrintJob.device_id == device_id)
+
+        if created_after:
+            query = query.where(PrintJob.created_at >= created_after)
+
+        if created_before:
+            query = query.where(PrintJob.created_at < created_before)
+
+        query = query.order_by(desc(PrintJob.created_at), desc(PrintJob.id))
+
         if limit:
-            print_jobs = print_jobs[:limit]
-            
-        return print_jobs
-        
+            query = query.limit(limit)
+        if offset:
+            query = query.offset(offset)
+
+        with get_db_session() as db_session:
+            return [dict(row._mapping) for row in db_session.execute(query)]
+
     except Exception as e:
         print(f"Error getting print jobs: {e}")
         return []
@@ -0,0 +1,485 @@
+"""
+Material reservation service.
+Print jobs hold their material from creation until they finish: one
+material_reservations row per (job, material), and material_allocations
+keeps each material's reserved total. Available to promise (ATP) is
+current_stock - reserved, so it reads one row per material instead of
+summing the active jobs.
+
+The total is maintained incrementally, in the transaction that writes the
+reservations, with relative UPDATEs (reserved = reserved + :delta). A
+reservation is guarded in the same statement by reserved + :delta <=
+current_stock, so concurrent reservations cannot promise the same stock
+twice. Requests are netted per material and tried with one UPDATE per
+material; for a material that does not fit, its requests are tried one
+by one in the order given, so earlier (higher priority) jobs win.
+
+Pending jobs created or edited through the ORM reserve at flush, within
+the stock available to promise (a job that does not fit stays Pending
+without a reservation and needs the stock when it is dispatched). The
+dispatcher reserves for the jobs it schedules, the job state machine
+reserves for jobs started or requeued by hand and releases jobs that
+finish or are cancelled, and nesting moves the reservations of merged
+parts to their combined job. sync_reservations() reconciles the
+reservations with the pending and active jobs, for writes made around
+the services; readers run it once per process.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import DateTime, and_, bindparam, delete, event, func, insert, inspect, literal, or_, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session, session_factory
+from src.db.models.material import Material, MaterialAllocation, MaterialReservation
+from src.db.models.print_job import PrintJob
+
+# Slack for float rounding when comparing reserved with current stock
+EPSILON = 1e-9
+
+# PrintJob attributes that decide what a job holds
+_JOB_ATTRIBUTES = ("status", "material_id", "material_used")
+
+materials_table = Material.__table__
+allocations_table = MaterialAllocation.__table__
+reservations_table = MaterialReservation.__table__
+
+_synced = False
+
+
+def _row_pk(key) -> str:
+    # Same format as the outbox uses for composite keys written through the ORM
+    return f"{key[0]},{key[1]}"
+
+
+def _ensure_allocations(db_session, material_ids: List[int], now: datetime) -> None:
+    """Create zero allocation rows for materials that have none yet"""
+    missing = select(materials_table.c.id, literal(0.0), literal(now, DateTime)).where(
+        materials_table.c.id.in_(material_ids),
+        materials_table.c.id.notin_(select(allocations_table.c.material_id)),
+    )
+    columns = ["material_id", "reserved", "updated_at"]
+    dialect = db_session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db_session.execute(insert(allocations_table).from_select(columns, missing))
+        return
+    # A concurrent transaction may create the same rows
+    db_session.execute(dialect_insert(allocations_table).from_select(columns, missing).on_conflict_do_nothing())
+
+
+def _guarded_update(now: datetime):
+    """Relative UPDATE of a reserved total, refused when an increase would exceed current stock"""
+    stock = (
+        select(func.coalesce(materials_table.c.current_stock, 0))
+        .where(materials_table.c.id == allocations_table.c.material_id)
+        .scalar_subquery()
+    )
+    return (
+        update(allocations_table)
+        .where(
+            allocations_table.c.material_id == bindparam("b_material_id"),
+            or_(bindparam("b_delta") <= 0, allocations_table.c.reserved + bindparam("b_delta") <= stock + EPSILON),
+        )
+        .values(reserved=allocations_table.c.reserved + bindparam("b_delta"), updated_at=now)
+    )
+
+
+def reserve_in_session(db_session, reservations: Iterable[Dict[str, Any]], allow_overcommit: bool = False,
+                       now: Optional[datetime] = None) -> Dict[str, List[int]]:
+    """
+    Reserve material for print jobs inside an existing transaction.
+
+    A job that already holds the material has its reservation replaced, so
+    only the difference is reserved (and nothing is written when the
+    quantity is unchanged).
+
+    Args:
+        db_session: Database session whose transaction the writes join
+        reservations: Dictionaries with print_job_id, material_id and
+            quantity (in the material's stock unit), highest priority first
+        allow_overcommit: Reserve even beyond the stock available (for jobs
+            that are already printing)
+        now: Time of the reservation (defaults to now)
+
+    Returns:
+        Dictionary with the job ids "reserved", and those rejected as
+        "insufficient" or for a "missing" material
+    """
+    requests: Dict[tuple, float] = {}
+    for reservation in reservations:
+        key = (reservation["print_job_id"], reservation["material_id"])
+        requests[key] = max(float(reservation["quantity"] or 0), 0.0)
+    result = {"reserved": [], "insufficient": [], "missing": []}
+    if not requests:
+        return result
+
+    now = now or datetime.now()
+    job_ids = sorted({job_id for job_id, _ in requests})
+    material_ids = sorted({material_id for _, material_id in requests})
+    held = {
+        (row.print_job_id, row.material_id): row.quantity
+        for row in db_session.execute(
+            select(reservations_table.c.print_job_id, reservations_table.c.material_id, reservations_table.c.quantity)
+            .where(reservations_table.c.print_job_id.in_(job_ids), reservations_table.c.material_id.in_(material_ids))
+        )
+    }
+    existing = set(db_session.scalars(select(materials_table.c.id).where(materials_table.c.id.in_(material_ids))))
+    _ensure_allocations(db_session, sorted(existing), now)
+
+    deltas: Dict[int, List[tuple]] = {}
+    for key, quantity in requests.items():
+        if key[1] not in existing:
+            result["missing"].append(key[0])
+        elif key in held and abs(quantity - held[key]) <= EPSILON:
+            result["reserved"].append(key[0])
+        else:
+            deltas.setdefault(key[1], []).append((key, quantity - held.get(key, 0.0)))
+
+    accepted = []
+    if not deltas:
+        return result
+    if allow_overcommit:
+        statement = (
+            update(allocations_table)
+            .where(allocations_table.c.material_id == bindparam("b_material_id"))
+            .values(reserved=allocations_table.c.reserved + bindparam("b_delta"), updated_at=now)
+        )
+        db_session.execute(statement, [
+            {"b_material_id": material_id, "b_delta": sum(delta for _, delta in entries)}
+            for material_id, entries in deltas.items()
+        ])
+        accepted = [key for entries in deltas.values() for key, _ in entries]
+    else:
+        statement = _guarded_update(now)
+        for material_id, entries in deltas.items():
+            total = sum(delta for _, delta in entries)
+            if db_session.execute(statement, {"b_material_id": material_id, "b_delta": total}).rowcount:
+                accepted.extend(key for key, _ in entries)
+                continue
+            # The netted total does not fit: reserve the jobs one at a time
+            for key, delta in entries:
+                if db_session.execute(statement, {"b_material_id": material_id, "b_delta": delta}).rowcount:
+                    accepted.append(key)
+                else:
+                    result["insufficient"].append(key[0])
+
+    if accepted:
+        replaced = [key for key in accepted if key in held]
+        if replaced:
+            db_session.execute(
+                delete(reservations_table).where(and_(
+                    reservations_table.c.print_job_id == bindparam("b_print_job_id"),
+                    reservations_table.c.material_id == bindparam("b_material_id"),
+                )),
+                [{"b_print_job_id": job_id, "b_material_id": material_id} for job_id, material_id in replaced],
+            )
+        db_session.execute(insert(reservations_table), [
+            {"print_job_id": job_id, "material_id": material_id, "quantity": requests[(job_id, material_id)],
+             "created_at": now}
+            for job_id, material_id in accepted
+        ])
+        outbox.record_events(db_session, "material_reservations", [_row_pk(key) for key in accepted], "insert")
+        outbox.record_events(db_session, "material_allocations", sorted({key[1] for key in accepted}),
+                             "update", ["reserved", "updated_at"])
+        result["reserved"].extend(job_id for job_id, _ in accepted)
+    return result
+
+
+def release_in_session(db_session, print_job_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+    """
+    Release all reservations of the given print jobs inside an existing transaction.
+
+    Returns:
+        Number of reservations released
+    """
+    print_job_ids = sorted(set(print_job_ids))
+    if not print_job_ids:
+        return 0
+    now = now or datetime.now()
+    released = db_session.execute(
+        select(reservations_table.c.print_job_id, reservations_table.c.material_id, reservations_table.c.quantity)
+        .where(reservations_table.c.print_job_id.in_(print_job_ids))
+    ).all()
+    if not released:
+        return 0
+
+    totals: Dict[int, float] = {}
+    for _, material_id, quantity in released:
+        totals[material_id] = totals.get(material_id, 0.0) + quantity
+    db_session.execute(delete(reservations_table).where(reservations_table.c.print_job_id.in_(print_job_ids)))
+    db_session.execute(
+        update(allocations_table)
+        .where(allocations_table.c.material_id == bindparam("b_material_id"))
+        .values(reserved=allocations_table.c.reserved - bindparam("b_quantity"), updated_at=now),
+        [{"b_material_id": material_id, "b_quantity": quantity} for material_id, quantity in totals.items()],
+    )
+    outbox.record_events(db_session, "material_reservations", [_row_pk(row) for row in released], "delete")
+    outbox.record_events(db_session, "material_allocations", sorted(totals), "update", ["reserved", "updated_at"])
+    return len(released)
+
+
+def job_reservations(db_session, jobs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Reservation requests for print jobs, converting material_used (grams/ml)
+    into each material's stock unit.
+
+    Args:
+        db_session: Database session
+        jobs: Dictionaries with id, material_id and material_used
+
+    Returns:
+        Dictionaries with print_job_id, material_id and quantity, for jobs
+        that use a material
+    """
+    from src.services.dispatch_service import material_required
+
+    jobs = [job for job in jobs if job.get("material_id") is not None and job.get("material_used")]
+    if not jobs:
+        return []
+    units = dict(db_session.execute(
+        select(materials_table.c.id, materials_table.c.unit)
+        .where(materials_table.c.id.in_({job["material_id"] for job in jobs}))
+    ).all())
+    return [
+        {"print_job_id": job["id"], "material_id": job["material_id"],
+         "quantity": material_required(job["material_used"], units.get(job["material_id"]))}
+        for job in jobs
+    ]
+
+
+def available_to_promise_query(*conditions):
+    """SELECT of material id, current stock, reserved and available (current stock minus reserved)"""
+    stock = func.coalesce(materials_table.c.current_stock, 0)
+    reserved = func.coalesce(allocations_table.c.reserved, 0)
+    return (
+        select(
+            materials_table.c.id.label("material_id"),
+            stock.label("current_stock"),
+            reserved.label("reserved"),
+            (stock - reserved).label("available"),
+        )
+        .select_from(materials_table.outerjoin(
+            allocations_table, allocations_table.c.material_id == materials_table.c.id
+        ))
+        .where(and_(True, *conditions))
+    )
+
+
+def reserve(print_job_id: int, material_id: int, quantity: float) -> bool:
+    """
+    Reserve material for one print job, if enough is available to promise.
+
+    Args:
+        print_job_id: Print job id
+        material_id: Material id
+        quantity: Quantity in the material's stock unit (replaces any
+            reservation the job already holds on the material)
+
+    Returns:
+        Whether the reservation was made
+    """
+    try:
+        with get_db_session() as db_session:
+            result = reserve_in_session(
+                db_session, [{"print_job_id": print_job_id, "material_id": material_id, "quantity": quantity}]
+            )
+            return bool(result["reserved"])
+    except Exception as e:
+        print(f"Error reserving material {material_id} for print job {print_job_id}: {e}")
+        return False
+
+
+def release(print_job_ids: Iterable[int]) -> int:
+    """
+    Release the reservations of print jobs.
+
+    Args:
+        print_job_ids: Print job ids
+
+    Returns:
+        Number of reservations released
+    """
+    try:
+        with get_db_session() as db_session:
+            return release_in_session(db_session, print_job_ids)
+    except Exception as e:
+        print(f"Error releasing material reservations: {e}")
+        return 0
+
+
+def get_available_to_promise(material_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, float]]:
+    """
+    Stock available to promise per material.
+
+    Args:
+        material_ids: Materials to read (defaults to all)
+
+    Returns:
+        Dictionary of material id -> dictionary with current_stock,
+        reserved and available
+    """
+    ensure_reservations_synced()
+    conditions = [] if material_ids is None else [materials_table.c.id.in_(list(material_ids))]
+    try:
+        with get_db_session() as db_session:
+            return {
+                row.material_id: {
+                    "current_stock": float(row.current_stock),
+                    "reserved": float(row.reserved),
+                    "available": float(row.available),
+                }
+                for row in db_session.execute(available_to_promise_query(*conditions))
+            }
+    except Exception as e:
+        print(f"Error retrieving available to promise stock: {e}")
+        return {}
+
+
+def get_material_reservations(material_id: int) -> List[Dict[str, Any]]:
+    """
+    Open reservations on a material.
+
+    Returns:
+        List of dictionaries with print_job_id, job_name, status, quantity
+        and created_at, oldest first
+    """
+    ensure_reservations_synced()
+    try:
+        with get_db_session() as db_session:
+            rows = db_session.execute(
+                select(
+                    reservations_table.c.print_job_id, PrintJob.name.label("job_name"), PrintJob.status,
+                    reservations_table.c.quantity, reservations_table.c.created_at,
+                )
+                .join(PrintJob.__table__, PrintJob.id == reservations_table.c.print_job_id)
+                .where(reservations_table.c.material_id == material_id)
+                .order_by(reservations_table.c.created_at, reservations_table.c.print_job_id)
+            ).all()
+            return [dict(row._mapping) for row in rows]
+    except Exception as e:
+        print(f"Error retrieving reservations for material {material_id}: {e}")
+        return []
+
+
+def _sync(db_session) -> Dict[str, int]:
+    from src.services.dispatch_service import RESERVED_JOB_STATUSES
+
+    now = datetime.now()
+    jobs = [
+        dict(row._mapping)
+        for row in db_session.execute(
+            select(PrintJob.id, PrintJob.material_id, PrintJob.material_used, PrintJob.status)
+            .where(PrintJob.status.in_(RESERVED_JOB_STATUSES))
+            .order_by(PrintJob.created_at, PrintJob.id)
+        )
+    ]
+    pending = {job["id"] for job in jobs if job["status"] == "Pending"}
+    wanted = {(r["print_job_id"], r["material_id"]): r for r in job_reservations(db_session, jobs)}
+    held = {
+        (row.print_job_id, row.material_id): row.quantity
+        for row in db_session.execute(select(reservations_table))
+    }
+
+    # Releasing works per job, so a stale job is re-reserved for what it still needs
+    stale = {job_id for job_id, material_id in held if (job_id, material_id) not in wanted}
+    released = release_in_session(db_session, stale, now)
+    missing = [
+        r for key, r in wanted.items()
+        if key not in held or key[0] in stale or abs(held[key] - r["quantity"]) > EPSILON
+    ]
+    # Active jobs are committed; pending ones only reserve what is still available, oldest first
+    reserved = len(reserve_in_session(
+        db_session, [r for r in missing if r["print_job_id"] not in pending], allow_overcommit=True, now=now,
+    )["reserved"])
+    reserved += len(reserve_in_session(
+        db_session, [r for r in missing if r["print_job_id"] in pending], now=now,
+    )["reserved"])
+
+    # Recompute every total from the reservations, clearing float drift
+    totals = dict(db_session.execute(
+        select(reservations_table.c.material_id, func.sum(reservations_table.c.quantity))
+        .group_by(reservations_table.c.material_id)
+    ).all())
+    _ensure_allocations(db_session, sorted(totals), now)
+    if totals:
+        db_session.execute(
+            update(allocations_table)
+            .where(allocations_table.c.material_id == bindparam("b_material_id"))
+            .values(reserved=bindparam("b_reserved"), updated_at=now),
+            [{"b_material_id": material_id, "b_reserved": total} for material_id, total in totals.items()],
+        )
+    db_session.execute(
+        update(allocations_table)
+        .where(allocations_table.c.material_id.notin_(list(totals)), allocations_table.c.reserved != 0)
+        .values(reserved=0.0, updated_at=now)
+    )
+    return {"reserved": reserved, "released": released}
+
+
+def sync_reservations() -> Dict[str, int]:
+    """
+    Reconcile reservations with the pending and active (Scheduled and In
+    Progress) print jobs: active jobs without one are reserved in full,
+    pending jobs without one are reserved if the stock is still available,
+    reservations of other jobs are released, and the reserved totals are
+    recomputed.
+
+    Returns:
+        Dictionary with the number of reservations made and released
+    """
+    global _synced
+    try:
+        with get_db_session() as db_session:
+            result = _sync(db_session)
+        _synced = True
+        return result
+    except Exception as e:
+        print(f"Error synchronizing material reservations: {e}")
+        return {"reserved": 0, "released": 0}
+
+
+def ensure_reservations_synced() -> None:
+    """Run sync_reservations() once per process, before reservations are first read"""
+    if not _synced:
+        sync_reservations()
+
+
+@event.listens_for(session_factory, "after_flush")
+def _reserve_flushed_jobs(session, flush_context):
+    """Keep the reservations of print jobs created, edited or deleted through the ORM in step"""
+    released, changed = [], []
+    for job in session.deleted:
+        if isinstance(job, PrintJob):
+            released.append(job.id)
+    for job in session.new | session.dirty:
+        if not isinstance(job, PrintJob):
+            continue
+        state = inspect(job)
+        if job not in session.new and not any(state.attrs[name].history.has_changes() for name in _JOB_ATTRIBUTES):
+            continue
+        if job not in session.new and (
+            state.attrs.material_id.history.has_changes() or not job.material_id or not job.material_used
+        ):
+            released.append(job.id)  # What it held is no longer what it uses
+        changed.append(job)
+    if not released and not changed:
+        return
+
+    from src.services.dispatch_service import ACTIVE_JOB_STATUSES, RESERVED_JOB_STATUSES
+
+    released.extend(job.id for job in changed if (job.status or "Pending") not in RESERVED_JOB_STATUSES)
+    release_in_session(session, released)
+
+    changed.sort(key=lambda job: (job.created_at or datetime.max, job.id))
+    requests = job_reservations(session, [
+        {"id": job.id, "material_id": job.material_id, "material_used": job.material_used}
+        for job in changed if (job.status or "Pending") in RESERVED_JOB_STATUSES
+    ])
+    active = {job.id for job in changed if job.status in ACTIVE_JOB_STATUSES}
+    reserve_in_session(session, [r for r in requests if r["print_job_id"] in active], allow_overcommit=True)
+    reserve_in_session(session, [r for r in requests if r["print_job_id"] not in active])
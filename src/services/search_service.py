@@ -0,0 +1,135 @@
+"""
+Global search service.
+Ranked search across materials, products, blueprints, certifications, OEMs
+and suppliers. On SQLite it queries the FTS5 search_index (see
+src.db.search_index): every word typed is matched as a prefix, all words
+must match, and results are ordered by BM25 with title matches weighted
+above body matches. On other databases, or when the index could not be
+installed (SQLite built without FTS5), it falls back to ILIKE over the
+indexed columns, ranking title matches first.
+"""
+
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, column, literal, or_, select, table, text, union_all
+from sqlalchemy.exc import OperationalError
+
+from src.db import search_index
+from src.db.connection import get_db_session
+
+DEFAULT_LIMIT = 20
+
+# BM25 weights of the entity, title and body columns
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(query: str) -> Optional[str]:
+    """Turn free text into an FTS5 query: every word as a quoted prefix, all required"""
+    words = _WORD.findall(query or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _fts_search(db_session, query: str, entities: List[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    entity_list = ", ".join(f":entity_{i}" for i in range(len(entities)))
+    rows = db_session.execute(
+        text(
+            f"SELECT entity, rowid / {search_index.ROWID_STRIDE} AS id, title, "
+            f"snippet({search_index.SEARCH_TABLE}, 2, '**', '**', '…', 12) AS snippet, "
+            f"bm25({search_index.SEARCH_TABLE}, 0, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score "
+            f"FROM {search_index.SEARCH_TABLE} "
+            f"WHERE {search_index.SEARCH_TABLE} MATCH :expression AND entity IN ({entity_list}) "
+            f"ORDER BY score LIMIT :limit"
+        ),
+        # LIMIT -1 is no limit in SQLite
+        {"expression": expression, "limit": -1 if limit is None else limit,
+         **{f"entity_{i}": e for i, e in enumerate(entities)}},
+    ).all()
+    return [
+        {"entity": entity, "id": int(row_id), "title": title, "snippet": snippet, "score": -float(score)}
+        for entity, row_id, title, snippet, score in rows
+    ]
+
+
+def _pattern_search(db_session, query: str, entities: List[str], limit: Optional[int]) -> List[Dict[str, Any]]:
+    words = _WORD.findall(query or "")
+    if not words:
+        return []
+    selects = []
+    for entity in entities:
+        spec = search_index.ENTITIES[entity]
+        title = column(spec["title"])
+        body_columns = [column(name) for name in spec["body"]]
+        source = table(spec["table"], column("id"), title, *body_columns)
+        matches_all = [or_(*(c.ilike(f"%{word}%") for c in [title] + body_columns)) for word in words]
+        title_hits = sum(case((title.ilike(f"%{word}%"), 1), else_=0) for word in words)
+        selects.append(
+            select(
+                literal(entity).label("entity"), source.c.id.label("id"),
+                source.c[spec["title"]].label("title"), title_hits.label("score"),
+            ).where(*matches_all)
+        )
+    rows = db_session.execute(union_all(*selects).order_by(text("score DESC")).limit(limit)).all()
+    return [
+        {"entity": entity, "id": int(row_id), "title": title, "snippet": None, "score": float(score or 0)}
+        for entity, row_id, title, score in rows
+    ]
+
+
+def search(query: str, entities: Optional[Iterable[str]] = None,
+           limit: Optional[int] = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+    """
+    Search the catalog.
+
+    Args:
+        query: Free text; each word matches as a prefix ("carb fib" finds
+            "Carbon Fiber")
+        entities: Entity names to search (material, product, blueprint,
+            certification, oem, supplier); defaults to all
+        limit: Maximum number of results (None for all)
+
+    Returns:
+        List of dictionaries with entity, id, title, snippet (matched body
+        text with the hits in **bold**, None without FTS) and score (higher
+        is better), best first
+    """
+    entities = [entity for entity in (entities or search_index.ENTITIES) if entity in search_index.ENTITIES]
+    if not entities or not (query or "").strip():
+        return []
+    try:
+        with get_db_session() as db_session:
+            if search_index.is_installed(db_session.connection()):
+                try:
+                    return _fts_search(db_session, query, entities, limit)
+                except OperationalError as e:
+                    print(f"Full-text search failed, using pattern matching: {e}")
+            return _pattern_search(db_session, query, entities, limit)
+    except Exception as e:
+        print(f"Error searching for '{query}': {e}")
+        return []
+
+
+def search_ids(query: str, entity: str, limit: Optional[int] = None) -> List[int]:
+    """Ids of one entity matching `query`, best match first (all of them unless `limit` is given)"""
+    return [result["id"] for result in search(query, [entity], limit)]
+
+
+def rebuild_search_index() -> int:
+    """Repopulate the search index from the catalog tables; returns the number of rows indexed"""
+    try:
+        with get_db_session() as db_session:
+            connection = db_session.connection()
+            if not search_index.is_installed(connection):
+                return 0
+            return search_index.rebuild(connection)
+    except Exception as e:
+        print(f"Error rebuilding search index: {e}")
+        return 0
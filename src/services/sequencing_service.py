@@ -0,0 +1,365 @@
+"""
+Print job sequencing service.
+Reorders each device's queue of scheduled print jobs to reduce material
+changeovers (setup time and purge material) without making any job miss
+its due date. The sequence starts from earliest-due-date order and is then
+improved by pulling later runs of the loaded material forward whenever the
+jobs they jump over have enough slack. The improvement step works on any
+existing order, so queues can be refined incrementally as jobs arrive.
+"""
+
+import time as timer
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, bindparam, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.print_job import PrintJob
+from src.services.dispatch_service import SCHEDULED_STATUS, job_duration_minutes
+
+# Setup time and purge material for one material changeover
+CHANGEOVER_MINUTES = 30
+PURGE_GRAMS = 25.0
+
+# Due date assumed for jobs without one: created_at plus this turnaround
+DEFAULT_TURNAROUND = timedelta(hours=72)
+
+# How many runs ahead the improver looks for the same material
+DEFAULT_LOOKAHEAD = 64
+
+_NO_SLACK_LIMIT = float("inf")
+
+
+def count_changeovers(sequence: List[Dict[str, Any]], initial_material: Optional[int] = None) -> int:
+    """Count material switches along a sequence (jobs without a material never cause one)"""
+    changes = 0
+    current = initial_material
+    for job in sequence:
+        material_id = job.get("material_id")
+        if material_id is None:
+            continue
+        if current is not None and material_id != current:
+            changes += 1
+        current = material_id
+    return changes
+
+
+def schedule_times(
+    sequence: List[Dict[str, Any]],
+    start_time: datetime,
+    initial_material: Optional[int] = None,
+    changeover_minutes: float = CHANGEOVER_MINUTES,
+    maintenance_date=None,
+) -> List[Dict[str, datetime]]:
+    """
+    Compute start and end times for a sequence on one device.
+
+    A changeover is inserted before every material switch, and a job that
+    would overlap the maintenance day starts the day after instead.
+    """
+    window_start = window_end = None
+    if maintenance_date:
+        window_start = datetime.combine(maintenance_date, time.min)
+        window_end = window_start + timedelta(days=1)
+
+    times = []
+    clock = start_time
+    current = initial_material
+    for job in sequence:
+        material_id = job.get("material_id")
+        if material_id is not None:
+            if current is not None and material_id != current:
+                clock += timedelta(minutes=changeover_minutes)
+            current = material_id
+
+        duration = timedelta(minutes=job_duration_minutes(job))
+        if window_start is not None and clock < window_end and clock + duration > window_start:
+            clock = window_end
+        times.append({"start_time": clock, "end_time": clock + duration})
+        clock += duration
+    return times
+
+
+def _slack_minutes(job: Dict[str, Any], end_time: datetime) -> float:
+    due = job.get("due_date")
+    if due is None:
+        return _NO_SLACK_LIMIT
+    return (due - end_time).total_seconds() / 60
+
+
+def improve_sequence(
+    sequence: List[Dict[str, Any]],
+    start_time: datetime,
+    initial_material: Optional[int] = None,
+    changeover_minutes: float = CHANGEOVER_MINUTES,
+    lookahead: int = DEFAULT_LOOKAHEAD,
+    time_budget: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Reduce changeovers in an existing sequence without creating late jobs.
+
+    The sequence is split into runs of one material. Walking left to right,
+    the next run of the current material (within `lookahead` runs) is
+    pulled forward next to it when every job it jumps over still finishes
+    by its due date after being delayed by the pulled run's duration. Jobs
+    that are already late are never delayed further.
+
+    Args:
+        sequence: Jobs (dictionaries with material_id, estimated_duration
+            and an optional due_date) in their current order
+        start_time: When the device starts the first job
+        initial_material: Material loaded on the device before the first job
+        changeover_minutes: Setup time per material switch
+        lookahead: Maximum number of runs searched for the same material
+        time_budget: Optional limit in seconds; the best order found so far
+            is returned when it runs out
+
+    Returns:
+        The improved sequence (a new list)
+    """
+    deadline = timer.perf_counter() + time_budget if time_budget else None
+    times = schedule_times(sequence, start_time, initial_material, changeover_minutes)
+
+    # Runs: [material_id, jobs, duration in minutes, minimum slack of its jobs]
+    runs: List[List] = [[initial_material, [], 0.0, _NO_SLACK_LIMIT]]
+    for job, job_times in zip(sequence, times):
+        material_id = job.get("material_id")
+        slack = _slack_minutes(job, job_times["end_time"])
+        run = runs[-1]
+        if material_id is None or material_id == run[0]:
+            run[1].append(job)
+            run[2] += job_duration_minutes(job)
+            run[3] = min(run[3], slack)
+        else:
+            runs.append([material_id, [job], job_duration_minutes(job), slack])
+
+    i = 0
+    while i < len(runs):
+        if deadline is not None and timer.perf_counter() > deadline:
+            break
+
+        material_id = runs[i][0]
+        pulled = False
+        if material_id is not None:
+            # Slack left in the runs between this one and the candidate
+            min_between = _NO_SLACK_LIMIT
+            for j in range(i + 1, min(i + 1 + lookahead, len(runs))):
+                if runs[j][0] == material_id:
+                    if min_between >= runs[j][2]:
+                        candidate = runs.pop(j)
+                        for k in range(i + 1, j):
+                            runs[k][3] -= candidate[2]
+                        runs[i][1].extend(candidate[1])
+                        runs[i][2] += candidate[2]
+                        # Pulled jobs only move earlier, so the run's slack can stay as is
+                        if j < len(runs) and runs[j - 1][0] == runs[j][0]:
+                            left, right = runs[j - 1], runs.pop(j)
+                            left[1].extend(right[1])
+                            left[2] += right[2]
+                            left[3] = min(left[3], right[3])
+                        pulled = True
+                    break
+                min_between = min(min_between, runs[j][3])
+        if not pulled:
+            i += 1
+
+    return [job for run in runs for job in run[1]]
+
+
+def sequence_jobs(
+    jobs: List[Dict[str, Any]],
+    start_time: datetime,
+    initial_material: Optional[int] = None,
+    changeover_minutes: float = CHANGEOVER_MINUTES,
+    lookahead: int = DEFAULT_LOOKAHEAD,
+    time_budget: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Build a changeover-minimizing sequence from scratch.
+
+    Jobs are first put in earliest-due-date order (which finishes as many
+    jobs on time as possible) and then improved with improve_sequence().
+    """
+    far_future = datetime.max
+    baseline = sorted(
+        jobs,
+        key=lambda job: (job.get("due_date") or far_future, job.get("created_at") or far_future, job["id"]),
+    )
+    return improve_sequence(
+        baseline, start_time, initial_material, changeover_minutes, lookahead, time_budget
+    )
+
+
+def _late_jobs(sequence, times) -> int:
+    return sum(
+        1 for job, job_times in zip(sequence, times)
+        if job.get("due_date") is not None and job_times["end_time"] > job["due_date"]
+    )
+
+
+def evaluate_resequencing(
+    current: List[Dict[str, Any]],
+    proposed: List[Dict[str, Any]],
+    start_time: datetime,
+    initial_material: Optional[int] = None,
+    changeover_minutes: float = CHANGEOVER_MINUTES,
+    purge_grams: float = PURGE_GRAMS,
+    maintenance_date=None,
+) -> Dict[str, Any]:
+    """Compare two orders of the same queue: changeovers, late jobs and machine hours saved"""
+    current_times = schedule_times(current, start_time, initial_material, changeover_minutes, maintenance_date)
+    proposed_times = schedule_times(proposed, start_time, initial_material, changeover_minutes, maintenance_date)
+
+    changeovers_before = count_changeovers(current, initial_material)
+    changeovers_after = count_changeovers(proposed, initial_material)
+    saved = changeovers_before - changeovers_after
+
+    return {
+        "jobs": len(proposed),
+        "changeovers_before": changeovers_before,
+        "changeovers_after": changeovers_after,
+        "late_jobs_before": _late_jobs(current, current_times),
+        "late_jobs_after": _late_jobs(proposed, proposed_times),
+        "hours_saved": round(saved * changeover_minutes / 60, 2),
+        "purge_grams_saved": round(saved * purge_grams, 1),
+        "times": proposed_times,
+    }
+
+
+def _load_device_queue(db_session, device_id: int, now: datetime, turnaround: timedelta,
+                       due_dates: Optional[Dict[int, datetime]]) -> Dict[str, Any]:
+    """Load a device's scheduled jobs (in current order), loaded material and start time"""
+    rows = db_session.execute(
+        select(
+            PrintJob.id, PrintJob.material_id, PrintJob.estimated_duration,
+            PrintJob.start_time, PrintJob.created_at,
+        )
+        .where(PrintJob.device_id == device_id, PrintJob.status == SCHEDULED_STATUS)
+        .order_by(PrintJob.start_time, PrintJob.id)
+    ).all()
+
+    queue = [
+        {
+            "id": job_id,
+            "material_id": material_id,
+            "estimated_duration": estimated_duration,
+            "created_at": created_at,
+            "due_date": (due_dates or {}).get(job_id) or ((created_at + turnaround) if created_at else None),
+        }
+        for job_id, material_id, estimated_duration, start_time, created_at in rows
+    ]
+
+    # The material loaded now is the one of the running job, else of the last job that ran
+    loaded = db_session.execute(
+        select(PrintJob.material_id, PrintJob.start_time, PrintJob.estimated_duration)
+        .where(PrintJob.device_id == device_id, PrintJob.status.in_(["In Progress", "Completed", "Failed"]))
+        .order_by(PrintJob.status != "In Progress", PrintJob.start_time.desc())
+        .limit(1)
+    ).first()
+
+    start_time = rows[0][3] if rows and rows[0][3] else now
+    return {
+        "queue": queue,
+        "initial_material": loaded[0] if loaded else None,
+        "start_time": max(start_time, now),
+    }
+
+
+def _write_start_times(db_session, times_by_job: Dict[int, datetime]) -> int:
+    table = PrintJob.__table__
+    statement = (
+        update(table)
+        .where(and_(table.c.id == bindparam("b_id"), table.c.status == SCHEDULED_STATUS))
+        .values(start_time=bindparam("b_start_time"), updated_at=bindparam("b_updated_at"))
+    )
+    now = datetime.utcnow()
+    result = db_session.execute(statement, [
+        {"b_id": job_id, "b_start_time": start, "b_updated_at": now}
+        for job_id, start in times_by_job.items()
+    ])
+    outbox.record_events(db_session, "print_jobs", list(times_by_job), "update", ["start_time", "updated_at"])
+    return result.rowcount
+
+
+def resequence_device_queues(
+    device_ids: Optional[List[int]] = None,
+    now: Optional[datetime] = None,
+    due_dates: Optional[Dict[int, datetime]] = None,
+    turnaround: timedelta = DEFAULT_TURNAROUND,
+    changeover_minutes: float = CHANGEOVER_MINUTES,
+    apply: bool = False,
+) -> Dict[str, Any]:
+    """
+    Resequence the scheduled queue of each device.
+
+    A device's new order is only kept when it saves changeovers without
+    adding late jobs; with apply=True the new start times are written back.
+
+    Args:
+        device_ids: Devices to resequence (default: every device with scheduled jobs)
+        now: Current time (defaults to now)
+        due_dates: Optional job id -> due date; other jobs are due
+            `turnaround` after they were created
+        turnaround: Default time allowed between creation and completion
+        changeover_minutes: Setup time per material switch
+        apply: Write the new start times to print_jobs
+
+    Returns:
+        Dictionary with per-device reports and fleet totals
+    """
+    now = now or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            if device_ids is None:
+                device_ids = list(db_session.scalars(
+                    select(PrintJob.device_id)
+                    .where(PrintJob.status == SCHEDULED_STATUS, PrintJob.device_id.isnot(None))
+                    .distinct()
+                ))
+            maintenance = dict(db_session.execute(
+                select(Device.id, Device.next_maintenance_date).where(Device.id.in_(device_ids))
+            ).all())
+
+            devices = {}
+            for device_id in device_ids:
+                loaded = _load_device_queue(db_session, device_id, now, turnaround, due_dates)
+                if not loaded["queue"]:
+                    continue
+                maintenance_date = maintenance.get(device_id)
+                if maintenance_date and maintenance_date < now.date():
+                    maintenance_date = None
+
+                proposed = sequence_jobs(
+                    loaded["queue"], loaded["start_time"], loaded["initial_material"], changeover_minutes
+                )
+                report = evaluate_resequencing(
+                    loaded["queue"], proposed, loaded["start_time"], loaded["initial_material"],
+                    changeover_minutes, maintenance_date=maintenance_date,
+                )
+                keep = (
+                    report["changeovers_after"] < report["changeovers_before"]
+                    and report["late_jobs_after"] <= report["late_jobs_before"]
+                )
+                if keep and apply:
+                    _write_start_times(db_session, {
+                        job["id"]: job_times["start_time"]
+                        for job, job_times in zip(proposed, report.pop("times"))
+                    })
+                report.pop("times", None)
+                report["applied"] = keep and apply
+                report["improved"] = keep
+                devices[device_id] = report
+
+        improved = [r for r in devices.values() if r["improved"]]
+        return {
+            "devices": devices,
+            "changeovers_saved": sum(r["changeovers_before"] - r["changeovers_after"] for r in improved),
+            "hours_saved": round(sum(r["hours_saved"] for r in improved), 2),
+            "purge_grams_saved": round(sum(r["purge_grams_saved"] for r in improved), 1),
+        }
+    except Exception as e:
+        print(f"Error resequencing device queues: {e}")
+        return {"devices": {}, "changeovers_saved": 0, "hours_saved": 0, "purge_grams_saved": 0}
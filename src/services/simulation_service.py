@@ -0,0 +1,398 @@
+"""
+Print farm simulation service.
+A discrete-event simulator (heapq event loop) of the print farm for
+capacity planning: jobs arrive at random, wait in one FIFO queue, print on
+the first free device, fail (and are reprinted) at the historical failure
+rate, and devices go down for maintenance at their historical frequency.
+
+Parameters are estimated from Device, PrintJob and MaintenanceRecord
+history; scenarios ("add 10 printers", "lose a site") are variations of
+those parameters. Replications run in a process pool and are summarized
+as distributions of throughput, lead time, queue length and utilization.
+"""
+
+import heapq
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, func, select
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device, MaintenanceRecord
+from src.db.models.print_job import PrintJob
+from src.services.oee_service import DEFAULT_DOWNTIME_MINUTES, MAINTENANCE_DOWNTIME_MINUTES
+
+DEFAULT_HORIZON_HOURS = 30 * 24
+DEFAULT_WARMUP_HOURS = 48
+DEFAULT_REPLICATIONS = 1000
+
+# Used when there is no history to estimate from
+FALLBACK_DURATIONS = [60.0, 120.0, 240.0]
+
+_ARRIVAL, _FINISH, _MAINTENANCE_START, _MAINTENANCE_END = range(4)
+
+METRICS = [
+    "throughput_per_day", "completed_jobs", "failed_prints", "lead_time_hours_mean",
+    "lead_time_hours_p95", "queue_length_mean", "queue_length_max", "utilization",
+]
+
+
+@dataclass(frozen=True)
+class FarmParameters:
+    """Inputs of one simulated print farm"""
+    devices_by_location: Dict[str, int]
+    arrivals_per_hour: float
+    durations: Tuple[float, ...] = tuple(FALLBACK_DURATIONS)  # Empirical print durations (minutes)
+    failure_rate: float = 0.0
+    maintenance_interval_hours: Optional[float] = None  # Mean time between maintenance per device
+    maintenance_minutes: float = DEFAULT_DOWNTIME_MINUTES
+    source: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def device_count(self) -> int:
+        return sum(self.devices_by_location.values())
+
+    def scenario(self, add_devices: int = 0, add_location: str = "New capacity",
+                 remove_locations: Iterable[str] = (), arrival_factor: float = 1.0) -> "FarmParameters":
+        """
+        A what-if variation of these parameters.
+
+        Args:
+            add_devices: Devices to add; negative removes devices from the
+                remaining locations in proportion to their size
+            add_location: Location the added devices are placed in
+            remove_locations: Locations lost entirely
+            arrival_factor: Multiplier on the job arrival rate
+
+        Returns:
+            New FarmParameters
+        """
+        devices = {
+            location: count for location, count in self.devices_by_location.items()
+            if location not in set(remove_locations)
+        }
+        if add_devices > 0:
+            devices[add_location] = devices.get(add_location, 0) + add_devices
+        elif add_devices < 0:
+            devices = _remove_proportionally(devices, -add_devices)
+        return replace(self, devices_by_location=devices, arrivals_per_hour=self.arrivals_per_hour * arrival_factor)
+
+
+def _remove_proportionally(devices: Dict[str, int], count: int) -> Dict[str, int]:
+    """Take `count` devices off the locations in proportion to their size, dropping emptied ones"""
+    total = sum(devices.values())
+    count = min(count, total)
+    if not count:
+        return dict(devices)
+    shares = {location: devices[location] * count / total for location in devices}
+    removed = {location: int(share) for location, share in shares.items()}
+    # Largest remainder: the devices left over go to the locations with the biggest fractional share
+    by_remainder = sorted(devices, key=lambda location: (removed[location] - shares[location], -devices[location]))
+    for location in by_remainder[:count - sum(removed.values())]:
+        removed[location] += 1
+    return {
+        location: devices[location] - removed[location]
+        for location in devices if devices[location] > removed[location]
+    }
+
+
+def estimate_parameters(days: int = 90, now: Optional[datetime] = None) -> FarmParameters:
+    """
+    Estimate farm parameters from the last `days` days of history.
+
+    Arrivals come from print job creation times, durations from actual
+    (else estimated) durations of jobs that finished in the window, the
+    failure rate from PrintJob.success of the same jobs and maintenance
+    frequency and downtime from MaintenanceRecord rows of
+    Active/Maintenance devices.
+
+    Args:
+        days: Length of the history window
+        now: End of the history window (defaults to now)
+
+    Returns:
+        FarmParameters
+    """
+    now = now or datetime.now()
+    since = now - timedelta(days=days)
+    try:
+        with get_db_session() as db_session:
+            devices_by_location = {
+                location or "Unassigned": count
+                for location, count in db_session.execute(
+                    select(Device.location, func.count(Device.id))
+                    .where(Device.status.in_(["Active", "Maintenance"]))
+                    .group_by(Device.location)
+                )
+            }
+
+            arrivals = db_session.scalar(
+                select(func.count(PrintJob.id)).where(PrintJob.created_at >= since, PrintJob.created_at < now)
+            ) or 0
+
+            finished_in_window = and_(PrintJob.end_time >= since, PrintJob.end_time < now)
+            durations = [
+                float(value) for value in db_session.scalars(
+                    select(func.coalesce(PrintJob.actual_duration, PrintJob.estimated_duration)).where(
+                        PrintJob.status.in_(["Completed", "Failed"]),
+                        func.coalesce(PrintJob.actual_duration, PrintJob.estimated_duration) > 0,
+                        finished_in_window,
+                    )
+                )
+            ]
+
+            outcomes = dict(db_session.execute(
+                select(PrintJob.success, func.count(PrintJob.id))
+                .where(PrintJob.success.isnot(None), finished_in_window)
+                .group_by(PrintJob.success)
+            ).all())
+
+            maintenance = db_session.execute(
+                select(MaintenanceRecord.maintenance_type, func.count(MaintenanceRecord.id)).where(
+                    MaintenanceRecord.status != "Cancelled",
+                    MaintenanceRecord.maintenance_date >= since.date(),
+                    MaintenanceRecord.maintenance_date <= now.date(),
+                ).group_by(MaintenanceRecord.maintenance_type)
+            ).all()
+    except Exception as e:
+        print(f"Error estimating simulation parameters: {e}")
+        return FarmParameters(devices_by_location={}, arrivals_per_hour=0.0)
+
+    device_count = sum(devices_by_location.values())
+    finished = sum(outcomes.values())
+    maintenance_count = sum(count for _, count in maintenance)
+    maintenance_minutes = (
+        sum(MAINTENANCE_DOWNTIME_MINUTES.get(kind, DEFAULT_DOWNTIME_MINUTES) * count for kind, count in maintenance)
+        / maintenance_count if maintenance_count else DEFAULT_DOWNTIME_MINUTES
+    )
+
+    return FarmParameters(
+        devices_by_location=devices_by_location,
+        arrivals_per_hour=arrivals / (days * 24),
+        durations=tuple(durations) or tuple(FALLBACK_DURATIONS),
+        failure_rate=outcomes.get(False, 0) / finished if finished else 0.0,
+        maintenance_interval_hours=(
+            device_count * days * 24 / maintenance_count if maintenance_count and device_count else None
+        ),
+        maintenance_minutes=maintenance_minutes,
+        source={"days": days, "jobs": arrivals, "finished_jobs": finished, "maintenance_records": maintenance_count},
+    )
+
+
+def simulate(params: FarmParameters, horizon_hours: float = DEFAULT_HORIZON_HOURS,
+             warmup_hours: float = DEFAULT_WARMUP_HOURS, seed: int = 0) -> Dict[str, float]:
+    """
+    Run one replication.
+
+    Jobs arrive as a Poisson process and draw a duration from the
+    empirical distribution. A failed print stops at a random point of its
+    duration and the job goes back to the front of the queue. Maintenance
+    on a device starts once its current print ends. Statistics are taken
+    after the warm-up period.
+
+    Args:
+        params: Farm parameters
+        horizon_hours: Simulated time after the warm-up
+        warmup_hours: Simulated time discarded before measuring
+        seed: Random seed of this replication
+
+    Returns:
+        Dictionary with one value per entry of METRICS
+    """
+    rng = random.Random(seed)
+    devices = params.device_count
+    end = (warmup_hours + horizon_hours) * 60
+    warmup = warmup_hours * 60
+    durations = params.durations
+
+    events: List[Tuple[float, int, int, Any]] = []
+    sequence = 0
+
+    def schedule(at: float, kind: int, data: Any = None):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (at, sequence, kind, data))
+
+    if params.arrivals_per_hour > 0:
+        schedule(rng.expovariate(params.arrivals_per_hour / 60), _ARRIVAL)
+    maintenance_rate = 1 / (params.maintenance_interval_hours * 60) if params.maintenance_interval_hours else 0.0
+    if maintenance_rate:
+        for device in range(devices):
+            schedule(rng.expovariate(maintenance_rate), _MAINTENANCE_START, device)
+
+    queue: List[Tuple[float, float]] = []  # (arrival time, duration), FIFO with retries at the front
+    queue_head = 0
+    retries: List[Tuple[float, float]] = []
+    idle = list(range(devices))
+    maintenance_due = set()
+    in_maintenance = set()
+
+    busy_minutes = 0.0
+    queue_area = 0.0
+    queue_max = 0
+    last_time = 0.0
+    completed = 0
+    failed = 0
+    lead_times: List[float] = []
+
+    def waiting() -> int:
+        return len(queue) - queue_head + len(retries)
+
+    def start_jobs(now: float):
+        nonlocal queue_head
+        while idle and (retries or queue_head < len(queue)):
+            if retries:
+                arrived, minutes = retries.pop()
+            else:
+                arrived, minutes = queue[queue_head]
+                queue_head += 1
+            device = idle.pop()
+            fails = rng.random() < params.failure_rate
+            run = minutes * rng.random() if fails else minutes
+            schedule(now + run, _FINISH, (device, arrived, minutes, fails, now))
+
+    while events:
+        now, _, kind, data = heapq.heappop(events)
+        if now > end:
+            break
+
+        # Time-weighted queue length after the warm-up
+        if now > warmup:
+            queue_area += waiting() * (now - max(last_time, warmup))
+        last_time = now
+
+        if kind == _ARRIVAL:
+            queue.append((now, durations[int(rng.random() * len(durations))]))
+            schedule(now + rng.expovariate(params.arrivals_per_hour / 60), _ARRIVAL)
+        elif kind == _FINISH:
+            device, arrived, minutes, fails, started = data
+            busy_minutes += max(now - max(started, warmup), 0.0)
+            if fails:
+                retries.append((arrived, minutes))
+                if now > warmup:
+                    failed += 1
+            elif now > warmup:
+                completed += 1
+                lead_times.append(now - arrived)
+            if device in maintenance_due:
+                maintenance_due.discard(device)
+                in_maintenance.add(device)
+                schedule(now + params.maintenance_minutes, _MAINTENANCE_END, device)
+            else:
+                idle.append(device)
+        elif kind == _MAINTENANCE_START:
+            if data in idle:
+                idle.remove(data)
+                in_maintenance.add(data)
+                schedule(now + params.maintenance_minutes, _MAINTENANCE_END, data)
+            elif data not in in_maintenance:
+                maintenance_due.add(data)
+        elif kind == _MAINTENANCE_END:
+            in_maintenance.discard(data)
+            idle.append(data)
+            schedule(now + rng.expovariate(maintenance_rate), _MAINTENANCE_START, data)
+
+        start_jobs(now)
+        # Compact the consumed part of the queue now and then
+        if queue_head > 4096 and queue_head * 2 > len(queue):
+            del queue[:queue_head]
+            queue_head = 0
+        queue_max = max(queue_max, waiting()) if now > warmup else queue_max
+
+    # Prints still running at the end count their elapsed time
+    for at, _, kind, data in events:
+        if kind == _FINISH:
+            busy_minutes += max(end - max(data[4], warmup), 0.0)
+    queue_area += waiting() * (end - max(last_time, warmup))
+
+    lead = np.array(lead_times) / 60 if lead_times else np.zeros(1)
+    return {
+        "throughput_per_day": completed / horizon_hours * 24,
+        "completed_jobs": completed,
+        "failed_prints": failed,
+        "lead_time_hours_mean": float(lead.mean()),
+        "lead_time_hours_p95": float(np.percentile(lead, 95)),
+        "queue_length_mean": queue_area / (horizon_hours * 60),
+        "queue_length_max": queue_max,
+        "utilization": busy_minutes / (devices * horizon_hours * 60) if devices else 0.0,
+    }
+
+
+def _simulate_chunk(args) -> List[Dict[str, float]]:
+    params, horizon_hours, warmup_hours, seeds = args
+    return [simulate(params, horizon_hours, warmup_hours, seed) for seed in seeds]
+
+
+def summarize(results: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Mean and 5th/50th/95th percentiles of each metric over replications"""
+    summary = {}
+    for metric in METRICS:
+        values = np.array([result[metric] for result in results], dtype=float)
+        if not len(values):
+            continue
+        p5, p50, p95 = np.percentile(values, [5, 50, 95])
+        summary[metric] = {
+            "mean": round(float(values.mean()), 3),
+            "p5": round(float(p5), 3),
+            "p50": round(float(p50), 3),
+            "p95": round(float(p95), 3),
+        }
+    return summary
+
+
+def run_replications(params: FarmParameters, replications: int = DEFAULT_REPLICATIONS,
+                     horizon_hours: float = DEFAULT_HORIZON_HOURS,
+                     warmup_hours: float = DEFAULT_WARMUP_HOURS, seed: int = 0,
+                     workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run independent replications in a process pool.
+
+    Seeds are split into one chunk per worker (a few per worker, to even
+    out stragglers) so each process runs many replications per task.
+
+    Args:
+        params: Farm parameters
+        replications: Number of replications
+        horizon_hours: Simulated time per replication after the warm-up
+        warmup_hours: Warm-up per replication
+        seed: Base seed; replication i uses seed + i
+        workers: Number of processes (defaults to the CPU count; 1 runs in-process)
+
+    Returns:
+        Dictionary with the per-metric summary and the raw results
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = list(range(seed, seed + replications))
+    if workers == 1:
+        results = _simulate_chunk((params, horizon_hours, warmup_hours, seeds))
+    else:
+        chunks = max(workers * 4, 1)
+        tasks = [(params, horizon_hours, warmup_hours, seeds[i::chunks]) for i in range(chunks) if seeds[i::chunks]]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = [result for chunk in pool.map(_simulate_chunk, tasks) for result in chunk]
+
+    return {"summary": summarize(results), "results": results, "replications": len(results)}
+
+
+def compare_scenarios(params: FarmParameters, scenarios: Dict[str, Dict[str, Any]],
+                      **kwargs) -> Dict[str, Dict[str, Any]]:
+    """
+    Simulate a baseline and what-if scenarios with the same seeds.
+
+    Args:
+        params: Baseline farm parameters
+        scenarios: Scenario name -> keyword arguments for FarmParameters.scenario
+        **kwargs: Passed to run_replications
+
+    Returns:
+        Scenario name ("baseline" first) -> metric summary
+    """
+    comparison = {"baseline": run_replications(params, **kwargs)["summary"]}
+    for name, changes in scenarios.items():
+        comparison[name] = run_replications(params.scenario(**changes), **kwargs)["summary"]
+    return comparison
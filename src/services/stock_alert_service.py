@@ -0,0 +1,279 @@
+"""
+Stock alert service.
+Maintains low_stock_materials, the set of active materials at or below
+their reorder level (below_reorder) or minimum stock level (below_minimum),
+and records a StockAlert when a material enters the set or drops past its
+minimum, instead of rescanning the materials table on every read.
+
+Every write that can move a material across a threshold (stock movements,
+material edits, creation and deactivation, forecast reorder levels) calls
+refresh_low_stock() with the materials it touched, in its own transaction.
+Only those rows are read and compared with their set entries, so an alert
+is raised once per downward crossing: a material that stays low raises
+nothing more, and alerts again only after it has recovered.
+
+Low-stock views read the set. sync_low_stock() reconciles the set with a
+full scan, for writes made around the services; reads run it once per
+process.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, or_, select, update
+
+from src.db import outbox
+from src.db.connection import get_db_session
+from src.db.models.material import LowStockMaterial, Material, StockAlert
+
+LEVEL_REORDER = "reorder"
+LEVEL_MINIMUM = "minimum"
+LEVELS = (LEVEL_REORDER, LEVEL_MINIMUM)
+
+# Materials read per query when refreshing
+REFRESH_CHUNK_SIZE = 500
+
+materials_table = Material.__table__
+low_stock_table = LowStockMaterial.__table__
+alerts_table = StockAlert.__table__
+
+_SET_COLUMNS = ["below_reorder", "below_minimum", "current_stock", "reorder_level", "min_stock_level"]
+
+_synced = False
+
+
+def _below(stock: Optional[float], threshold: Optional[float]) -> bool:
+    # Mirrors current_stock <= threshold in SQL: NULL on either side is not low
+    return stock is not None and threshold is not None and stock <= threshold
+
+
+def _refresh_chunk(db_session, material_ids: List[int], now: datetime, alert: bool) -> List[Dict[str, Any]]:
+    materials = db_session.execute(
+        select(materials_table.c.id, materials_table.c.current_stock, materials_table.c.reorder_level,
+               materials_table.c.min_stock_level, materials_table.c.is_active)
+        .where(materials_table.c.id.in_(material_ids))
+    ).all()
+    entries = {
+        row.material_id: row
+        for row in db_session.execute(select(low_stock_table).where(low_stock_table.c.material_id.in_(material_ids)))
+    }
+
+    # Entries of materials that no longer exist are removed too
+    existing = {row.id for row in materials}
+    removed = [material_id for material_id in entries if material_id not in existing]
+    inserted, updated, alerts = [], [], []
+    for material_id, stock, reorder_level, min_stock_level, is_active in materials:
+        entry = entries.get(material_id)
+        below_reorder = bool(is_active) and _below(stock, reorder_level)
+        below_minimum = bool(is_active) and _below(stock, min_stock_level)
+        if not (below_reorder or below_minimum):
+            if entry is not None:
+                removed.append(material_id)
+            continue
+
+        values = {
+            "below_reorder": below_reorder, "below_minimum": below_minimum, "current_stock": stock,
+            "reorder_level": reorder_level, "min_stock_level": min_stock_level,
+        }
+        if entry is None:
+            inserted.append({"material_id": material_id, "since": now, "updated_at": now, **values})
+        elif any(getattr(entry, name) != value for name, value in values.items()):
+            updated.append({"b_material_id": material_id, "updated_at": now, **values})
+
+        # Alert on entering the set, and again on dropping past the minimum
+        if below_minimum and (entry is None or not entry.below_minimum):
+            level, threshold = LEVEL_MINIMUM, min_stock_level
+        elif entry is None:
+            level, threshold = LEVEL_REORDER, reorder_level
+        else:
+            continue
+        alerts.append({
+            "material_id": material_id, "level": level, "current_stock": stock,
+            "threshold": threshold, "created_at": now,
+        })
+
+    if removed:
+        db_session.execute(delete(low_stock_table).where(low_stock_table.c.material_id.in_(removed)))
+        outbox.record_events(db_session, "low_stock_materials", removed, "delete")
+    if inserted:
+        db_session.execute(insert(low_stock_table), inserted)
+        outbox.record_events(db_session, "low_stock_materials", [row["material_id"] for row in inserted], "insert")
+    if updated:
+        db_session.execute(
+            update(low_stock_table).where(low_stock_table.c.material_id == bindparam("b_material_id")),
+            updated,
+        )
+        outbox.record_events(db_session, "low_stock_materials", [row["b_material_id"] for row in updated],
+                             "update", _SET_COLUMNS + ["updated_at"])
+
+    if not alert or not alerts:
+        return []
+    connection = db_session.connection()
+    for row in alerts:
+        row["id"] = connection.execute(insert(alerts_table), row).inserted_primary_key[0]
+    outbox.record_events(db_session, "stock_alerts", [row["id"] for row in alerts], "insert")
+    return alerts
+
+
+def refresh_low_stock(db_session, material_ids: Iterable[int], now: Optional[datetime] = None,
+                      alert: bool = True) -> List[Dict[str, Any]]:
+    """
+    Bring the low-stock set up to date for materials a write just touched
+    (same transaction), raising alerts for downward crossings.
+
+    Args:
+        db_session: Database session whose transaction the writes join
+        material_ids: Materials whose stock, thresholds or active flag may
+            have changed
+        now: Time of the change (defaults to now)
+        alert: Whether to record alerts (False when backfilling)
+
+    Returns:
+        List of the alerts raised, as dictionaries
+    """
+    material_ids = sorted(set(material_ids))
+    now = now or datetime.now()
+    alerts = []
+    for start in range(0, len(material_ids), REFRESH_CHUNK_SIZE):
+        alerts.extend(_refresh_chunk(db_session, material_ids[start:start + REFRESH_CHUNK_SIZE], now, alert))
+    return alerts
+
+
+def _sync(db_session, alert: bool) -> int:
+    low = select(materials_table.c.id).where(
+        materials_table.c.is_active == True,
+        or_(materials_table.c.current_stock <= materials_table.c.reorder_level,
+            materials_table.c.current_stock <= materials_table.c.min_stock_level),
+    )
+    material_ids = set(db_session.scalars(low)) | set(db_session.scalars(select(low_stock_table.c.material_id)))
+    refresh_low_stock(db_session, material_ids, alert=alert)
+    return db_session.scalar(select(func.count()).select_from(low_stock_table))
+
+
+def sync_low_stock() -> int:
+    """
+    Reconcile the low-stock set with a full scan of the materials table.
+
+    Materials that became low through writes made around the services raise
+    alerts; filling an empty set does not.
+
+    Returns:
+        Number of materials in the set afterwards
+    """
+    global _synced
+    try:
+        with get_db_session() as db_session:
+            populated = db_session.scalar(select(func.count()).select_from(low_stock_table)) > 0
+            count = _sync(db_session, alert=populated)
+        _synced = True
+        return count
+    except Exception as e:
+        print(f"Error synchronizing low stock materials: {e}")
+        return 0
+
+
+def ensure_low_stock_synced() -> None:
+    """Run sync_low_stock() once per process, before the set is first read"""
+    if not _synced:
+        sync_low_stock()
+
+
+def get_low_stock(level: str = LEVEL_REORDER) -> List[Dict[str, Any]]:
+    """
+    Materials in the low-stock set.
+
+    Args:
+        level: "reorder" for materials at or below their reorder level,
+            "minimum" for those at or below their minimum stock level
+
+    Returns:
+        List of dictionaries with material_id, name, unit, current_stock,
+        reorder_level, min_stock_level, below_reorder, below_minimum and
+        since, lowest stock relative to the threshold first
+    """
+    if level not in LEVELS:
+        raise ValueError(f"Unknown low stock level '{level}' (expected one of {', '.join(LEVELS)})")
+    ensure_low_stock_synced()
+    flag = low_stock_table.c.below_minimum if level == LEVEL_MINIMUM else low_stock_table.c.below_reorder
+    threshold = low_stock_table.c.min_stock_level if level == LEVEL_MINIMUM else low_stock_table.c.reorder_level
+    try:
+        with get_db_session() as db_session:
+            rows = db_session.execute(
+                select(low_stock_table, materials_table.c.name, materials_table.c.unit)
+                .join(materials_table, materials_table.c.id == low_stock_table.c.material_id)
+                .where(flag == True)
+                .order_by(low_stock_table.c.current_stock / func.nullif(threshold, 0), low_stock_table.c.material_id)
+            ).all()
+            return [dict(row._mapping) for row in rows]
+    except Exception as e:
+        print(f"Error retrieving low stock materials: {e}")
+        return []
+
+
+def count_low_stock(level: str = LEVEL_REORDER) -> int:
+    """Number of materials at or below their reorder level ("reorder") or minimum stock level ("minimum")"""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown low stock level '{level}' (expected one of {', '.join(LEVELS)})")
+    ensure_low_stock_synced()
+    flag = low_stock_table.c.below_minimum if level == LEVEL_MINIMUM else low_stock_table.c.below_reorder
+    try:
+        with get_db_session() as db_session:
+            return db_session.scalar(select(func.count()).select_from(low_stock_table).where(flag == True))
+    except Exception as e:
+        print(f"Error counting low stock materials: {e}")
+        return 0
+
+
+def get_stock_alerts(unacknowledged_only: bool = True, limit: int = 50) -> List[Dict[str, Any]]:
+    """
+    Most recent stock alerts.
+
+    Args:
+        unacknowledged_only: Leave out acknowledged alerts
+        limit: Maximum number of alerts
+
+    Returns:
+        List of dictionaries with the StockAlert columns and the material
+        name, newest first
+    """
+    try:
+        with get_db_session() as db_session:
+            query = (
+                select(alerts_table, materials_table.c.name)
+                .join(materials_table, materials_table.c.id == alerts_table.c.material_id)
+                .order_by(alerts_table.c.created_at.desc(), alerts_table.c.id.desc())
+                .limit(limit)
+            )
+            if unacknowledged_only:
+                query = query.where(alerts_table.c.acknowledged_at.is_(None))
+            return [dict(row._mapping) for row in db_session.execute(query)]
+    except Exception as e:
+        print(f"Error retrieving stock alerts: {e}")
+        return []
+
+
+def acknowledge_alerts(alert_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Mark alerts as acknowledged.
+
+    Args:
+        alert_ids: Alerts to acknowledge (defaults to all unacknowledged)
+
+    Returns:
+        Number of alerts acknowledged
+    """
+    query = select(alerts_table.c.id).where(alerts_table.c.acknowledged_at.is_(None))
+    if alert_ids is not None:
+        query = query.where(alerts_table.c.id.in_(list(alert_ids)))
+    try:
+        with get_db_session() as db_session:
+            ids = list(db_session.scalars(query))
+            if ids:
+                db_session.execute(
+                    update(alerts_table).where(alerts_table.c.id.in_(ids)).values(acknowledged_at=datetime.now())
+                )
+                outbox.record_events(db_session, "stock_alerts", ids, "update", ["acknowledged_at"])
+            return len(ids)
+    except Exception as e:
+        print(f"Error acknowledging stock alerts: {e}")
+        return 0
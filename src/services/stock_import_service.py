@@ -0,0 +1,174 @@
+"""
+Stock movement import service.
+Streams receipts and issues from CSV or Excel files into the stock ledger:
+the file is read in chunks, each chunk is validated column-wise, material
+names are resolved to ids with one query per chunk, and the valid rows are
+applied with apply_stock_movements_in_session (one relative UPDATE per
+material and one executemany INSERT of StockAdjustment rows) in one
+transaction per chunk.
+
+Rows that fail validation, name an unknown material or would take stock
+below zero (when negative stock is not allowed) are skipped and reported
+with their spreadsheet row number; the rest of the file is still imported.
+"""
+
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy import func, or_, select
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material
+from src.services.material_service import apply_stock_movements_in_session
+from src.utils.file_handlers import DEFAULT_CHUNK_SIZE, count_data_rows, iter_table_chunks
+from src.utils.validators import validate_stock_movements
+
+_MOVEMENT_FIELDS = ["material_id", "quantity", "adjustment_type", "adjustment_date", "unit_cost", "notes"]
+
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+def _error_records(errors: pd.DataFrame) -> List[Dict[str, Any]]:
+    return errors[["row", "column", "value", "error"]].to_dict("records")
+
+
+def _resolve_material_ids(db_session, chunk: pd.DataFrame) -> pd.Series:
+    """
+    Material id of every row of a validated chunk, in one query.
+
+    Rows that give a material_id are checked against the table; rows that
+    give a name are matched case-insensitively (the lowest id wins when
+    names repeat). Unknown materials resolve to <NA>.
+    """
+    ids = [int(value) for value in chunk["material_id"].dropna().unique()]
+    names = chunk.loc[chunk["material_id"].isna(), "material"].str.lower().unique().tolist()
+
+    conditions = []
+    if ids:
+        conditions.append(Material.id.in_(ids))
+    if names:
+        conditions.append(func.lower(Material.name).in_(names))
+    if not conditions:
+        return pd.Series(pd.NA, index=chunk.index, dtype="Int64")
+
+    found = db_session.execute(
+        select(Material.id, func.lower(Material.name)).where(or_(*conditions)).order_by(Material.id.desc())
+    ).all()
+    known_ids = {material_id for material_id, _ in found}
+    by_name = {name: material_id for material_id, name in found}  # Descending order: lowest id written last
+
+    by_id = chunk["material_id"].where(chunk["material_id"].isin(known_ids))
+    return by_id.fillna(chunk["material"].str.lower().map(by_name)).astype("Int64")
+
+
+def _apply_chunk(chunk: pd.DataFrame, allow_negative: bool) -> Dict[str, Any]:
+    """Resolve and apply one validated chunk in a single transaction"""
+    errors = []
+    with get_db_session() as db_session:
+        material_ids = _resolve_material_ids(db_session, chunk)
+        unknown = material_ids.isna()
+        if unknown.any():
+            rejected = chunk[unknown]
+            errors.append(pd.DataFrame({
+                "row": rejected.index,
+                "column": "material",
+                "value": rejected["material"].where(rejected["material_id"].isna(), rejected["material_id"].astype(str)),
+                "error": "unknown material",
+            }))
+        chunk = chunk[~unknown].assign(material_id=material_ids[~unknown])
+
+        fields = [name for name in _MOVEMENT_FIELDS if name in chunk]
+        movements = chunk[fields].astype(object).where(chunk[fields].notna(), None).to_dict("records")
+
+        # A rejected material leaves the whole batch unapplied; retry without it
+        result = apply_stock_movements_in_session(db_session, movements, allow_negative)
+        while movements and not result["applied"]:
+            failed = set(result["missing"]) | set(result["insufficient"])
+            if not failed:
+                break
+            mask = chunk["material_id"].isin(failed)
+            errors.append(pd.DataFrame({
+                "row": chunk.index[mask],
+                "column": "quantity",
+                "value": chunk.loc[mask, "quantity"].astype(str),
+                "error": ["unknown material" if material_id in result["missing"] else "insufficient stock"
+                          for material_id in chunk.loc[mask, "material_id"]],
+            }))
+            chunk = chunk[~mask]
+            movements = [movement for movement in movements if movement["material_id"] not in failed]
+            result = apply_stock_movements_in_session(db_session, movements, allow_negative)
+
+    return {"applied": result["applied"], "errors": errors}
+
+
+def import_stock_movements(
+    source,
+    filename: Optional[str] = None,
+    chunksize: int = DEFAULT_CHUNK_SIZE,
+    allow_negative: bool = True,
+    progress_callback: Optional[ProgressCallback] = None,
+) -> Dict[str, Any]:
+    """
+    Import stock movements from a CSV or Excel (.xlsx) file.
+
+    Expected columns (header names are case-insensitive): material (name)
+    or material_id, quantity (positive for receipts, negative for issues)
+    and adjustment_type; optionally date, unit_cost and notes.
+
+    Args:
+        source: File path or binary file-like object (e.g. a Streamlit upload)
+        filename: File name used to detect the format when `source` has none
+        chunksize: Rows read, validated and committed at a time
+        allow_negative: Whether movements may take stock below zero; when
+            False the rows of materials that would go negative are rejected
+        progress_callback: Called after each chunk with (rows processed,
+            total rows or None when unknown)
+
+    Returns:
+        Dictionary with the number of rows read, applied and rejected, and
+        the row-level errors (spreadsheet row, column, value, error)
+    """
+    try:
+        total = count_data_rows(source, filename)
+    except Exception as e:
+        print(f"Error counting rows of {filename or source}: {e}")
+        total = None
+
+    label = os.path.basename(filename or getattr(source, "name", None) or str(source))
+    rows = applied = 0
+    next_row = 2  # Spreadsheet row after the last one read (row 1 is the header)
+    errors: List[Dict[str, Any]] = []
+    try:
+        for raw in iter_table_chunks(source, filename, chunksize):
+            valid, invalid = validate_stock_movements(raw)
+            chunk_errors = [invalid] if len(invalid) else []
+            if len(valid):
+                if "notes" not in valid:
+                    valid["notes"] = None
+                valid["notes"] = valid["notes"].fillna(
+                    f"Imported from {label} row " + valid.index.to_series().astype(str)
+                )
+                try:
+                    result = _apply_chunk(valid, allow_negative)
+                    applied += result["applied"]
+                    chunk_errors.extend(result["errors"])
+                except Exception as e:
+                    print(f"Error importing stock movements (rows {raw.index[0]}-{raw.index[-1]}): {e}")
+                    chunk_errors.append(pd.DataFrame({
+                        "row": valid.index, "column": "", "value": "", "error": f"database error: {e}",
+                    }))
+            for frame in chunk_errors:
+                errors.extend(_error_records(frame))
+
+            rows += len(raw)
+            next_row = raw.index[-1] + 1
+            if progress_callback:
+                progress_callback(rows, total)
+    except Exception as e:
+        print(f"Error reading stock movement file {label}: {e}")
+        errors.append({"row": next_row, "column": "", "value": "", "error": f"unreadable file: {e}"})
+
+    errors.sort(key=lambda error: error["row"])
+    rejected = len({error["row"] for error in errors})
+    return {"rows": rows, "applied": applied, "rejected": rejected, "errors": errors}
@@ -0,0 +1,271 @@
+"""
+Stock ledger service.
+Treats StockAdjustment rows as the ledger of material movements and keeps
+periodic per-material balance snapshots in stock_snapshots, so the stock
+of a material on any date is one snapshot lookup plus a scan of the
+adjustments dated between the snapshot and that date.
+
+A material's first snapshot is anchored on Material.current_stock (stock
+loaded without adjustments becomes its opening balance); later snapshots
+roll the previous one forward by the adjustments in between. Adjustments
+backdated before the latest snapshot show up as drift in reconcile_stock().
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, insert, select
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, StockAdjustment, StockSnapshot
+
+# How often take_snapshots_if_due() writes a new snapshot
+SNAPSHOT_INTERVAL = timedelta(days=1)
+
+# Differences below this are rounding, not drift
+DEFAULT_TOLERANCE = 1e-6
+
+adjustments_table = StockAdjustment.__table__
+snapshots_table = StockSnapshot.__table__
+
+
+def _latest_snapshots(at: Optional[datetime] = None):
+    """Subquery: latest snapshot time per material (optionally not after `at`)"""
+    query = select(
+        snapshots_table.c.material_id,
+        func.max(snapshots_table.c.snapshot_at).label("snapshot_at"),
+    ).group_by(snapshots_table.c.material_id)
+    if at is not None:
+        query = query.where(snapshots_table.c.snapshot_at <= at)
+    return query.subquery("latest")
+
+
+def _ledger_balances(db_session, at: datetime) -> Dict[int, Dict[str, Any]]:
+    """
+    Ledger balance of every material at `at`, in three grouped statements.
+
+    Returns:
+        Material id -> balance, snapshot time used (None when anchored on
+        current_stock) and the number of adjustments scanned
+    """
+    latest = _latest_snapshots(at)
+    snapshot_rows = db_session.execute(
+        select(latest.c.material_id, latest.c.snapshot_at, snapshots_table.c.balance).join(
+            snapshots_table,
+            and_(
+                snapshots_table.c.material_id == latest.c.material_id,
+                snapshots_table.c.snapshot_at == latest.c.snapshot_at,
+            ),
+        )
+    ).all()
+    snapshots = {material_id: (snapshot_at, balance) for material_id, snapshot_at, balance in snapshot_rows}
+
+    # Movements after each material's snapshot up to `at`
+    deltas = {
+        material_id: (float(total or 0), count)
+        for material_id, total, count in db_session.execute(
+            select(adjustments_table.c.material_id, func.sum(adjustments_table.c.quantity), func.count())
+            .join(latest, latest.c.material_id == adjustments_table.c.material_id)
+            .where(adjustments_table.c.adjustment_date > latest.c.snapshot_at, adjustments_table.c.adjustment_date <= at)
+            .group_by(adjustments_table.c.material_id)
+        )
+    }
+
+    # Materials without a snapshot yet: current stock minus movements dated after `at`
+    unsnapshotted = db_session.execute(
+        select(Material.id, Material.current_stock).where(Material.id.notin_(select(latest.c.material_id)))
+    ).all()
+    later = {}
+    if unsnapshotted:
+        later = {
+            material_id: (float(total or 0), count)
+            for material_id, total, count in db_session.execute(
+                select(adjustments_table.c.material_id, func.sum(adjustments_table.c.quantity), func.count())
+                .where(
+                    adjustments_table.c.material_id.in_([row[0] for row in unsnapshotted]),
+                    adjustments_table.c.adjustment_date > at,
+                )
+                .group_by(adjustments_table.c.material_id)
+            )
+        }
+
+    balances = {}
+    for material_id, (snapshot_at, balance) in snapshots.items():
+        delta, count = deltas.get(material_id, (0.0, 0))
+        balances[material_id] = {"balance": balance + delta, "snapshot_at": snapshot_at, "scanned": count}
+    for material_id, current_stock in unsnapshotted:
+        delta, count = later.get(material_id, (0.0, 0))
+        balances[material_id] = {"balance": float(current_stock or 0) - delta, "snapshot_at": None, "scanned": count}
+    return balances
+
+
+def take_snapshots(at: Optional[datetime] = None) -> int:
+    """
+    Write a balance snapshot for every material.
+
+    Args:
+        at: Snapshot time (defaults to now)
+
+    Returns:
+        Number of snapshots written
+    """
+    at = at or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            balances = _ledger_balances(db_session, at)
+            existing = set(db_session.scalars(
+                select(snapshots_table.c.material_id).where(snapshots_table.c.snapshot_at == at)
+            ))
+            rows = [
+                {
+                    "material_id": material_id,
+                    "snapshot_at": at,
+                    "balance": values["balance"],
+                    "adjustment_count": values["scanned"] if values["snapshot_at"] is not None else 0,
+                    "created_at": datetime.utcnow(),
+                }
+                for material_id, values in balances.items()
+                if material_id not in existing
+            ]
+            if rows:
+                db_session.execute(insert(snapshots_table), rows)
+            return len(rows)
+    except Exception as e:
+        print(f"Error taking stock snapshots: {e}")
+        return 0
+
+
+def take_snapshots_if_due(now: Optional[datetime] = None, interval: timedelta = SNAPSHOT_INTERVAL) -> int:
+    """Take snapshots when the latest one is older than `interval`; returns the number written"""
+    now = now or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            latest = db_session.scalar(select(func.max(snapshots_table.c.snapshot_at)))
+    except Exception as e:
+        print(f"Error checking stock snapshots: {e}")
+        return 0
+    if latest is not None and now - latest < interval:
+        return 0
+    return take_snapshots(now)
+
+
+def get_stock_as_of(material_id: int, when: datetime) -> Optional[float]:
+    """
+    Stock of one material at a point in time.
+
+    Reads the latest snapshot at or before `when` (primary key lookup) and
+    adds the adjustments dated after it up to `when` (index range scan).
+
+    Args:
+        material_id: Material id
+        when: Point in time
+
+    Returns:
+        Balance at `when`, or None if the material does not exist
+    """
+    try:
+        with get_db_session() as db_session:
+            snapshot = db_session.execute(
+                select(snapshots_table.c.snapshot_at, snapshots_table.c.balance)
+                .where(snapshots_table.c.material_id == material_id, snapshots_table.c.snapshot_at <= when)
+                .order_by(snapshots_table.c.snapshot_at.desc())
+                .limit(1)
+            ).first()
+
+            if snapshot is not None:
+                delta = db_session.scalar(
+                    select(func.coalesce(func.sum(adjustments_table.c.quantity), 0.0)).where(
+                        adjustments_table.c.material_id == material_id,
+                        adjustments_table.c.adjustment_date > snapshot.snapshot_at,
+                        adjustments_table.c.adjustment_date <= when,
+                    )
+                )
+                return float(snapshot.balance) + float(delta)
+
+            # Before the first snapshot: walk back from the earliest one, else from current stock
+            anchor = db_session.execute(
+                select(snapshots_table.c.snapshot_at, snapshots_table.c.balance)
+                .where(snapshots_table.c.material_id == material_id)
+                .order_by(snapshots_table.c.snapshot_at)
+                .limit(1)
+            ).first()
+            if anchor is None:
+                current_stock = db_session.scalar(select(Material.current_stock).where(Material.id == material_id))
+                if current_stock is None and not db_session.scalar(
+                    select(func.count(Material.id)).where(Material.id == material_id)
+                ):
+                    return None
+                anchor_balance, upper = float(current_stock or 0), None
+            else:
+                anchor_balance, upper = float(anchor.balance), anchor.snapshot_at
+
+            query = select(func.coalesce(func.sum(adjustments_table.c.quantity), 0.0)).where(
+                adjustments_table.c.material_id == material_id,
+                adjustments_table.c.adjustment_date > when,
+            )
+            if upper is not None:
+                query = query.where(adjustments_table.c.adjustment_date <= upper)
+            return anchor_balance - float(db_session.scalar(query))
+    except Exception as e:
+        print(f"Error getting stock of material {material_id} as of {when}: {e}")
+        return None
+
+
+def get_all_stock_as_of(when: datetime) -> Dict[int, float]:
+    """Stock of every material at a point in time"""
+    try:
+        with get_db_session() as db_session:
+            return {material_id: values["balance"] for material_id, values in _ledger_balances(db_session, when).items()}
+    except Exception as e:
+        print(f"Error getting stock as of {when}: {e}")
+        return {}
+
+
+def reconcile_stock(tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    Compare current_stock, stock_quantity and the ledger for the whole catalog.
+
+    The ledger balance is the latest snapshot plus the adjustments since;
+    materials without a snapshot are anchored on current_stock, so only
+    their stock_quantity can drift.
+
+    Args:
+        tolerance: Largest difference treated as equal
+
+    Returns:
+        One dictionary per material whose three figures disagree, with
+        the figures, the drift of each against the ledger and the sum of
+        all its adjustments
+    """
+    try:
+        with get_db_session() as db_session:
+            now = datetime.now()
+            ledger = _ledger_balances(db_session, now)
+            adjustment_totals = dict(db_session.execute(
+                select(adjustments_table.c.material_id, func.sum(adjustments_table.c.quantity))
+                .group_by(adjustments_table.c.material_id)
+            ).all())
+            materials = db_session.execute(
+                select(Material.id, Material.name, Material.current_stock, Material.stock_quantity)
+            ).all()
+    except Exception as e:
+        print(f"Error reconciling stock: {e}")
+        return []
+
+    drifts = []
+    for material_id, name, current_stock, stock_quantity in materials:
+        balance = ledger.get(material_id, {}).get("balance", float(current_stock or 0))
+        current_drift = float(current_stock or 0) - balance
+        quantity_drift = float(stock_quantity or 0) - balance
+        if abs(current_drift) > tolerance or abs(quantity_drift) > tolerance:
+            drifts.append({
+                "material_id": material_id,
+                "name": name,
+                "current_stock": current_stock,
+                "stock_quantity": stock_quantity,
+                "ledger_balance": round(balance, 6),
+                "current_stock_drift": round(current_drift, 6),
+                "stock_quantity_drift": round(quantity_drift, 6),
+                "adjustment_total": float(adjustment_totals.get(material_id) or 0),
+            })
+    return drifts
@@ -190,8 +190,8 @@ def create_subscription(db_session, user_id, plan_name, price, start_date=None,
         print(f"Error creating subscription: {e}")
         raise
 
-def cancel_subscription(db_session, subscription_id, user_id):
-    """Cancel a subscription (admin or subscription owner)."""
+def cancel_subscription(db_session, subscription_id, identity):
+    """Cancel a subscription (admin or subscription owner, checked against the caller's SessionIdentity)."""
     try:
         # Find subscription
         subscription = db_session.query(Subscription).filter(
@@ -202,10 +202,7 @@ def cancel_subscription(db_session, subscription_id, user_id):
             raise ValueError(f"Subscription ID {subscription_id} not found")
             
         # Check if user is authorized (subscription owner or admin)
-        user = db_session.query(User).filter(User.id == user_id).first()
-        is_admin = user and user.role == 'admin'
-        
-        if subscription.user_id != user_id and not is_admin:
+        if subscription.user_id != identity.user_id and not identity.is_admin:
             raise PermissionError("User does not have permission to cancel this subscription")
             
         # Update subscription
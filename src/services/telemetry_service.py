@@ -0,0 +1,404 @@
+"""
+Print telemetry service - time-series store for running print jobs.
+Samples (progress, nozzle/bed temperature, layer) keyed by (device_id,
+job_id, ts) are appended in batches to telemetry_samples and downsampled
+into 1 minute and 1 hour rollup tiers. Range queries read the coarsest
+tier that still gives enough points, so dashboards never scan raw samples
+for long ranges. Raw samples and 1 minute rollups past their retention
+period are pruned by the writer's background thread once rolled up.
+Telemetry is written with Core inserts and does not go through the ORM
+unit of work or the outbox.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import pandas as pd
+from sqlalchemy import and_, func, insert, literal, select
+
+from src.db.connection import get_db_session
+from src.db.models.telemetry import TelemetryRollup, TelemetrySample
+
+# Tier name -> bucket width in seconds ("raw" samples are 1 second apart)
+TIERS = {"raw": 1, "1m": 60, "1h": 3600}
+
+DEFAULT_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "5000"))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "2"))
+DEFAULT_ROLLUP_INTERVAL = float(os.getenv("TELEMETRY_ROLLUP_INTERVAL", "60"))
+DEFAULT_PRUNE_INTERVAL = float(os.getenv("TELEMETRY_PRUNE_INTERVAL", "3600"))
+
+# Seconds a minute stays open for late samples before it is rolled up
+ROLLUP_LATENESS = 120
+
+# How long each tier is kept
+RETENTION = {"raw": timedelta(days=7), "1m": timedelta(days=90)}
+
+# Upper bound on points returned by a range query before moving to a coarser tier
+DEFAULT_MAX_POINTS = 2000
+
+samples_table = TelemetrySample.__table__
+rollups_table = TelemetryRollup.__table__
+
+
+def to_epoch(value: Union[datetime, int, float]) -> int:
+    """Convert a (naive UTC or aware) datetime or a number to epoch seconds"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def from_epoch(seconds: int) -> datetime:
+    """Convert epoch seconds to a naive UTC datetime"""
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).replace(tzinfo=None)
+
+
+def _insert_ignoring_duplicates(db_session, table, rows: List[Dict[str, Any]]):
+    """Append rows, skipping keys that already exist (a resent sample is not an error)"""
+    dialect = db_session.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        db_session.execute(insert(table), rows)
+        return
+    db_session.execute(dialect_insert(table).on_conflict_do_nothing(), rows)
+
+
+def write_samples(samples: Iterable[Dict[str, Any]]) -> int:
+    """
+    Append a batch of samples in one executemany INSERT.
+
+    Args:
+        samples: Dictionaries with device_id, job_id, ts (datetime or epoch
+            seconds) and any of progress, nozzle_temp, bed_temp, layer
+
+    Returns:
+        Number of samples submitted
+    """
+    # One row per key and second; the last value sent wins within a batch
+    rows = {}
+    for sample in samples:
+        row = {
+            "device_id": sample["device_id"],
+            "job_id": sample["job_id"],
+            "ts": to_epoch(sample["ts"]),
+            "progress": sample.get("progress"),
+            "nozzle_temp": sample.get("nozzle_temp"),
+            "bed_temp": sample.get("bed_temp"),
+            "layer": sample.get("layer"),
+        }
+        rows[(row["device_id"], row["job_id"], row["ts"])] = row
+
+    if not rows:
+        return 0
+    with get_db_session() as db_session:
+        _insert_ignoring_duplicates(db_session, samples_table, list(rows.values()))
+    return len(rows)
+
+
+class TelemetryWriter:
+    """
+    Buffers samples in memory and writes them in batches.
+
+    Samples are flushed when the buffer reaches batch_size or every
+    flush_interval seconds by the background thread, which also runs the
+    rollups every rollup_interval seconds and prunes expired telemetry
+    every prune_interval seconds.
+    """
+
+    def __init__(self, batch_size: int = DEFAULT_BATCH_SIZE,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 rollup_interval: float = DEFAULT_ROLLUP_INTERVAL,
+                 prune_interval: float = DEFAULT_PRUNE_INTERVAL):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rollup_interval = rollup_interval
+        self.prune_interval = prune_interval
+        self._buffer: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._full = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.written = 0
+
+    def append(self, device_id: int, job_id: int, ts, progress: Optional[float] = None,
+               nozzle_temp: Optional[float] = None, bed_temp: Optional[float] = None,
+               layer: Optional[int] = None):
+        """Buffer one sample"""
+        self.extend([{
+            "device_id": device_id, "job_id": job_id, "ts": ts, "progress": progress,
+            "nozzle_temp": nozzle_temp, "bed_temp": bed_temp, "layer": layer,
+        }])
+
+    def extend(self, samples: Iterable[Dict[str, Any]]):
+        """Buffer several samples"""
+        with self._lock:
+            self._buffer.extend(samples)
+            full = len(self._buffer) >= self.batch_size
+        if full:
+            if self.is_running():
+                self._full.set()
+            else:
+                self.flush()
+
+    def flush(self) -> int:
+        """Write everything buffered so far, returning the number of samples written"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            written = 0
+            for offset in range(0, len(pending), self.batch_size):
+                try:
+                    written += write_samples(pending[offset:offset + self.batch_size])
+                except Exception as e:
+                    print(f"[Telemetry] Error writing {len(pending) - offset} samples: {e}")
+                    # Keep the unwritten samples for the next attempt
+                    with self._lock:
+                        self._buffer[:0] = pending[offset:]
+                    break
+            self.written += written
+            return written
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        next_rollup = datetime.utcnow() + timedelta(seconds=self.rollup_interval)
+        next_prune = datetime.utcnow() + timedelta(seconds=self.prune_interval)
+        while not self._stop.is_set():
+            if self._full.wait(self.flush_interval):
+                self._full.clear()
+            self.flush()
+            if datetime.utcnow() >= next_rollup:
+                rollup_telemetry()
+                next_rollup = datetime.utcnow() + timedelta(seconds=self.rollup_interval)
+            if datetime.utcnow() >= next_prune:
+                prune_telemetry()
+                next_prune = datetime.utcnow() + timedelta(seconds=self.prune_interval)
+        self.flush()
+
+    def start(self) -> bool:
+        """Start the background flusher if it is not already running"""
+        if self.is_running():
+            return False
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the background flusher after a final flush"""
+        self._stop.set()
+        self._full.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+
+
+_writer: Optional[TelemetryWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> TelemetryWriter:
+    """Get the process-wide telemetry writer, starting its flusher on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = TelemetryWriter()
+        _writer.start()
+        return _writer
+
+
+def record_sample(device_id: int, job_id: int, ts, **values):
+    """Buffer one sample on the process-wide writer"""
+    get_writer().append(device_id, job_id, ts, **values)
+
+
+def _rollup_watermark(db_session, tier: str) -> Optional[int]:
+    """Start of the first bucket of a tier that has not been rolled up yet"""
+    width = TIERS[tier]
+    last = db_session.scalar(select(func.max(rollups_table.c.bucket)).where(rollups_table.c.tier == tier))
+    if last is not None:
+        return last + width
+
+    if tier == "1m":
+        first = db_session.scalar(select(func.min(samples_table.c.ts)))
+    else:
+        first = db_session.scalar(select(func.min(rollups_table.c.bucket)).where(rollups_table.c.tier == "1m"))
+    return None if first is None else first - first % width
+
+
+def _rollup_minutes(db_session, lo: int, hi: int):
+    s = samples_table.c
+    bucket = (s.ts - s.ts % 60).label("bucket")
+    source = (
+        select(
+            literal("1m"), s.device_id, s.job_id, bucket, func.count(),
+            func.max(s.progress),
+            func.avg(s.nozzle_temp), func.min(s.nozzle_temp), func.max(s.nozzle_temp),
+            func.avg(s.bed_temp), func.min(s.bed_temp), func.max(s.bed_temp),
+            func.max(s.layer),
+        )
+        .where(and_(s.ts >= lo, s.ts < hi))
+        .group_by(s.device_id, s.job_id, bucket)
+    )
+    db_session.execute(insert(rollups_table).from_select(_ROLLUP_COLUMNS, source))
+
+
+def _rollup_hours(db_session, lo: int, hi: int):
+    r = rollups_table.c
+    bucket = (r.bucket - r.bucket % 3600).label("bucket")
+    samples = func.sum(r.samples)
+    source = (
+        select(
+            literal("1h"), r.device_id, r.job_id, bucket, samples,
+            func.max(r.progress),
+            func.sum(r.nozzle_temp_avg * r.samples) / samples, func.min(r.nozzle_temp_min), func.max(r.nozzle_temp_max),
+            func.sum(r.bed_temp_avg * r.samples) / samples, func.min(r.bed_temp_min), func.max(r.bed_temp_max),
+            func.max(r.layer),
+        )
+        .where(and_(r.tier == "1m", r.bucket >= lo, r.bucket < hi))
+        .group_by(r.device_id, r.job_id, bucket)
+    )
+    db_session.execute(insert(rollups_table).from_select(_ROLLUP_COLUMNS, source))
+
+
+_ROLLUP_COLUMNS = [
+    "tier", "device_id", "job_id", "bucket", "samples", "progress",
+    "nozzle_temp_avg", "nozzle_temp_min", "nozzle_temp_max",
+    "bed_temp_avg", "bed_temp_min", "bed_temp_max", "layer",
+]
+
+
+def rollup_telemetry(now: Optional[datetime] = None) -> Dict[str, Optional[datetime]]:
+    """
+    Roll closed minutes of raw samples into the 1m tier and closed hours of
+    the 1m tier into the 1h tier, each with one INSERT ... SELECT.
+
+    A minute is closed ROLLUP_LATENESS seconds after it ends; an hour once
+    all of its minutes are rolled up. Samples arriving for a closed minute
+    stay in the raw tier only.
+
+    Returns:
+        Dictionary with each tier's watermark (the first bucket not yet rolled up)
+    """
+    now_ts = to_epoch(now or datetime.utcnow())
+    try:
+        with get_db_session() as db_session:
+            minute_hi = (now_ts - ROLLUP_LATENESS) // 60 * 60
+            minute_lo = _rollup_watermark(db_session, "1m")
+            if minute_lo is not None and minute_lo < minute_hi:
+                _rollup_minutes(db_session, minute_lo, minute_hi)
+
+            minute_mark = _rollup_watermark(db_session, "1m")
+            hour_hi = minute_mark // 3600 * 3600 if minute_mark is not None else None
+            hour_lo = _rollup_watermark(db_session, "1h")
+            if hour_lo is not None and hour_hi is not None and hour_lo < hour_hi:
+                _rollup_hours(db_session, hour_lo, hour_hi)
+
+            hour_mark = _rollup_watermark(db_session, "1h")
+        return {
+            "1m": from_epoch(minute_mark) if minute_mark is not None else None,
+            "1h": from_epoch(hour_mark) if hour_mark is not None else None,
+        }
+    except Exception as e:
+        print(f"[Telemetry] Error rolling up telemetry: {e}")
+        return {"1m": None, "1h": None}
+
+
+def prune_telemetry(now: Optional[datetime] = None) -> Dict[str, int]:
+    """Delete raw samples and 1m rollups older than their retention period, once rolled up"""
+    now = now or datetime.utcnow()
+    removed = {}
+    try:
+        with get_db_session() as db_session:
+            # Data the next tier has not absorbed yet is kept, even past its retention
+            raw_before = to_epoch(now - RETENTION["raw"])
+            raw_before = min(raw_before, _rollup_watermark(db_session, "1m") or raw_before)
+            removed["raw"] = db_session.execute(
+                samples_table.delete().where(samples_table.c.ts < raw_before)
+            ).rowcount
+            minute_before = to_epoch(now - RETENTION["1m"])
+            minute_before = min(minute_before, _rollup_watermark(db_session, "1h") or minute_before)
+            removed["1m"] = db_session.execute(
+                rollups_table.delete().where(and_(rollups_table.c.tier == "1m", rollups_table.c.bucket < minute_before))
+            ).rowcount
+        return removed
+    except Exception as e:
+        print(f"[Telemetry] Error pruning telemetry: {e}")
+        return {}
+
+
+def choose_tier(start: datetime, end: datetime, max_points: int = DEFAULT_MAX_POINTS) -> str:
+    """Pick the finest tier that returns at most max_points buckets per series"""
+    span = max(to_epoch(end) - to_epoch(start), 1)
+    for tier, width in TIERS.items():
+        if span / width <= max_points:
+            return tier
+    return "1h"
+
+
+def query_telemetry(
+    start: datetime,
+    end: datetime,
+    device_id: Optional[int] = None,
+    job_id: Optional[int] = None,
+    tier: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> pd.DataFrame:
+    """
+    Get telemetry for a time range from the appropriate tier.
+
+    Args:
+        start: Range start (naive UTC)
+        end: Range end (naive UTC, exclusive)
+        device_id: Optional device filter
+        job_id: Optional job filter
+        tier: Force "raw", "1m" or "1h" instead of choosing by range length
+        max_points: Points per series above which a coarser tier is used
+
+    Returns:
+        DataFrame with ts, device_id, job_id, progress, nozzle_temp,
+        bed_temp, layer and samples; rollup tiers add min/max columns
+    """
+    tier = tier or choose_tier(start, end, max_points)
+    lo, hi = to_epoch(start), to_epoch(end)
+
+    if tier == "raw":
+        c = samples_table.c
+        query = select(
+            c.ts, c.device_id, c.job_id, c.progress, c.nozzle_temp, c.bed_temp, c.layer,
+        ).where(and_(c.ts >= lo, c.ts < hi))
+    else:
+        c = rollups_table.c
+        query = select(
+            c.bucket.label("ts"), c.device_id, c.job_id, c.progress,
+            c.nozzle_temp_avg.label("nozzle_temp"), c.nozzle_temp_min, c.nozzle_temp_max,
+            c.bed_temp_avg.label("bed_temp"), c.bed_temp_min, c.bed_temp_max,
+            c.layer, c.samples,
+        ).where(and_(c.tier == tier, c.bucket >= lo, c.bucket < hi))
+
+    if device_id is not None:
+        query = query.where(c.device_id == device_id)
+    if job_id is not None:
+        query = query.where(c.job_id == job_id)
+    query = query.order_by(c.device_id, c.job_id, query.selected_columns.ts)
+
+    try:
+        with get_db_session() as db_session:
+            result = db_session.execute(query)
+            df = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    except Exception as e:
+        print(f"[Telemetry] Error querying telemetry: {e}")
+        return pd.DataFrame()
+
+    if not df.empty:
+        df["ts"] = pd.to_datetime(df["ts"], unit="s")
+    df.attrs["tier"] = tier
+    return df
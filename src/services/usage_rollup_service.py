@@ -0,0 +1,202 @@
+"""
+Material usage rollup service.
+Maintains material_usage_daily: stock adjustments summed per (material,
+day, adjustment type), so usage and cost over any date range read at most
+one row per material, type and day instead of the whole adjustment history.
+
+The rollup is updated in the transaction that writes the adjustments
+(material_service._insert_adjustments calls record_adjustments), with one
+INSERT ... SELECT ... ON CONFLICT DO UPDATE over the new rows. Adjustments
+written around the service can be folded in with rebuild_usage_rollup().
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import Date, and_, case, delete, exists, func, insert, select, update
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, MaterialUsageDaily, StockAdjustment
+
+# Adjustment types that remove stock without being consumed
+NON_USAGE_TYPES = ("Write-off",)
+
+adjustments_table = StockAdjustment.__table__
+rollup_table = MaterialUsageDaily.__table__
+
+_KEY_COLUMNS = ["material_id", "day", "adjustment_type"]
+_SUM_COLUMNS = ["quantity_in", "quantity_out", "cost_in", "cost_out", "movements"]
+
+
+def _aggregate(*conditions):
+    """SELECT of adjustments matching `conditions`, summed into rollup rows"""
+    quantity = adjustments_table.c.quantity
+    cost = quantity * func.coalesce(adjustments_table.c.unit_cost, 0)
+    day = func.date(adjustments_table.c.adjustment_date, type_=Date)
+    return (
+        select(
+            adjustments_table.c.material_id,
+            day,
+            adjustments_table.c.adjustment_type,
+            func.sum(case((quantity > 0, quantity), else_=0)),
+            func.sum(case((quantity < 0, -quantity), else_=0)),
+            func.sum(case((quantity > 0, cost), else_=0)),
+            func.sum(case((quantity < 0, -cost), else_=0)),
+            func.count(),
+        )
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        .where(and_(True, *conditions))
+        .group_by(adjustments_table.c.material_id, day, adjustments_table.c.adjustment_type)
+    )
+
+
+def _add_to_rollup(db_session, source) -> None:
+    """Add the rows selected by `source` to the rollup, summing into existing days"""
+    dialect = db_session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        statement = dialect_insert(rollup_table).from_select(_KEY_COLUMNS + _SUM_COLUMNS, source)
+        db_session.execute(statement.on_conflict_do_update(
+            index_elements=_KEY_COLUMNS,
+            set_={name: rollup_table.c[name] + statement.excluded[name] for name in _SUM_COLUMNS},
+        ))
+        return
+
+    # Other dialects: read the sums, then update existing days and insert new ones
+    rows = [dict(zip(_KEY_COLUMNS + _SUM_COLUMNS, row)) for row in db_session.execute(source)]
+    for row in rows:
+        key = and_(*(rollup_table.c[name] == row[name] for name in _KEY_COLUMNS))
+        result = db_session.execute(
+            update(rollup_table).where(key).values({name: rollup_table.c[name] + row[name] for name in _SUM_COLUMNS})
+        )
+        if not result.rowcount:
+            db_session.execute(insert(rollup_table).values(row))
+
+
+def record_adjustments(db_session, adjustment_ids: List[int]) -> None:
+    """Fold newly inserted StockAdjustment rows into the rollup (same transaction)"""
+    if not adjustment_ids:
+        return
+    if not db_session.scalar(select(exists().select_from(rollup_table))):
+        # First write since the rollup was added: backfill, which covers these rows too
+        _rebuild(db_session)
+        return
+    _add_to_rollup(db_session, _aggregate(adjustments_table.c.id.in_(adjustment_ids)))
+
+
+def rebuild_usage_rollup(material_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Recompute the rollup from the adjustment history.
+
+    Args:
+        material_ids: Materials to rebuild (defaults to all)
+
+    Returns:
+        Number of rows in the rollup afterwards
+    """
+    try:
+        with get_db_session() as db_session:
+            return _rebuild(db_session, material_ids)
+    except Exception as e:
+        print(f"Error rebuilding material usage rollup: {e}")
+        return 0
+
+
+def _rebuild(db_session, material_ids: Optional[Iterable[int]] = None) -> int:
+    clear = delete(rollup_table)
+    conditions = []
+    if material_ids is not None:
+        material_ids = list(material_ids)
+        clear = clear.where(rollup_table.c.material_id.in_(material_ids))
+        conditions.append(adjustments_table.c.material_id.in_(material_ids))
+    db_session.execute(clear)
+    db_session.execute(insert(rollup_table).from_select(_KEY_COLUMNS + _SUM_COLUMNS, _aggregate(*conditions)))
+    return db_session.scalar(select(func.count()).select_from(rollup_table))
+
+
+def ensure_usage_rollup(db_session) -> None:
+    """Backfill the rollup the first time it is read on a database with history"""
+    if not db_session.scalar(select(exists().select_from(rollup_table))) and \
+            db_session.scalar(select(exists().select_from(adjustments_table))):
+        _rebuild(db_session)
+
+
+def _day(value: Union[date, datetime]) -> date:
+    return value.date() if isinstance(value, datetime) else value
+
+
+def usage_query(start: Union[date, datetime], end: Union[date, datetime], *group_by,
+                include_write_offs: bool = False, join_materials: bool = False):
+    """
+    SELECT of usage (stock out) and its cost over a day range, grouped by
+    the given columns of material_usage_daily and/or materials.
+
+    Args:
+        start: First day (inclusive)
+        end: Last day (inclusive)
+        *group_by: Columns to group by (e.g. rollup_table.c.material_id,
+            Material.material_type)
+        include_write_offs: Whether write-offs count as usage
+        join_materials: Join materials, to group by its columns
+
+    Returns:
+        Select of the group_by columns followed by usage_amount and usage_cost
+    """
+    query = (
+        select(
+            *group_by,
+            func.sum(rollup_table.c.quantity_out).label("usage_amount"),
+            func.sum(rollup_table.c.cost_out).label("usage_cost"),
+        )
+        .select_from(
+            rollup_table.join(Material.__table__, Material.__table__.c.id == rollup_table.c.material_id)
+            if join_materials else rollup_table
+        )
+        .where(rollup_table.c.day.between(_day(start), _day(end)), rollup_table.c.quantity_out > 0)
+        .group_by(*group_by)
+    )
+    if not include_write_offs:
+        query = query.where(rollup_table.c.adjustment_type.notin_(NON_USAGE_TYPES))
+    return query
+
+
+def get_usage_by_period(start: Union[date, datetime], end: Union[date, datetime],
+                        period: str = "month", by: str = "material_type") -> List[Dict[str, Any]]:
+    """
+    Usage and cost per period for charts.
+
+    Args:
+        start: First day (inclusive)
+        end: Last day (inclusive)
+        period: "day" or "month"
+        by: "material_type" or "material"
+
+    Returns:
+        List of dictionaries with period (date or "YYYY-MM"), group,
+        usage_amount and usage_cost, ordered by period
+    """
+    if period not in ("day", "month"):
+        raise ValueError(f"Unknown period '{period}' (expected 'day' or 'month')")
+    try:
+        with get_db_session() as db_session:
+            ensure_usage_rollup(db_session)
+            group = Material.name if by == "material" else func.coalesce(Material.material_type, Material.type)
+            rows = db_session.execute(
+                usage_query(start, end, rollup_table.c.day, group.label("group"), join_materials=True)
+            ).all()
+    except Exception as e:
+        print(f"Error retrieving material usage by {period}: {e}")
+        return []
+
+    totals: Dict[Any, Dict[str, Any]] = {}
+    for day, group, amount, cost in rows:
+        key_period = day.strftime("%Y-%m") if period == "month" else day
+        entry = totals.setdefault((key_period, group), {
+            "period": key_period, "group": group, "usage_amount": 0.0, "usage_cost": 0.0,
+        })
+        entry["usage_amount"] += float(amount or 0)
+        entry["usage_cost"] += float(cost or 0)
+    return sorted(totals.values(), key=lambda entry: (str(entry["period"]), str(entry["group"])))
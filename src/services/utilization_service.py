@@ -0,0 +1,275 @@
+"""
+Device utilization service.
+Computes busy time per device per day (or hour) from PrintJob start/end
+times with a vectorized NumPy interval sweep. Overlapping jobs on one
+device are merged first so busy time is never counted twice, and jobs
+still In Progress are treated as busy until now. Jobs that never ran
+(Pending, Scheduled, Cancelled, Merged) are left out, even when the
+dispatcher has written a planned start time onto them. Closed days are computed
+once and cached; refreshes only recompute the current day.
+"""
+
+import threading
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, or_, select
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.print_job import PrintJob
+
+DAY = 86400
+HOUR = 3600
+RUNNING_STATUS = "In Progress"
+BUSY_STATUSES = [RUNNING_STATUS, "Completed", "Failed"]
+
+_engines: Dict[Tuple[int, int], "UtilizationEngine"] = {}
+_engines_lock = threading.Lock()
+
+
+def merge_intervals(device_index: np.ndarray, starts: np.ndarray, ends: np.ndarray):
+    """
+    Turn possibly overlapping intervals into disjoint ones, per device.
+
+    Intervals are sorted by (device, start); each one is trimmed to begin
+    after the furthest end seen so far on the same device. The running
+    maximum is taken over ends offset by device, so one accumulate call
+    covers every device without resetting between groups.
+
+    Args:
+        device_index: Dense device index (0..n-1) for each interval
+        starts: Interval starts in seconds (int64)
+        ends: Interval ends in seconds (int64)
+
+    Returns:
+        (device_index, starts, ends) of disjoint, non-empty intervals
+    """
+    if len(starts) == 0:
+        return device_index, starts, ends
+
+    # One int64 key per interval sorts by (device, start) faster than lexsort
+    base = starts.min()
+    span = int(max(ends.max(), starts.max()) - base) + 1
+    order = np.argsort(device_index.astype(np.int64) * span + (starts - base))
+    device_index, starts, ends = device_index[order], starts[order], ends[order]
+
+    offset = device_index.astype(np.int64) * span
+    running_end = np.maximum.accumulate(ends - base + offset) - offset + base
+
+    # Furthest end of the earlier intervals on the same device
+    previous_end = np.empty_like(running_end)
+    previous_end[0] = np.iinfo(np.int64).min
+    previous_end[1:] = running_end[:-1]
+    first_of_device = np.ones(len(starts), dtype=bool)
+    first_of_device[1:] = device_index[1:] != device_index[:-1]
+    previous_end[first_of_device] = np.iinfo(np.int64).min
+
+    trimmed_starts = np.maximum(starts, previous_end)
+    keep = ends > trimmed_starts
+    return device_index[keep], trimmed_starts[keep], ends[keep]
+
+
+def busy_seconds(device_index: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+                 n_devices: int, period_start: int, n_bins: int, bin_seconds: int) -> np.ndarray:
+    """
+    Busy seconds per device per bin for a set of intervals.
+
+    Each disjoint interval contributes a +1 slope at its start and a -1
+    slope at its end. For an event at x in bin k, the bin gets the partial
+    amount up to its right edge and every later bin a whole bin width;
+    both parts are accumulated with bincount and a cumulative sum, so the
+    cost is O(intervals + devices * bins).
+
+    Args:
+        device_index: Dense device index for each interval
+        starts: Interval starts in epoch seconds
+        ends: Interval ends in epoch seconds
+        n_devices: Number of devices (rows of the result)
+        period_start: Epoch seconds of the first bin's left edge
+        n_bins: Number of bins
+        bin_seconds: Bin width in seconds
+
+    Returns:
+        Array of shape (n_devices, n_bins) with busy seconds
+    """
+    device_index, starts, ends = merge_intervals(device_index, starts, ends)
+
+    positions = np.concatenate([starts, ends]) - period_start
+    weights = np.concatenate([np.ones(len(starts)), -np.ones(len(ends))])
+    devices = np.concatenate([device_index, device_index])
+
+    in_range = positions < n_bins * bin_seconds
+    positions, weights, devices = positions[in_range], weights[in_range], devices[in_range]
+
+    # Events before the period start a slope in the first bin
+    bins = np.floor_divide(positions, bin_seconds)
+    before = bins < 0
+    bins = np.where(before, -1, bins)
+
+    width = n_bins + 1
+    partial_amount = np.where(before, 0.0, (bins + 1) * bin_seconds - positions) * weights
+    partial = np.bincount(
+        (devices * width + np.maximum(bins, 0))[~before],
+        weights=partial_amount[~before],
+        minlength=n_devices * width,
+    ).reshape(n_devices, width)
+    slopes = np.bincount(
+        devices * width + bins + 1,
+        weights=weights,
+        minlength=n_devices * width,
+    ).reshape(n_devices, width)
+
+    busy = partial[:, :n_bins] + np.cumsum(slopes, axis=1)[:, :n_bins] * bin_seconds
+    return np.clip(busy, 0, bin_seconds)
+
+
+def _epoch(value: datetime) -> int:
+    return int((value - datetime(1970, 1, 1)).total_seconds())
+
+
+def _load_intervals(period_start: datetime, period_end: datetime, now: datetime):
+    """Start/end seconds and device ids of jobs overlapping a period (running jobs end now)"""
+    with get_db_session() as db_session:
+        rows = db_session.execute(
+            select(PrintJob.device_id, PrintJob.start_time, PrintJob.end_time).where(
+                PrintJob.device_id.isnot(None),
+                PrintJob.start_time.isnot(None),
+                PrintJob.status.in_(BUSY_STATUSES),
+                PrintJob.start_time < period_end,
+                or_(
+                    and_(PrintJob.end_time.is_(None), PrintJob.status == RUNNING_STATUS),
+                    PrintJob.end_time >= period_start,
+                ),
+            )
+        ).all()
+
+    if not rows:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty
+
+    device_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+    starts = np.array([r[1] for r in rows], dtype="datetime64[s]").astype(np.int64)
+    ends = np.array([r[2] or now for r in rows], dtype="datetime64[s]").astype(np.int64)
+    return device_ids, starts, np.minimum(ends, _epoch(now))
+
+
+class UtilizationEngine:
+    """
+    Cached per-device utilization over a rolling window.
+
+    Closed days are computed once; refresh() only recomputes the bins of
+    the current day, and rolls the window forward when the day changes
+    (recomputing every day since the previous refresh). History edits for
+    closed days need rebuild().
+    """
+
+    def __init__(self, days: int = 30, bin_seconds: int = DAY):
+        if DAY % bin_seconds:
+            raise ValueError("bin_seconds must divide a day")
+        self.days = days
+        self.bin_seconds = bin_seconds
+        self.bins_per_day = DAY // bin_seconds
+        self.device_ids = np.array([], dtype=np.int64)
+        self.device_names: Dict[int, str] = {}
+        self.busy = np.zeros((0, 0))
+        self.period_start: Optional[datetime] = None
+        self.refreshed_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def _compute(self, period_start: datetime, days: int, now: datetime, device_ids: np.ndarray) -> np.ndarray:
+        period_end = period_start + timedelta(days=days)
+        job_devices, starts, ends = _load_intervals(period_start, period_end, now)
+        known = np.isin(job_devices, device_ids)
+        index = np.searchsorted(device_ids, job_devices[known])
+        return busy_seconds(
+            index, starts[known], ends[known], len(device_ids),
+            _epoch(period_start), days * self.bins_per_day, self.bin_seconds,
+        )
+
+    def _devices(self) -> Dict[int, str]:
+        with get_db_session() as db_session:
+            return dict(db_session.execute(select(Device.id, Device.name)).all())
+
+    def rebuild(self, now: Optional[datetime] = None):
+        """Recompute the whole window"""
+        now = now or datetime.now()
+        today = datetime.combine(now.date(), time.min)
+        with self._lock:
+            self.device_names = self._devices()
+            self.device_ids = np.array(sorted(self.device_names), dtype=np.int64)
+            self.period_start = today - timedelta(days=self.days - 1)
+            self.busy = self._compute(self.period_start, self.days, now, self.device_ids)
+            self.refreshed_at = now
+
+    def refresh(self, now: Optional[datetime] = None):
+        """Bring the window up to date, recomputing only the days since the last refresh"""
+        now = now or datetime.now()
+        today = datetime.combine(now.date(), time.min)
+        expected_start = today - timedelta(days=self.days - 1)
+
+        if (
+            self.period_start is None
+            or (expected_start - self.period_start).days >= self.days
+            or self._devices() != self.device_names
+        ):
+            self.rebuild(now)
+            return
+
+        with self._lock:
+            shift = (expected_start - self.period_start).days
+            # The previous "today" was partial; it and any days skipped since are recomputed with today
+            last_refreshed_day = self.period_start + timedelta(days=self.days - 1)
+            if shift > 0:
+                self.busy = np.concatenate(
+                    [self.busy[:, shift * self.bins_per_day:],
+                     np.zeros((len(self.device_ids), shift * self.bins_per_day))],
+                    axis=1,
+                )
+                self.period_start = expected_start
+
+            recent = (today - last_refreshed_day).days + 1
+            self.busy[:, -recent * self.bins_per_day:] = self._compute(
+                last_refreshed_day, recent, now, self.device_ids
+            )
+            self.refreshed_at = now
+
+    def utilization(self) -> Dict[str, np.ndarray]:
+        """
+        Utilization arrays ready for charting.
+
+        Returns:
+            Dictionary with device_ids, device_names (aligned with
+            device_ids), bin_starts (datetime64) and percent (devices x
+            bins, busy time as a percentage of the bin)
+        """
+        with self._lock:
+            bin_starts = (
+                np.datetime64(self.period_start, "s")
+                + np.arange(self.busy.shape[1]) * np.timedelta64(self.bin_seconds, "s")
+            ) if self.period_start is not None else np.array([], dtype="datetime64[s]")
+            return {
+                "device_ids": self.device_ids.copy(),
+                "device_names": [self.device_names.get(int(i), f"Device {i}") for i in self.device_ids],
+                "bin_starts": bin_starts,
+                "percent": self.busy * (100.0 / self.bin_seconds),
+            }
+
+
+def get_utilization(days: int = 30, bin_seconds: int = DAY, now: Optional[datetime] = None) -> Dict[str, np.ndarray]:
+    """
+    Get device utilization for the last `days` days from a shared engine.
+
+    The first call computes the window; later calls only recompute today.
+    """
+    key = (days, bin_seconds)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _engines[key] = UtilizationEngine(days, bin_seconds)
+    try:
+        engine.refresh(now)
+    except Exception as e:
+        print(f"Error refreshing utilization: {e}")
+    return engine.utilization()
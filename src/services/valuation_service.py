@@ -0,0 +1,540 @@
+"""
+Inventory valuation service.
+Values stock on hand and the cost of goods consumed by replaying the stock
+ledger (StockAdjustment rows, oldest first) of every material, either with
+FIFO cost layers or with a moving weighted average:
+
+- Positive adjustments are receipts at their unit_cost (a missing cost
+  takes the material's previous receipt cost, then its cost_per_unit).
+- Negative adjustments are issues, costed by the method; their recorded
+  unit_cost is ignored.
+- Stock the ledger does not explain (current_stock minus every adjustment)
+  is an opening balance at cost_per_unit, ahead of the first adjustment.
+- Issues beyond the stock on hand are costed at the latest receipt cost,
+  and the receipts that later cover them are not expensed again.
+
+The replay is vectorized over all materials at once. FIFO issue costs are
+differences of each material's cumulative receipt cost curve at its
+cumulative issued quantity; the moving average is a linear recurrence over
+receipts, solved with cumulative sums (see _linear_recurrence).
+
+Valuation state at month boundaries is kept in valuation_checkpoints, so
+valuing a month end replays only the movements since the previous one.
+Checkpoints are only written by checkpoint_valuations (run from cron via
+scripts/stock_ledger.py checkpoint-valuation); reads never write.
+Adjustments backdated before a checkpoint drop the material's later
+checkpoints (invalidate_checkpoints, called when adjustments are inserted).
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import and_, bindparam, delete, func, insert, select
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, StockAdjustment, ValuationCheckpoint
+
+METHODS = ("fifo", "average")
+
+# Materials listed in an IN clause when loading movements; larger groups are filtered after loading
+IN_LIST_LIMIT = 500
+
+# Width, in log units, of the blocks the moving-average recurrence is summed in
+RECURRENCE_BLOCK = 40.0
+
+# Quantities smaller than this are rounding
+EPSILON = 1e-9
+
+adjustments_table = StockAdjustment.__table__
+materials_table = Material.__table__
+checkpoints_table = ValuationCheckpoint.__table__
+
+_STATE_COLUMNS = ["quantity", "value", "unit_cost", "receipt_cost", "layers", "consumed_quantity", "consumed_cost"]
+
+
+def _check_method(method: str) -> None:
+    if method not in METHODS:
+        raise ValueError(f"Unknown valuation method '{method}' (expected one of {', '.join(METHODS)})")
+
+
+def month_start(value: datetime) -> datetime:
+    """Midnight of the first day of `value`'s month"""
+    return datetime(value.year, value.month, 1)
+
+
+def next_month(value: datetime) -> datetime:
+    """Midnight of the first day of the month after `value`'s"""
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _linear_recurrence(groups: np.ndarray, alpha: np.ndarray, beta: np.ndarray) -> np.ndarray:
+    """
+    Solve x_k = alpha_k * x_(k-1) + beta_k within each group without a loop.
+
+    Rows are sorted by group, 0 <= alpha <= 1 and alpha = 0 restarts the
+    recurrence. The solution is x_k = sum_j beta_j * exp(L_k - L_j), L
+    being the cumulative log(alpha). Rows are bucketed into blocks of L
+    RECURRENCE_BLOCK wide: terms two or more blocks back are scaled by
+    less than exp(-RECURRENCE_BLOCK) and dropped, so each x_k is a
+    cumulative sum over its own block plus the previous block's total,
+    with every exponent inside the float range.
+    """
+    log_alpha = np.full(len(alpha), -3 * RECURRENCE_BLOCK)
+    positive = alpha > 0
+    log_alpha[positive] = np.log(alpha[positive])
+
+    frame = pd.DataFrame({"group": groups, "decay": -log_alpha})
+    decay = frame.groupby("group", sort=False)["decay"].cumsum().to_numpy()
+    block = np.floor(decay / RECURRENCE_BLOCK)
+    offset = decay - block * RECURRENCE_BLOCK
+    frame["block"] = block
+    frame["scaled"] = beta * np.exp(offset)
+
+    by_block = frame.groupby(["group", "block"], sort=False)["scaled"]
+    within = by_block.cumsum().to_numpy()
+    previous = by_block.sum().reindex(pd.MultiIndex.from_arrays([groups, block - 1])).fillna(0).to_numpy()
+    return np.exp(-offset) * (within + np.exp(-RECURRENCE_BLOCK) * previous)
+
+
+def _prepare(openings: pd.DataFrame, movements: pd.DataFrame, method: str) -> pd.DataFrame:
+    """Opening rows followed by each material's movements, with the latest receipt cost on every row"""
+    if method == "fifo":
+        # A zero row carrying the opening cost, then one opening receipt per layer still on hand
+        layers = [
+            (material_id, float(quantity), float(cost))
+            for material_id, material_layers in openings["layers"].items()
+            for quantity, cost in (material_layers or [])
+        ]
+        opening_rows = pd.concat([
+            pd.DataFrame({"material_id": openings.index, "quantity": 0.0, "unit_cost": openings["receipt_cost"].to_numpy()}),
+            pd.DataFrame(layers, columns=["material_id", "quantity", "unit_cost"]),
+        ], ignore_index=True)
+    else:
+        opening_rows = pd.DataFrame({
+            "material_id": openings.index, "quantity": openings["quantity"].to_numpy(),
+            "unit_cost": openings["receipt_cost"].to_numpy(),
+        })
+    opening_rows["opening"] = True
+
+    movements = movements[movements["material_id"].isin(openings.index)].assign(opening=False)
+    rows = pd.concat([opening_rows, movements[["material_id", "quantity", "unit_cost", "opening"]]], ignore_index=True)
+    rows = rows.sort_values("material_id", kind="stable", ignore_index=True)
+    rows["quantity"] = rows["quantity"].astype(float)
+
+    receipt = rows["opening"] | (rows["quantity"] > 0)
+    rows["receipt"] = receipt
+    rows["cost"] = rows["unit_cost"].astype(float).where(receipt).groupby(rows["material_id"]).ffill()
+    return rows
+
+
+def _replay_average(openings: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    material_id = rows["material_id"].to_numpy()
+    quantity = rows["quantity"].to_numpy()
+    cost = rows["cost"].to_numpy()
+    after = rows["quantity"].groupby(rows["material_id"]).cumsum().to_numpy()
+    before = after - quantity
+
+    # Between receipts the average is constant; receipt k sets the value on hand to
+    # W_k = (stock before / stock after receipt k-1) * W_(k-1) + quantity * cost,
+    # restarting at the receipt cost when nothing was on hand (the opening row
+    # restarts at the opening average)
+    receipt = rows["receipt"].to_numpy()
+    opening = rows["opening"].to_numpy()[receipt]
+    r_group, r_after, r_before = material_id[receipt], after[receipt], before[receipt]
+    r_cost = np.where(opening, openings["unit_cost"].reindex(r_group).to_numpy(), cost[receipt])
+    previous_after = pd.Series(r_after).groupby(r_group).shift().to_numpy()
+    restart = opening | (r_before <= EPSILON)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = np.where(restart, 0.0, np.clip(r_before / previous_after, 0.0, 1.0))
+        beta = np.where(restart, r_after * r_cost, quantity[receipt] * r_cost)
+        value = _linear_recurrence(r_group, alpha, beta)
+        average = np.where(np.abs(r_after) > EPSILON, value / r_after, r_cost)
+
+    rows = rows.assign(average=np.nan)
+    rows.loc[receipt, "average"] = average
+    rows["average"] = rows["average"].groupby(rows["material_id"]).ffill()
+    issued = np.where(receipt, 0.0, -quantity)
+    rows["issued"] = issued
+    rows["issue_cost"] = issued * rows["average"].to_numpy()
+    rows["after"] = after
+
+    grouped = rows.groupby("material_id", sort=False)
+    last = grouped.last()
+    closing = pd.DataFrame({
+        "quantity": last["after"],
+        "value": last["after"] * last["average"],
+        "unit_cost": last["average"],
+        "receipt_cost": last["cost"],
+        "layers": None,
+        "consumed_quantity": grouped["issued"].sum(),
+        "consumed_cost": grouped["issue_cost"].sum(),
+    })
+    return closing
+
+
+def _replay_fifo(openings: pd.DataFrame, rows: pd.DataFrame) -> pd.DataFrame:
+    material_id = rows["material_id"].to_numpy()
+    quantity = rows["quantity"].to_numpy()
+    cost = rows["cost"].to_numpy()
+    by_material = rows.groupby("material_id", sort=False)
+
+    # Opening shortage: units issued ahead of receipts, already expensed
+    shortage = (-openings["quantity"]).clip(lower=0).where(openings["layers"].map(lambda layers: not layers), 0.0)
+    received = np.where(quantity > 0, quantity, 0.0)
+    issued = np.where(rows["opening"].to_numpy() | (quantity >= 0), 0.0, -quantity)
+    cum_received = pd.Series(received).groupby(material_id).cumsum().to_numpy()
+    cum_cost = pd.Series(received * np.nan_to_num(cost)).groupby(material_id).cumsum().to_numpy()
+    cum_issued = pd.Series(issued).groupby(material_id).cumsum().to_numpy() \
+        + shortage.reindex(material_id).to_numpy()
+    issued_before = cum_issued - issued
+
+    # Receipt cost curves of all materials laid end to end on one axis for np.interp
+    totals = pd.DataFrame({"received": cum_received, "cost": cum_cost, "issued": cum_issued}) \
+        .groupby(material_id, sort=False).last()
+    offsets = (totals["received"] + 1).cumsum() - (totals["received"] + 1)
+    bases = totals["cost"].cumsum() - totals["cost"]
+    row_offset = offsets.reindex(material_id).to_numpy()
+    row_base = bases.reindex(material_id).to_numpy()
+    points = received > 0
+    curve_x = np.concatenate([offsets.to_numpy(), row_offset[points] + cum_received[points]])
+    curve_y = np.concatenate([bases.to_numpy(), row_base[points] + cum_cost[points]])
+    order = np.argsort(curve_x, kind="stable")
+    curve_x, curve_y = curve_x[order], curve_y[order]
+
+    def curve(position: np.ndarray, offset: np.ndarray, base: np.ndarray) -> np.ndarray:
+        """Cost of a material's first `position` units received"""
+        return np.interp(offset + position, curve_x, curve_y) - base
+
+    # An issue takes the units between its cumulative bounds that had been received by then,
+    # and the rest at the latest receipt cost
+    costed = curve(np.minimum(cum_issued, cum_received), row_offset, row_base) \
+        - curve(np.minimum(issued_before, cum_received), row_offset, row_base)
+    uncovered = np.clip(cum_issued - np.maximum(issued_before, cum_received), 0.0, None)
+    rows = rows.assign(issued=issued, issue_cost=np.where(issued > 0, costed + uncovered * cost, 0.0))
+
+    grouped = rows.groupby("material_id", sort=False)
+    last_cost = grouped["cost"].last()
+    on_hand = totals["received"] - totals["issued"]
+    consumed_to = np.minimum(totals["issued"], totals["received"]).to_numpy()
+    layer_value = totals["cost"].to_numpy() - curve(consumed_to, offsets.to_numpy(), bases.to_numpy())
+    value = np.where(on_hand > EPSILON, layer_value, on_hand * last_cost)
+    closing = pd.DataFrame({
+        "quantity": on_hand,
+        "value": value,
+        "unit_cost": np.where(on_hand > EPSILON, value / on_hand.where(on_hand > EPSILON, 1.0), last_cost),
+        "receipt_cost": last_cost,
+        "consumed_quantity": grouped["issued"].sum(),
+        "consumed_cost": grouped["issue_cost"].sum(),
+    })
+
+    # Layers still on hand: the part of each receipt beyond the cumulative issued quantity
+    issued_total = totals["issued"].reindex(material_id).to_numpy()
+    remaining = cum_received - np.maximum(cum_received - received, issued_total)
+    keep = points & (remaining > EPSILON)
+    layers: Dict[int, List[List[float]]] = {}
+    for key, amount, unit_cost in zip(material_id[keep], remaining[keep], cost[keep]):
+        layers.setdefault(int(key), []).append([float(amount), float(unit_cost)])
+    closing["layers"] = [layers.get(int(key), []) for key in closing.index]
+    return closing
+
+
+def replay(openings: pd.DataFrame, movements: pd.DataFrame, method: str = "fifo") -> pd.DataFrame:
+    """
+    Roll valuation state forward over movements.
+
+    Args:
+        openings: Opening state indexed by material id, with the
+            ValuationCheckpoint columns quantity, value, unit_cost,
+            receipt_cost, layers, consumed_quantity and consumed_cost
+        movements: material_id, quantity and unit_cost of the movements, in
+            ledger order within each material
+        method: "fifo" or "average"
+
+    Returns:
+        Closing state in the same shape as `openings`, plus the number of
+        movements replayed per material
+    """
+    _check_method(method)
+    if openings.empty:
+        return openings.assign(movements=0)
+    rows = _prepare(openings, movements, method)
+    closing = (_replay_fifo if method == "fifo" else _replay_average)(openings, rows)
+    closing = closing.reindex(openings.index)
+    closing["consumed_quantity"] += openings["consumed_quantity"].astype(float)
+    closing["consumed_cost"] += openings["consumed_cost"].astype(float)
+    counts = movements["material_id"].value_counts()
+    closing["movements"] = counts.reindex(closing.index).fillna(0).astype(int)
+    return closing
+
+
+def _load_openings(db_session, at: datetime, method: str) -> pd.DataFrame:
+    """Each material's latest checkpoint before `at`, or its opening balance when it has none"""
+    latest = (
+        select(checkpoints_table.c.material_id, func.max(checkpoints_table.c.checkpoint_at).label("checkpoint_at"))
+        .where(checkpoints_table.c.method == method, checkpoints_table.c.checkpoint_at <= at)
+        .group_by(checkpoints_table.c.material_id)
+        .subquery("latest")
+    )
+    checkpoints = pd.DataFrame(
+        db_session.execute(
+            select(checkpoints_table.c.material_id, checkpoints_table.c.checkpoint_at,
+                   *(checkpoints_table.c[name] for name in _STATE_COLUMNS))
+            .join(latest, and_(
+                checkpoints_table.c.material_id == latest.c.material_id,
+                checkpoints_table.c.checkpoint_at == latest.c.checkpoint_at,
+            ))
+            .where(checkpoints_table.c.method == method)
+        ).all(),
+        columns=["material_id", "since"] + _STATE_COLUMNS,
+    ).set_index("material_id")
+
+    # Without a checkpoint: stock the ledger does not explain, at the material's cost
+    materials = db_session.execute(
+        select(materials_table.c.id, materials_table.c.current_stock,
+               func.coalesce(materials_table.c.cost_per_unit, materials_table.c.price_per_unit, 0))
+        .where(materials_table.c.id.notin_(select(latest.c.material_id)))
+    ).all()
+    ledger_totals = {}
+    if materials:
+        totals = select(adjustments_table.c.material_id, func.sum(adjustments_table.c.quantity)) \
+            .group_by(adjustments_table.c.material_id)
+        if len(materials) <= IN_LIST_LIMIT:
+            totals = totals.where(adjustments_table.c.material_id.in_([row[0] for row in materials]))
+        elif len(checkpoints):
+            totals = totals.where(adjustments_table.c.material_id.notin_(select(latest.c.material_id)))
+        ledger_totals = dict(db_session.execute(totals).all())
+    opening_rows = []
+    for material_id, current_stock, unit_cost in materials:
+        quantity = float(current_stock or 0) - float(ledger_totals.get(material_id) or 0)
+        if abs(quantity) <= EPSILON:
+            quantity = 0.0
+        opening_rows.append({
+            "material_id": material_id, "since": None, "quantity": quantity,
+            "value": quantity * float(unit_cost), "unit_cost": float(unit_cost), "receipt_cost": float(unit_cost),
+            "layers": [[quantity, float(unit_cost)]] if quantity > 0 else [],
+            "consumed_quantity": 0.0, "consumed_cost": 0.0,
+        })
+    openings = pd.DataFrame(opening_rows, columns=["material_id", "since"] + _STATE_COLUMNS).set_index("material_id")
+    if len(checkpoints):
+        openings = pd.concat([checkpoints, openings]) if len(openings) else checkpoints
+    numeric = ["quantity", "value", "unit_cost", "receipt_cost", "consumed_quantity", "consumed_cost"]
+    openings[numeric] = openings[numeric].astype(float)
+    return openings.sort_index()
+
+
+def _load_movements(db_session, openings: pd.DataFrame, at: datetime) -> pd.DataFrame:
+    """Movements dated from each material's checkpoint (or the start) up to `at`, in ledger order"""
+    columns = [adjustments_table.c.material_id, adjustments_table.c.quantity, adjustments_table.c.unit_cost]
+    ledger_order = [adjustments_table.c.material_id, adjustments_table.c.adjustment_date, adjustments_table.c.id]
+    groups: Dict[Optional[datetime], List[int]] = {}
+    for material_id, since in openings["since"].items():
+        start = None if pd.isna(since) else pd.Timestamp(since).to_pydatetime()
+        groups.setdefault(start, []).append(int(material_id))
+
+    frames = []
+    for start, material_ids in groups.items():
+        query = select(*columns).where(adjustments_table.c.adjustment_date < at).order_by(*ledger_order)
+        if start is not None:
+            query = query.where(adjustments_table.c.adjustment_date >= start)
+        if len(material_ids) <= IN_LIST_LIMIT:
+            query = query.where(adjustments_table.c.material_id.in_(material_ids))
+        frame = pd.DataFrame(db_session.execute(query).all(), columns=["material_id", "quantity", "unit_cost"])
+        if len(material_ids) > IN_LIST_LIMIT:
+            frame = frame[frame["material_id"].isin(material_ids)]
+        frames.append(frame)
+    if not frames:
+        return pd.DataFrame(columns=["material_id", "quantity", "unit_cost"])
+    # Each group is in ledger order; groups hold different materials
+    return pd.concat(frames, ignore_index=True).sort_values("material_id", kind="stable", ignore_index=True)
+
+
+def compute_valuation(db_session, at: datetime, method: str = "fifo") -> pd.DataFrame:
+    """
+    Valuation state of every material covering adjustments dated before `at`.
+
+    Args:
+        db_session: Database session
+        at: Valuation time (exclusive)
+        method: "fifo" or "average"
+
+    Returns:
+        DataFrame indexed by material id with quantity, value, unit_cost,
+        receipt_cost, layers (FIFO), consumed_quantity and consumed_cost
+        since the start of the ledger, and the number of movements replayed
+    """
+    _check_method(method)
+    openings = _load_openings(db_session, at, method)
+    movements = _load_movements(db_session, openings, at)
+    return replay(openings, movements, method)
+
+
+def _save_checkpoints(db_session, valuation: pd.DataFrame, at: datetime, method: str) -> int:
+    db_session.execute(
+        delete(checkpoints_table).where(checkpoints_table.c.method == method, checkpoints_table.c.checkpoint_at == at)
+    )
+    rows = [
+        {
+            "material_id": int(material_id), "method": method, "checkpoint_at": at,
+            "quantity": float(state.quantity), "value": float(state.value), "unit_cost": float(state.unit_cost),
+            "receipt_cost": float(state.receipt_cost),
+            "layers": state.layers if method == "fifo" else None,
+            "consumed_quantity": float(state.consumed_quantity), "consumed_cost": float(state.consumed_cost),
+            "created_at": datetime.utcnow(),
+        }
+        for material_id, state in valuation.iterrows()
+    ]
+    if rows:
+        db_session.execute(insert(checkpoints_table), rows)
+    return len(rows)
+
+
+def invalidate_checkpoints(db_session, earliest: Dict[int, datetime]) -> None:
+    """Drop checkpoints that a backdated adjustment falls before (material id -> earliest adjustment date)"""
+    if not earliest:
+        return
+    db_session.execute(
+        delete(checkpoints_table).where(
+            checkpoints_table.c.material_id == bindparam("b_material_id"),
+            checkpoints_table.c.checkpoint_at > bindparam("b_date"),
+        ),
+        [{"b_material_id": material_id, "b_date": date} for material_id, date in earliest.items()],
+    )
+
+
+def checkpoint_valuations(method: str = "fifo", through: Optional[datetime] = None) -> int:
+    """
+    Write month-end checkpoints up to `through`, each replaying one month.
+
+    Args:
+        method: "fifo" or "average"
+        through: Last boundary to checkpoint (defaults to the start of the
+            current month)
+
+    Returns:
+        Number of checkpoints written
+    """
+    _check_method(method)
+    now = datetime.now()
+    through = month_start(through or now)
+    try:
+        with get_db_session() as db_session:
+            latest = db_session.scalar(
+                select(func.max(checkpoints_table.c.checkpoint_at)).where(checkpoints_table.c.method == method)
+            )
+            first = db_session.scalar(select(func.min(adjustments_table.c.adjustment_date)))
+            if first is None:
+                return 0
+            boundary = next_month(latest if latest is not None else first)
+            written = 0
+            while boundary <= through:
+                valuation = compute_valuation(db_session, boundary, method)
+                written += _save_checkpoints(db_session, valuation, boundary, method)
+                boundary = next_month(boundary)
+            return written
+    except Exception as e:
+        print(f"Error writing {method} valuation checkpoints: {e}")
+        return 0
+
+
+def _material_details(db_session) -> pd.DataFrame:
+    return pd.DataFrame(
+        db_session.execute(
+            select(materials_table.c.id, materials_table.c.name,
+                   func.coalesce(materials_table.c.material_type, materials_table.c.type), materials_table.c.unit)
+        ).all(),
+        columns=["material_id", "name", "material_type", "unit"],
+    ).set_index("material_id")
+
+
+def get_inventory_valuation(at: Optional[datetime] = None, method: str = "fifo") -> Dict[str, Any]:
+    """
+    Value of the stock on hand.
+
+    Args:
+        at: Valuation time (defaults to now); adjustments dated before it count
+        method: "fifo" or "average"
+
+    Returns:
+        Dictionary with at, method, total_value and materials (list of
+        dictionaries with material_id, name, material_type, unit, quantity,
+        value and unit_cost), highest value first
+    """
+    _check_method(method)
+    at = at or datetime.now()
+    try:
+        with get_db_session() as db_session:
+            valuation = compute_valuation(db_session, at, method)
+            details = _material_details(db_session)
+    except Exception as e:
+        print(f"Error valuing inventory: {e}")
+        return {"at": at, "method": method, "total_value": 0.0, "materials": []}
+
+    materials = details.join(valuation[["quantity", "value", "unit_cost"]], how="inner")
+    materials = materials[(materials["quantity"].abs() > EPSILON) | (materials["value"].abs() > EPSILON)]
+    materials = materials.sort_values("value", ascending=False).reset_index()
+    return {
+        "at": at,
+        "method": method,
+        "total_value": float(materials["value"].sum()),
+        "materials": materials.to_dict("records"),
+    }
+
+
+def get_consumed_cost_by_period(start: datetime, end: Optional[datetime] = None, method: str = "fifo",
+                                period: str = "month", by: str = "material_type") -> List[Dict[str, Any]]:
+    """
+    Cost of goods consumed (issued) per period.
+
+    Months are valued at their boundaries; each one replays only the
+    movements since the checkpoint before it (see checkpoint_valuations).
+    Nothing is written, so this is safe to call while rendering.
+
+    Args:
+        start: Start of the first period
+        end: End of the last period (defaults to now)
+        method: "fifo" or "average"
+        period: "month", or "total" for the whole range
+        by: "material_type" or "material"
+
+    Returns:
+        List of dictionaries with period ("YYYY-MM", or None for "total"),
+        group, consumed_quantity and consumed_cost, ordered by period
+    """
+    _check_method(method)
+    if period not in ("month", "total"):
+        raise ValueError(f"Unknown period '{period}' (expected 'month' or 'total')")
+    end = end or datetime.now()
+    boundaries = [start]
+    if period == "month":
+        boundary = next_month(start)
+        while boundary < end:
+            boundaries.append(boundary)
+            boundary = next_month(boundary)
+    boundaries.append(end)
+
+    try:
+        with get_db_session() as db_session:
+            states = [compute_valuation(db_session, at, method) for at in boundaries]
+            details = _material_details(db_session)
+    except Exception as e:
+        print(f"Error computing consumed cost: {e}")
+        return []
+
+    group = details["name"] if by == "material" else details["material_type"].fillna("Uncategorized")
+    results = []
+    for period_start, opening, closing in zip(boundaries, states, states[1:]):
+        consumed = closing[["consumed_quantity", "consumed_cost"]].subtract(
+            opening[["consumed_quantity", "consumed_cost"]], fill_value=0
+        )
+        consumed = consumed[consumed["consumed_quantity"].abs() > EPSILON]
+        totals = consumed.groupby(group.reindex(consumed.index)).sum()
+        for name, row in totals.iterrows():
+            results.append({
+                "period": period_start.strftime("%Y-%m") if period == "month" else None,
+                "group": name,
+                "consumed_quantity": float(row["consumed_quantity"]),
+                "consumed_cost": float(row["consumed_cost"]),
+            })
+    return results
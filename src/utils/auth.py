@@ -3,10 +3,104 @@ import streamlit as st
 import hashlib
 import os
 import secrets
+from dataclasses import dataclass, field
 from datetime import datetime
+from typing import FrozenSet, Iterable, Optional
 from src.db.connection import get_db_session
 from src.db.models.user import User
 
+# Permissions granted to each role (role names are compared in lower case)
+ROLE_PERMISSIONS = {
+    "admin": frozenset({
+        "manage_users", "manage_oems", "manage_devices", "manage_materials",
+        "manage_certifications", "view_subscriptions", "manage_subscriptions",
+        "view_payments", "refund_payments",
+    }),
+    "manager": frozenset({
+        "manage_users", "manage_oems", "manage_devices", "manage_materials",
+        "view_subscriptions", "view_payments",
+    }),
+    "technician": frozenset({"manage_devices", "manage_materials"}),
+    "certification authority": frozenset({"manage_certifications"}),
+    "end user": frozenset(),
+    "user": frozenset(),
+}
+
+
+@dataclass(frozen=True)
+class SessionIdentity:
+    """Who is logged in, resolved once at login and kept in st.session_state"""
+
+    user_id: int
+    username: str
+    role: str
+    permissions: FrozenSet[str] = field(default_factory=frozenset)
+
+    @property
+    def is_admin(self) -> bool:
+        return self.role.lower() == "admin"
+
+    def has_role(self, roles: Iterable[str]) -> bool:
+        """True if the user is an admin or has one of the given roles"""
+        return self.is_admin or self.role.lower() in {role.lower() for role in roles}
+
+    def can(self, permission: str) -> bool:
+        return permission in self.permissions
+
+
+def build_identity(user) -> SessionIdentity:
+    """Build a SessionIdentity from a user dictionary (as returned by authenticate_user) or User object."""
+    if isinstance(user, dict):
+        user_id, username, role = user["id"], user["username"], user["role"] or ""
+    else:
+        user_id, username, role = user.id, user.username, user.role or ""
+
+    return SessionIdentity(
+        user_id=user_id,
+        username=username,
+        role=role,
+        permissions=ROLE_PERMISSIONS.get(role.lower(), frozenset()),
+    )
+
+
+def login_session(user) -> SessionIdentity:
+    """Store the identity of a freshly authenticated user in the Streamlit session."""
+    identity = build_identity(user)
+    st.session_state.identity = identity
+    st.session_state.authenticated = True
+    st.session_state.user_id = identity.user_id
+    st.session_state.username = identity.username
+    st.session_state.user_role = identity.role
+    if isinstance(user, dict):
+        st.session_state.user_info = user
+    return identity
+
+
+def get_session_identity(db_session=None) -> Optional[SessionIdentity]:
+    """
+    Get the identity of the current session.
+
+    When nobody has logged in and a db_session is given, fall back to the
+    placeholder user from auth_service.get_current_user_id. The fallback is
+    resolved once and then cached in the session like a real login.
+    """
+    identity = st.session_state.get("identity")
+    if identity is not None or db_session is None:
+        return identity
+
+    from src.services.auth_service import get_current_user_id
+
+    user_id = get_current_user_id(db_session)
+    if user_id is None:
+        return None
+    user = db_session.query(User).filter(User.id == user_id).first()
+    if user is None:
+        return None
+
+    identity = build_identity(user)
+    st.session_state.identity = identity
+    return identity
+
 
 def hash_password(password, salt=None):
     """Hash a password with a salt for secure storage."""
@@ -59,11 +153,17 @@ def check_authorization(allowed_roles):
     """Check if the authenticated user has one of the allowed roles or is admin."""
     check_authentication()
 
-    user_role = st.session_state.get("user_role", "").lower()
-    allowed_roles = [role.lower() for role in allowed_roles]
-
-    if user_role == "admin" or user_role in allowed_roles:
-        return  # Authorized
+    identity = st.session_state.get("identity")
+    if identity is not None:
+        if identity.has_role(allowed_roles):
+            return  # Authorized
+        user_role = identity.role.lower()
+    else:
+        user_role = (st.session_state.get("user_role") or "").lower()
+        allowed_roles = [role.lower() for role in allowed_roles]
+
+        if user_role == "admin" or user_role in allowed_roles:
+            return  # Authorized
 
     st.error(
         f"Access denied. Your role ({user_role}) does not have permission to view this page."
@@ -1,6 +1,126 @@
 import os
+from typing import IO, Iterator, Optional, Union
 
-def save_uploaded_file(uploaded_file):
-    '''Save an uploaded file'''
-    pass
-
+import pandas as pd
+
+UPLOAD_DIR = os.path.join("data", "uploads")
+
+# Rows per chunk when streaming tabular files
+DEFAULT_CHUNK_SIZE = 5000
+
+EXCEL_EXTENSIONS = (".xlsx", ".xlsm")
+
+Source = Union[str, IO[bytes]]
+
+
+def save_uploaded_file(uploaded_file, directory: str = UPLOAD_DIR) -> str:
+    '''Save an uploaded file and return its path'''
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, os.path.basename(uploaded_file.name))
+    with open(path, "wb") as handle:
+        handle.write(uploaded_file.getbuffer())
+    return path
+
+
+def _file_name(source: Source, filename: Optional[str]) -> str:
+    return filename or (source if isinstance(source, str) else getattr(source, "name", "")) or ""
+
+
+def is_excel_file(source: Source, filename: Optional[str] = None) -> bool:
+    '''Whether a file is an Excel workbook, judged by its extension'''
+    return _file_name(source, filename).lower().endswith(EXCEL_EXTENSIONS)
+
+
+def count_data_rows(source: Source, filename: Optional[str] = None) -> Optional[int]:
+    '''
+    Number of data rows (excluding the header) in a CSV or Excel file.
+
+    Used to size progress bars. CSV files are counted by scanning for line
+    breaks, so rows with quoted embedded newlines are overcounted; Excel
+    files report the sheet dimension. Returns None when unknown.
+    '''
+    if is_excel_file(source, filename):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(source, read_only=True)
+        try:
+            rows = workbook.active.max_row
+        finally:
+            workbook.close()
+        if hasattr(source, "seek"):
+            source.seek(0)
+        return max(rows - 1, 0) if rows else None
+
+    if isinstance(source, str):
+        with open(source, "rb") as handle:
+            return count_data_rows(handle, filename or source)
+
+    start = source.tell()
+    lines = sum(block.count(b"\n") for block in iter(lambda: source.read(1 << 20), b""))
+    end = source.tell()
+    unterminated = False
+    if end > start:
+        source.seek(end - 1)
+        unterminated = source.read(1) != b"\n"
+    source.seek(start)
+    return max(lines + int(unterminated) - 1, 0)
+
+
+def _iter_excel_chunks(source: Source, chunksize: int) -> Iterator[pd.DataFrame]:
+    '''Stream the active sheet of a workbook without loading it into memory'''
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(name).strip() if name is not None else f"column_{i}" for i, name in enumerate(header)]
+        chunk, row_numbers = [], []
+        # iter_rows starts at row 1 and yields missing rows as empty ones, so counting gives the row number
+        for row_number, row in enumerate(rows, start=2):
+            if all(value is None for value in row):
+                continue
+            chunk.append(row[:len(columns)])
+            row_numbers.append(row_number)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame.from_records(chunk, columns=columns, index=row_numbers)
+                chunk, row_numbers = [], []
+        if chunk:
+            yield pd.DataFrame.from_records(chunk, columns=columns, index=row_numbers)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_chunks(source: Source, chunksize: int) -> Iterator[pd.DataFrame]:
+    '''Stream a CSV file, dropping blank lines without renumbering the rows'''
+    # Blank lines are kept while reading so the running index stays aligned with the file
+    chunks = pd.read_csv(source, chunksize=chunksize, dtype=str, keep_default_na=False,
+                         skipinitialspace=True, skip_blank_lines=False)
+    for chunk in chunks:
+        # Data row i (0-based) is on spreadsheet row i + 2, below the header
+        chunk.index = chunk.index + 2
+        blank = chunk.apply(lambda column: column.isna() | (column.str.strip() == "")).all(axis=1)
+        chunk = chunk[~blank]
+        if len(chunk):
+            yield chunk
+
+
+def iter_table_chunks(source: Source, filename: Optional[str] = None,
+                      chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    '''
+    Read a CSV or Excel file as a stream of DataFrames of up to `chunksize` rows.
+
+    Args:
+        source: Path or binary file-like object (e.g. a Streamlit upload)
+        filename: Name used to detect the format when `source` has none
+        chunksize: Rows per chunk
+
+    Yields:
+        DataFrames whose index is the spreadsheet row number of each row
+        (the header is row 1); blank rows are skipped but keep their number
+    '''
+    if is_excel_file(source, filename):
+        return _iter_excel_chunks(source, chunksize)
+    return _iter_csv_chunks(source, chunksize)
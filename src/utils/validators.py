@@ -1,7 +1,120 @@
 import re
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
 
 def validate_email(email):
     '''Validate email format'''
     email_regex = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
     return re.match(email_regex, email) is not None
-
+
+
+# Stock movement types accepted by imports; the sign of the quantity is the direction
+STOCK_MOVEMENT_TYPES = ("Purchase", "Receipt", "Usage", "Issue", "Return", "Transfer", "Write-off", "Adjustment")
+
+# Header spellings accepted for each stock movement column
+STOCK_MOVEMENT_COLUMNS = {
+    "material": ("material", "material_name", "name"),
+    "material_id": ("material_id",),
+    "quantity": ("quantity", "qty"),
+    "adjustment_type": ("adjustment_type", "type", "movement_type"),
+    "adjustment_date": ("adjustment_date", "date"),
+    "unit_cost": ("unit_cost", "cost"),
+    "notes": ("notes", "note", "reference"),
+}
+
+
+def normalize_columns(df: pd.DataFrame, aliases: dict) -> pd.DataFrame:
+    '''Rename columns to their canonical names ("Material Name" -> "material")'''
+    lookup = {alias: name for name, names in aliases.items() for alias in names}
+    renamed = {}
+    for column in df.columns:
+        key = re.sub(r"[\s\-]+", "_", str(column).strip().lower())
+        if key in lookup and lookup[key] not in renamed.values():
+            renamed[column] = lookup[key]
+    return df.rename(columns=renamed)[list(renamed.values())]
+
+
+def _blank(series: pd.Series) -> pd.Series:
+    return series.isna() | (series.astype(str).str.strip() == "")
+
+
+def validate_stock_movements(df: pd.DataFrame,
+                             movement_types: Iterable[str] = STOCK_MOVEMENT_TYPES) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    '''
+    Validate a chunk of stock movement rows with column-wise checks.
+
+    A row needs a material (name or id), a non-zero numeric quantity and a
+    known movement type (matched case-insensitively); the date and unit cost
+    are optional but must parse when present.
+
+    Args:
+        df: Raw chunk as read from the file, indexed by data row number
+        movement_types: Accepted adjustment types
+
+    Returns:
+        Tuple of the valid rows with typed, canonical columns and a DataFrame
+        of errors (row, column, value, error), one line per failed check
+    '''
+    df = normalize_columns(df, STOCK_MOVEMENT_COLUMNS)
+    errors = []
+
+    def reject(mask: pd.Series, column: str, message: str):
+        if mask.any():
+            values = df[column][mask] if column in df else pd.Series("", index=df.index[mask])
+            errors.append(pd.DataFrame({
+                "row": df.index[mask], "column": column,
+                "value": values.astype(str).to_numpy(), "error": message,
+            }))
+
+    missing = [name for name in ("quantity", "adjustment_type") if name not in df]
+    if "material" not in df and "material_id" not in df:
+        missing.insert(0, "material")
+    for name in missing:
+        reject(pd.Series(True, index=df.index), name, "missing column")
+    if missing:
+        return df.iloc[0:0], pd.concat(errors, ignore_index=True)
+
+    out = pd.DataFrame(index=df.index)
+
+    if "material_id" in df:
+        material_id = pd.to_numeric(df["material_id"], errors="coerce")
+        reject(~_blank(df["material_id"]) & (material_id.isna() | (material_id % 1 != 0)), "material_id", "not an integer id")
+        out["material_id"] = material_id.where(material_id % 1 == 0).astype("Int64")
+    else:
+        out["material_id"] = pd.Series(pd.NA, index=df.index, dtype="Int64")
+    out["material"] = df["material"].fillna("").astype(str).str.strip() if "material" in df else ""
+    no_material = out["material_id"].isna() & (out["material"] == "")
+    if "material_id" in df:
+        no_material &= _blank(df["material_id"])
+    reject(no_material, "material", "material is required")
+
+    quantity = pd.to_numeric(df["quantity"], errors="coerce")
+    reject(quantity.isna() | ~np.isfinite(quantity), "quantity", "not a number")
+    reject(quantity == 0, "quantity", "quantity is zero")
+    out["quantity"] = quantity
+
+    canonical = {name.lower(): name for name in movement_types}
+    adjustment_type = df["adjustment_type"].fillna("").astype(str).str.strip().str.lower().map(canonical)
+    reject(adjustment_type.isna(), "adjustment_type", f"unknown type (expected one of {', '.join(movement_types)})")
+    out["adjustment_type"] = adjustment_type
+
+    if "adjustment_date" in df:
+        blank = _blank(df["adjustment_date"])
+        dates = pd.to_datetime(df["adjustment_date"].where(~blank), errors="coerce")
+        reject(~blank & dates.isna(), "adjustment_date", "unparseable date")
+        out["adjustment_date"] = dates
+    if "unit_cost" in df:
+        blank = _blank(df["unit_cost"])
+        unit_cost = pd.to_numeric(df["unit_cost"].where(~blank), errors="coerce")
+        reject(~blank & (unit_cost.isna() | (unit_cost < 0)), "unit_cost", "not a non-negative number")
+        out["unit_cost"] = unit_cost
+    if "notes" in df:
+        notes = df["notes"].fillna("").astype(str).str.strip()
+        out["notes"] = notes.where(~_blank(df["notes"]))
+
+    if not errors:
+        return out, pd.DataFrame(columns=["row", "column", "value", "error"])
+    errors = pd.concat(errors, ignore_index=True)
+    return out.drop(index=errors["row"].unique()), errors
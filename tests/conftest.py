@@ -1,8 +1,34 @@
+import os
+import sys
+import tempfile
+
 import pytest
 
+# Point the app at a scratch database before anything from src is imported
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test_dashboard.db")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
 # Test fixtures
 @pytest.fixture
 def sample_data():
     '''Provide sample data for tests'''
     pass
-
+
+
+@pytest.fixture(scope="session")
+def _database():
+    '''Create the schema once per test run'''
+    from src.db.connection import init_db
+    init_db()
+
+
+@pytest.fixture
+def db(_database):
+    '''Empty database for one test; every table is cleared afterwards'''
+    from src.db.connection import Base, Session, engine
+    yield
+    Session.remove()
+    with engine.begin() as connection:
+        for table in reversed(Base.metadata.sorted_tables):
+            connection.execute(table.delete())
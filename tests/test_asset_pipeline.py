@@ -0,0 +1,36 @@
+"""
+Tests for the stylesheet pipeline: bundles go inline wherever /app/static
+would not serve them as text/css.
+"""
+
+import pytest
+
+from src.components import asset_pipeline
+
+
+@pytest.fixture
+def sent(monkeypatch, tmp_path):
+    monkeypatch.setattr(asset_pipeline, "DIST_DIR", tmp_path)
+    monkeypatch.setattr(asset_pipeline, "STATIC_DIR", tmp_path.parent)
+    monkeypatch.setattr(asset_pipeline.st, "session_state", {}, raising=False)
+    calls = []
+    monkeypatch.setattr(asset_pipeline.st, "markdown", lambda body, **kwargs: calls.append(("inline", body)))
+    monkeypatch.setattr(asset_pipeline.st, "html", lambda body, **kwargs: calls.append(("link", body)))
+    monkeypatch.setattr(asset_pipeline, "_html_runs_scripts", lambda: True)
+    return calls
+
+
+@pytest.mark.parametrize("serving, serves_css, expected", [
+    (False, True, "inline"),
+    (True, False, "inline"),
+    (True, True, "link"),
+])
+def test_stylesheet_is_inlined_unless_served_as_css(sent, monkeypatch, serving, serves_css, expected):
+    monkeypatch.setattr(asset_pipeline, "static_serving_enabled", lambda: serving)
+    monkeypatch.setattr(asset_pipeline, "_static_serves_css", lambda: serves_css)
+
+    asset_pipeline.inject_stylesheet("test", [".a { color: red; }"])
+
+    assert [kind for kind, _ in sent] == [expected]
+    if expected == "inline":
+        assert sent[0][1] == "<style>.a{color:red}</style>"
@@ -0,0 +1,60 @@
+"""
+Tests for the background aggregate refresher: a burst of committed writes
+is coalesced into one refresh of the aggregates that depend on them.
+"""
+
+import time
+
+import pytest
+
+from src.services import cache_warmup_service
+
+
+@pytest.fixture
+def counting_aggregate(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache_warmup_service, "HOT_AGGREGATES", {"counted": lambda: calls.append(1) or len(calls)})
+    monkeypatch.setattr(cache_warmup_service, "AGGREGATE_DEPENDENCIES", {"print_jobs": ["counted"]})
+    monkeypatch.setattr(cache_warmup_service, "STALE_REFRESH_DELAY", 0.3)
+    cache_warmup_service.stop_background_refresh(timeout=5)
+    yield calls
+    cache_warmup_service.stop_background_refresh(timeout=5)
+    cache_warmup_service._cache.clear()
+    cache_warmup_service._stale.clear()
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_burst_of_writes_is_coalesced(counting_aggregate):
+    cache_warmup_service.start_background_refresh(interval=60)
+    assert wait_for(lambda: len(counting_aggregate) == 1)  # Initial warm-up
+
+    # The first write refreshes right away
+    cache_warmup_service._mark_stale({"table_name": "print_jobs"})
+    assert wait_for(lambda: len(counting_aggregate) == 2)
+
+    # Writes within the delay wait for it and share one refresh
+    for _ in range(100):
+        cache_warmup_service._mark_stale({"table_name": "print_jobs"})
+    time.sleep(0.1)
+    assert len(counting_aggregate) == 2
+    assert wait_for(lambda: len(counting_aggregate) == 3)
+    time.sleep(0.5)
+
+    assert len(counting_aggregate) == 3
+    assert cache_warmup_service.get_aggregate("counted") == 3
+
+
+def test_unrelated_tables_do_not_trigger_a_refresh(counting_aggregate):
+    cache_warmup_service.start_background_refresh(interval=60)
+    assert wait_for(lambda: len(counting_aggregate) == 1)
+
+    cache_warmup_service._mark_stale({"table_name": "users"})
+    time.sleep(0.2)
+
+    assert len(counting_aggregate) == 1
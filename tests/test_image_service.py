@@ -0,0 +1,41 @@
+"""
+Tests for the image service: local files outside the static and data
+directories are never read, and remote URLs are never fetched.
+"""
+
+import pytest
+
+from src.services import image_service
+
+LOGO = "static/images/logo.png"
+
+
+@pytest.fixture(autouse=True)
+def scratch_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_service, "THUMBNAIL_CACHE_DIR", tmp_path)
+    image_service.clear_memory_cache()
+    yield
+    image_service.clear_memory_cache()
+
+
+def test_thumbnail_of_a_static_image_fits_the_bucket():
+    thumbnail = image_service.get_thumbnail(LOGO, 64)
+
+    assert thumbnail
+    assert thumbnail == image_service.thumbnail_or_source(LOGO, 60)
+
+
+@pytest.mark.parametrize("source", ["/etc/passwd", "static/../../../etc/passwd", "src/db/connection.py"])
+def test_files_outside_the_image_directories_are_not_read(source, monkeypatch):
+    monkeypatch.setattr(image_service.Path, "read_bytes", lambda path: pytest.fail(f"read {path}"))
+
+    assert image_service.get_thumbnail(source, 64) is None
+    assert image_service.thumbnail_or_source(source, 64) is None
+
+
+def test_remote_urls_are_passed_through_without_fetching(monkeypatch):
+    monkeypatch.setattr(image_service, "_read_source", lambda source: pytest.fail(f"fetched {source}"))
+    url = "http://169.254.169.254/latest/meta-data"
+
+    assert image_service.get_thumbnail(url, 64) is None
+    assert image_service.thumbnail_or_source(url, 64) == url
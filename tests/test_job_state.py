@@ -0,0 +1,33 @@
+"""
+Tests for the print job state machine: a completion whose material usage
+cannot be posted is rolled back and reported, not committed without it.
+"""
+
+from sqlalchemy import func, select
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, StockAdjustment
+from src.db.models.print_job import PrintJob
+from src.services import job_state_service
+from src.services.job_state_service import transition_jobs
+
+
+def test_completion_without_posted_usage_is_rejected(db, monkeypatch):
+    with get_db_session() as session:
+        session.add(Material(id=1, name="State PLA", type="Polymer", unit="g", current_stock=100.0))
+        session.add_all([
+            PrintJob(id=job_id, name=f"Job {job_id}", status="In Progress", material_id=1, material_used=10.0)
+            for job_id in (1, 2)
+        ])
+    # The material is deleted between reading it and posting the usage
+    monkeypatch.setattr(job_state_service, "apply_stock_movements_in_session",
+                        lambda session, movements: {"applied": 0, "missing": [1], "insufficient": []})
+
+    result = transition_jobs([1, 2], "Completed")
+
+    assert result["applied"] == 0
+    assert {(r["job_id"], r["reason"]) for r in result["rejected"]} == {(1, "consumption_failed"),
+                                                                       (2, "consumption_failed")}
+    with get_db_session() as session:
+        assert set(session.scalars(select(PrintJob.status))) == {"In Progress"}
+        assert session.scalar(select(func.count()).select_from(StockAdjustment)) == 0
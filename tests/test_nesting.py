@@ -0,0 +1,106 @@
+"""
+Tests for build-plate nesting: packed parts stay on the plate, never
+overlap and keep the spacing gap, and applying a plate never overwrites
+a part that stopped being Pending.
+"""
+
+import random
+
+import pytest
+from sqlalchemy import select
+
+from src.db.connection import get_db_session
+from src.db.models.print_job import PrintJob
+from src.services.nesting_service import MERGED_STATUS, _merge_plate, pack_parts
+
+TOLERANCE = 0.011  # Placements are rounded to 0.01 mm
+
+
+def random_parts(count, seed):
+    rng = random.Random(seed)
+    return [
+        {"id": i, "size": (rng.uniform(5, 120), rng.uniform(5, 120), rng.uniform(1, 150))}
+        for i in range(count)
+    ]
+
+
+def separated(a, b, spacing):
+    ax, ay, (aw, ad, _) = a["x"], a["y"], a["size"]
+    bx, by, (bw, bd, _) = b["x"], b["y"], b["size"]
+    return (
+        ax + aw + spacing <= bx + TOLERANCE or bx + bw + spacing <= ax + TOLERANCE
+        or ay + ad + spacing <= by + TOLERANCE or by + bd + spacing <= ay + TOLERANCE
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_packed_parts_stay_on_the_plate_without_overlapping(seed):
+    volume, spacing = (250.0, 210.0, 210.0), 5.0
+    parts = random_parts(60, seed)
+
+    result = pack_parts(parts, volume, spacing)
+
+    placed = [p for plate in result["plates"] for p in plate["placements"]]
+    assert sorted([p["id"] for p in placed] + result["unplaced"]) == [part["id"] for part in parts]
+    for plate in result["plates"]:
+        placements = plate["placements"]
+        for p in placements:
+            width, depth, height = p["size"]
+            assert p["x"] >= spacing - TOLERANCE and p["y"] >= spacing - TOLERANCE
+            assert p["x"] + width <= volume[0] - spacing + TOLERANCE
+            assert p["y"] + depth <= volume[1] - spacing + TOLERANCE
+            assert height <= volume[2]
+        for i, a in enumerate(placements):
+            for b in placements[i + 1:]:
+                assert separated(a, b, spacing), (a, b)
+
+
+def test_parts_too_large_for_the_volume_are_left_out():
+    parts = [{"id": 1, "size": (300.0, 10.0, 10.0)}, {"id": 2, "size": (10.0, 10.0, 500.0)},
+             {"id": 3, "size": (200.0, 10.0, 10.0)}]
+
+    result = pack_parts(parts, (250.0, 210.0, 210.0))
+
+    assert sorted(result["unplaced"]) == [1, 2]
+    assert [plate["part_ids"] for plate in result["plates"]] == [[3]]
+
+
+def _pending_jobs(*job_ids):
+    with get_db_session() as session:
+        session.add_all([
+            PrintJob(id=job_id, name=f"Part {job_id}", status="Pending", estimated_duration=30, material_used=5)
+            for job_id in job_ids
+        ])
+    return {
+        job_id: {"id": job_id, "name": f"Part {job_id}", "user_id": None, "estimated_duration": 30, "material_used": 5}
+        for job_id in job_ids
+    }
+
+
+def _statuses():
+    with get_db_session() as session:
+        return dict(session.execute(select(PrintJob.id, PrintJob.status)).all())
+
+
+def test_merge_plate_marks_parts_merged(db):
+    jobs = _pending_jobs(1, 2)
+
+    with get_db_session() as session:
+        combined_id = _merge_plate(session, {"part_ids": [1, 2], "area_utilization": 40.0}, jobs, None, None)
+
+    assert _statuses() == {1: MERGED_STATUS, 2: MERGED_STATUS, combined_id: "Pending"}
+
+
+def test_merge_plate_skips_a_plate_whose_part_moved_on(db):
+    jobs = _pending_jobs(1, 2)
+    with get_db_session() as session:
+        session.get(PrintJob, 2).status = "Scheduled"
+        claimed_at = session.get(PrintJob, 1).updated_at
+
+    with get_db_session() as session:
+        combined_id = _merge_plate(session, {"part_ids": [1, 2], "area_utilization": 40.0}, jobs, None, None)
+
+    assert combined_id is None
+    assert _statuses() == {1: "Pending", 2: "Scheduled"}
+    with get_db_session() as session:
+        assert session.get(PrintJob, 1).updated_at == claimed_at
@@ -0,0 +1,42 @@
+"""
+Tests for the materialized daily OEE: a requeued job drops out of the day
+it had finished on.
+"""
+
+from datetime import datetime, timedelta
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.print_job import PrintJob
+from src.services import oee_service
+from src.services.job_state_service import transition_jobs
+
+NOW = datetime(2026, 3, 10, 12, 0)
+
+
+def add_failed_job(finished_at):
+    with get_db_session() as session:
+        session.add(Device(id=1, name="OEE printer", device_type="FDM", model="Prusa", serial_number="O-1",
+                           status="Active", created_at=NOW - timedelta(days=365)))
+        session.add(PrintJob(id=1, name="OEE job", status="In Progress", device_id=1,
+                             start_time=finished_at - timedelta(hours=1), estimated_duration=60))
+    transition_jobs([1], "Failed", at=finished_at)
+
+
+def finished_by_day():
+    return {row["day"]: row["finished_jobs"] for row in oee_service.get_oee("day", days=10, end=NOW.date())
+            if row["finished_jobs"]}
+
+
+def test_requeued_job_leaves_the_day_it_finished_on(db):
+    finished_at = NOW - timedelta(days=5)
+    add_failed_job(finished_at)
+    oee_service.materialize_oee(now=NOW)
+    assert finished_by_day() == {finished_at.date(): 1}
+
+    transition_jobs([1], "Pending")
+    result = oee_service.materialize_oee(now=NOW + timedelta(minutes=1))
+
+    assert result["days"] == 2  # The day it left and today
+    assert finished_by_day() == {}
+
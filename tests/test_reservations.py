@@ -0,0 +1,106 @@
+"""
+Tests for material reservations: pending print jobs hold their material
+from creation, keep it through dispatch and release it when they finish,
+are cancelled or are merged into a nested plate.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import select
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.material import Material, MaterialReservation
+from src.db.models.print_job import PrintJob
+from src.services import dispatch_service, reservation_service
+from src.services.job_state_service import transition_jobs
+from src.services.nesting_service import _merge_plate
+
+
+def add_material(stock):
+    with get_db_session() as session:
+        session.add(Material(id=1, name="Reserved PLA", type="Polymer", unit="g", current_stock=stock))
+
+
+def add_jobs(*material_used):
+    with get_db_session() as session:
+        for job_id, used in enumerate(material_used, start=1):
+            session.add(PrintJob(id=job_id, name=f"Job {job_id}", status="Pending", material_id=1,
+                                 material_used=used, created_at=datetime(2026, 1, job_id)))
+            session.flush()
+
+
+def held():
+    with get_db_session() as session:
+        return dict(session.execute(select(MaterialReservation.print_job_id, MaterialReservation.quantity)).all())
+
+
+def available():
+    with get_db_session() as session:
+        return session.execute(reservation_service.available_to_promise_query()).one().available
+
+
+def test_pending_jobs_reserve_when_created(db):
+    add_material(100.0)
+
+    add_jobs(60.0, 30.0, 20.0)
+
+    # The third job does not fit the stock that is left, so it holds nothing
+    assert held() == {1: 60.0, 2: 30.0}
+    assert available() == 10.0
+
+
+def test_edited_job_reserves_its_new_quantity(db):
+    add_material(100.0)
+    add_jobs(60.0)
+
+    with get_db_session() as session:
+        session.get(PrintJob, 1).material_used = 80.0
+
+    assert held() == {1: 80.0}
+    assert available() == 20.0
+
+
+def test_cancelled_job_releases_and_requeued_job_reserves_again(db):
+    add_material(100.0)
+    add_jobs(60.0, 30.0)
+
+    transition_jobs([1], "Cancelled")
+    transition_jobs([2], "In Progress")
+    transition_jobs([2], "Failed")
+    assert held() == {}
+    assert available() == 100.0
+
+    transition_jobs([2], "Pending")
+    assert held() == {2: 30.0}
+
+
+def test_dispatch_keeps_the_reservation_and_blocks_unreserved_jobs(db):
+    add_material(100.0)
+    add_jobs(60.0, 30.0, 20.0)
+    with get_db_session() as session:
+        session.add(Device(id=1, name="Printer", device_type="FDM", model="Prusa", serial_number="R-1",
+                           status="Active"))
+
+    result = dispatch_service.dispatch_pending_jobs(now=datetime(2026, 2, 1))
+
+    assert [a["job_id"] for a in result["assignments"]] == [1, 2]
+    assert result["blocked"] == {"insufficient_stock": 1}
+    assert held() == {1: 60.0, 2: 30.0}
+    assert available() == 10.0
+
+
+def test_merged_parts_hand_their_reservation_to_the_combined_job(db):
+    add_material(100.0)
+    add_jobs(40.0, 30.0)
+    parts = {
+        job_id: {"id": job_id, "name": f"Job {job_id}", "user_id": None, "estimated_duration": 30,
+                 "material_used": used}
+        for job_id, used in ((1, 40.0), (2, 30.0))
+    }
+
+    with get_db_session() as session:
+        combined_id = _merge_plate(session, {"part_ids": [1, 2], "area_utilization": 50.0}, parts, 1, None)
+
+    assert held() == {combined_id: 70.0}
+    assert available() == 30.0
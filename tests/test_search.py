@@ -0,0 +1,57 @@
+"""
+Tests for catalog search: full-text ranking on SQLite, and the pattern
+matching fallback when the FTS5 index is missing or fails.
+"""
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.exc import OperationalError
+
+from src.db import search_index
+from src.db.connection import get_db_session
+from src.db.models.material import Material
+from src.services import search_service
+from src.services.material_service import search_materials
+
+
+@pytest.fixture
+def catalog(db):
+    with get_db_session() as session:
+        session.execute(insert(Material.__table__), [
+            {"id": 1, "name": "Carbon Fiber Sheet", "type": "Composite", "description": "Woven twill"},
+            {"id": 2, "name": "PLA Filament", "type": "Polymer", "description": "Carbon filled blend"},
+            {"id": 3, "name": "Aluminum 6061", "type": "Metal", "description": "Bar stock"},
+        ])
+
+
+def test_prefix_words_rank_title_matches_first(catalog):
+    results = search_service.search("carb", ["material"])
+
+    assert [result["id"] for result in results] == [1, 2]
+    assert search_service.search("carb fib", ["material"])[0]["title"] == "Carbon Fiber Sheet"
+
+
+def test_pattern_search_is_used_without_the_index(catalog, monkeypatch):
+    monkeypatch.setattr(search_index, "is_installed", lambda connection: False)
+
+    assert [result["id"] for result in search_service.search("carb", ["material"])] == [1, 2]
+    assert [material.id for material in search_materials("aluminum")] == [3]
+
+
+def test_pattern_search_is_used_when_full_text_search_fails(catalog, monkeypatch):
+    def broken(*args):
+        raise OperationalError("SELECT ... MATCH", {}, Exception("no such module: fts5"))
+
+    monkeypatch.setattr(search_service, "_fts_search", broken)
+
+    assert [result["id"] for result in search_service.search("carbon", ["material"])] == [1, 2]
+
+
+def test_search_ids_returns_every_match(db):
+    with get_db_session() as session:
+        session.execute(insert(Material.__table__), [
+            {"id": i, "name": f"Bulk resin {i}", "type": "Polymer"} for i in range(1, 1201)
+        ])
+
+    assert len(search_service.search_ids("resin", "material")) == 1200
+    assert len(search_materials("bulk resin")) == 1200
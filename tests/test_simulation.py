@@ -0,0 +1,46 @@
+"""
+Tests for the farm simulation parameters: every estimate comes from the
+same history window.
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.db.connection import get_db_session
+from src.db.models.print_job import PrintJob
+from src.services.simulation_service import FarmParameters, estimate_parameters
+
+NOW = datetime(2026, 3, 1)
+
+
+def add_finished_job(job_id, ended_days_ago, success, duration):
+    end_time = NOW - timedelta(days=ended_days_ago)
+    with get_db_session() as session:
+        session.add(PrintJob(id=job_id, name=f"Job {job_id}", status="Completed" if success else "Failed",
+                             success=success, actual_duration=duration, created_at=end_time - timedelta(hours=2),
+                             end_time=end_time))
+
+
+def test_durations_and_failures_only_use_the_window(db):
+    add_finished_job(1, 5, True, 30.0)
+    add_finished_job(2, 10, True, 50.0)
+    add_finished_job(3, 200, False, 600.0)
+
+    params = estimate_parameters(days=30, now=NOW)
+
+    assert sorted(params.durations) == [30.0, 50.0]
+    assert params.failure_rate == 0.0
+    assert params.source["jobs"] == params.source["finished_jobs"] == 2
+
+
+@pytest.mark.parametrize("add_devices, expected", [
+    (-3, {"A": 8, "B": 4}),
+    (-14, {"A": 1}),
+    (-20, {}),
+    (2, {"A": 10, "B": 5, "New capacity": 2}),
+])
+def test_scenario_removes_devices_across_locations(add_devices, expected):
+    params = FarmParameters(devices_by_location={"A": 10, "B": 5}, arrivals_per_hour=1.0)
+
+    assert params.scenario(add_devices=add_devices).devices_by_location == expected
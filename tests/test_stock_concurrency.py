@@ -0,0 +1,123 @@
+"""
+Concurrency tests for atomic stock adjustments.
+Threads share one SQLite database file, so lost updates and oversold
+stock show up as wrong totals.
+"""
+
+import threading
+
+import pytest
+
+from src.db.connection import Session, get_db_session
+from src.db.models.material import Material, StockAdjustment
+from src.services.material_service import (
+    adjust_material_stock, apply_stock_movements, apply_stock_movements_in_session,
+)
+
+THREADS = 8
+ADJUSTMENTS = 25
+
+
+def run_threads(count, target):
+    def run():
+        try:
+            target()
+        finally:
+            Session.remove()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def add_materials(*stock_levels):
+    with get_db_session() as session:
+        session.add_all([
+            Material(id=material_id, name=f"Concurrency material {material_id}", type="Polymer", current_stock=stock)
+            for material_id, stock in enumerate(stock_levels, start=1)
+        ])
+
+
+def stock(material_id):
+    with get_db_session() as session:
+        return session.get(Material, material_id).current_stock
+
+
+def adjustment_count(material_id):
+    with get_db_session() as session:
+        return session.query(StockAdjustment).filter(StockAdjustment.material_id == material_id).count()
+
+
+def test_concurrent_additions_are_not_lost(db):
+    add_materials(0.0)
+    failures = []
+
+    def add():
+        for _ in range(ADJUSTMENTS):
+            if not adjust_material_stock(1, 1.0, "Purchase"):
+                failures.append(1)
+
+    run_threads(THREADS, add)
+
+    assert not failures
+    assert stock(1) == THREADS * ADJUSTMENTS
+    assert adjustment_count(1) == THREADS * ADJUSTMENTS
+
+
+def test_guarded_withdrawals_never_oversell(db):
+    available = THREADS * ADJUSTMENTS // 2
+    add_materials(float(available))
+    succeeded = []
+
+    def withdraw():
+        for _ in range(ADJUSTMENTS):
+            if adjust_material_stock(1, -1.0, "Usage", allow_negative=False):
+                succeeded.append(1)
+
+    run_threads(THREADS, withdraw)
+
+    assert len(succeeded) == available
+    assert stock(1) == 0
+    assert adjustment_count(1) == available
+
+
+def test_batch_with_an_insufficient_line_is_rejected_whole(db):
+    add_materials(10.0, 5.0)
+
+    result = apply_stock_movements([(1, -1.0, "Usage"), (2, -10.0, "Usage")], allow_negative=False)
+
+    assert result["applied"] == 0
+    assert result["insufficient"] == [2]
+    assert stock(1) == 10.0
+    assert stock(2) == 5.0
+    assert adjustment_count(1) == 0
+
+
+def test_rejected_batch_leaves_stock_and_timestamps_untouched(db):
+    add_materials(0.1, 5.0)
+    with get_db_session() as session:
+        before = {material.id: material.updated_at for material in session.query(Material)}
+
+    result = apply_stock_movements([(1, 0.2, "Purchase"), (2, -10.0, "Usage"), (99, 1.0, "Purchase")],
+                                   allow_negative=False)
+
+    assert result == {"applied": 0, "missing": [99], "insufficient": [2]}
+    assert stock(1) == 0.1  # Not 0.1 + 0.2 - 0.2
+    with get_db_session() as session:
+        assert {material.id: material.updated_at for material in session.query(Material)} == before
+
+
+def test_applied_movements_roll_back_with_their_transaction(db):
+    add_materials(10.0)
+
+    with pytest.raises(RuntimeError):
+        with get_db_session() as session:
+            assert apply_stock_movements_in_session(session, [
+                {"material_id": 1, "quantity": -1.0, "adjustment_type": "Usage"},
+            ], allow_negative=False)["applied"] == 1
+            raise RuntimeError("later failure in the same transaction")
+
+    assert stock(1) == 10.0
+    assert adjustment_count(1) == 0
@@ -0,0 +1,64 @@
+"""
+Tests for bulk stock movement imports: errors and notes refer to the
+spreadsheet row the user sees, even after blank rows.
+"""
+
+import io
+
+import pytest
+from sqlalchemy import select
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, StockAdjustment
+from src.services.stock_import_service import import_stock_movements
+
+
+def upload(content: bytes, name: str) -> io.BytesIO:
+    buffer = io.BytesIO(content)
+    buffer.name = name
+    return buffer
+
+
+@pytest.fixture
+def materials(db):
+    with get_db_session() as session:
+        session.add_all([
+            Material(id=1, name="Import PLA", type="Polymer", current_stock=10.0),
+            Material(id=2, name="Import Resin", type="Polymer", current_stock=10.0),
+        ])
+
+
+def imported_notes():
+    with get_db_session() as session:
+        return sorted(session.scalars(select(StockAdjustment.notes)))
+
+
+def test_csv_errors_report_the_spreadsheet_row_after_blank_lines(materials):
+    content = b"material_id,quantity,type\n1,2,Purchase\n\n2,3,BOGUS\n , ,\n2,-1,Usage\n"
+
+    result = import_stock_movements(upload(content, "movements.csv"))
+
+    assert result["applied"] == 2
+    assert [(error["row"], error["column"]) for error in result["errors"]] == [(4, "adjustment_type")]
+    assert imported_notes() == ["Imported from movements.csv row 2", "Imported from movements.csv row 6"]
+
+
+def test_excel_errors_report_the_sheet_row_after_blank_rows(materials):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["material_id", "quantity", "type"])
+    sheet.append([1, 2, "Purchase"])
+    sheet.append([])
+    sheet.append([2, 3, "BOGUS"])
+    sheet.cell(row=7, column=1, value=2)
+    sheet.cell(row=7, column=2, value=-1)
+    sheet.cell(row=7, column=3, value="Usage")
+    content = io.BytesIO()
+    workbook.save(content)
+
+    result = import_stock_movements(upload(content.getvalue(), "movements.xlsx"))
+
+    assert result["applied"] == 2
+    assert [(error["row"], error["column"]) for error in result["errors"]] == [(4, "adjustment_type")]
+    assert imported_notes() == ["Imported from movements.xlsx row 2", "Imported from movements.xlsx row 7"]
@@ -0,0 +1,50 @@
+"""
+Tests for telemetry retention: expired samples are pruned once they are
+rolled up, and the writer's background thread runs the pruning.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from src.db.connection import get_db_session
+from src.services import telemetry_service
+from src.services.telemetry_service import TelemetryWriter, prune_telemetry, rollup_telemetry, write_samples
+
+NOW = datetime(2026, 3, 1)
+
+
+def add_samples(start, minutes):
+    write_samples([
+        {"device_id": 1, "job_id": 1, "ts": start + timedelta(seconds=second), "progress": second / 60}
+        for second in range(0, minutes * 60, 10)
+    ])
+
+
+def sample_count():
+    with get_db_session() as session:
+        return session.scalar(select(func.count()).select_from(telemetry_service.samples_table))
+
+
+def test_expired_samples_are_pruned_once_rolled_up(db):
+    add_samples(NOW - timedelta(days=10), 5)
+
+    # Not rolled up yet: kept past the retention period
+    assert prune_telemetry(now=NOW)["raw"] == 0
+
+    rollup_telemetry(now=NOW)
+    assert prune_telemetry(now=NOW)["raw"] == 30
+    assert sample_count() == 0
+
+
+def test_writer_prunes_in_the_background(db, monkeypatch):
+    calls = []
+    monkeypatch.setattr(telemetry_service, "prune_telemetry", lambda: calls.append(1))
+    writer = TelemetryWriter(flush_interval=0.01, rollup_interval=3600, prune_interval=0.05)
+
+    writer.start()
+    time.sleep(0.3)
+    writer.stop(timeout=5)
+
+    assert calls
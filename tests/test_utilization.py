@@ -0,0 +1,34 @@
+"""
+Tests for the rolling utilization engine: refreshing after a gap of
+several days gives the same window as a full rebuild.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from src.db.connection import get_db_session
+from src.db.models.device import Device
+from src.db.models.print_job import PrintJob
+from src.services.utilization_service import UtilizationEngine
+
+START = datetime(2026, 3, 10, 12, 0)
+
+
+def test_refresh_after_a_gap_recomputes_the_skipped_days(db):
+    with get_db_session() as session:
+        session.add(Device(id=1, name="Busy printer", device_type="FDM", model="Prusa", serial_number="U-1",
+                           status="Active"))
+        session.add(PrintJob(id=1, name="Six hours", status="Completed", device_id=1,
+                             start_time=datetime(2026, 3, 11, 6, 0), end_time=datetime(2026, 3, 11, 12, 0)))
+    engine = UtilizationEngine(days=7)
+    engine.rebuild(START)
+
+    engine.refresh(START + timedelta(days=2))
+    rebuilt = UtilizationEngine(days=7)
+    rebuilt.rebuild(START + timedelta(days=2))
+
+    refreshed, expected = engine.utilization(), rebuilt.utilization()
+    assert np.array_equal(refreshed["bin_starts"], expected["bin_starts"])
+    np.testing.assert_allclose(refreshed["percent"], expected["percent"])
+    assert refreshed["percent"][0][list(refreshed["bin_starts"]).index(np.datetime64("2026-03-11"))] == 25.0
@@ -0,0 +1,165 @@
+"""
+Tests for FIFO and moving-average inventory valuation.
+The vectorized replay is compared with a straightforward per-movement
+loop over a random ledger with opening balances, missing costs and
+negative stock, with and without month-end checkpoints.
+"""
+
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, insert, select, text
+
+from src.db.connection import get_db_session
+from src.db.models.material import Material, StockAdjustment, ValuationCheckpoint
+from src.services import valuation_service
+from src.services.material_service import apply_stock_movements
+
+MATERIALS = 20
+MOVEMENTS = 1500
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def ledger(db):
+    rng = random.Random(7)
+    stock = [0.0] * MATERIALS
+    movements = []
+    for _ in range(MOVEMENTS):
+        material = rng.randrange(MATERIALS)
+        quantity = rng.choice([1, 1, -1]) * rng.uniform(0.1, 20)
+        stock[material] += quantity
+        movements.append({
+            "material_id": material + 1,
+            "quantity": quantity,
+            "unit_cost": rng.choice([None, rng.uniform(1, 10), rng.uniform(1, 10)]),
+            "adjustment_type": "Test",
+            "adjustment_date": START + timedelta(minutes=rng.randrange(60 * 24 * 400)),
+        })
+
+    with get_db_session() as session:
+        session.execute(insert(Material.__table__), [
+            {
+                "id": material + 1,
+                "name": f"Material {material}",
+                "type": "Polymer",
+                # Every third material has stock the ledger does not explain
+                "current_stock": stock[material] + (10.0 if material % 3 == 0 else 0.0),
+                "cost_per_unit": rng.choice([None, 5.0]),
+                "is_active": True,
+            }
+            for material in range(MATERIALS)
+        ])
+        session.execute(insert(StockAdjustment.__table__), movements)
+
+
+def reference_valuation(at, method):
+    """Per-movement replay: material id -> (quantity, value, consumed cost)"""
+    with get_db_session() as session:
+        materials = session.execute(text(
+            "SELECT id, current_stock, COALESCE(cost_per_unit, price_per_unit, 0) FROM materials"
+        )).all()
+        totals = dict(session.execute(text(
+            "SELECT material_id, SUM(quantity) FROM stock_adjustments GROUP BY material_id"
+        )).all())
+        movements = session.execute(text(
+            "SELECT material_id, quantity, unit_cost FROM stock_adjustments WHERE adjustment_date < :at "
+            "ORDER BY material_id, adjustment_date, id"
+        ), {"at": at}).all()
+
+    by_material = {}
+    for material_id, quantity, cost in movements:
+        by_material.setdefault(material_id, []).append((quantity, cost))
+
+    result = {}
+    for material_id, current_stock, fallback_cost in materials:
+        opening = current_stock - (totals.get(material_id) or 0)
+        opening = 0.0 if abs(opening) < 1e-9 else opening
+        last_cost, consumed = fallback_cost, 0.0
+
+        if method == "fifo":
+            layers = [[opening, fallback_cost]] if opening > 0 else []
+            short = max(-opening, 0.0)
+            for quantity, cost in by_material.get(material_id, []):
+                if quantity > 0:
+                    cost = last_cost if cost is None else cost
+                    last_cost = cost
+                    cover = min(short, quantity)
+                    short, quantity = short - cover, quantity - cover
+                    if quantity > 0:
+                        layers.append([quantity, cost])
+                else:
+                    need = -quantity
+                    while need > 1e-12 and layers:
+                        take = min(need, layers[0][0])
+                        consumed += take * layers[0][1]
+                        layers[0][0] -= take
+                        need -= take
+                        if layers[0][0] <= 1e-12:
+                            layers.pop(0)
+                    if need > 1e-12:
+                        consumed += need * last_cost
+                        short += need
+            quantity = sum(layer[0] for layer in layers) - short
+            value = sum(layer[0] * layer[1] for layer in layers) if quantity > 1e-9 else quantity * last_cost
+        else:
+            quantity, average = opening, fallback_cost
+            for moved, cost in by_material.get(material_id, []):
+                if moved > 0:
+                    cost = last_cost if cost is None else cost
+                    last_cost = cost
+                    average = cost if quantity <= 1e-9 else (quantity * average + moved * cost) / (quantity + moved)
+                else:
+                    consumed += -moved * average
+                quantity += moved
+            value = quantity * average
+
+        result[material_id] = (quantity, value, consumed)
+    return result
+
+
+def assert_matches_reference(at, method):
+    expected = reference_valuation(at, method)
+    with get_db_session() as session:
+        valuation = valuation_service.compute_valuation(session, at, method)
+
+    for material_id, (quantity, value, consumed) in expected.items():
+        row = valuation.loc[material_id]
+        assert math.isclose(row.quantity, quantity, abs_tol=1e-6), material_id
+        assert math.isclose(row.value, value, rel_tol=1e-7, abs_tol=1e-5), material_id
+        assert math.isclose(row.consumed_cost, consumed, rel_tol=1e-7, abs_tol=1e-5), material_id
+
+
+@pytest.mark.parametrize("method", valuation_service.METHODS)
+def test_replay_matches_reference(ledger, method):
+    assert_matches_reference(datetime(2025, 7, 1), method)
+    assert_matches_reference(datetime(2026, 3, 1), method)
+
+
+@pytest.mark.parametrize("method", valuation_service.METHODS)
+def test_checkpoints_give_the_same_valuation(ledger, method):
+    assert valuation_service.checkpoint_valuations(method, datetime(2025, 12, 1)) > 0
+
+    assert_matches_reference(datetime(2026, 3, 1), method)
+    assert_matches_reference(datetime(2025, 12, 15), method)
+
+
+@pytest.mark.parametrize("method", valuation_service.METHODS)
+def test_backdated_movement_drops_later_checkpoints(ledger, method):
+    valuation_service.checkpoint_valuations(method, datetime(2025, 12, 1))
+
+    apply_stock_movements([{"material_id": 1, "quantity": 5.0, "adjustment_type": "Purchase",
+                            "unit_cost": 3.0, "adjustment_date": datetime(2025, 6, 1)}])
+
+    with get_db_session() as session:
+        later = session.scalar(
+            select(func.count()).select_from(ValuationCheckpoint.__table__).where(
+                ValuationCheckpoint.material_id == 1,
+                ValuationCheckpoint.method == method,
+                ValuationCheckpoint.checkpoint_at > datetime(2025, 6, 1),
+            )
+        )
+    assert later == 0
+    assert_matches_reference(datetime(2026, 3, 1), method)